@@ -12,51 +12,135 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable, Sequence
+import importlib.metadata
+import threading
 from typing import cast
 
 from oslo_log import log as logging
-from stevedore import extension
+from stevedore import named
 
 import os_vif.exception
 import os_vif.i18n
 import os_vif.objects
 import os_vif.plugin
 
-_EXT_MANAGER: extension.ExtensionManager[
-    os_vif.plugin.PluginBase
-] | None = None
 LOG = logging.getLogger(__name__)
 
 
+class _PluginManager:
+    """The VIF plugins registered in the ``os_vif`` namespace.
+
+    Only the entry points are read up front. A plugin is imported,
+    configured and instantiated the first time it is used, so a process
+    does not pay for the dependencies of the plugins it never uses.
+    """
+
+    def __init__(self) -> None:
+        self._entry_points = self._list_entry_points('os_vif')
+        self._manifests = self._list_entry_points('os_vif.manifests')
+        self._plugins: dict[str, os_vif.plugin.PluginBase] = {}
+        self._lock = threading.Lock()
+        self._host_info: os_vif.objects.HostInfo | None = None
+
+    @staticmethod
+    def _list_entry_points(
+        namespace: str,
+    ) -> dict[str, importlib.metadata.EntryPoint]:
+        # NOTE: no names are given, so stevedore only lists the entry
+        # points (from its cache) and does not load any of them
+        manager: named.NamedExtensionManager[
+            object
+        ] = named.NamedExtensionManager(
+            namespace=namespace, names=[], invoke_on_load=False)
+        return {ep.name: ep for ep in manager.list_entry_points()}
+
+    def names(self) -> list[str]:
+        return list(self._entry_points)
+
+    def get(self, plugin_name: str) -> os_vif.plugin.PluginBase:
+        """Return the plugin called ``plugin_name``, loading it if needed.
+
+        :raises ``exception.NoMatchingPlugin`` if there is no such plugin.
+        """
+        plugin = self._plugins.get(plugin_name)
+        if plugin is not None:
+            return plugin
+
+        try:
+            entry_point = self._entry_points[plugin_name]
+        except KeyError:
+            raise os_vif.exception.NoMatchingPlugin(plugin_name=plugin_name)
+
+        with self._lock:
+            plugin = self._plugins.get(plugin_name)
+            if plugin is None:
+                cls = cast(
+                    type[os_vif.plugin.PluginBase], entry_point.load())
+                plugin = cls.load(plugin_name)
+                LOG.debug(("Loaded VIF plugin class '%(cls)s' "
+                           "with name '%(plugin_name)s'"),
+                          {'cls': cls, 'plugin_name': plugin_name})
+                self._plugins[plugin_name] = plugin
+        return plugin
+
+    def describe(self, plugin_name: str) -> os_vif.objects.HostPluginInfo:
+        """Describe a plugin, from its manifest if it has one."""
+        entry_point = self._manifests.get(plugin_name)
+        if entry_point is not None:
+            try:
+                manifest = cast(
+                    Sequence[os_vif.plugin.VIFManifest], entry_point.load())
+                return os_vif.objects.host_info.HostPluginInfo.from_manifest(
+                    plugin_name, manifest)
+            except Exception:
+                LOG.warning("Unable to load the manifest of VIF plugin "
+                            "'%s', loading the plugin instead",
+                            plugin_name, exc_info=True)
+        return self.get(plugin_name).describe()
+
+    def host_info(
+        self, permitted_vif_type_names: list[str] | None,
+    ) -> os_vif.objects.HostInfo:
+        """Return a copy of the, possibly filtered, description of the host.
+
+        The description and its filtered views are built once. Concurrent
+        callers may both build them, which is harmless, so this is not
+        locked.
+        """
+        info = self._host_info
+        if info is None:
+            info = os_vif.objects.host_info.HostInfo(plugin_info=[
+                self.describe(name) for name in sorted(self.names())])
+            self._host_info = info
+        if permitted_vif_type_names is not None:
+            info = info.filtered_vif_types(permitted_vif_type_names)
+        return info.obj_clone()
+
+
+_EXT_MANAGER: _PluginManager | None = None
+
+
 def initialize(reset: bool = False) -> None:
     """
-    Loads all os_vif plugins and initializes them with a dictionary of
-    configuration options. These configuration options are passed as-is
-    to the individual VIF plugins that are loaded via stevedore.
+    Registers the os_vif plugins. Each plugin is loaded and initialized
+    with its configuration options the first time a VIF it handles is
+    plugged or unplugged, or when :func:`host_info` is called for a plugin
+    that does not provide a manifest. These
+    configuration options are passed as-is to the individual VIF plugins
+    that are found via stevedore.
 
-    :param reset: Recreate and load the VIF plugin extensions.
+    :param reset: Recreate the registry of VIF plugins, discarding the
+                  plugins loaded so far.
     """
     global _EXT_MANAGER
     if _EXT_MANAGER is None:
         os_vif.objects.register_all()
 
     if reset or (_EXT_MANAGER is None):
-        _EXT_MANAGER = extension.ExtensionManager(
-            namespace='os_vif', invoke_on_load=False)
-        loaded_plugins = []
-        for plugin_name in _EXT_MANAGER.names():
-            # FIXME(stephenfin): This is a bug in stevedore's typing
-            # https://review.opendev.org/c/openstack/stevedore/+/986059
-            cls = cast(
-                os_vif.plugin.PluginBase, _EXT_MANAGER[plugin_name].plugin
-            )
-            obj = cls.load(plugin_name)
-            LOG.debug(("Loaded VIF plugin class '%(cls)s' "
-                       "with name '%(plugin_name)s'"),
-                      {'cls': cls, 'plugin_name': plugin_name})
-            loaded_plugins.append(plugin_name)
-            _EXT_MANAGER[plugin_name].obj = obj
-        LOG.info("Loaded VIF plugins: %s", ", ".join(loaded_plugins))
+        _EXT_MANAGER = _PluginManager()
+        LOG.info("Registered VIF plugins: %s",
+                 ", ".join(_EXT_MANAGER.names()))
 
 
 def plug(
@@ -79,15 +163,7 @@ def plug(
     if _EXT_MANAGER is None:
         raise os_vif.exception.LibraryNotInitialized()
 
-    plugin_name = vif.plugin
-    try:
-        plugin = _EXT_MANAGER[plugin_name].obj
-    except KeyError:
-        raise os_vif.exception.NoMatchingPlugin(plugin_name=plugin_name)
-
-    # we know this is set since ExtensionManager was invoked with
-    # invoke_on_load
-    assert plugin is not None
+    plugin = _EXT_MANAGER.get(vif.plugin)
 
     try:
         LOG.debug("Plugging vif %s", vif)
@@ -119,15 +195,7 @@ def unplug(
     if _EXT_MANAGER is None:
         raise os_vif.exception.LibraryNotInitialized()
 
-    plugin_name = vif.plugin
-    try:
-        plugin = _EXT_MANAGER[plugin_name].obj
-    except KeyError:
-        raise os_vif.exception.NoMatchingPlugin(plugin_name=plugin_name)
-
-    # we know this is set since ExtensionManager was invoked with
-    # invoke_on_load
-    assert plugin is not None
+    plugin = _EXT_MANAGER.get(vif.plugin)
 
     try:
         LOG.debug("Unplugging vif %s", vif)
@@ -139,6 +207,134 @@ def unplug(
         raise os_vif.exception.UnplugException(vif=vif, err=err)
 
 
+def _group_by_plugin(
+    vifs: Sequence[os_vif.objects.VIFBase],
+) -> dict[str, list[int]]:
+    """Return the indexes of ``vifs`` grouped by plugin name, in order."""
+    groups: dict[str, list[int]] = {}
+    for idx, vif in enumerate(vifs):
+        groups.setdefault(vif.plugin, []).append(idx)
+    return groups
+
+
+def _run_batch(
+    vifs: Sequence[os_vif.objects.VIFBase],
+    instance_info: os_vif.objects.InstanceInfo,
+    action: str,
+    exc_class: type[os_vif.exception.ExceptionBase],
+) -> list[os_vif.exception.ExceptionBase | None]:
+    if _EXT_MANAGER is None:
+        raise os_vif.exception.LibraryNotInitialized()
+
+    results: list[os_vif.exception.ExceptionBase | None] = [None] * len(vifs)
+    for plugin_name, indexes in _group_by_plugin(vifs).items():
+        try:
+            plugin = _EXT_MANAGER.get(plugin_name)
+        except os_vif.exception.NoMatchingPlugin:
+            for idx in indexes:
+                results[idx] = os_vif.exception.NoMatchingPlugin(
+                    plugin_name=plugin_name)
+            continue
+        except Exception as err:
+            # The plugin failed to import or to load, so none of its VIFs
+            # can be handled but the other plugins can still run.
+            LOG.error("Failed to load plugin %(plugin)s",
+                      {'plugin': plugin_name}, exc_info=True)
+            for idx in indexes:
+                results[idx] = exc_class(vif=vifs[idx], err=err)
+            continue
+
+        batch = [vifs[idx] for idx in indexes]
+        run: Callable[
+            [Sequence[os_vif.objects.VIFBase], os_vif.objects.InstanceInfo],
+            list[Exception | None],
+        ] = getattr(plugin, action + '_batch')
+        LOG.debug("%(action)sging %(count)d vifs with plugin %(plugin)s",
+                  {'action': action.capitalize(), 'count': len(batch),
+                   'plugin': plugin_name})
+        try:
+            errors = run(batch, instance_info)
+        except Exception as err:
+            # A plugin should report per-VIF failures in its results, but
+            # if the batch as a whole blows up then every VIF in it failed.
+            LOG.error("Failed to %(action)s vifs with plugin %(plugin)s",
+                      {'action': action, 'plugin': plugin_name},
+                      exc_info=True)
+            errors = [err] * len(batch)
+
+        if len(errors) != len(batch):
+            # The results cannot be matched to the VIFs, so do not report
+            # any of them as plugged or unplugged.
+            LOG.error("Plugin %(plugin)s returned %(results)d results for "
+                      "%(count)d vifs",
+                      {'plugin': plugin_name, 'results': len(errors),
+                       'count': len(batch)})
+            errors = [RuntimeError(
+                'plugin %s returned %d results for %d vifs' % (
+                    plugin_name, len(errors), len(batch)))] * len(batch)
+
+        for idx, vif, error in zip(indexes, batch, errors):
+            if error is None:
+                LOG.info("Successfully %(action)sged vif %(vif)s",
+                         {'action': action, 'vif': vif})
+                continue
+            LOG.error("Failed to %(action)s vif %(vif)s: %(err)s",
+                      {'action': action, 'vif': vif, 'err': error})
+            results[idx] = exc_class(vif=vif, err=error)
+    return results
+
+
+def plug_many(
+    vifs: Sequence[os_vif.objects.VIFBase],
+    instance_info: os_vif.objects.InstanceInfo,
+) -> list[os_vif.exception.ExceptionBase | None]:
+    """
+    Given a list of VIF models, perform operations to plug them all.
+
+    The VIFs are grouped by plugin and each plugin is handed its whole
+    group at once via ``PluginBase.plug_batch()``, which allows plugins to
+    amortize backend work across many VIFs. A failure to plug one VIF does
+    not prevent the others from being plugged.
+
+    :param vifs: Sequence of instances of subclasses of
+                 ``os_vif.objects.vif.VIFBase``.
+    :param instance_info: ``os_vif.objects.instance_info.InstanceInfo`` object.
+    :raises ``exception.LibraryNotInitialized`` if the user of the library
+            did not call ``os_vif.initialize(**config)`` before trying to
+            plug VIFs.
+    :returns: a list with one entry per VIF, in the same order as ``vifs``.
+              Each entry is ``None`` if the VIF was plugged,
+              ``exception.NoMatchingPlugin`` if there is no plugin for the
+              type of VIF or ``exception.PlugException`` if plugging it
+              failed.
+    """
+    return _run_batch(
+        vifs, instance_info, 'plug', os_vif.exception.PlugException)
+
+
+def unplug_many(
+    vifs: Sequence[os_vif.objects.VIFBase],
+    instance_info: os_vif.objects.InstanceInfo,
+) -> list[os_vif.exception.ExceptionBase | None]:
+    """
+    Given a list of VIF models, perform operations to unplug them all.
+
+    :param vifs: Sequence of instances of subclasses of
+                 ``os_vif.objects.vif.VIFBase``.
+    :param instance_info: ``os_vif.objects.instance_info.InstanceInfo`` object.
+    :raises ``exception.LibraryNotInitialized`` if the user of the library
+            did not call ``os_vif.initialize(**config)`` before trying to
+            unplug VIFs.
+    :returns: a list with one entry per VIF, in the same order as ``vifs``.
+              Each entry is ``None`` if the VIF was unplugged,
+              ``exception.NoMatchingPlugin`` if there is no plugin for the
+              type of VIF or ``exception.UnplugException`` if unplugging it
+              failed.
+    """
+    return _run_batch(
+        vifs, instance_info, 'unplug', os_vif.exception.UnplugException)
+
+
 def host_info(
     permitted_vif_type_names: list[str] | None = None,
 ) -> os_vif.objects.HostInfo:
@@ -156,21 +352,14 @@ def host_info(
     usage configuration. For example, to remove VIFVHostUser if
     the guest does not support shared memory.
 
+    The plugins that declare their supported VIF types in an
+    ``os_vif.manifests`` entry point are not imported. The result is
+    computed once per filter and a copy of it is returned.
+
     :returns: a os_vif.host_info.HostInfo class instance
     """
 
     if _EXT_MANAGER is None:
         raise os_vif.exception.LibraryNotInitialized()
 
-    plugins = []
-    for name in sorted(_EXT_MANAGER.names()):
-        plugin = _EXT_MANAGER[name].obj
-        # We know obj is non-none since we invoked ExtensionManager with
-        # invoke_on_load
-        assert plugin is not None
-        plugins.append(plugin.describe())
-
-    info = os_vif.objects.host_info.HostInfo(plugin_info=plugins)
-    if permitted_vif_type_names is not None:
-        info.filter_vif_types(permitted_vif_type_names)
-    return info
+    return _EXT_MANAGER.host_info(permitted_vif_type_names)
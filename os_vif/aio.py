@@ -0,0 +1,190 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""asyncio front-end to the os-vif API.
+
+The plugins are synchronous and block on OVSDB commits and privsep calls,
+so the coroutines in this module run the regular :mod:`os_vif` functions on
+bounded pools of worker threads. This allows an asyncio based agent to
+overlap many plugs without blocking its event loop. The exceptions raised
+are the same as for the synchronous API.
+
+Each plugin gets its own pool. Only the plugins that declare themselves
+thread safe, see :attr:`os_vif.plugin.PluginBase.THREAD_SAFE`, run several
+operations at once, the others run them one at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Sequence
+from concurrent import futures
+import functools
+import threading
+from typing import TypeVar
+
+import os_vif
+import os_vif.exception
+import os_vif.objects
+
+DEFAULT_MAX_WORKERS = 8
+
+_T = TypeVar('_T')
+
+# The worker pools by plugin name, host_info() runs on the pool of None
+_EXECUTORS: dict[str | None, futures.ThreadPoolExecutor] = {}
+# Whether the plugins are thread safe, by plugin name
+_THREAD_SAFE: dict[str, bool] = {}
+_EXECUTOR_LOCK = threading.Lock()
+_max_workers = DEFAULT_MAX_WORKERS
+
+
+def configure(max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+    """Set the maximum number of VIF operations run concurrently by a plugin.
+
+    Operations already running are not affected, new ones are run on new
+    pools of up to ``max_workers`` threads. The plugins that are not thread
+    safe always run one operation at a time.
+
+    :param max_workers: maximum number of worker threads per plugin.
+    """
+    global _max_workers
+    if max_workers < 1:
+        raise ValueError('max_workers must be greater than zero')
+    with _EXECUTOR_LOCK:
+        _max_workers = max_workers
+        _shutdown(wait=False)
+
+
+def shutdown(wait: bool = True) -> None:
+    """Release the worker threads.
+
+    :param wait: wait for the running operations to complete.
+    """
+    with _EXECUTOR_LOCK:
+        _shutdown(wait)
+        _THREAD_SAFE.clear()
+
+
+def _shutdown(wait: bool) -> None:
+    for executor in _EXECUTORS.values():
+        executor.shutdown(wait=wait)
+    _EXECUTORS.clear()
+
+
+def _get_executor(
+    plugin_name: str | None = None,
+) -> futures.ThreadPoolExecutor:
+    with _EXECUTOR_LOCK:
+        executor = _EXECUTORS.get(plugin_name)
+        if executor is None:
+            if plugin_name is None or _THREAD_SAFE.get(plugin_name):
+                max_workers = _max_workers
+            else:
+                max_workers = 1
+            executor = futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='os_vif')
+            _EXECUTORS[plugin_name] = executor
+        return executor
+
+
+def _is_thread_safe(plugin_name: str) -> bool:
+    assert os_vif._EXT_MANAGER is not None  # narrow type
+    try:
+        return os_vif._EXT_MANAGER.get(plugin_name).THREAD_SAFE
+    except Exception:
+        # NOTE: the error is raised by the operation itself
+        return False
+
+
+async def _run(
+    func: Callable[..., _T], *args: object, plugin_name: str | None = None,
+) -> _T:
+    # NOTE: fail fast rather than spending a worker thread on it
+    if os_vif._EXT_MANAGER is None:
+        raise os_vif.exception.LibraryNotInitialized()
+    loop = asyncio.get_running_loop()
+    if plugin_name is not None and plugin_name not in _THREAD_SAFE:
+        # NOTE: the plugin is loaded on a worker as it may be imported
+        thread_safe = await loop.run_in_executor(
+            _get_executor(), _is_thread_safe, plugin_name)
+        _THREAD_SAFE.setdefault(plugin_name, thread_safe)
+    return await loop.run_in_executor(
+        _get_executor(plugin_name), functools.partial(func, *args))
+
+
+async def _run_many(
+    func: Callable[
+        [Sequence[os_vif.objects.VIFBase], os_vif.objects.InstanceInfo],
+        list[os_vif.exception.ExceptionBase | None],
+    ],
+    vifs: Sequence[os_vif.objects.VIFBase],
+    instance_info: os_vif.objects.InstanceInfo,
+) -> list[os_vif.exception.ExceptionBase | None]:
+    """Run a batch operation on the pool of the plugin of each VIF."""
+    if os_vif._EXT_MANAGER is None:
+        raise os_vif.exception.LibraryNotInitialized()
+    groups = os_vif._group_by_plugin(vifs)
+    group_results = await asyncio.gather(*[
+        _run(func, [vifs[idx] for idx in indexes], instance_info,
+             plugin_name=plugin_name)
+        for plugin_name, indexes in groups.items()])
+    results: list[os_vif.exception.ExceptionBase | None] = [None] * len(vifs)
+    for indexes, group_result in zip(groups.values(), group_results):
+        for idx, result in zip(indexes, group_result):
+            results[idx] = result
+    return results
+
+
+async def plug(
+    vif: os_vif.objects.VIFBase,
+    instance_info: os_vif.objects.InstanceInfo,
+) -> None:
+    """Asynchronous version of :func:`os_vif.plug`."""
+    await _run(os_vif.plug, vif, instance_info, plugin_name=vif.plugin)
+
+
+async def unplug(
+    vif: os_vif.objects.VIFBase,
+    instance_info: os_vif.objects.InstanceInfo,
+) -> None:
+    """Asynchronous version of :func:`os_vif.unplug`."""
+    await _run(os_vif.unplug, vif, instance_info, plugin_name=vif.plugin)
+
+
+async def plug_many(
+    vifs: Sequence[os_vif.objects.VIFBase],
+    instance_info: os_vif.objects.InstanceInfo,
+) -> list[os_vif.exception.ExceptionBase | None]:
+    """Asynchronous version of :func:`os_vif.plug_many`.
+
+    The VIFs of different plugins are plugged concurrently.
+    """
+    return await _run_many(os_vif.plug_many, vifs, instance_info)
+
+
+async def unplug_many(
+    vifs: Sequence[os_vif.objects.VIFBase],
+    instance_info: os_vif.objects.InstanceInfo,
+) -> list[os_vif.exception.ExceptionBase | None]:
+    """Asynchronous version of :func:`os_vif.unplug_many`.
+
+    The VIFs of different plugins are unplugged concurrently.
+    """
+    return await _run_many(os_vif.unplug_many, vifs, instance_info)
+
+
+async def host_info(
+    permitted_vif_type_names: list[str] | None = None,
+) -> os_vif.objects.HostInfo:
+    """Asynchronous version of :func:`os_vif.host_info`."""
+    return await _run(os_vif.host_info, permitted_vif_type_names)
@@ -11,7 +11,67 @@
 #    under the License.
 
 import abc
-from typing import Any
+from collections.abc import Mapping
+from typing import Any, NamedTuple
+
+
+class LinkInfo(NamedTuple):
+    """The state of a link at the time of a :meth:`IpCommand.snapshot`."""
+
+    #: interface index
+    ifindex: int
+    #: interface flags (IFF_*)
+    flags: int
+    #: MTU
+    mtu: int | None
+    #: name of the master device, e.g. a bridge, if any
+    master: str | None
+    #: link type, e.g. "veth" or "bridge", if known
+    kind: str | None
+
+
+class PhysPort(NamedTuple):
+    """A link that is a port of a switchdev capable device."""
+
+    #: interface name
+    ifname: str
+    #: hardware switch ID, as hex digits like sysfs phys_switch_id
+    switch_id: str
+    #: name of the port on the switch, e.g. "p0" or "pf0vf1", if known
+    port_name: str | None
+    #: name of the parent device, e.g. its PCI address, if known
+    parent_dev: str | None
+    #: interface index, if known
+    ifindex: int | None = None
+
+
+class LinkEvent(NamedTuple):
+    """A link added, changed or deleted, as notified by the kernel."""
+
+    #: True if the link was deleted
+    deleted: bool
+    #: interface index
+    ifindex: int
+    #: interface name
+    ifname: str
+    #: the switch port of the link, if it is one and was not deleted
+    port: PhysPort | None
+
+
+class LinkSubscription(metaclass=abc.ABCMeta):
+    """Link notifications received since they were last read."""
+
+    @abc.abstractmethod
+    def read(self) -> list[LinkEvent] | None:
+        """Return the pending link events without blocking.
+
+        :return: the events in the order the kernel sent them, or None if
+                 some were lost and the links must be read again
+        """
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """Stop receiving link notifications."""
 
 
 class IpCommand(metaclass=abc.ABCMeta):
@@ -76,6 +136,54 @@ class IpCommand(metaclass=abc.ABCMeta):
         :return: status of the command execution
         """
 
+    @abc.abstractmethod
+    def ensure(
+        self,
+        device: str,
+        dev_type: str,
+        check_exit_code: list[int] | None = None,
+        state: str | None = None,
+        mtu: int | None = None,
+        address: str | None = None,
+        promisc: bool | None = None,
+        master: str | None = None,
+        peer: str | None = None,
+        link: str | None = None,
+        vlan_id: int | None = None,
+        ageing: int | None = None,
+        mode: str | None = None,
+        multiqueue: bool = False,
+    ) -> Any:
+        """Method to create an interface with all its link parameters.
+
+        The device is created with the link parameters applied in the same
+        request where the device type allows it. If the device already
+        exists, the link parameters are applied with a single combined set
+        instead. For veth devices, state, mtu and promisc are applied to
+        both ends of the pair while address and master only apply to
+        'device'.
+
+        :param   device: A network device (string)
+        :param   dev_type: String network device type (TYPE_VETH, TYPE_VLAN,
+                           TYPE_BRIDGE, TYPE_TUNTAP)
+        :param   check_exit_code: List of integers of allowed execution exit
+                                  codes
+        :param   state: String network device state
+        :param   mtu: Integer MTU value
+        :param   address: String MAC address
+        :param   promisc: Boolean promiscuous mode
+        :param   master: String the master device that this device belongs to
+        :param   peer: String peer name, for veth interfaces
+        :param   link: String root network interface name, 'device' will be a
+                       VLAN tagged virtual interface
+        :param   vlan_id: Integer VLAN ID for VLAN devices
+        :param   ageing: integer value in seconds before learned
+                         mac addresses are forgotten.
+        :param   mode: String mode for tuntap devices ('tap' or 'tun')
+        :param   multiqueue: Boolean to enable multiqueue for tuntap devices
+        :return: status of the command execution
+        """
+
     @abc.abstractmethod
     def delete(
         self, device: str, check_exit_code: list[int] | None = None
@@ -94,3 +202,54 @@ class IpCommand(metaclass=abc.ABCMeta):
         :param   device: A network device (string)
         :return: True if device exists else False
         """
+
+    @abc.abstractmethod
+    def list_phys_ports(self) -> list[PhysPort]:
+        """Method to list the links that are ports of a hardware switch.
+
+        The links are listed with a single dump of all the links rather
+        than by reading the attributes of each one.
+
+        :return: a list of :class:`PhysPort`, in link dump order
+        """
+
+    @abc.abstractmethod
+    def subscribe_links(self) -> LinkSubscription:
+        """Method to subscribe to the link notifications of the kernel.
+
+        Only the changes made after the subscription are notified; callers
+        that keep track of the links must read them afterwards.
+
+        :return: a :class:`LinkSubscription`
+        :raises OSError: if the notifications cannot be subscribed to
+        """
+
+    @abc.abstractmethod
+    def snapshot(self) -> Mapping[str, LinkInfo]:
+        """Method to get the state of all the links at once.
+
+        The links are read with a single dump. The returned mapping is
+        read-only and is not updated afterwards; callers that change links
+        must take a new snapshot, or check those links with
+        :meth:`exists`, to see the changes.
+
+        :return: a read-only mapping of interface name to :class:`LinkInfo`
+        """
+
+    @abc.abstractmethod
+    def wait_for_link(
+        self,
+        device: str,
+        present: bool = True,
+        timeout: float | None = None,
+    ) -> bool:
+        """Method to wait until a device exists, or no longer exists.
+
+        :param   device: A network device (string)
+        :param   present: wait for the device to exist if True, to be
+                          deleted if False
+        :param   timeout: maximum number of seconds to wait, None to wait
+                          forever
+        :return: True if the device reached the expected state, False if
+                 the timeout expired first
+        """
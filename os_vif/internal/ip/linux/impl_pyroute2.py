@@ -10,23 +10,496 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from collections.abc import Mapping
+import errno
+import os
+import select
+import socket
+import threading
+import time
+import types
 from typing import Any
+import weakref
 
 from oslo_log import log as logging
 from oslo_utils import excutils
 from pyroute2 import iproute
 from pyroute2.netlink import exceptions as ipexc
+from pyroute2.netlink import rtnl
 from pyroute2.netlink.rtnl import ifinfmsg
+from pyroute2.netlink.rtnl import iprsocket
 
 from os_vif import exception
 from os_vif.internal.ip import ip_command
-from os_vif import utils
 
 LOG = logging.getLogger(__name__)
 
+# NOTE: socket.NETLINK_ROUTE is only defined on Linux builds of python
+NETLINK_ROUTE = 0
+_MONITOR_RCVBUF = 1024 * 1024
+#: default maximum number of links kept by a :class:`LinkMonitor`
+DEFAULT_MAX_LINKS = 32768
+# how often the monitor thread checks whether it has been stopped
+_MONITOR_POLL_INTERVAL = 1.0
+# how often wait_for_link() polls the kernel when there is no monitor
+_WAIT_POLL_INTERVAL = 0.1
+
+
+class _LinkCache:
+    """Per-thread cache of interface name to (ifindex, flags).
+
+    Entries are kept coherent by subscribing to the RTNLGRP_LINK multicast
+    group on a plain non-blocking netlink socket. Pending notifications are
+    applied by :meth:`sync` before every lookup, so a cached entry is never
+    older than the last link event the kernel has delivered. If the
+    notification socket overflows or cannot be created the cache is dropped
+    and every lookup goes back to the kernel.
+    """
+
+    def __init__(self) -> None:
+        self._links: dict[str, tuple[int, int]] = {}
+        self._names: dict[int, str] = {}
+        self._marshal = iprsocket.MarshalRtnl()
+        self._sock: socket.socket | None = None
+        try:
+            sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, _MONITOR_RCVBUF)
+            sock.bind((0, rtnl.RTMGRP_LINK))
+            sock.setblocking(False)
+            self._sock = sock
+        except OSError as e:
+            LOG.debug('Unable to subscribe to link notifications, '
+                      'interface lookups will not be cached: %s', e)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self.clear()
+
+    def clear(self) -> None:
+        self._links.clear()
+        self._names.clear()
+
+    def invalidate(self, name: str) -> None:
+        entry = self._links.pop(name, None)
+        if entry is not None:
+            self._names.pop(entry[0], None)
+
+    def get(self, name: str) -> tuple[int, int] | None:
+        self.sync()
+        return self._links.get(name)
+
+    def put(self, name: str, index: int, flags: int) -> None:
+        if self._sock is None:
+            return
+        self.invalidate(name)
+        stale = self._names.pop(index, None)
+        if stale is not None:
+            self._links.pop(stale, None)
+        self._links[name] = (index, flags)
+        self._names[index] = name
+
+    def sync(self) -> None:
+        """Apply all pending link notifications to the cache."""
+        if self._sock is None:
+            return
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # NOTE: the kernel dropped notifications, so we can no
+                # longer tell which entries are stale.
+                self.clear()
+                continue
+            for msg in self._marshal.parse(data):
+                self._apply(msg)
+
+    def _apply(self, msg: Any) -> None:
+        index = msg['index']
+        name = self._names.get(index)
+        if msg['header']['type'] == rtnl.RTM_DELLINK:
+            if name is not None:
+                self.invalidate(name)
+            return
+        ifname = msg.get_attr('IFLA_IFNAME')
+        if name is not None and name != ifname:
+            # the interface was renamed
+            self.invalidate(name)
+            name = None
+        if name is not None or ifname in self._links:
+            self.put(ifname, index, msg['flags'])
+
+
+def _link_socket() -> socket.socket:
+    """Return a non-blocking socket subscribed to link notifications."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _MONITOR_RCVBUF)
+        sock.bind((0, rtnl.RTMGRP_LINK))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+# (ifindex, flags, mtu, master ifindex, kind) of a link
+_LinkState = tuple[int, int, int | None, int | None, str | None]
+
+
+class LinkMonitor:
+    """Process wide cache of the state of all the links.
+
+    The cache is loaded with a dump of the links and kept current by a
+    background thread subscribed to the RTNLGRP_LINK multicast group.
+    Lookups apply the pending notifications first, so a link changed by
+    this process is seen as soon as the change has been acknowledged by the
+    kernel. It is safe to use from any thread.
+
+    At most ``max_links`` links are kept. On hosts with more links the
+    cache is incomplete and the links it does not hold are reported as
+    unknown rather than missing.
+    """
+
+    def __init__(self, max_links: int = DEFAULT_MAX_LINKS) -> None:
+        self.max_links = max_links
+        self.pid: int | None = None
+        self._cond = threading.Condition()
+        self._links: dict[str, _LinkState] = {}
+        self._names: dict[int, str] = {}
+        self._complete = False
+        self._marshal = iprsocket.MarshalRtnl()
+        self._sock: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return (self._sock is not None and self.pid == os.getpid() and
+                self._thread is not None and self._thread.is_alive())
+
+    def start(self) -> None:
+        """Load the links and start following their changes.
+
+        :raises OSError: if the notifications cannot be subscribed to
+        """
+        # NOTE: subscribe before the dump so that no change is missed, the
+        # notifications queued meanwhile are applied over the dump.
+        self._sock = _link_socket()
+        self.pid = os.getpid()
+        self._stopped.clear()
+        with self._cond:
+            self._load()
+        self._thread = threading.Thread(
+            target=self._run, name='os-vif-link-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop following the link changes and drop the cache."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+            self._clear()
+            self._cond.notify_all()
+
+    def _clear(self) -> None:
+        self._links.clear()
+        self._names.clear()
+        self._complete = False
+
+    def _load(self) -> None:
+        self._clear()
+        self._complete = True
+        with iproute.IPRoute() as ip:
+            for msg in ip.get_links():
+                self._apply(msg)
+
+    def _run(self) -> None:
+        sock = self._sock
+        assert sock is not None  # narrow type
+        while not self._stopped.is_set():
+            try:
+                readable, _, _ = select.select(
+                    [sock], [], [], _MONITOR_POLL_INTERVAL)
+                if readable:
+                    with self._cond:
+                        self._sync()
+                        self._cond.notify_all()
+            except Exception:
+                LOG.exception('Link monitor failed, links will be looked '
+                              'up in the kernel')
+                with self._cond:
+                    self._clear()
+                    self._cond.notify_all()
+                return
+
+    def _sync(self) -> None:
+        """Apply all the pending link notifications, with the lock held."""
+        if self._sock is None:
+            return
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # NOTE: the kernel dropped notifications, reload the links;
+                # the ones queued from now on are applied over the dump.
+                LOG.debug('Link notifications were lost, reloading links')
+                self._load()
+                continue
+            for msg in self._marshal.parse(data):
+                self._apply(msg)
+
+    def _apply(self, msg: Any) -> None:
+        # NOTE: RTM_DELLINK messages of the AF_BRIDGE family are sent when a
+        # port leaves a bridge, the link itself is not deleted.
+        if msg.get('family', socket.AF_UNSPEC) != socket.AF_UNSPEC:
+            return
+        index = msg['index']
+        name = self._names.get(index)
+        if msg['header']['type'] == rtnl.RTM_DELLINK:
+            if name is not None:
+                del self._names[index]
+                self._links.pop(name, None)
+            return
+        ifname = msg.get_attr('IFLA_IFNAME')
+        if name is not None and name != ifname:
+            # the interface was renamed
+            self._links.pop(name, None)
+        elif name is None and ifname not in self._links:
+            if len(self._links) >= self.max_links:
+                self._complete = False
+                return
+        stale = self._links.get(ifname)
+        if stale is not None and stale[0] != index:
+            self._names.pop(stale[0], None)
+        self._names[index] = ifname
+        self._links[ifname] = (
+            index, msg['flags'], msg.get_attr('IFLA_MTU'),
+            msg.get_attr('IFLA_MASTER') or None,
+            msg.get_nested('IFLA_LINKINFO', 'IFLA_INFO_KIND'))
+
+    def _info(self, state: _LinkState) -> ip_command.LinkInfo:
+        index, flags, mtu, master, kind = state
+        return ip_command.LinkInfo(
+            ifindex=index, flags=flags, mtu=mtu,
+            master=self._names.get(master) if master else None, kind=kind)
+
+    def _lookup(self, name: str) -> tuple[bool, ip_command.LinkInfo | None]:
+        self._sync()
+        state = self._links.get(name)
+        if state is not None:
+            return True, self._info(state)
+        return self._complete, None
+
+    def get(self, name: str) -> tuple[bool, ip_command.LinkInfo | None]:
+        """Look a link up.
+
+        :returns: a (known, info) tuple. ``info`` is None if the link does
+            not exist, ``known`` is False if the cache cannot tell.
+        """
+        with self._cond:
+            return self._lookup(name)
+
+    def snapshot(self) -> Mapping[str, ip_command.LinkInfo] | None:
+        """Return all the links, or None if the cache is incomplete."""
+        with self._cond:
+            self._sync()
+            if not self._complete:
+                return None
+            return types.MappingProxyType(
+                {name: self._info(state)
+                 for name, state in self._links.items()})
+
+    def wait(
+        self,
+        name: str,
+        present: bool = True,
+        timeout: float | None = None,
+    ) -> bool | None:
+        """Wait until a link exists, or no longer exists.
+
+        :returns: True if the link reached the expected state, False on
+            timeout and None if the cache cannot tell.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                known, info = self._lookup(name)
+                if not known or self._sock is None:
+                    return None
+                if (info is not None) == present:
+                    return True
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(
+                    _MONITOR_POLL_INTERVAL if remaining is None
+                    else min(remaining, _MONITOR_POLL_INTERVAL))
+
+
+def _phys_port(msg: Any) -> ip_command.PhysPort | None:
+    """Return the switch port described by an RTM_NEWLINK message, if any."""
+    switch_id = msg.get_attr('IFLA_PHYS_SWITCH_ID')
+    if not switch_id:
+        return None
+    return ip_command.PhysPort(
+        ifname=msg.get_attr('IFLA_IFNAME'),
+        switch_id=switch_id.replace(':', '').lower(),
+        port_name=msg.get_attr('IFLA_PHYS_PORT_NAME'),
+        parent_dev=msg.get_attr('IFLA_PARENT_DEV_NAME'),
+        ifindex=msg['index'])
+
+
+class _LinkSubscription(ip_command.LinkSubscription):
+
+    def __init__(self) -> None:
+        self._sock: socket.socket | None = _link_socket()
+        self._marshal = iprsocket.MarshalRtnl()
+
+    def read(self) -> list[ip_command.LinkEvent] | None:
+        if self._sock is None:
+            return None
+        events: list[ip_command.LinkEvent] = []
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # the kernel dropped notifications, drain the ones queued
+                # since so that the next read starts from a clean state
+                self.read()
+                return None
+            for msg in self._marshal.parse(data):
+                # see LinkMonitor._apply() for the AF_BRIDGE messages
+                if msg.get('family', socket.AF_UNSPEC) != socket.AF_UNSPEC:
+                    continue
+                deleted = msg['header']['type'] == rtnl.RTM_DELLINK
+                events.append(ip_command.LinkEvent(
+                    deleted=deleted,
+                    ifindex=msg['index'],
+                    ifname=msg.get_attr('IFLA_IFNAME'),
+                    port=None if deleted else _phys_port(msg)))
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def _close_sockets(
+    pid: int, ip: iproute.IPRoute, links: _LinkCache
+) -> None:
+    # NOTE: the sockets inherited by a child process are left to the parent
+    if pid == os.getpid():
+        ip.close()
+        links.close()
+
+
+class _ThreadSockets:
+    """The netlink sockets of a thread.
+
+    They are closed when the thread ends, as the thread local data is
+    dropped then, so the short lived workers of a thread pool do not leak
+    them.
+    """
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.ip = iproute.IPRoute()
+        self.links = _LinkCache()
+        self._finalizer = weakref.finalize(
+            self, _close_sockets, self.pid, self.ip, self.links)
+
+    def close(self) -> None:
+        self._finalizer()
+
 
 class PyRoute2(ip_command.IpCommand):
 
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._monitor: LinkMonitor | None = None
+        self._monitor_lock = threading.Lock()
+
+    def start_monitor(self, max_links: int = DEFAULT_MAX_LINKS) -> None:
+        """Keep the state of the links of the host in memory.
+
+        Once started, a :class:`LinkMonitor` answers the link lookups of all
+        the threads of the process instead of the kernel. Does nothing if a
+        monitor is already running.
+
+        :param max_links: maximum number of links kept in memory
+        :raises OSError: if the link notifications cannot be subscribed to
+        """
+        with self._monitor_lock:
+            if self._get_monitor() is not None:
+                return
+            monitor = LinkMonitor(max_links)
+            monitor.start()
+            self._monitor = monitor
+
+    def stop_monitor(self) -> None:
+        """Stop the link monitor started by :meth:`start_monitor`."""
+        with self._monitor_lock:
+            monitor, self._monitor = self._monitor, None
+        if monitor is not None and monitor.pid == os.getpid():
+            monitor.stop()
+
+    def _get_monitor(self) -> LinkMonitor | None:
+        # NOTE: the monitor thread does not survive a fork
+        monitor = self._monitor
+        if monitor is None or not monitor.running:
+            return None
+        return monitor
+
+    def _get_ip(self) -> iproute.IPRoute:
+        """Return this thread's long lived IPRoute socket.
+
+        The socket and the link cache are per thread as neither is safe to
+        share, are recreated after a fork and are closed when the thread
+        ends.
+        """
+        return self._get_sockets().ip
+
+    def _get_links(self) -> _LinkCache:
+        return self._get_sockets().links
+
+    def _get_sockets(self) -> _ThreadSockets:
+        sockets: _ThreadSockets | None = getattr(
+            self._local, 'sockets', None)
+        if sockets is None or sockets.pid != os.getpid():
+            sockets = self._local.sockets = _ThreadSockets()
+        return sockets
+
+    def close(self) -> None:
+        """Release the netlink sockets owned by the calling thread."""
+        sockets: _ThreadSockets | None = getattr(
+            self._local, 'sockets', None)
+        if sockets is not None:
+            sockets.close()
+        self._local.__dict__.clear()
+
     def _ip_link(
         self,
         ip: iproute.IPRoute,
@@ -56,35 +529,84 @@ class PyRoute2(ip_command.IpCommand):
         master: str | None = None,
     ) -> Any:
         check_exit_code = check_exit_code or []
-        with iproute.IPRoute() as ip:
-            idx = self._lookup_interface(ip, device)
-            args = {'index': idx}
-            if state:
-                args['state'] = state
-            if mtu:
-                args['mtu'] = mtu
-            if address:
-                args['address'] = address
-            if promisc is not None:
-                flags = ip.link('get', index=idx)[0]['flags']
-                args['flags'] = (utils.set_mask(flags, ifinfmsg.IFF_PROMISC)
-                                 if promisc is True else
-                                 utils.unset_mask(flags, ifinfmsg.IFF_PROMISC))
-            if master:
-                args['master'] = self._lookup_interface(ip, master)
-
-            if isinstance(check_exit_code, int):
-                check_exit_code = [check_exit_code]
-
-            return self._ip_link(ip, 'set', check_exit_code, **args)
+        ip = self._get_ip()
+        args = self._link_args(ip, state, mtu, address, promisc, master)
+        args['index'] = self._lookup_interface(ip, device)
 
-    def _lookup_interface(
+        if isinstance(check_exit_code, int):
+            check_exit_code = [check_exit_code]
+
+        # NOTE: the kernel queues the RTM_NEWLINK notification for this
+        # change before it acks the request, so the cached flags are
+        # refreshed by the next lookup without invalidating them here.
+        return self._ip_link(ip, 'set', check_exit_code, **args)
+
+    def _link_args(
+        self,
+        ip: iproute.IPRoute,
+        state: str | None = None,
+        mtu: int | None = None,
+        address: str | None = None,
+        promisc: bool | None = None,
+        master: str | None = None,
+    ) -> dict[str, Any]:
+        """Build the RTM_NEWLINK arguments for the given link parameters.
+
+        Flags are sent together with a change mask so that only the
+        requested flags are modified and the current flags of the device
+        do not need to be read first.
+        """
+        args: dict[str, Any] = {}
+        flags = change = 0
+        if state:
+            change |= ifinfmsg.IFF_UP
+            if state == 'up':
+                flags |= ifinfmsg.IFF_UP
+        if promisc is not None:
+            change |= ifinfmsg.IFF_PROMISC
+            if promisc:
+                flags |= ifinfmsg.IFF_PROMISC
+        if change:
+            args['flags'] = flags
+            args['change'] = change
+        if mtu:
+            args['mtu'] = mtu
+        if address:
+            args['address'] = address
+        if master:
+            args['master'] = self._lookup_interface(ip, master)
+        return args
+
+    def _lookup_link(
         self, ip: iproute.IPRoute, link: str | None,
-    ) -> Any:
-        idx = ip.link_lookup(ifname=link)
-        if not len(idx):
+    ) -> tuple[int, int]:
+        """Return the (ifindex, flags) of a link, using the cache."""
+        if not link:
             raise exception.NetworkInterfaceNotFound(interface=link)
-        return idx[0]
+        monitor = self._get_monitor()
+        if monitor is not None:
+            known, info = monitor.get(link)
+            if info is not None:
+                return info.ifindex, info.flags
+            if known:
+                raise exception.NetworkInterfaceNotFound(interface=link)
+        links = self._get_links()
+        cached = links.get(link)
+        if cached is not None:
+            return cached
+        try:
+            msg = ip.link('get', ifname=link)[0]
+        except ipexc.NetlinkError as e:
+            if e.code == errno.ENODEV:
+                raise exception.NetworkInterfaceNotFound(interface=link)
+            raise
+        links.put(link, msg['index'], msg['flags'])
+        return msg['index'], msg['flags']
+
+    def _lookup_interface(
+        self, ip: iproute.IPRoute, link: str | None,
+    ) -> int:
+        return self._lookup_link(ip, link)[0]
 
     def add(
         self,
@@ -99,46 +621,136 @@ class PyRoute2(ip_command.IpCommand):
         multiqueue: bool = False,
     ) -> Any:
         check_exit_code = check_exit_code or []
-        with iproute.IPRoute() as ip:
-            args: dict[str, Any] = {
-                'ifname': device, 'kind': dev_type,
-            }
-            if self.TYPE_VLAN == dev_type:
-                args['vlan_id'] = vlan_id
-                args['link'] = self._lookup_interface(ip, link)
-            elif self.TYPE_VETH == dev_type:
-                args['peer'] = peer
-            elif self.TYPE_BRIDGE == dev_type:
-                # NOTE(sean-k-mooney): the keys are defined in the pyroute2
-                # codebase but are not documented. see the nla_map field
-                # in the bridge_data class located in the
-                # pyroute2.netlink.rtnl.ifinfmsg module for mode details
-                # https://github.com/svinota/pyroute2/blob/3ba9cdde34b2346ef8c2f8ba17cef5dbeb4c6d52/pyroute2/netlink/rtnl/ifinfmsg/__init__.py#L776-L820
-                args['IFLA_BR_FORWARD_DELAY'] = 0  # set no delay
-                args['IFLA_BR_STP_STATE'] = 0  # disable spanning tree
-                args['IFLA_BR_MCAST_SNOOPING'] = 0  # disable snooping
-                # NOTE(sean-k-mooney): we conditionally enable mac ageing as
-                # this code is shared between the ovs and linux bridge
-                # plugins. For linux bridge we want to allow the default
-                # ageing of 300 seconds, whereas for ovs with the ip-tables
-                # firewall we want to disable ageing. None was chosen as
-                # the default value of ageing to allow the caller to determine
-                # what policy to use and keep this code generic.
-                if ageing is not None:
-                    args['IFLA_BR_AGEING_TIME'] = ageing
-            elif self.TYPE_TUNTAP == dev_type:
-                # Set mode (default to 'tap' if not specified)
-                # This matches the 'ip tuntap add' command behavior
-                tap_mode = mode if mode else 'tap'
-                args['mode'] = tap_mode
-                if multiqueue:
-                    # Enable multiqueue if requested
-                    # This sets the IFF_MULTI_QUEUE flag in IFTUN_IFR
-                    args['ifr'] = {'multi_queue': True}
-            else:
-                raise exception.NetworkInterfaceTypeNotDefined(type=dev_type)
-
-            return self._ip_link(ip, 'add', check_exit_code, **args)
+        ip = self._get_ip()
+        args = self._create_args(ip, device, dev_type, peer, link, vlan_id,
+                                 ageing, mode, multiqueue)
+        return self._ip_link(ip, 'add', check_exit_code, **args)
+
+    def _create_args(
+        self,
+        ip: iproute.IPRoute,
+        device: str,
+        dev_type: str,
+        peer: str | dict[str, Any] | None = None,
+        link: str | None = None,
+        vlan_id: int | None = None,
+        ageing: int | None = None,
+        mode: str | None = None,
+        multiqueue: bool = False,
+    ) -> dict[str, Any]:
+        args: dict[str, Any] = {
+            'ifname': device, 'kind': dev_type,
+        }
+        if self.TYPE_VLAN == dev_type:
+            args['vlan_id'] = vlan_id
+            args['link'] = self._lookup_interface(ip, link)
+        elif self.TYPE_VETH == dev_type:
+            args['peer'] = peer
+        elif self.TYPE_BRIDGE == dev_type:
+            # NOTE(sean-k-mooney): the keys are defined in the pyroute2
+            # codebase but are not documented. see the nla_map field
+            # in the bridge_data class located in the
+            # pyroute2.netlink.rtnl.ifinfmsg module for mode details
+            # https://github.com/svinota/pyroute2/blob/3ba9cdde34b2346ef8c2f8ba17cef5dbeb4c6d52/pyroute2/netlink/rtnl/ifinfmsg/__init__.py#L776-L820
+            args['IFLA_BR_FORWARD_DELAY'] = 0  # set no delay
+            args['IFLA_BR_STP_STATE'] = 0  # disable spanning tree
+            args['IFLA_BR_MCAST_SNOOPING'] = 0  # disable snooping
+            # NOTE(sean-k-mooney): we conditionally enable mac ageing as
+            # this code is shared between the ovs and linux bridge
+            # plugins. For linux bridge we want to allow the default
+            # ageing of 300 seconds, whereas for ovs with the ip-tables
+            # firewall we want to disable ageing. None was chosen as
+            # the default value of ageing to allow the caller to determine
+            # what policy to use and keep this code generic.
+            if ageing is not None:
+                args['IFLA_BR_AGEING_TIME'] = ageing
+        elif self.TYPE_TUNTAP == dev_type:
+            # Set mode (default to 'tap' if not specified)
+            # This matches the 'ip tuntap add' command behavior
+            tap_mode = mode if mode else 'tap'
+            args['mode'] = tap_mode
+            if multiqueue:
+                # Enable multiqueue if requested
+                # This sets the IFF_MULTI_QUEUE flag in IFTUN_IFR
+                args['ifr'] = {'multi_queue': True}
+        else:
+            raise exception.NetworkInterfaceTypeNotDefined(type=dev_type)
+
+        return args
+
+    def ensure(
+        self,
+        device: str,
+        dev_type: str,
+        check_exit_code: list[int] | None = None,
+        state: str | None = None,
+        mtu: int | None = None,
+        address: str | None = None,
+        promisc: bool | None = None,
+        master: str | None = None,
+        peer: str | None = None,
+        link: str | None = None,
+        vlan_id: int | None = None,
+        ageing: int | None = None,
+        mode: str | None = None,
+        multiqueue: bool = False,
+    ) -> Any:
+        check_exit_code = check_exit_code or []
+        ip = self._get_ip()
+        link_args = self._link_args(ip, state, mtu, address, promisc, master)
+        # NOTE: pyroute2 only encodes netlink attributes for the veth peer,
+        # so the peer flags can not be set when the pair is created.
+        peer_args = self._link_args(ip, state=state, promisc=promisc)
+        if self.TYPE_VETH == dev_type and mtu:
+            peer_spec: str | dict[str, Any] | None = {
+                'ifname': peer, 'mtu': mtu}
+        else:
+            peer_spec = peer
+
+        ret = None
+        if self.TYPE_TUNTAP == dev_type:
+            # NOTE: tuntap devices are created with an ioctl which ignores
+            # the link attributes, so they are always applied with a set.
+            self.add(device, dev_type, check_exit_code=[errno.EEXIST],
+                     mode=mode, multiqueue=multiqueue)
+            if link_args:
+                link_args['index'] = self._lookup_interface(ip, device)
+                ret = self._ip_link(ip, 'set', check_exit_code, **link_args)
+        else:
+            create_args = self._create_args(ip, device, dev_type, peer, link,
+                                            vlan_id, ageing, mode, multiqueue)
+            args = dict(create_args, **link_args)
+            if self.TYPE_VETH == dev_type:
+                args['peer'] = peer_spec
+            try:
+                ret = self._ip_link(ip, 'add', [], **args)
+            except ipexc.NetlinkError as e:
+                if e.code == errno.EEXIST:
+                    pass
+                elif e.code in check_exit_code and args != create_args:
+                    # NOTE: a link attribute was refused with an allowed
+                    # error, which is only logged when the attributes are
+                    # set once the device exists, so create it without them.
+                    LOG.debug('Creating %s without its link attributes: %s',
+                              device, e)
+                    self._ip_link(ip, 'add', [], **create_args)
+                elif e.code in check_exit_code:
+                    LOG.error('NetlinkError was raised, code %s, message: %s',
+                              e.code, str(e))
+                    return None
+                else:
+                    raise
+                if link_args:
+                    link_args['index'] = self._lookup_interface(ip, device)
+                    ret = self._ip_link(
+                        ip, 'set', check_exit_code, **link_args)
+                if self.TYPE_VETH == dev_type and mtu:
+                    peer_args['mtu'] = mtu
+
+        if self.TYPE_VETH == dev_type and peer_args:
+            peer_args['index'] = self._lookup_interface(ip, peer)
+            ret = self._ip_link(ip, 'set', check_exit_code, **peer_args)
+        return ret
 
     def delete(
         self,
@@ -146,15 +758,72 @@ class PyRoute2(ip_command.IpCommand):
         check_exit_code: list[int] | None = None,
     ) -> Any:
         check_exit_code = check_exit_code or []
-        with iproute.IPRoute() as ip:
-            idx = self._lookup_interface(ip, device)
+        ip = self._get_ip()
+        idx = self._lookup_interface(ip, device)
+        try:
             return self._ip_link(ip, 'del', check_exit_code, **{'index': idx})
+        finally:
+            self._get_links().invalidate(device)
 
     def exists(self, device: str) -> bool:
         """Return True if the device exists."""
-        with iproute.IPRoute() as ip:
-            try:
-                self._lookup_interface(ip, device)
-                return True
-            except Exception:
+        try:
+            self._lookup_interface(self._get_ip(), device)
+            return True
+        except Exception:
+            return False
+
+    def list_phys_ports(self) -> list[ip_command.PhysPort]:
+        ports = []
+        for msg in self._get_ip().get_links():
+            port = _phys_port(msg)
+            if port is not None:
+                ports.append(port)
+        return ports
+
+    def subscribe_links(self) -> ip_command.LinkSubscription:
+        return _LinkSubscription()
+
+    def snapshot(self) -> Mapping[str, ip_command.LinkInfo]:
+        monitor = self._get_monitor()
+        if monitor is not None:
+            links_snapshot = monitor.snapshot()
+            if links_snapshot is not None:
+                return links_snapshot
+        ip = self._get_ip()
+        # apply the pending link events before they are superseded by the
+        # dump, the cache is refreshed with its result as well
+        links = self._get_links()
+        links.sync()
+        msgs = list(ip.get_links())
+        names = {msg['index']: msg.get_attr('IFLA_IFNAME') for msg in msgs}
+        snapshot = {}
+        for msg in msgs:
+            name = names[msg['index']]
+            master = msg.get_attr('IFLA_MASTER')
+            snapshot[name] = ip_command.LinkInfo(
+                ifindex=msg['index'],
+                flags=msg['flags'],
+                mtu=msg.get_attr('IFLA_MTU'),
+                master=names.get(master) if master else None,
+                kind=msg.get_nested('IFLA_LINKINFO', 'IFLA_INFO_KIND'))
+            links.put(name, msg['index'], msg['flags'])
+        return types.MappingProxyType(snapshot)
+
+    def wait_for_link(
+        self,
+        device: str,
+        present: bool = True,
+        timeout: float | None = None,
+    ) -> bool:
+        monitor = self._get_monitor()
+        if monitor is not None:
+            result = monitor.wait(device, present, timeout)
+            if result is not None:
+                return result
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.exists(device) != present:
+            if deadline is not None and time.monotonic() >= deadline:
                 return False
+            time.sleep(_WAIT_POLL_INTERVAL)
+        return True
@@ -11,15 +11,198 @@
 #    under the License.
 
 from collections.abc import Callable
-from typing import Any
+from typing import Any, Self
 
+import netaddr
 from oslo_versionedobjects import base as ovo_base
+from oslo_versionedobjects import exception as ovo_exception
+from oslo_versionedobjects import fields as ovo_fields
+
+# Converts a field value to or from its primitive form. None means the value
+# is used as is.
+_ToPrimitive = Callable[[Any], Any] | None
+_FromPrimitive = Callable[[Any, Any], Any] | None
+
+
+class _NotCompilable(Exception):
+    """A field type the compiled (de)serializers do not handle."""
+
+
+def _compile_to_primitive(
+    field_type: ovo_fields.FieldType[Any],
+) -> _ToPrimitive:
+    impl = type(field_type).to_primitive
+    if impl is ovo_fields.FieldType.to_primitive:
+        return None
+    if impl in (ovo_fields.IPAddress.to_primitive,
+                ovo_fields.IPNetwork.to_primitive):
+        return str
+    if isinstance(field_type, ovo_fields.Object):
+        return lambda value: value.obj_to_primitive()
+    if isinstance(field_type, ovo_fields.List):
+        element = _compile_to_primitive(field_type._element_type._type)
+        if element is None:
+            return list
+        return lambda value: [
+            None if item is None else element(item) for item in value]
+    raise _NotCompilable()
+
+
+def _compile_from_primitive(
+    field_type: ovo_fields.FieldType[Any],
+) -> _FromPrimitive:
+    # NOTE: the values are not coerced, which is where fields validate them
+    impl = type(field_type).from_primitive
+    if impl is ovo_fields.FieldType.from_primitive:
+        return None
+    coerce = type(field_type).coerce
+    if coerce is ovo_fields.IPAddress.coerce:
+        return lambda value, context: netaddr.IPAddress(value)
+    if coerce is ovo_fields.IPNetwork.coerce:
+        return lambda value, context: netaddr.IPNetwork(value)
+    if isinstance(field_type, ovo_fields.Object):
+        return _object_from_trusted_primitive
+    if isinstance(field_type, ovo_fields.List):
+        element = _compile_from_primitive(field_type._element_type._type)
+        if element is None:
+            return lambda value, context: list(value)
+        return lambda value, context: [
+            None if item is None else element(item, context)
+            for item in value]
+    raise _NotCompilable()
+
+
+def _object_from_trusted_primitive(value: Any, context: Any) -> Any:
+    # NOTE: as the Object field type does, pass hydrated objects through
+    if isinstance(value, ovo_base.VersionedObject):
+        return value
+    return VersionedObject.obj_from_trusted_primitive(value, context)
+
+
+# The compiled (de)serializers, by class, as (field name, attribute name,
+# converter) tuples. None if a field of the class cannot be compiled.
+_TO_PRIMITIVE: dict[type, list[tuple[str, str, _ToPrimitive]] | None] = {}
+_FROM_PRIMITIVE: dict[
+    type, list[tuple[str, str, _FromPrimitive]] | None] = {}
+
+
+def _to_primitive_plan(
+    cls: type[ovo_base.VersionedObject],
+) -> list[tuple[str, str, _ToPrimitive]] | None:
+    try:
+        return _TO_PRIMITIVE[cls]
+    except KeyError:
+        pass
+    plan: list[tuple[str, str, _ToPrimitive]] | None
+    try:
+        plan = [
+            (name, ovo_base._get_attrname(name),
+             _compile_to_primitive(field._type))
+            for name, field in cls.fields.items()]
+    except _NotCompilable:
+        plan = None
+    _TO_PRIMITIVE[cls] = plan
+    return plan
+
+
+def _from_primitive_plan(
+    cls: type[ovo_base.VersionedObject],
+) -> list[tuple[str, str, _FromPrimitive]] | None:
+    try:
+        return _FROM_PRIMITIVE[cls]
+    except KeyError:
+        pass
+    plan: list[tuple[str, str, _FromPrimitive]] | None
+    try:
+        plan = [
+            (name, ovo_base._get_attrname(name),
+             _compile_from_primitive(field._type))
+            for name, field in cls.fields.items()]
+    except _NotCompilable:
+        plan = None
+    _FROM_PRIMITIVE[cls] = plan
+    return plan
 
 
 class VersionedObject(ovo_base.VersionedObject):
 
     OBJ_PROJECT_NAMESPACE = 'os_vif'
 
+    def obj_to_primitive(
+        self,
+        target_version: str | None = None,
+        version_manifest: dict[str, str] | None = None,
+    ) -> dict[str, Any]:
+        """Dehydrate the object, as the base implementation does
+
+        The fields of each class are walked with converters built the first
+        time the class is serialized, rather than by asking each field to
+        convert its value. Serializing to another version still uses the
+        base implementation.
+        """
+        plan = _to_primitive_plan(type(self))
+        if (plan is None or version_manifest or
+                target_version not in (None, self.VERSION)):
+            return super().obj_to_primitive(target_version, version_manifest)
+
+        values = self.__dict__
+        data = {}
+        for name, attr, convert in plan:
+            if attr in values:
+                value = values[attr]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                data[name] = value
+
+        primitive = {
+            self._obj_primitive_key('name'): self.obj_name(),
+            self._obj_primitive_key('namespace'): self.OBJ_PROJECT_NAMESPACE,
+            self._obj_primitive_key('version'): self.VERSION,
+            self._obj_primitive_key('data'): data,
+        }
+        changes = [name for name in self.obj_what_changed() if name in data]
+        if changes:
+            primitive[self._obj_primitive_key('changes')] = changes
+        return primitive
+
+    @classmethod
+    def obj_from_trusted_primitive(
+        cls, primitive: dict[str, Any], context: Any = None,
+    ) -> Self:
+        """Hydrate an object from a primitive known to be valid
+
+        This gives the same object as :meth:`obj_from_primitive` but does
+        not coerce the field values, which is where they are validated, so
+        it must only be used on primitives produced by
+        :meth:`obj_to_primitive`, for example by a trusted RPC peer.
+        """
+        objns = cls._obj_primitive_field(primitive, 'namespace')
+        objname = cls._obj_primitive_field(primitive, 'name')
+        objver = cls._obj_primitive_field(primitive, 'version')
+        if objns != cls.OBJ_PROJECT_NAMESPACE:
+            raise ovo_exception.UnsupportedObjectError(
+                objtype='%s.%s' % (objns, objname))
+        objclass = cls.obj_class_from_name(objname, objver)
+        plan = _from_primitive_plan(objclass)
+        if plan is None:
+            return objclass._obj_from_primitive(  # type: ignore[return-value]
+                context, objver, primitive)
+
+        self = objclass()
+        self._context = context
+        self.VERSION = objver
+        objdata = cls._obj_primitive_field(primitive, 'data')
+        values = self.__dict__
+        for name, attr, convert in plan:
+            if name in objdata:
+                value = objdata[name]
+                if convert is not None and value is not None:
+                    value = convert(value, context)
+                values[attr] = value
+        changes = cls._obj_primitive_field(primitive, 'changes', [])
+        self._changed_fields = {x for x in changes if x in self.fields}
+        return self  # type: ignore[return-value]
+
 
 class VersionedObjectPrintableMixin(object):
     """Mix-in to implement __str__ method for a versioned object
@@ -0,0 +1,235 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A compact msgpack encoding of the os-vif objects.
+
+The objects are first turned into their usual primitives, with
+``obj_to_primitive()``, so the version negotiation is the one of the JSON
+primitives and relies on ``obj_make_compatible()``. The primitives are then
+packed without their ``versioned_object.*`` envelopes: each object becomes a
+list of field values preceded by the index of a schema, and the schemas,
+which hold the object name, namespace, version and field names, are sent
+once per payload. Decoding gives back the exact primitives, except that the
+``versioned_object.changes`` lists are in field order.
+
+This is meant for VIFs and HostInfo objects, and any os-vif object whose
+fields are not plain dicts.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any
+
+from oslo_serialization import msgpackutils
+
+from os_vif.objects import base as osv_base
+
+__all__ = [
+    'dumps',
+    'dumps_list',
+    'loads',
+    'loads_list',
+    'pack_primitive',
+    'unpack_primitive',
+]
+
+# Bumped on any incompatible change to the layout of the payloads
+FORMAT_VERSION = 1
+
+_NAME = osv_base.VersionedObject._obj_primitive_key('name')
+_NAMESPACE = osv_base.VersionedObject._obj_primitive_key('namespace')
+_VERSION = osv_base.VersionedObject._obj_primitive_key('version')
+_DATA = osv_base.VersionedObject._obj_primitive_key('data')
+_CHANGES = osv_base.VersionedObject._obj_primitive_key('changes')
+
+# How a field value is encoded
+_PLAIN = 0
+_OBJECT = 1
+_OBJECT_LIST = 2
+
+
+class _Encoder:
+
+    def __init__(self) -> None:
+        self.schemas: list[list[Any]] = []
+        self._schema_index: dict[tuple[Any, ...], int] = {}
+
+    def encode(self, primitive: dict[str, Any]) -> list[Any]:
+        data: dict[str, Any] = primitive[_DATA]
+        names = tuple(data)
+        kinds = []
+        values = []
+        for name in names:
+            kind, value = self._encode_value(data[name])
+            kinds.append(kind)
+            values.append(value)
+
+        key = (primitive[_NAME], primitive[_NAMESPACE], primitive[_VERSION],
+               names, tuple(kinds))
+        index = self._schema_index.get(key)
+        if index is None:
+            index = len(self.schemas)
+            self._schema_index[key] = index
+            self.schemas.append([
+                primitive[_NAME], primitive[_NAMESPACE], primitive[_VERSION],
+                list(names), kinds])
+
+        changes = 0
+        for name in primitive.get(_CHANGES, ()):
+            changes |= 1 << names.index(name)
+        return [index, changes] + values
+
+    def _encode_value(self, value: Any) -> tuple[int, Any]:
+        if isinstance(value, dict):
+            if _NAME not in value:
+                raise ValueError('Plain dict fields cannot be encoded')
+            return _OBJECT, self.encode(value)
+        if (isinstance(value, list) and value and
+                all(isinstance(item, dict) for item in value)):
+            return _OBJECT_LIST, [self.encode(item) for item in value]
+        return _PLAIN, value
+
+
+def _decode(schemas: list[list[Any]], encoded: list[Any]) -> dict[str, Any]:
+    try:
+        name, namespace, version, names, kinds = schemas[encoded[0]]
+    except (IndexError, TypeError, ValueError):
+        raise ValueError('Invalid compact object: %r' % encoded[:1])
+    changes = encoded[1]
+    values = encoded[2:]
+    if len(values) != len(names):
+        raise ValueError('Invalid compact %s object' % name)
+
+    data = {}
+    for field, kind, value in zip(names, kinds, values):
+        if kind == _OBJECT:
+            value = _decode(schemas, value)
+        elif kind == _OBJECT_LIST:
+            value = [_decode(schemas, item) for item in value]
+        data[field] = value
+
+    primitive = {
+        _NAME: name,
+        _NAMESPACE: namespace,
+        _VERSION: version,
+        _DATA: data,
+    }
+    if changes:
+        primitive[_CHANGES] = [
+            field for idx, field in enumerate(names) if changes >> idx & 1]
+    return primitive
+
+
+def _pack(primitives: list[dict[str, Any]], many: bool) -> bytes:
+    encoder = _Encoder()
+    encoded = [encoder.encode(primitive) for primitive in primitives]
+    root = encoded if many else encoded[0]
+    return msgpackutils.dumps([FORMAT_VERSION, encoder.schemas, many, root])
+
+
+def _unpack(data: bytes, many: bool) -> list[dict[str, Any]]:
+    try:
+        format_version, schemas, is_many, root = msgpackutils.loads(data)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid compact payload')
+    if format_version != FORMAT_VERSION:
+        raise ValueError(
+            'Unsupported compact payload format %s' % format_version)
+    if is_many != many:
+        raise ValueError('Expected a payload of %s' % (
+            'a list of objects' if many else 'a single object'))
+    return [_decode(schemas, item) for item in (root if many else [root])]
+
+
+def pack_primitive(primitive: dict[str, Any]) -> bytes:
+    """Encode the primitive of an object, as from ``obj_to_primitive()``."""
+    return _pack([primitive], many=False)
+
+
+def unpack_primitive(data: bytes) -> dict[str, Any]:
+    """Decode a payload of :func:`pack_primitive` back into a primitive.
+
+    :raises ValueError: if the payload is not valid
+    """
+    return _unpack(data, many=False)[0]
+
+
+def _from_primitive(
+    primitive: dict[str, Any], context: Any, trusted: bool,
+) -> osv_base.VersionedObject:
+    if trusted:
+        return osv_base.VersionedObject.obj_from_trusted_primitive(
+            primitive, context)
+    return osv_base.VersionedObject.obj_from_primitive(primitive, context)
+
+
+def dumps(
+    obj: osv_base.VersionedObject,
+    target_version: str | None = None,
+    version_manifest: dict[str, str] | None = None,
+) -> bytes:
+    """Encode an object.
+
+    :param obj: the object
+    :param target_version: the version to backport the object to,
+        defaults to its version in ``version_manifest`` if any
+    :param version_manifest: the versions to backport the object and the
+        objects it contains to, by object name
+    """
+    if target_version is None and version_manifest:
+        target_version = version_manifest.get(obj.obj_name())
+    return pack_primitive(
+        obj.obj_to_primitive(target_version, version_manifest))
+
+
+def loads(
+    data: bytes, context: Any = None, trusted: bool = False,
+) -> osv_base.VersionedObject:
+    """Decode an object encoded with :func:`dumps`.
+
+    :param data: the payload
+    :param context: the context of the object
+    :param trusted: hydrate the object with ``obj_from_trusted_primitive()``,
+        which does not validate the field values
+    :raises ValueError: if the payload is not valid
+    """
+    return _from_primitive(unpack_primitive(data), context, trusted)
+
+
+def dumps_list(
+    objs: Sequence[osv_base.VersionedObject],
+    version_manifest: dict[str, str] | None = None,
+) -> bytes:
+    """Encode several objects, sharing the schemas of their classes.
+
+    :param objs: the objects
+    :param version_manifest: the versions to backport the objects to, by
+        object name
+    """
+    return _pack(
+        [obj.obj_to_primitive(
+            (version_manifest or {}).get(obj.obj_name()), version_manifest)
+         for obj in objs],
+        many=True)
+
+
+def loads_list(
+    data: bytes, context: Any = None, trusted: bool = False,
+) -> list[osv_base.VersionedObject]:
+    """Decode the objects encoded with :func:`dumps_list`.
+
+    See :func:`loads` for the parameters.
+    """
+    return [
+        _from_primitive(primitive, context, trusted)
+        for primitive in _unpack(data, many=True)]
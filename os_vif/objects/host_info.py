@@ -12,7 +12,8 @@
 
 from __future__ import annotations
 
-from typing import Any
+from collections.abc import Callable, Collection, Sequence
+from typing import Any, TYPE_CHECKING, TypeAlias, TypeVar
 
 from oslo_utils import versionutils
 from oslo_versionedobjects import base
@@ -21,6 +22,100 @@ from oslo_versionedobjects import fields
 from os_vif import exception
 from os_vif.objects import base as osv_base
 
+if TYPE_CHECKING:
+    from os_vif import plugin as osv_plugin
+
+_T = TypeVar('_T')
+
+
+_Snapshot: TypeAlias = tuple[tuple[Any, ...], tuple[str, ...]]
+
+
+def _snapshot(items: Sequence[_T], name: Callable[[_T], str]) -> _Snapshot:
+    """Returns the items of a list field and their names
+
+    The items themselves are kept, rather than their ids, so that an id
+    cannot be reused by another object while the snapshot is alive.
+    """
+    return tuple(items), tuple(name(item) for item in items)
+
+
+def _is_current(
+    snapshot: _Snapshot, items: Sequence[_T], name: Callable[[_T], str],
+) -> bool:
+    """Returns whether a list field still holds the items of a snapshot
+
+    Adding, removing or replacing an item, in place or not, and renaming
+    one are all detected.
+    """
+    old_items, old_names = snapshot
+    return (len(old_items) == len(items) and
+            all(old is new for old, new in zip(old_items, items)) and
+            all(old == name(new) for old, new in zip(old_names, items)))
+
+
+def _index_by_name(
+    obj: object, items: list[_T], name: Callable[[_T], str],
+) -> dict[str, _T]:
+    """Returns the items of a list field keyed by name
+
+    The index is kept on ``obj`` and rebuilt when an item of the field is
+    added, removed, replaced or renamed. The first of several items with
+    the same name is indexed, as a scan of the list would find.
+    """
+    cached: tuple[_Snapshot, dict[str, _T]] | None = getattr(
+        obj, '_name_index', None)
+    if cached is not None and _is_current(cached[0], items, name):
+        return cached[1]
+
+    index: dict[str, _T] = {}
+    for item in items:
+        index.setdefault(name(item), item)
+    setattr(obj, '_name_index', (_snapshot(items, name), index))
+    return index
+
+
+def _permitted_set(
+    permitted_vif_type_names: Collection[str],
+) -> frozenset[str]:
+    if isinstance(permitted_vif_type_names, frozenset):
+        return permitted_vif_type_names
+    return frozenset(permitted_vif_type_names)
+
+
+# The negotiated versions, by (object name, min version, max version). Each
+# entry also records how many versions of the object were registered when it
+# was computed, as registering another one can change the result.
+_NEGOTIATED_VERSIONS: dict[tuple[str, str, str], tuple[int, str | None]] = {}
+
+
+def _negotiate_version(
+    object_name: str,
+    max_version: str,
+    min_version: str,
+) -> str | None:
+    """Returns the newest registered version within the bounds, if any"""
+    registered = base.VersionedObjectRegistry.obj_classes().get(object_name)
+    if not registered:
+        return None
+
+    key = (object_name, min_version, max_version)
+    cached = _NEGOTIATED_VERSIONS.get(key)
+    if cached is not None and cached[0] == len(registered):
+        return cached[1]
+
+    minwant = versionutils.convert_version_to_tuple(min_version)
+    maxwant = versionutils.convert_version_to_tuple(max_version)
+    version = None
+    for regobj in registered:
+        got = versionutils.convert_version_to_tuple(regobj.VERSION)
+        if minwant <= got <= maxwant:
+            version = regobj.VERSION
+            break
+
+    _NEGOTIATED_VERSIONS[key] = (len(registered), version)
+    return version
+
 
 def _get_common_version(
     object_name: str,
@@ -32,22 +127,16 @@ def _get_common_version(
     """Returns the accepted version from the loaded OVO registry"""
     reg = base.VersionedObjectRegistry.obj_classes()
 
-    if object_name not in reg:
+    if not reg.get(object_name):
         raise exc_notmatch(name=object_name)
 
-    gotvers = []
-    for regobj in reg[object_name]:
-        gotvers.append(regobj.VERSION)
-        got = versionutils.convert_version_to_tuple(regobj.VERSION)
-        minwant = versionutils.convert_version_to_tuple(min_version)
-        maxwant = versionutils.convert_version_to_tuple(max_version)
-
-        if minwant <= got <= maxwant:
-            return regobj.VERSION
+    version = _negotiate_version(object_name, max_version, min_version)
+    if version is not None:
+        return version
 
     raise exc_notsupported(
         name=object_name,
-        got_versions=",".join(gotvers),
+        got_versions=",".join(regobj.VERSION for regobj in reg[object_name]),
         min_version=min_version,
         max_version=max_version,
     )
@@ -150,25 +239,100 @@ class HostPluginInfo(osv_base.VersionedObject, base.ComparableVersionedObject,
         "vif_info": fields.ListOfObjectsField("HostVIFInfo"),
     }
 
+    @classmethod
+    def from_manifest(
+        cls, plugin_name: str, manifest: Sequence[osv_plugin.VIFManifest],
+    ) -> HostPluginInfo:
+        """Build the description of a plugin from its manifest."""
+        return cls(
+            plugin_name=plugin_name,
+            vif_info=[
+                HostVIFInfo(
+                    vif_object_name=vif['vif_object_name'],
+                    min_version=vif['min_version'],
+                    max_version=vif['max_version'],
+                    supported_port_profiles=[
+                        HostPortProfileInfo(**profile)
+                        for profile in vif['supported_port_profiles']
+                    ])
+                for vif in manifest
+            ])
+
+    @staticmethod
+    def _vif_name(vif: HostVIFInfo) -> str:
+        return vif.vif_object_name
+
+    def _vif_index(self) -> dict[str, HostVIFInfo]:
+        return _index_by_name(self, self.vif_info, self._vif_name)
+
     def has_vif(self, name: str) -> bool:
-        for vif in self.vif_info:
-            if vif.vif_object_name == name:
-                return True
-        return False
+        return name in self._vif_index()
 
     def get_vif(self, name: str) -> HostVIFInfo:
+        try:
+            return self._vif_index()[name]
+        except KeyError:
+            raise exception.NoMatchingVIFClass(vif_name=name)
+
+    def get_common_versions(self) -> dict[str, str]:
+        """Negotiate the versions of all the VIFs and port profiles
+
+        :returns: the accepted versions, by object name. The objects
+            without an accepted version are left out. A port profile listed
+            by several VIF types is negotiated with the first one.
+        """
+        versions = {}
         for vif in self.vif_info:
-            if vif.vif_object_name == name:
-                return vif
-
-        raise exception.NoMatchingVIFClass(vif_name=name)
-
-    def filter_vif_types(self, permitted_vif_type_names: list[str]) -> None:
-        new_vif_info = []
-        for vif in self.vif_info:
-            if vif.vif_object_name in permitted_vif_type_names:
-                new_vif_info.append(vif)
-        self.vif_info = new_vif_info
+            version = _negotiate_version(
+                vif.vif_object_name, vif.max_version, vif.min_version)
+            if version is not None:
+                versions[vif.vif_object_name] = version
+            if not vif.obj_attr_is_set('supported_port_profiles'):
+                continue
+            for profile in vif.supported_port_profiles:
+                if profile.profile_object_name in versions:
+                    continue
+                version = _negotiate_version(
+                    profile.profile_object_name,
+                    profile.max_version,
+                    profile.min_version)
+                if version is not None:
+                    versions[profile.profile_object_name] = version
+        return versions
+
+    def filter_vif_types(
+        self, permitted_vif_type_names: Collection[str],
+    ) -> None:
+        permitted = _permitted_set(permitted_vif_type_names)
+        self.vif_info = [
+            vif for vif in self.vif_info if vif.vif_object_name in permitted]
+
+    def filtered_vif_types(
+        self, permitted_vif_type_names: Collection[str],
+    ) -> HostPluginInfo:
+        """Returns a copy of this object filtered as by filter_vif_types
+
+        The copy is cached by permitted names until the plugin name or a
+        VIF of ``vif_info`` changes and shares its HostVIFInfo objects with
+        this one, so neither should be modified.
+        """
+        permitted = _permitted_set(permitted_vif_type_names)
+        vif_info = self.vif_info
+        views: dict[
+            frozenset[str], tuple[_Snapshot, HostPluginInfo]
+        ] = self.__dict__.setdefault('_filtered_views', {})
+        cached = views.get(permitted)
+        if (cached is not None and
+                cached[1].plugin_name == self.plugin_name and
+                _is_current(cached[0], vif_info, self._vif_name)):
+            return cached[1]
+
+        view = HostPluginInfo(
+            plugin_name=self.plugin_name,
+            vif_info=[
+                vif for vif in vif_info if vif.vif_object_name in permitted])
+        views[permitted] = (_snapshot(vif_info, self._vif_name), view)
+        return view
 
 
 @base.VersionedObjectRegistry.register
@@ -183,24 +347,65 @@ class HostInfo(osv_base.VersionedObject, base.ComparableVersionedObject,
         "plugin_info": fields.ListOfObjectsField("HostPluginInfo"),
     }
 
+    def _plugin_index(self) -> dict[str, HostPluginInfo]:
+        return _index_by_name(
+            self, self.plugin_info, lambda plugin: plugin.plugin_name)
+
     def has_plugin(self, name: str) -> bool:
-        for plugin in self.plugin_info:
-            if name == plugin.plugin_name:
-                return True
-        return False
+        return name in self._plugin_index()
 
     def get_plugin(self, name: str) -> HostPluginInfo:
-        for plugin in self.plugin_info:
-            if name == plugin.plugin_name:
-                return plugin
-
-        raise exception.NoMatchingPlugin(plugin_name=name)
-
-    def filter_vif_types(self, permitted_vif_type_names: list[str]) -> None:
+        try:
+            return self._plugin_index()[name]
+        except KeyError:
+            raise exception.NoMatchingPlugin(plugin_name=name)
+
+    def get_common_versions(self) -> dict[str, dict[str, str]]:
+        """Negotiate the versions of the VIFs and port profiles of all plugins
+
+        :returns: the result of
+            :meth:`HostPluginInfo.get_common_versions`, by plugin name
+        """
+        return {
+            plugin.plugin_name: plugin.get_common_versions()
+            for plugin in self.plugin_info
+        }
+
+    def filter_vif_types(
+        self, permitted_vif_type_names: Collection[str],
+    ) -> None:
+        permitted = _permitted_set(permitted_vif_type_names)
         new_plugins = []
         for plugin in self.plugin_info:
-            plugin.filter_vif_types(permitted_vif_type_names)
+            plugin.filter_vif_types(permitted)
             if len(plugin.vif_info) == 0:
                 continue
             new_plugins.append(plugin)
         self.plugin_info = new_plugins
+
+    def filtered_vif_types(
+        self, permitted_vif_type_names: Collection[str],
+    ) -> HostInfo:
+        """Returns a copy of this object filtered as by filter_vif_types
+
+        The copy is cached by permitted names until a plugin or its
+        ``vif_info`` changes and shares its HostVIFInfo objects with this
+        one, so neither should be modified.
+        """
+        permitted = _permitted_set(permitted_vif_type_names)
+        plugins = [
+            view for view in (
+                plugin.filtered_vif_types(permitted)
+                for plugin in self.plugin_info)
+            if view.vif_info]
+        views: dict[frozenset[str], HostInfo] = self.__dict__.setdefault(
+            '_filtered_views', {})
+        cached = views.get(permitted)
+        if (cached is not None and
+                len(cached.plugin_info) == len(plugins) and
+                all(a is b for a, b in zip(cached.plugin_info, plugins))):
+            return cached
+
+        view = HostInfo(plugin_info=plugins)
+        views[permitted] = view
+        return view
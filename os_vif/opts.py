@@ -34,9 +34,9 @@ os_vif.initialize()
 if os_vif._EXT_MANAGER is None:
     raise RuntimeError('os_vif is not initialized')
 
-plugins_list: list[tuple[str, plugin.PluginBase | None]]
+plugins_list: list[tuple[str, plugin.PluginBase]]
 plugins_list = [
-    (name, os_vif._EXT_MANAGER[name].obj)
+    (name, os_vif._EXT_MANAGER.get(name))
     for name in sorted(os_vif._EXT_MANAGER.names())
 ]
 
@@ -44,5 +44,5 @@ plugins_list = [
 def list_plugins_opts() -> list[tuple[str, list[cfg.Opt]]]:
     return [
         ('os_vif_' + g, copy.deepcopy(o.CONFIG_OPTS))
-        for g, o in plugins_list if o is not None
+        for g, o in plugins_list
     ]
@@ -13,7 +13,8 @@
 from __future__ import annotations
 
 import abc
-from typing import Self, TYPE_CHECKING
+from collections.abc import Sequence
+from typing import Self, TYPE_CHECKING, TypedDict
 
 from oslo_config import cfg
 
@@ -24,6 +25,30 @@ if TYPE_CHECKING:
 CONF = cfg.CONF
 
 
+class PortProfileManifest(TypedDict):
+    """A port profile supported by a VIF of a plugin manifest."""
+
+    profile_object_name: str
+    min_version: str
+    max_version: str
+
+
+class VIFManifest(TypedDict):
+    """A VIF type supported by a plugin, as declared in its manifest.
+
+    A plugin may register a sequence of these as an entry point in the
+    ``os_vif.manifests`` namespace, under the name of the plugin. It is then
+    used by ``os_vif.host_info()`` instead of :meth:`PluginBase.describe`,
+    which avoids importing the plugin. The manifest must only import
+    ``os_vif`` modules.
+    """
+
+    vif_object_name: str
+    min_version: str
+    max_version: str
+    supported_port_profiles: list[PortProfileManifest]
+
+
 class PluginBase(metaclass=abc.ABCMeta):
     """Base class for all VIF plugins."""
 
@@ -31,6 +56,11 @@ class PluginBase(metaclass=abc.ABCMeta):
     # the plugin config parameters
     CONFIG_OPTS: list[cfg.Opt] = []
 
+    # Override to True if the plug and unplug methods, and their batch
+    # versions, can be called from several threads at once. Otherwise
+    # os_vif.aio runs one of them at a time.
+    THREAD_SAFE: bool = False
+
     def __init__(self, config: cfg.ConfigOpts.GroupAttr) -> None:
         """
         Initialize the plugin object with the provided config
@@ -78,6 +108,60 @@ class PluginBase(metaclass=abc.ABCMeta):
                 bubble up.
         """
 
+    def plug_batch(
+        self,
+        vifs: Sequence[objects.VIFBase],
+        instance_info: objects.InstanceInfo,
+    ) -> list[Exception | None]:
+        """
+        Given a batch of VIF models, perform operations to plug them all.
+
+        The default implementation calls :meth:`plug` for each VIF in turn.
+        Plugins that can amortize work across several VIFs, such as sharing
+        a single backend transaction, should override this method.
+
+        :param vifs: sequence of ``os_vif.objects.vif.VIFBase`` objects.
+        :param instance_info: ``os_vif.objects.instance_info.InstanceInfo``
+            object.
+        :returns: a list with one entry per VIF, in the same order as
+            ``vifs``. Each entry is ``None`` if the VIF was plugged or the
+            exception raised while plugging it.
+        """
+        results: list[Exception | None] = []
+        for vif in vifs:
+            try:
+                self.plug(vif, instance_info)
+                results.append(None)
+            except Exception as err:
+                results.append(err)
+        return results
+
+    def unplug_batch(
+        self,
+        vifs: Sequence[objects.VIFBase],
+        instance_info: objects.InstanceInfo,
+    ) -> list[Exception | None]:
+        """
+        Given a batch of VIF models, perform operations to unplug them all.
+
+        The default implementation calls :meth:`unplug` for each VIF in turn.
+
+        :param vifs: sequence of ``os_vif.objects.vif.VIFBase`` objects.
+        :param instance_info: ``os_vif.objects.instance_info.InstanceInfo``
+            object.
+        :returns: a list with one entry per VIF, in the same order as
+            ``vifs``. Each entry is ``None`` if the VIF was unplugged or the
+            exception raised while unplugging it.
+        """
+        results: list[Exception | None] = []
+        for vif in vifs:
+            try:
+                self.unplug(vif, instance_info)
+                results.append(None)
+            except Exception as err:
+                results.append(err)
+        return results
+
     @classmethod
     def load(cls, plugin_name: str) -> Self:
         """
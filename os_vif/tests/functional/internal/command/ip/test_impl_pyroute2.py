@@ -128,6 +128,11 @@ def _ip_cmd_add(*args, **kwargs):
     ip_lib.add(*args, **kwargs)
 
 
+@privsep.os_vif_pctxt.entrypoint
+def _ip_cmd_ensure(*args, **kwargs):
+    ip_lib.ensure(*args, **kwargs)
+
+
 @privsep.os_vif_pctxt.entrypoint
 def _ip_cmd_delete(*args, **kwargs):
     ip_lib.delete(*args, **kwargs)
@@ -195,6 +200,22 @@ class TestIpCommand(ShellIpCommands, base.BaseFunctionalTestCase):
         _ip_cmd_add(device, 'vlan', link=link, vlan_id=100)
         self.assertTrue(self.exist_device(device))
 
+    def test_ensure_veth(self):
+        device = "test_dev_15"
+        peer = "test_devpeer15"
+        self.addCleanup(self.del_device, device)
+        _ip_cmd_ensure(device, 'veth', peer=peer, state='up', promisc=True,
+                       mtu=1400)
+        for dev in (device, peer):
+            self.assertEqual('UP', self.show_state(dev))
+            self.assertTrue(self.show_promisc(dev))
+            self.assertEqual(1400, self.show_mtu(dev))
+        _ip_cmd_ensure(device, 'veth', peer=peer, promisc=False, mtu=1300)
+        for dev in (device, peer):
+            self.assertEqual('UP', self.show_state(dev))
+            self.assertFalse(self.show_promisc(dev))
+            self.assertEqual(1300, self.show_mtu(dev))
+
     def test_add_veth(self):
         device = "test_dev_7"
         peer = "test_devpeer"
@@ -10,17 +10,51 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import errno
+import operator
+import socket
+import threading
 from unittest import mock
 
 from pyroute2 import iproute
 from pyroute2.netlink import exceptions as ipexc
+from pyroute2.netlink import rtnl
 from pyroute2.netlink.rtnl import ifinfmsg
+from pyroute2.netlink.rtnl import iprsocket
 
 from os_vif import exception
+from os_vif.internal.ip import ip_command
 from os_vif.internal.ip.linux import impl_pyroute2
 from os_vif.tests.unit import base
 
 
+def _link_data(*links, msg_type=rtnl.RTM_NEWLINK, family=0):
+    """Return the encoded messages of an RTM_NEWLINK dump of links.
+
+    Each link is an (index, attrs) tuple.
+    """
+    data = b''
+    for index, attrs in links:
+        msg = ifinfmsg.ifinfmsg()
+        msg['index'] = index
+        msg['family'] = family
+        msg['attrs'] = attrs
+        msg['header']['type'] = msg_type
+        msg.encode()
+        data += bytes(msg.data)
+    return data
+
+
+def _link_dump(*links, msg_type=rtnl.RTM_NEWLINK, family=0):
+    """Return the parsed messages of an RTM_NEWLINK dump of links.
+
+    Each link is an (index, attrs) tuple. The messages are encoded and
+    decoded by pyroute2 as they would be when read from the kernel.
+    """
+    data = _link_data(*links, msg_type=msg_type, family=family)
+    return list(iprsocket.MarshalRtnl().parse(data))
+
+
 class TestIpCommand(base.TestCase):
 
     ERROR_CODE = 40
@@ -41,45 +75,93 @@ class TestIpCommand(base.TestCase):
         self.ip_link_p = mock.patch.object(iproute.IPRoute, 'link',
                                            create=True)
         self.ip_link = self.ip_link_p.start()
+        self.addCleanup(self.ip_link_p.stop)
+        self.addCleanup(self.ip.close)
+
+    def _fake_link(self, links, error=None,
+                   error_commands=('add', 'set', 'del')):
+        """Answer link('get') from links and raise error for other calls."""
+        def _link(command, **kwargs):
+            if command == 'get':
+                if kwargs['ifname'] not in links:
+                    raise ipexc.NetlinkError(errno.ENODEV)
+                index, flags = links[kwargs['ifname']]
+                return [{'index': index, 'flags': flags}]
+            if error and command in error_commands:
+                raise error
+        self.ip_link.side_effect = _link
 
     def test_set(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[1],
-                create=True) as mock_link_lookup:
-            self.ip_link.return_value = [{'flags': 0x4000}]
-            self.ip.set(self.DEVICE, state=self.UP, mtu=self.MTU,
-                        address=self.MAC, promisc=True)
-            mock_link_lookup.assert_called_once_with(ifname=self.DEVICE)
-            args = {'state': self.UP,
-                    'mtu': self.MTU,
-                    'address': self.MAC,
-                    'flags': 0x4000 | ifinfmsg.IFF_PROMISC}
-            calls = [mock.call('get', index=1),
-                     mock.call('set', index=1, **args)]
-            self.ip_link.assert_has_calls(calls)
+        self._fake_link({self.DEVICE: (1, 0x4000)})
+        self.ip.set(self.DEVICE, state=self.UP, mtu=self.MTU,
+                    address=self.MAC, promisc=True)
+        args = {'mtu': self.MTU,
+                'address': self.MAC,
+                'flags': ifinfmsg.IFF_UP | ifinfmsg.IFF_PROMISC,
+                'change': ifinfmsg.IFF_UP | ifinfmsg.IFF_PROMISC}
+        self.assertEqual(
+            [mock.call('get', ifname=self.DEVICE),
+             mock.call('set', index=1, **args)],
+            self.ip_link.call_args_list)
+
+    def test_set_promisc_off(self):
+        self._fake_link({self.DEVICE: (1, ifinfmsg.IFF_PROMISC)})
+        self.ip.set(self.DEVICE, state='down', promisc=False)
+        self.ip_link.assert_called_with(
+            'set', index=1, flags=0,
+            change=ifinfmsg.IFF_UP | ifinfmsg.IFF_PROMISC)
+
+    def test_set_uses_link_cache(self):
+        self._fake_link({self.DEVICE: (1, 0)})
+        self.ip.set(self.DEVICE, state=self.UP)
+        self.ip.set(self.DEVICE, mtu=self.MTU)
+        self.assertEqual(
+            [mock.call('get', ifname=self.DEVICE),
+             mock.call('set', index=1, flags=ifinfmsg.IFF_UP,
+                       change=ifinfmsg.IFF_UP),
+             mock.call('set', index=1, mtu=self.MTU)],
+            self.ip_link.call_args_list)
+
+    def test_set_reuses_socket(self):
+        self._fake_link({self.DEVICE: (1, 0)})
+        with mock.patch.object(iproute, 'IPRoute') as mock_iproute:
+            mock_iproute.return_value.link.side_effect = (
+                self.ip_link.side_effect)
+            self.ip.close()
+            self.ip.set(self.DEVICE, state=self.UP)
+            self.ip.set(self.DEVICE, mtu=self.MTU)
+        mock_iproute.assert_called_once_with()
+
+    @mock.patch.object(impl_pyroute2, '_LinkCache')
+    @mock.patch.object(iproute, 'IPRoute')
+    def test_sockets_closed_with_thread(self, mock_iproute, mock_cache):
+        thread = threading.Thread(target=self.ip._get_ip)
+        thread.start()
+        thread.join()
+        del thread
+
+        mock_iproute.return_value.close.assert_called_once_with()
+        mock_cache.return_value.close.assert_called_once_with()
 
     def test_set_exit_code(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[1],
-                create=True) as mock_link_lookup:
-            self.ip_link.side_effect = ipexc.NetlinkError(self.ERROR_CODE,
-                                                          msg="Error message")
+        self._fake_link(
+            {self.DEVICE: (1, 0)},
+            error=ipexc.NetlinkError(self.ERROR_CODE, msg="Error message"))
 
-            self.ip.set(self.DEVICE, check_exit_code=[self.ERROR_CODE])
-            mock_link_lookup.assert_called_once_with(ifname=self.DEVICE)
-            self.ip_link.assert_called_once_with('set', index=1)
+        self.ip.set(self.DEVICE, check_exit_code=[self.ERROR_CODE])
+        self.assertEqual(
+            [mock.call('get', ifname=self.DEVICE),
+             mock.call('set', index=1)],
+            self.ip_link.call_args_list)
 
-            self.assertRaises(ipexc.NetlinkError, self.ip.set, self.DEVICE,
-                              check_exit_code=[self.OTHER_ERROR_CODE])
+        self.assertRaises(ipexc.NetlinkError, self.ip.set, self.DEVICE,
+                          check_exit_code=[self.OTHER_ERROR_CODE])
 
     def test_set_no_interface_found(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[],
-                create=True) as mock_link_lookup:
-            self.assertRaises(exception.NetworkInterfaceNotFound, self.ip.set,
-                              self.DEVICE)
-            mock_link_lookup.assert_called_once_with(ifname=self.DEVICE)
-            self.ip_link.assert_not_called()
+        self._fake_link({})
+        self.assertRaises(exception.NetworkInterfaceNotFound, self.ip.set,
+                          self.DEVICE)
+        self.ip_link.assert_called_once_with('get', ifname=self.DEVICE)
 
     def test_add_veth(self):
         self.ip.add(self.DEVICE, self.TYPE_VETH, peer='peer')
@@ -87,17 +169,17 @@ class TestIpCommand(base.TestCase):
             'add', ifname=self.DEVICE, kind=self.TYPE_VETH, peer='peer')
 
     def test_add_vlan(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[1],
-                create=True) as mock_link_lookup:
-            self.ip.add(self.DEVICE, self.TYPE_VLAN, link=self.LINK,
-                        vlan_id=self.VLAN_ID)
-            mock_link_lookup.assert_called_once_with(ifname=self.LINK)
-            args = {'ifname': self.DEVICE,
-                    'kind': self.TYPE_VLAN,
-                    'vlan_id': self.VLAN_ID,
-                    'link': 1}
-            self.ip_link.assert_called_once_with('add', **args)
+        self._fake_link({self.LINK: (1, 0)})
+        self.ip.add(self.DEVICE, self.TYPE_VLAN, link=self.LINK,
+                    vlan_id=self.VLAN_ID)
+        args = {'ifname': self.DEVICE,
+                'kind': self.TYPE_VLAN,
+                'vlan_id': self.VLAN_ID,
+                'link': 1}
+        self.assertEqual(
+            [mock.call('get', ifname=self.LINK),
+             mock.call('add', **args)],
+            self.ip_link.call_args_list)
 
     def test_add_bridge(self):
         self.ip.add(self.DEVICE, self.TYPE_BRIDGE)
@@ -119,13 +201,10 @@ class TestIpCommand(base.TestCase):
         self.ip_link.assert_called_once_with('add', **args)
 
     def test_add_vlan_no_interface_found(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[],
-                create=True) as mock_link_lookup:
-            self.assertRaises(exception.NetworkInterfaceNotFound, self.ip.add,
-                              self.DEVICE, self.TYPE_VLAN, link=self.LINK)
-            mock_link_lookup.assert_called_once_with(ifname=self.LINK)
-            self.ip_link.assert_not_called()
+        self._fake_link({})
+        self.assertRaises(exception.NetworkInterfaceNotFound, self.ip.add,
+                          self.DEVICE, self.TYPE_VLAN, link=self.LINK)
+        self.ip_link.assert_called_once_with('get', ifname=self.LINK)
 
     def test_add_other_type(self):
         self.assertRaises(exception.NetworkInterfaceTypeNotDefined,
@@ -146,35 +225,149 @@ class TestIpCommand(base.TestCase):
             self.TYPE_VLAN, peer='peer',
             check_exit_code=[self.OTHER_ERROR_CODE])
 
+    def test_ensure_veth(self):
+        self._fake_link({'peer': (2, 0)})
+        flags = ifinfmsg.IFF_UP | ifinfmsg.IFF_PROMISC
+        self.ip.ensure(self.DEVICE, self.TYPE_VETH, peer='peer',
+                       state=self.UP, promisc=True, mtu=self.MTU)
+        self.assertEqual(
+            [mock.call('add', ifname=self.DEVICE, kind=self.TYPE_VETH,
+                       peer={'ifname': 'peer', 'mtu': self.MTU},
+                       flags=flags, change=flags, mtu=self.MTU),
+             mock.call('get', ifname='peer'),
+             mock.call('set', index=2, flags=flags, change=flags)],
+            self.ip_link.call_args_list)
+
+    def test_ensure_veth_exists(self):
+        self._fake_link({self.DEVICE: (1, 0), 'peer': (2, 0)},
+                        error=ipexc.NetlinkError(errno.EEXIST),
+                        error_commands=('add',))
+
+        self.ip.ensure(self.DEVICE, self.TYPE_VETH, peer='peer',
+                       promisc=True, mtu=self.MTU)
+        promisc = ifinfmsg.IFF_PROMISC
+        self.assertEqual(
+            [mock.call('add', ifname=self.DEVICE, kind=self.TYPE_VETH,
+                       peer={'ifname': 'peer', 'mtu': self.MTU},
+                       flags=promisc, change=promisc, mtu=self.MTU),
+             mock.call('get', ifname=self.DEVICE),
+             mock.call('set', index=1, flags=promisc, change=promisc,
+                       mtu=self.MTU),
+             mock.call('get', ifname='peer'),
+             mock.call('set', index=2, flags=promisc, change=promisc,
+                       mtu=self.MTU)],
+            self.ip_link.call_args_list)
+
+    def test_ensure_veth_allowed_error(self):
+        links = {}
+        error = ipexc.NetlinkError(errno.ENOENT)
+
+        def _link(command, **kwargs):
+            if command == 'get':
+                return [{'index': links[kwargs['ifname']], 'flags': 0}]
+            if command == 'add' and 'mtu' in kwargs:
+                raise error
+            if command == 'add':
+                links.update({self.DEVICE: 1, 'peer': 2})
+            elif command == 'set':
+                raise error
+        self.ip_link.side_effect = _link
+
+        self.ip.ensure(self.DEVICE, self.TYPE_VETH, peer='peer',
+                       promisc=True, mtu=self.MTU,
+                       check_exit_code=[0, errno.ENOENT, 254])
+        promisc = ifinfmsg.IFF_PROMISC
+        # the device is created without the refused attributes, which are
+        # then set with the allowed error logged
+        self.assertEqual(
+            [mock.call('add', ifname=self.DEVICE, kind=self.TYPE_VETH,
+                       peer={'ifname': 'peer', 'mtu': self.MTU},
+                       flags=promisc, change=promisc, mtu=self.MTU),
+             mock.call('add', ifname=self.DEVICE, kind=self.TYPE_VETH,
+                       peer='peer'),
+             mock.call('get', ifname=self.DEVICE),
+             mock.call('set', index=1, flags=promisc, change=promisc,
+                       mtu=self.MTU),
+             mock.call('get', ifname='peer'),
+             mock.call('set', index=2, flags=promisc, change=promisc,
+                       mtu=self.MTU)],
+            self.ip_link.call_args_list)
+
+    def test_ensure_veth_error(self):
+        self._fake_link({}, error=ipexc.NetlinkError(errno.ENOENT),
+                        error_commands=('add',))
+        self.assertRaises(ipexc.NetlinkError, self.ip.ensure, self.DEVICE,
+                          self.TYPE_VETH, peer='peer', mtu=self.MTU)
+        self.assertEqual(1, self.ip_link.call_count)
+
+    def test_ensure_bridge_with_master(self):
+        self._fake_link({'master': (3, 0)})
+        self.ip.ensure(self.DEVICE, self.TYPE_BRIDGE, master='master',
+                       state=self.UP)
+        self.ip_link.assert_called_with(
+            'add', ifname=self.DEVICE, kind=self.TYPE_BRIDGE,
+            IFLA_BR_FORWARD_DELAY=0, IFLA_BR_STP_STATE=0,
+            IFLA_BR_MCAST_SNOOPING=0, flags=ifinfmsg.IFF_UP,
+            change=ifinfmsg.IFF_UP, master=3)
+
+    def test_ensure_add_error(self):
+        self._fake_link({}, error=ipexc.NetlinkError(self.ERROR_CODE))
+        self.ip.ensure(self.DEVICE, self.TYPE_BRIDGE,
+                       check_exit_code=[self.ERROR_CODE])
+        self.assertRaises(ipexc.NetlinkError, self.ip.ensure, self.DEVICE,
+                          self.TYPE_BRIDGE)
+
+    def test_ensure_tap(self):
+        self._fake_link({self.DEVICE: (1, 0)})
+        self.ip.ensure(self.DEVICE, 'tuntap', mode='tap', state=self.UP,
+                       address=self.MAC, mtu=self.MTU)
+        self.assertEqual(
+            [mock.call('add', ifname=self.DEVICE, kind='tuntap',
+                       mode='tap'),
+             mock.call('get', ifname=self.DEVICE),
+             mock.call('set', index=1, flags=ifinfmsg.IFF_UP,
+                       change=ifinfmsg.IFF_UP, mtu=self.MTU,
+                       address=self.MAC)],
+            self.ip_link.call_args_list)
+
     def test_delete(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[1],
-                create=True) as mock_link_lookup:
-            self.ip.delete(self.DEVICE)
-            mock_link_lookup.assert_called_once_with(ifname=self.DEVICE)
-            self.ip_link.assert_called_once_with('del', index=1)
+        self._fake_link({self.DEVICE: (1, 0)})
+        self.ip.delete(self.DEVICE)
+        self.assertEqual(
+            [mock.call('get', ifname=self.DEVICE),
+             mock.call('del', index=1)],
+            self.ip_link.call_args_list)
+
+    def test_delete_invalidates_link_cache(self):
+        self._fake_link({self.DEVICE: (1, 0)})
+        self.ip.delete(self.DEVICE)
+        self._fake_link({})
+        self.assertFalse(self.ip.exists(self.DEVICE))
 
     def test_delete_no_interface_found(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[],
-                create=True) as mock_link_lookup:
-            self.assertRaises(exception.NetworkInterfaceNotFound,
-                              self.ip.delete, self.DEVICE)
-            mock_link_lookup.assert_called_once_with(ifname=self.DEVICE)
+        self._fake_link({})
+        self.assertRaises(exception.NetworkInterfaceNotFound,
+                          self.ip.delete, self.DEVICE)
+        self.ip_link.assert_called_once_with('get', ifname=self.DEVICE)
 
     def test_delete_exit_code(self):
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[1],
-                create=True) as mock_link_lookup:
-            self.ip_link.side_effect = ipexc.NetlinkError(self.ERROR_CODE,
-                                                          msg="Error message")
+        self._fake_link(
+            {self.DEVICE: (1, 0)},
+            error=ipexc.NetlinkError(self.ERROR_CODE, msg="Error message"))
+
+        self.ip.delete(self.DEVICE, check_exit_code=[self.ERROR_CODE])
+        self.assertEqual(
+            [mock.call('get', ifname=self.DEVICE),
+             mock.call('del', index=1)],
+            self.ip_link.call_args_list)
 
-            self.ip.delete(self.DEVICE, check_exit_code=[self.ERROR_CODE])
-            mock_link_lookup.assert_called_once_with(ifname=self.DEVICE)
-            self.ip_link.assert_called_once_with('del', index=1)
+        self.assertRaises(ipexc.NetlinkError, self.ip.delete, self.DEVICE,
+                          check_exit_code=[self.OTHER_ERROR_CODE])
 
-            self.assertRaises(ipexc.NetlinkError, self.ip.delete, self.DEVICE,
-                              check_exit_code=[self.OTHER_ERROR_CODE])
+    def test_exists(self):
+        self._fake_link({self.DEVICE: (1, 0)})
+        self.assertTrue(self.ip.exists(self.DEVICE))
+        self.assertFalse(self.ip.exists(self.LINK))
 
     def test_add_tap(self):
         """Test creating a basic tap device."""
@@ -229,15 +422,198 @@ class TestIpCommand(base.TestCase):
 
     def test_set_no_multiqueue_parameter(self):
         """Verify set() no longer accepts multiqueue parameter."""
-        with mock.patch.object(
-                iproute.IPRoute, 'link_lookup', return_value=[1],
-                create=True):
-            self.ip_link.return_value = [{'flags': 0}]
-
-            # Should work without multiqueue
-            self.ip.set(self.DEVICE, state=self.UP, mtu=self.MTU,
-                        address=self.MAC)
-
-            # Should raise TypeError if multiqueue is passed
-            self.assertRaises(TypeError, self.ip.set, self.DEVICE,
-                            multiqueue=True)
+        self._fake_link({self.DEVICE: (1, 0)})
+
+        # Should work without multiqueue
+        self.ip.set(self.DEVICE, state=self.UP, mtu=self.MTU,
+                    address=self.MAC)
+
+        # Should raise TypeError if multiqueue is passed
+        self.assertRaises(TypeError, self.ip.set, self.DEVICE,
+                          multiqueue=True)
+
+    def test_list_phys_ports(self):
+        switch_id = bytes.fromhex('5c6f4f0003e5b1')
+        dump = _link_dump(
+            (1, [('IFLA_IFNAME', 'lo')]),
+            (2, [('IFLA_IFNAME', 'enp3s0f0'),
+                 ('IFLA_PHYS_SWITCH_ID', switch_id),
+                 ('IFLA_PHYS_PORT_NAME', 'p0'),
+                 ('IFLA_PARENT_DEV_NAME', '0000:03:00.0')]),
+            (3, [('IFLA_IFNAME', 'enp3s0f0_1'),
+                 ('IFLA_PHYS_SWITCH_ID', switch_id),
+                 ('IFLA_PHYS_PORT_NAME', 'pf0vf1')]))
+        with mock.patch.object(iproute.IPRoute, 'get_links', create=True,
+                               return_value=dump) as mock_get_links:
+            ports = self.ip.list_phys_ports()
+        mock_get_links.assert_called_once_with()
+        self.assertEqual(
+            [ip_command.PhysPort('enp3s0f0', '5c6f4f0003e5b1', 'p0',
+                                 '0000:03:00.0', 2),
+             ip_command.PhysPort('enp3s0f0_1', '5c6f4f0003e5b1', 'pf0vf1',
+                                 None, 3)],
+            ports)
+
+    @mock.patch.object(impl_pyroute2, '_link_socket')
+    def test_subscribe_links(self, mock_link_socket):
+        switch_id = bytes.fromhex('5c6f4f0003e5b1')
+        sock = mock_link_socket.return_value
+        sock.recv.side_effect = [
+            _link_data((3, [('IFLA_IFNAME', 'enp3s0f0_1'),
+                            ('IFLA_PHYS_SWITCH_ID', switch_id),
+                            ('IFLA_PHYS_PORT_NAME', 'pf0vf1')]),
+                       (4, [('IFLA_IFNAME', 'tap1')])),
+            # a port leaving a bridge is not a deletion
+            _link_data((4, [('IFLA_IFNAME', 'tap1')]),
+                       msg_type=rtnl.RTM_DELLINK, family=socket.AF_BRIDGE),
+            _link_data((4, [('IFLA_IFNAME', 'tap1')]),
+                       msg_type=rtnl.RTM_DELLINK),
+            BlockingIOError()]
+        subscription = self.ip.subscribe_links()
+        self.assertEqual(
+            [ip_command.LinkEvent(
+                False, 3, 'enp3s0f0_1',
+                ip_command.PhysPort('enp3s0f0_1', '5c6f4f0003e5b1',
+                                    'pf0vf1', None, 3)),
+             ip_command.LinkEvent(False, 4, 'tap1', None),
+             ip_command.LinkEvent(True, 4, 'tap1', None)],
+            subscription.read())
+
+        # lost notifications are reported, the ones queued since dropped
+        sock.recv.side_effect = [
+            OSError(errno.ENOBUFS, 'No buffer space available'),
+            _link_data((4, [('IFLA_IFNAME', 'tap1')])),
+            BlockingIOError()]
+        self.assertIsNone(subscription.read())
+        sock.recv.side_effect = BlockingIOError()
+        self.assertEqual([], subscription.read())
+
+        subscription.close()
+        sock.close.assert_called_once_with()
+        self.assertIsNone(subscription.read())
+
+    def test_snapshot(self):
+        dump = _link_dump(
+            (1, [('IFLA_IFNAME', 'lo'), ('IFLA_MTU', 65536)]),
+            (7, [('IFLA_IFNAME', 'qbr1'), ('IFLA_MTU', 1500),
+                 ('IFLA_LINKINFO', {'attrs': [
+                     ('IFLA_INFO_KIND', 'bridge')]})]),
+            (8, [('IFLA_IFNAME', 'qvb1'), ('IFLA_MTU', 1450),
+                 ('IFLA_MASTER', 7),
+                 ('IFLA_LINKINFO', {'attrs': [
+                     ('IFLA_INFO_KIND', 'veth')]})]))
+        with mock.patch.object(iproute.IPRoute, 'get_links', create=True,
+                               return_value=dump) as mock_get_links:
+            links = self.ip.snapshot()
+        mock_get_links.assert_called_once_with()
+        self.assertEqual(
+            {'lo': ip_command.LinkInfo(1, 0, 65536, None, None),
+             'qbr1': ip_command.LinkInfo(7, 0, 1500, None, 'bridge'),
+             'qvb1': ip_command.LinkInfo(8, 0, 1450, 'qbr1', 'veth')},
+            dict(links))
+        self.assertRaises(TypeError, operator.setitem, links, 'lo', None)
+
+
+class TestLinkMonitor(base.TestCase):
+
+    def setUp(self):
+        super(TestLinkMonitor, self).setUp()
+        self.monitor = impl_pyroute2.LinkMonitor()
+        self.monitor._complete = True
+
+    def _apply(self, *links, **kwargs):
+        for msg in _link_dump(*links, **kwargs):
+            self.monitor._apply(msg)
+
+    def test_get(self):
+        self._apply(
+            (7, [('IFLA_IFNAME', 'qbr1'), ('IFLA_MTU', 1500),
+                 ('IFLA_LINKINFO', {'attrs': [
+                     ('IFLA_INFO_KIND', 'bridge')]})]),
+            (8, [('IFLA_IFNAME', 'qvb1'), ('IFLA_MTU', 1450),
+                 ('IFLA_MASTER', 7)]))
+        self.assertEqual(
+            (True, ip_command.LinkInfo(8, 0, 1450, 'qbr1', None)),
+            self.monitor.get('qvb1'))
+        self.assertEqual((True, None), self.monitor.get('tap1'))
+
+    def test_rename_and_delete(self):
+        self._apply((8, [('IFLA_IFNAME', 'qvb1')]))
+        self._apply((8, [('IFLA_IFNAME', 'qvb2')]))
+        self.assertEqual((True, None), self.monitor.get('qvb1'))
+        self.assertTrue(self.monitor.get('qvb2')[1])
+        # a port leaving a bridge is not a deletion
+        self._apply((8, [('IFLA_IFNAME', 'qvb2')]),
+                    msg_type=rtnl.RTM_DELLINK, family=socket.AF_BRIDGE)
+        self.assertTrue(self.monitor.get('qvb2')[1])
+        self._apply((8, [('IFLA_IFNAME', 'qvb2')]),
+                    msg_type=rtnl.RTM_DELLINK)
+        self.assertEqual((True, None), self.monitor.get('qvb2'))
+
+    def test_bounded(self):
+        self.monitor.max_links = 1
+        self._apply((1, [('IFLA_IFNAME', 'lo')]),
+                    (8, [('IFLA_IFNAME', 'qvb1')]))
+        self.assertTrue(self.monitor.get('lo')[1])
+        # the cache is full so it can not tell whether qvb1 exists
+        self.assertEqual((False, None), self.monitor.get('qvb1'))
+        self.assertIsNone(self.monitor.snapshot())
+
+    def test_wait(self):
+        self.monitor._sock = mock.Mock()
+        self.monitor._sock.recv.side_effect = BlockingIOError()
+
+        def _add_link():
+            with self.monitor._cond:
+                self._apply((8, [('IFLA_IFNAME', 'qvb1')]))
+                self.monitor._cond.notify_all()
+
+        timer = threading.Timer(0.1, _add_link)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertTrue(self.monitor.wait('qvb1', timeout=5))
+        self.assertFalse(self.monitor.wait('qvb1', present=False,
+                                           timeout=0.1))
+
+
+class TestIpCommandMonitor(base.TestCase):
+
+    def setUp(self):
+        super(TestIpCommandMonitor, self).setUp()
+        self.ip = impl_pyroute2.PyRoute2()
+        self.addCleanup(self.ip.close)
+        self.monitor = mock.Mock(spec=impl_pyroute2.LinkMonitor)
+        self.monitor.running = True
+        self.ip._monitor = self.monitor
+
+    @mock.patch.object(iproute.IPRoute, 'link', create=True)
+    def test_exists_uses_monitor(self, ip_link):
+        self.monitor.get.side_effect = [
+            (True, ip_command.LinkInfo(8, 0, 1500, None, None)),
+            (True, None)]
+        self.assertTrue(self.ip.exists('qvb1'))
+        self.assertFalse(self.ip.exists('qvb2'))
+        ip_link.assert_not_called()
+
+    @mock.patch.object(iproute.IPRoute, 'link', create=True)
+    def test_exists_unknown_to_monitor(self, ip_link):
+        self.monitor.get.return_value = (False, None)
+        ip_link.return_value = [{'index': 8, 'flags': 0}]
+        self.assertTrue(self.ip.exists('qvb1'))
+        ip_link.assert_called_once_with('get', ifname='qvb1')
+
+    def test_wait_for_link(self):
+        self.monitor.wait.return_value = True
+        self.assertTrue(self.ip.wait_for_link('qvb1', timeout=1))
+        self.monitor.wait.assert_called_once_with('qvb1', True, 1)
+
+    @mock.patch.object(impl_pyroute2, '_WAIT_POLL_INTERVAL', 0)
+    def test_wait_for_link_no_monitor(self):
+        self.ip._monitor = None
+        with mock.patch.object(self.ip, 'exists',
+                               side_effect=[True, True, False]):
+            self.assertTrue(
+                self.ip.wait_for_link('qvb1', present=False, timeout=5))
+        with mock.patch.object(self.ip, 'exists', return_value=True):
+            self.assertFalse(
+                self.ip.wait_for_link('qvb1', present=False, timeout=0))
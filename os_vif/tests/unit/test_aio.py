@@ -0,0 +1,127 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import threading
+from unittest import mock
+
+import os_vif
+from os_vif import aio
+from os_vif import exception
+from os_vif.tests.unit import base
+
+
+class TestAio(base.TestCase):
+
+    def setUp(self):
+        super(TestAio, self).setUp()
+        self.addCleanup(aio.configure, aio.DEFAULT_MAX_WORKERS)
+        self.addCleanup(aio.shutdown)
+        ext_manager = mock.patch.object(os_vif, '_EXT_MANAGER', mock.Mock())
+        self.ext_manager = ext_manager.start()
+        self.addCleanup(ext_manager.stop)
+        self.ext_manager.get.return_value.THREAD_SAFE = True
+        self.vif = mock.Mock(plugin='ovs')
+
+    def test_not_initialized(self):
+        with mock.patch.object(os_vif, '_EXT_MANAGER', None):
+            self.assertRaises(
+                exception.LibraryNotInitialized, asyncio.run,
+                aio.plug(self.vif, mock.sentinel.info))
+
+    @mock.patch.object(os_vif, 'plug')
+    def test_plug(self, mock_plug):
+        main_thread = threading.get_ident()
+        threads = []
+        mock_plug.side_effect = (
+            lambda vif, info: threads.append(threading.get_ident()))
+        asyncio.run(aio.plug(self.vif, mock.sentinel.info))
+        mock_plug.assert_called_once_with(self.vif, mock.sentinel.info)
+        self.assertNotEqual([main_thread], threads)
+
+    @mock.patch.object(os_vif, 'unplug')
+    def test_unplug_error(self, mock_unplug):
+        error = exception.UnplugException(vif=None, err='boom')
+        mock_unplug.side_effect = error
+        with self.assertRaisesRegex(exception.UnplugException, 'boom'):
+            asyncio.run(aio.unplug(self.vif, mock.sentinel.info))
+
+    @mock.patch.object(os_vif, 'plug_many', return_value=[None])
+    def test_plug_many(self, mock_plug_many):
+        results = asyncio.run(
+            aio.plug_many([self.vif], mock.sentinel.info))
+        self.assertEqual([None], results)
+        mock_plug_many.assert_called_once_with(
+            [self.vif], mock.sentinel.info)
+
+    @mock.patch.object(os_vif, 'unplug_many')
+    def test_unplug_many_per_plugin(self, mock_unplug_many):
+        vifs = [mock.Mock(plugin='ovs'), mock.Mock(plugin='noop'),
+                mock.Mock(plugin='ovs')]
+        error = exception.UnplugException(vif=vifs[2], err='boom')
+        mock_unplug_many.side_effect = lambda batch, info: [
+            error if vif is vifs[2] else None for vif in batch]
+        results = asyncio.run(aio.unplug_many(vifs, mock.sentinel.info))
+        self.assertEqual([None, None, error], results)
+        # each plugin gets its VIFs on its own pool
+        mock_unplug_many.assert_has_calls(
+            [mock.call([vifs[0], vifs[2]], mock.sentinel.info),
+             mock.call([vifs[1]], mock.sentinel.info)], any_order=True)
+
+    @mock.patch.object(os_vif, 'host_info')
+    def test_host_info(self, mock_host_info):
+        info = asyncio.run(aio.host_info(['VIFOpenVSwitch']))
+        self.assertEqual(mock_host_info.return_value, info)
+        mock_host_info.assert_called_once_with(['VIFOpenVSwitch'])
+
+    def _peak_concurrency(self, mock_plug):
+        """Plug 5 VIFs concurrently and return the most plugged at once."""
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+        release = threading.Event()
+
+        def _plug(vif, info):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            release.wait(5)
+            with lock:
+                running[0] -= 1
+
+        mock_plug.side_effect = _plug
+
+        async def _plug_all():
+            tasks = [
+                asyncio.ensure_future(aio.plug(self.vif, mock.sentinel.info))
+                for _ in range(5)]
+            await asyncio.sleep(0.1)
+            release.set()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(_plug_all())
+        self.assertEqual(5, mock_plug.call_count)
+        return peak[0]
+
+    @mock.patch.object(os_vif, 'plug')
+    def test_concurrency_is_bounded(self, mock_plug):
+        aio.configure(max_workers=2)
+        self.assertEqual(2, self._peak_concurrency(mock_plug))
+
+    @mock.patch.object(os_vif, 'plug')
+    def test_plugin_not_thread_safe(self, mock_plug):
+        self.ext_manager.get.return_value.THREAD_SAFE = False
+        self.assertEqual(1, self._peak_concurrency(mock_plug))
+        self.ext_manager.get.assert_called_once_with('ovs')
+
+    def test_configure_invalid(self):
+        self.assertRaises(ValueError, aio.configure, 0)
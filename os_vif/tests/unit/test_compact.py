@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_serialization import jsonutils
+from oslo_serialization import msgpackutils
+
+import os_vif
+from os_vif import objects
+from os_vif.objects import compact
+from os_vif.tests.unit import base
+
+
+def _sorted_changes(primitive):
+    """Sort the changes lists of a primitive and its children."""
+    if isinstance(primitive, list):
+        return [_sorted_changes(item) for item in primitive]
+    if not isinstance(primitive, dict):
+        return primitive
+    result = {key: _sorted_changes(value) for key, value in primitive.items()}
+    if 'versioned_object.changes' in result:
+        result['versioned_object.changes'] = sorted(
+            result['versioned_object.changes'])
+    return result
+
+
+class TestCompact(base.TestCase):
+
+    def setUp(self):
+        super(TestCompact, self).setUp()
+
+        os_vif.objects.register_all()
+
+        subnet = objects.subnet.Subnet(
+            cidr='192.168.1.0/24',
+            dns=['192.168.1.1'],
+            gateway='192.168.1.254',
+            ips=objects.fixed_ip.FixedIPList(objects=[
+                objects.fixed_ip.FixedIP(
+                    address='192.168.1.%d' % idx, floating_ips=[])
+                for idx in range(10, 14)]),
+            routes=objects.route.RouteList(objects=[]))
+        self.vif = objects.vif.VIFOpenVSwitch(
+            id='b679325f-ca89-4ee0-a8be-6db1409b69ea',
+            address='ca:fe:de:ad:be:ef',
+            plugin='ovs',
+            vif_name='tap-xxx-yyy-zzz',
+            bridge_name='br-int',
+            network=objects.network.Network(
+                id='b82c1929-051e-481d-8110-4669916c7915',
+                label='Demo Net',
+                subnets=objects.subnet.SubnetList(objects=[subnet])),
+            port_profile=objects.vif.VIFPortProfileOpenVSwitch(
+                interface_id='e65867e0-9340-4a7f-a256-09af6eb7a3aa',
+                datapath_type='netdev'))
+
+    def _assert_round_trip(self, obj, **kwargs):
+        primitive = obj.obj_to_primitive()
+        data = compact.dumps(obj)
+        self.assertEqual(_sorted_changes(primitive),
+                         _sorted_changes(compact.unpack_primitive(data)))
+        self.assertLess(len(data), len(jsonutils.dumps(primitive)))
+
+        obj2 = compact.loads(data, **kwargs)
+        obj.obj_reset_changes(recursive=True)
+        obj2.obj_reset_changes(recursive=True)
+        self.assertEqual(obj, obj2)
+
+    def test_vif(self):
+        self._assert_round_trip(self.vif)
+
+    def test_vif_trusted(self):
+        self._assert_round_trip(self.vif, trusted=True)
+
+    def test_vif_changes(self):
+        self.vif.obj_reset_changes(recursive=True)
+        self.vif.bridge_name = 'br-ex'
+        primitive = compact.unpack_primitive(compact.dumps(self.vif))
+        self.assertEqual(['bridge_name'],
+                         primitive['versioned_object.changes'])
+        self.assertNotIn('versioned_object.changes',
+                         primitive['versioned_object.data']['network'])
+
+    def test_host_info(self):
+        os_vif.initialize()
+        self._assert_round_trip(os_vif.host_info())
+
+    def test_target_version(self):
+        vif = objects.vif.VIFVHostUser(
+            id='b679325f-ca89-4ee0-a8be-6db1409b69ea',
+            path='/some/socket.path',
+            mode=objects.fields.VIFVHostUserMode.CLIENT,
+            vif_name='vhu123')
+        primitive = compact.unpack_primitive(
+            compact.dumps(vif, version_manifest={'VIFVHostUser': '1.0'}))
+        self.assertEqual(
+            _sorted_changes(vif.obj_to_primitive(target_version='1.0')),
+            _sorted_changes(primitive))
+        self.assertNotIn('vif_name', primitive['versioned_object.data'])
+
+    def test_list(self):
+        vif2 = self.vif.obj_clone()
+        vif2.id = '0a7c9a72-88a0-4dc2-8b9f-2ae5bd4a3a29'
+        data = compact.dumps_list([self.vif, vif2])
+        # the schemas are shared by the objects of the payload
+        schemas = msgpackutils.loads(data)[1]
+        self.assertEqual(
+            len(schemas), len({tuple(schema[:3]) for schema in schemas}))
+
+        vifs = compact.loads_list(data)
+        self.assertEqual(
+            _sorted_changes([vif.obj_to_primitive()
+                             for vif in (self.vif, vif2)]),
+            _sorted_changes([vif.obj_to_primitive() for vif in vifs]))
+        self.assertRaises(ValueError, compact.loads, data)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, compact.unpack_primitive, b'\x93')
+        self.assertRaises(
+            ValueError, compact.unpack_primitive,
+            msgpackutils.dumps([compact.FORMAT_VERSION + 1, [], False, []]))
+        self.assertRaises(
+            ValueError, compact.unpack_primitive,
+            msgpackutils.dumps([compact.FORMAT_VERSION, [], False, [0, 0]]))
+        self.assertRaises(
+            ValueError, compact.pack_primitive,
+            {'versioned_object.name': 'Foo',
+             'versioned_object.namespace': 'os_vif',
+             'versioned_object.version': '1.0',
+             'versioned_object.data': {'bar': {'baz': 1}}})
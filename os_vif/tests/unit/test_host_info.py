@@ -10,6 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from unittest import mock
+
+from oslo_utils import versionutils
+from oslo_versionedobjects import base as ovo_base
+
 from vif_plug_ovs import constants as ovs_constants
 
 from os_vif import exception
@@ -124,6 +129,83 @@ class TestHostInfo(base.TestCase):
         self.assertEqual(objects.vif.VIFOpenVSwitch.VERSION,
                          ver)
 
+    @mock.patch.object(versionutils, 'convert_version_to_tuple',
+                       wraps=versionutils.convert_version_to_tuple)
+    def test_common_version_memoized(self, mock_convert):
+        info = objects.host_info.HostVIFInfo(
+            vif_object_name="VIFOpenVSwitch",
+            min_version="1.0",
+            max_version="42.0")
+
+        ver = info.get_common_version()
+        self.assertTrue(mock_convert.called)
+        mock_convert.reset_mock()
+        self.assertEqual(ver, info.get_common_version())
+        mock_convert.assert_not_called()
+
+    def test_common_version_registry_change(self):
+        info = objects.host_info.HostVIFInfo(
+            vif_object_name="VIFOpenVSwitch",
+            min_version="1.0",
+            max_version="42.0")
+        self.assertEqual(objects.vif.VIFOpenVSwitch.VERSION,
+                         info.get_common_version())
+
+        class VIFOpenVSwitch(objects.vif.VIFOpenVSwitch):
+            VERSION = '42.0'
+
+        registry = ovo_base.VersionedObjectRegistry.obj_classes()
+        with mock.patch.dict(registry, {'VIFOpenVSwitch': [
+                VIFOpenVSwitch] + registry['VIFOpenVSwitch']}):
+            self.assertEqual('42.0', info.get_common_version())
+        self.assertEqual(objects.vif.VIFOpenVSwitch.VERSION,
+                         info.get_common_version())
+
+    def test_common_versions(self):
+        pp_ovs = objects.host_info.HostPortProfileInfo(
+            profile_object_name="VIFPortProfileOpenVSwitch",
+            min_version="1.0",
+            max_version="10.0")
+        host_info = objects.host_info.HostInfo(
+            plugin_info=[
+                objects.host_info.HostPluginInfo(
+                    plugin_name="ovs",
+                    vif_info=[
+                        objects.host_info.HostVIFInfo(
+                            vif_object_name="VIFOpenVSwitch",
+                            min_version="1.0",
+                            max_version="10.0",
+                            supported_port_profiles=[pp_ovs]),
+                        objects.host_info.HostVIFInfo(
+                            vif_object_name="VIFBridge",
+                            min_version="1729.0",
+                            max_version="8753.0",
+                            supported_port_profiles=[pp_ovs]),
+                        objects.host_info.HostVIFInfo(
+                            vif_object_name="VIFFishFood",
+                            min_version="1.0",
+                            max_version="1.8"),
+                    ]),
+                objects.host_info.HostPluginInfo(
+                    plugin_name="noop",
+                    vif_info=[
+                        objects.host_info.HostVIFInfo(
+                            vif_object_name="VIFVHostUser",
+                            min_version="1.0",
+                            max_version="10.0",
+                            supported_port_profiles=[]),
+                    ]),
+            ])
+
+        self.assertEqual(
+            {"ovs": {
+                "VIFOpenVSwitch": objects.vif.VIFOpenVSwitch.VERSION,
+                "VIFPortProfileOpenVSwitch":
+                    objects.vif.VIFPortProfileOpenVSwitch.VERSION},
+             "noop": {
+                 "VIFVHostUser": objects.vif.VIFVHostUser.VERSION}},
+            host_info.get_common_versions())
+
     def test_filtering(self):
         host_info = objects.host_info.HostInfo(
             plugin_info=[
@@ -167,3 +249,123 @@ class TestHostInfo(base.TestCase):
         self.assertEqual(len(plugin.vif_info), 1)
         self.assertEqual(plugin.vif_info[0].vif_object_name,
                          "VIFOpenVSwitch")
+
+    def test_plugin_from_manifest(self):
+        plugin_info = objects.host_info.HostPluginInfo.from_manifest(
+            'demo', [
+                {'vif_object_name': 'VIFOpenVSwitch',
+                 'min_version': '1.0',
+                 'max_version': '2.0',
+                 'supported_port_profiles': [
+                     {'profile_object_name': 'VIFPortProfileOpenVSwitch',
+                      'min_version': '1.0',
+                      'max_version': '1.1'}]},
+            ])
+        self.assertEqual('demo', plugin_info.plugin_name)
+        vif_info = plugin_info.get_vif('VIFOpenVSwitch')
+        self.assertEqual(('1.0', '2.0'),
+                         (vif_info.min_version, vif_info.max_version))
+        self.assertEqual(
+            'VIFPortProfileOpenVSwitch',
+            vif_info.supported_port_profiles[0].profile_object_name)
+
+    def test_lookups_follow_changes(self):
+        plugin = self.host_info.get_plugin(ovs_constants.PLUGIN_NAME)
+        self.assertFalse(plugin.has_vif("VIFHostDevice"))
+
+        plugin.vif_info.append(objects.host_info.HostVIFInfo(
+            vif_object_name="VIFHostDevice",
+            min_version="1.0",
+            max_version="1.0"))
+        self.assertTrue(plugin.has_vif("VIFHostDevice"))
+
+        plugin.vif_info = plugin.vif_info[:1]
+        self.assertTrue(plugin.has_vif("VIFBridge"))
+        self.assertFalse(plugin.has_vif("VIFOpenVSwitch"))
+        self.assertRaises(exception.NoMatchingVIFClass,
+                          plugin.get_vif, "VIFOpenVSwitch")
+
+        self.host_info.plugin_info = []
+        self.assertFalse(self.host_info.has_plugin(ovs_constants.PLUGIN_NAME))
+        self.assertRaises(exception.NoMatchingPlugin,
+                          self.host_info.get_plugin,
+                          ovs_constants.PLUGIN_NAME)
+
+    def test_lookups_follow_replacement(self):
+        plugin = self.host_info.get_plugin(ovs_constants.PLUGIN_NAME)
+        self.assertTrue(plugin.has_vif("VIFBridge"))
+
+        vif = objects.host_info.HostVIFInfo(
+            vif_object_name="VIFHostDevice",
+            min_version="1.0",
+            max_version="1.0")
+        plugin.vif_info[0] = vif
+        self.assertFalse(plugin.has_vif("VIFBridge"))
+        self.assertIs(vif, plugin.get_vif("VIFHostDevice"))
+
+        other = objects.host_info.HostPluginInfo(
+            plugin_name="other", vif_info=[])
+        self.host_info.plugin_info[0] = other
+        self.assertFalse(self.host_info.has_plugin(ovs_constants.PLUGIN_NAME))
+        self.assertIs(other, self.host_info.get_plugin("other"))
+
+    def test_lookups_follow_renaming(self):
+        plugin = self.host_info.get_plugin(ovs_constants.PLUGIN_NAME)
+        vif = plugin.get_vif("VIFBridge")
+
+        vif.vif_object_name = "VIFHostDevice"
+        self.assertFalse(plugin.has_vif("VIFBridge"))
+        self.assertIs(vif, plugin.get_vif("VIFHostDevice"))
+
+        plugin.plugin_name = "other"
+        self.assertFalse(self.host_info.has_plugin(ovs_constants.PLUGIN_NAME))
+        self.assertIs(plugin, self.host_info.get_plugin("other"))
+
+    def test_filtered_view_follows_changes(self):
+        view = self.host_info.filtered_vif_types(["VIFHostDevice"])
+        self.assertEqual([], view.plugin_info)
+
+        plugin = self.host_info.get_plugin(ovs_constants.PLUGIN_NAME)
+        plugin.vif_info[0] = objects.host_info.HostVIFInfo(
+            vif_object_name="VIFHostDevice",
+            min_version="1.0",
+            max_version="1.0")
+        view = self.host_info.filtered_vif_types(["VIFHostDevice"])
+        self.assertEqual(1, len(view.plugin_info))
+
+        plugin.vif_info[0].vif_object_name = "VIFBridge"
+        view = self.host_info.filtered_vif_types(["VIFHostDevice"])
+        self.assertEqual([], view.plugin_info)
+
+        plugin.plugin_name = "other"
+        view = self.host_info.filtered_vif_types(["VIFBridge"])
+        self.assertEqual("other", view.plugin_info[0].plugin_name)
+
+    def test_filtering_set(self):
+        self.host_info.filter_vif_types({"VIFBridge", "VIFVHostUser"})
+        plugin = self.host_info.get_plugin(ovs_constants.PLUGIN_NAME)
+        self.assertEqual(
+            ["VIFBridge", "VIFVHostUser"],
+            [vif.vif_object_name for vif in plugin.vif_info])
+
+    def test_filtered_view(self):
+        view = self.host_info.filtered_vif_types(["VIFOpenVSwitch"])
+        plugin = self.host_info.get_plugin(ovs_constants.PLUGIN_NAME)
+        self.assertEqual(3, len(plugin.vif_info))
+        self.assertEqual(
+            ["VIFOpenVSwitch"],
+            [vif.vif_object_name
+             for vif in view.get_plugin(ovs_constants.PLUGIN_NAME).vif_info])
+        self.assertIs(plugin.get_vif("VIFOpenVSwitch"),
+                      view.plugin_info[0].vif_info[0])
+
+        # the same permitted names give the same view
+        self.assertIs(
+            view, self.host_info.filtered_vif_types({"VIFOpenVSwitch"}))
+        self.assertEqual(
+            [], self.host_info.filtered_vif_types(["VIFFishFood"]).plugin_info)
+
+        # until the filtered object changes
+        plugin.vif_info = plugin.vif_info[:1]
+        view = self.host_info.filtered_vif_types(["VIFOpenVSwitch"])
+        self.assertEqual([], view.plugin_info)
@@ -10,11 +10,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from unittest import mock
+
+import netaddr
 from oslo_versionedobjects import base as ovo_base
+from oslo_versionedobjects import fields
 from oslo_versionedobjects import fixture
 
 import os_vif
 from os_vif import objects
+from os_vif.objects import base as osv_base
 from os_vif.tests.unit import base
 
 
@@ -135,3 +140,70 @@ class TestObjectVersions(base.TestCase):
         self.assertIn('multiqueue', profile)
         self.assertIn('interface_id', profile)
         self.assertNotIn('nonexistent_field', profile)
+
+
+class TestCompiledSerialization(base.TestCase):
+    def setUp(self):
+        super(TestCompiledSerialization, self).setUp()
+
+        os_vif.objects.register_all()
+
+        subnet = objects.subnet.Subnet(
+            cidr='192.168.1.0/24',
+            dns=['192.168.1.1', '8.8.8.8'],
+            gateway='192.168.1.254',
+            ips=objects.fixed_ip.FixedIPList(objects=[
+                objects.fixed_ip.FixedIP(
+                    address='192.168.1.10', floating_ips=['10.0.0.5'])]),
+            routes=objects.route.RouteList(objects=[
+                objects.route.Route(
+                    cidr='10.0.0.0/8', gateway='192.168.1.1',
+                    interface='eth0')]))
+        self.vif = objects.vif.VIFOpenVSwitch(
+            id='b679325f-ca89-4ee0-a8be-6db1409b69ea',
+            address='CA:FE:DE:AD:BE:EF',
+            plugin='ovs',
+            vif_name='tap-xxx-yyy-zzz',
+            bridge_name='br-int',
+            network=objects.network.Network(
+                id='b82c1929-051e-481d-8110-4669916c7915',
+                label='Demo Net',
+                mtu=1500,
+                subnets=objects.subnet.SubnetList(objects=[subnet])),
+            port_profile=objects.vif.VIFPortProfileOpenVSwitch(
+                interface_id='e65867e0-9340-4a7f-a256-09af6eb7a3aa',
+                datapath_type='netdev'))
+
+    def test_to_primitive(self):
+        with mock.patch.object(osv_base, '_to_primitive_plan',
+                               return_value=None):
+            expected = self.vif.obj_to_primitive()
+        self.assertEqual(expected, self.vif.obj_to_primitive())
+
+    def test_from_trusted_primitive(self):
+        primitive = self.vif.obj_to_primitive()
+        vif = objects.vif.VIFBase.obj_from_trusted_primitive(primitive)
+        self.assertIsInstance(vif, objects.vif.VIFOpenVSwitch)
+        self.assertEqual(
+            objects.vif.VIFBase.obj_from_primitive(primitive), vif)
+
+        assert vif.network is not None
+        subnet = vif.network.subnets.objects[0]
+        self.assertIsInstance(subnet.cidr, netaddr.IPNetwork)
+        self.assertIsInstance(subnet.dns[0], netaddr.IPAddress)
+        self.assertEqual(netaddr.IPAddress('10.0.0.5'),
+                         subnet.ips.objects[0].floating_ips[0])
+        self.assertEqual('ca:fe:de:ad:be:ef', vif.address)
+        self.assertEqual(self.vif.obj_what_changed(), vif.obj_what_changed())
+
+    def test_not_compilable(self):
+        @ovo_base.VersionedObjectRegistry.register_if(False)
+        class Demo(osv_base.VersionedObject):
+            fields = {
+                'name': fields.StringField(),
+                'address': fields.IPV4AddressField(),
+            }
+
+        # IPV4Address validates the addresses in from_primitive()
+        self.assertIsNotNone(osv_base._to_primitive_plan(Demo))
+        self.assertIsNone(osv_base._from_primitive_plan(Demo))
@@ -10,10 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import importlib.metadata
+import sys
 from unittest import mock
 
 from oslo_config import cfg
-from stevedore import extension
 
 import os_vif
 from os_vif import exception
@@ -56,23 +57,95 @@ class DemoPluginNoConfig(plugin.PluginBase):
         pass
 
 
+DEMO_MANIFEST = [
+    {'vif_object_name': 'VIFBridge',
+     'min_version': '1.0',
+     'max_version': '1.0',
+     'supported_port_profiles': []},
+    {'vif_object_name': 'VIFOpenVSwitch',
+     'min_version': '1.0',
+     'max_version': '1.0',
+     'supported_port_profiles': []},
+]
+
+
 class TestOSVIF(base.TestCase):
 
     def setUp(self):
         super(TestOSVIF, self).setUp()
         os_vif._EXT_MANAGER = None
 
-    @mock.patch('stevedore.extension.ExtensionManager')
+    def _entry_points(self, manifests=None, **plugins):
+        """Register fake entry points for the given plugin classes.
+
+        :param manifests: a dict of the names of the module attributes
+            holding the manifests of the plugins, by plugin name.
+        """
+        entry_points = {
+            'os_vif': [
+                importlib.metadata.EntryPoint(
+                    name=name, value='%s:%s' % (__name__, cls.__name__),
+                    group='os_vif')
+                for name, cls in plugins.items()],
+            'os_vif.manifests': [
+                importlib.metadata.EntryPoint(
+                    name=name, value='%s:%s' % (__name__, attr),
+                    group='os_vif.manifests')
+                for name, attr in (manifests or {}).items()],
+        }
+        return mock.patch(
+            'stevedore.extension.ExtensionManager.list_entry_points',
+            autospec=True,
+            side_effect=lambda manager: entry_points[manager.namespace])
+
+    @mock.patch('stevedore.named.NamedExtensionManager')
     def test_initialize(self, mock_EM):
         self.assertIsNone(os_vif._EXT_MANAGER)
         # Note: the duplicate call for initialize is to validate
         # that the extension manager is only initialized once
         os_vif.initialize()
         os_vif.initialize()
-        mock_EM.assert_called_once_with(
-            invoke_on_load=False, namespace='os_vif')
+        mock_EM.assert_has_calls([
+            mock.call(invoke_on_load=False, namespace='os_vif', names=[]),
+            mock.call(invoke_on_load=False, namespace='os_vif.manifests',
+                      names=[]),
+        ], any_order=True)
+        self.assertEqual(2, mock_EM.call_count)
         self.assertIsNotNone(os_vif._EXT_MANAGER)
 
+    @mock.patch.object(DemoPlugin, 'load', wraps=DemoPlugin.load)
+    def test_initialize_lazy(self, mock_load):
+        with self._entry_points(foobar=DemoPlugin, other=DemoPluginNoConfig):
+            os_vif.initialize()
+        assert os_vif._EXT_MANAGER is not None
+        self.assertEqual(['foobar', 'other'], os_vif._EXT_MANAGER.names())
+        mock_load.assert_not_called()
+
+        info = objects.instance_info.InstanceInfo()
+        vif = objects.vif.VIFBridge(
+            id='9a12694f-f95e-49fa-9edb-70239aee5a2c', plugin='foobar')
+        os_vif.plug(vif, info)
+        os_vif.unplug(vif, info)
+        mock_load.assert_called_once_with('foobar')
+
+    def test_initialize_does_not_import_plugins(self):
+        os_vif.initialize()
+        assert os_vif._EXT_MANAGER is not None
+        self.assertIn('ovs', os_vif._EXT_MANAGER.names())
+        with mock.patch.dict(sys.modules):
+            sys.modules.pop('vif_plug_ovs.ovs', None)
+            os_vif.initialize(reset=True)
+            self.assertNotIn('vif_plug_ovs.ovs', sys.modules)
+
+    def test_plug_no_matching_plugin(self):
+        with self._entry_points(foobar=DemoPlugin):
+            os_vif.initialize()
+        vif = objects.vif.VIFBridge(
+            id='9a12694f-f95e-49fa-9edb-70239aee5a2c', plugin='missing')
+        self.assertRaises(
+            exception.NoMatchingPlugin,
+            os_vif.plug, vif, objects.instance_info.InstanceInfo())
+
     def test_load_plugin(self):
         obj = DemoPlugin.load("demo")
         self.assertTrue(hasattr(cfg.CONF, "os_vif_demo"))
@@ -100,18 +173,7 @@ class TestOSVIF(base.TestCase):
 
     @mock.patch.object(DemoPlugin, "plug")
     def test_plug(self, mock_plug):
-        # We don't bother building a fake EntryPoint here
-        plg = extension.Extension(name="demo",
-                                  entry_point=None,  # type: ignore
-                                  plugin=DemoPlugin,
-                                  obj=None)
-        with mock.patch(
-            'stevedore.extension.ExtensionManager.names',
-            return_value=['foobar'],
-        ), mock.patch(
-            'stevedore.extension.ExtensionManager.__getitem__',
-            return_value=plg,
-        ):
+        with self._entry_points(foobar=DemoPlugin):
             os_vif.initialize()
             info = objects.instance_info.InstanceInfo()
             vif = objects.vif.VIFBridge(
@@ -122,18 +184,7 @@ class TestOSVIF(base.TestCase):
 
     @mock.patch.object(DemoPlugin, "unplug")
     def test_unplug(self, mock_unplug):
-        # We don't bother building a fake EntryPoint here
-        plg = extension.Extension(name="demo",
-                                  entry_point=None,  # type: ignore
-                                  plugin=DemoPlugin,
-                                  obj=None)
-        with mock.patch(
-            'stevedore.extension.ExtensionManager.names',
-            return_value=['foobar']
-        ), mock.patch(
-            'stevedore.extension.ExtensionManager.__getitem__',
-            return_value=plg,
-        ):
+        with self._entry_points(foobar=DemoPlugin):
             os_vif.initialize()
             info = objects.instance_info.InstanceInfo()
             vif = objects.vif.VIFBridge(
@@ -142,6 +193,134 @@ class TestOSVIF(base.TestCase):
             os_vif.unplug(vif, info)
             mock_unplug.assert_called_once_with(vif, info)
 
+    def test_plug_many_not_initialized(self):
+        self.assertRaises(
+            exception.LibraryNotInitialized,
+            os_vif.plug_many, [], None)
+
+    def test_unplug_many_not_initialized(self):
+        self.assertRaises(
+            exception.LibraryNotInitialized,
+            os_vif.unplug_many, [], None)
+
+    @mock.patch.object(DemoPlugin, "plug_batch")
+    def test_plug_many(self, mock_plug_batch):
+        error = ValueError('boom')
+        mock_plug_batch.return_value = [None, error]
+        with self._entry_points(foobar=DemoPlugin):
+            os_vif.initialize()
+            info = objects.instance_info.InstanceInfo()
+            vif1 = objects.vif.VIFBridge(
+                id='9a12694f-f95e-49fa-9edb-70239aee5a2c',
+                plugin='foobar')
+            vif2 = objects.vif.VIFBridge(
+                id='0a7c9a72-88a0-4dc2-8b9f-2ae5bd4a3a29',
+                plugin='missing')
+            vif3 = objects.vif.VIFBridge(
+                id='b2dfb3c4-0fd4-4a8a-9b1e-3f2d81c4f5a0',
+                plugin='foobar')
+            results = os_vif.plug_many([vif1, vif2, vif3], info)
+
+        mock_plug_batch.assert_called_once_with([vif1, vif3], info)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], exception.NoMatchingPlugin)
+        result = results[2]
+        self.assertIsInstance(result, exception.PlugException)
+        assert result is not None
+        self.assertEqual({'vif': vif3, 'err': error}, result.kwargs)
+
+    @mock.patch.object(DemoPlugin, "plug_batch", return_value=[None])
+    def test_plug_many_wrong_result_count(self, mock_plug_batch):
+        with self._entry_points(foobar=DemoPlugin):
+            os_vif.initialize()
+            info = objects.instance_info.InstanceInfo()
+            vifs = [
+                objects.vif.VIFBridge(
+                    id='9a12694f-f95e-49fa-9edb-70239aee5a2c',
+                    plugin='foobar'),
+                objects.vif.VIFBridge(
+                    id='b2dfb3c4-0fd4-4a8a-9b1e-3f2d81c4f5a0',
+                    plugin='foobar'),
+            ]
+            results = os_vif.plug_many(vifs, info)
+
+        mock_plug_batch.assert_called_once_with(vifs, info)
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertIsInstance(result, exception.PlugException)
+
+    @mock.patch.object(DemoPlugin, "unplug_batch",
+                       side_effect=RuntimeError('boom'))
+    def test_unplug_many_batch_failure(self, mock_unplug_batch):
+        with self._entry_points(foobar=DemoPlugin):
+            os_vif.initialize()
+            info = objects.instance_info.InstanceInfo()
+            vifs = [
+                objects.vif.VIFBridge(
+                    id='9a12694f-f95e-49fa-9edb-70239aee5a2c',
+                    plugin='foobar'),
+                objects.vif.VIFBridge(
+                    id='b2dfb3c4-0fd4-4a8a-9b1e-3f2d81c4f5a0',
+                    plugin='foobar'),
+            ]
+            results = os_vif.unplug_many(vifs, info)
+
+        mock_unplug_batch.assert_called_once_with(vifs, info)
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertIsInstance(result, exception.UnplugException)
+
+    @mock.patch.object(DemoPlugin, "unplug_batch", return_value=[None])
+    def test_unplug_many_plugin_import_failure(self, mock_unplug_batch):
+        with self._entry_points(foobar=DemoPlugin) as mock_list:
+            broken = importlib.metadata.EntryPoint(
+                name='broken', value='os_vif.tests.unit.missing:Plugin',
+                group='os_vif')
+            list_entry_points = mock_list.side_effect
+            mock_list.side_effect = lambda manager: list_entry_points(
+                manager) + ([broken] if manager.namespace == 'os_vif'
+                            else [])
+            os_vif.initialize()
+            info = objects.instance_info.InstanceInfo()
+            vif1 = objects.vif.VIFBridge(
+                id='9a12694f-f95e-49fa-9edb-70239aee5a2c',
+                plugin='broken')
+            vif2 = objects.vif.VIFBridge(
+                id='b2dfb3c4-0fd4-4a8a-9b1e-3f2d81c4f5a0',
+                plugin='foobar')
+            results = os_vif.unplug_many([vif1, vif2], info)
+
+        mock_unplug_batch.assert_called_once_with([vif2], info)
+        result = results[0]
+        self.assertIsInstance(result, exception.UnplugException)
+        assert result is not None
+        self.assertIsInstance(result.kwargs['err'], ImportError)
+        self.assertIsNone(results[1])
+
+    def test_plugin_plug_batch(self):
+        plugin = DemoPluginNoConfig.load("demonocfg")
+        error = ValueError('boom')
+        with mock.patch.object(plugin, 'plug',
+                               side_effect=[None, error]) as mock_plug:
+            results = plugin.plug_batch(
+                [mock.sentinel.vif1, mock.sentinel.vif2], mock.sentinel.info)
+        mock_plug.assert_has_calls(
+            [mock.call(mock.sentinel.vif1, mock.sentinel.info),
+             mock.call(mock.sentinel.vif2, mock.sentinel.info)])
+        self.assertEqual([None, error], results)
+
+    def test_plugin_unplug_batch(self):
+        plugin = DemoPluginNoConfig.load("demonocfg")
+        error = ValueError('boom')
+        with mock.patch.object(plugin, 'unplug',
+                               side_effect=[error, None]) as mock_unplug:
+            results = plugin.unplug_batch(
+                [mock.sentinel.vif1, mock.sentinel.vif2], mock.sentinel.info)
+        mock_unplug.assert_has_calls(
+            [mock.call(mock.sentinel.vif1, mock.sentinel.info),
+             mock.call(mock.sentinel.vif2, mock.sentinel.info)])
+        self.assertEqual([error, None], results)
+
     def test_host_info_all(self):
         os_vif.initialize()
         info = os_vif.host_info()
@@ -176,6 +355,44 @@ class TestOSVIF(base.TestCase):
         self.assertEqual(len(vif_info), 1)
         self.assertEqual(vif_info[0].vif_object_name, "VIFOpenVSwitch")
 
+    @mock.patch.object(DemoPlugin, 'load', wraps=DemoPlugin.load)
+    def test_host_info_from_manifest(self, mock_load):
+        with self._entry_points(manifests={'foobar': 'DEMO_MANIFEST'},
+                                foobar=DemoPlugin):
+            os_vif.initialize()
+
+        with mock.patch.object(
+            objects.host_info.HostPluginInfo, 'from_manifest',
+            wraps=objects.host_info.HostPluginInfo.from_manifest,
+        ) as mock_from_manifest:
+            info = os_vif.host_info()
+            filtered = os_vif.host_info(
+                permitted_vif_type_names=['VIFOpenVSwitch'])
+            # mutating a result does not change the next ones
+            info.plugin_info[0].vif_info = []
+            filtered.plugin_info = []
+            info = os_vif.host_info()
+            filtered = os_vif.host_info(
+                permitted_vif_type_names=['VIFOpenVSwitch'])
+
+        mock_from_manifest.assert_called_once_with('foobar', DEMO_MANIFEST)
+        mock_load.assert_not_called()
+        self.assertEqual(
+            ['VIFBridge', 'VIFOpenVSwitch'],
+            [vif.vif_object_name for vif in info.plugin_info[0].vif_info])
+        self.assertEqual(
+            ['VIFOpenVSwitch'],
+            [vif.vif_object_name
+             for vif in filtered.plugin_info[0].vif_info])
+
+    def test_host_info_does_not_import_plugins(self):
+        with mock.patch.dict(sys.modules):
+            sys.modules.pop('vif_plug_ovs.ovs', None)
+            os_vif.initialize()
+            info = os_vif.host_info()
+            self.assertNotIn('vif_plug_ovs.ovs', sys.modules)
+        self.assertTrue(info.has_plugin('ovs'))
+
     def test_list_opts_entrypoints(self):
         list_opts = opts.list_plugins_opts()
         for group in list_opts:
@@ -10,10 +10,12 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from unittest import mock
 import warnings
 
 import os_vif
 from os_vif import objects
+from os_vif.objects import base as osv_base
 from os_vif.tests.unit import base
 
 
@@ -30,6 +32,12 @@ class TestVIFS(base.TestCase):
         prim = vif.obj_to_primitive()
         self.assertEqual("os_vif", prim["versioned_object.namespace"])
         vif2 = objects.vif.VIFBase.obj_from_primitive(prim)
+        vif3 = objects.vif.VIFBase.obj_from_trusted_primitive(prim)
+
+        # the compiled serializer gives what the generic one does
+        with mock.patch.object(osv_base, '_to_primitive_plan',
+                               return_value=None):
+            self.assertEqual(prim, vif.obj_to_primitive())
 
         # The __eq__ function works by using obj_to_primitive()
         # and this includes a list of changed fields. Very
@@ -42,8 +50,10 @@ class TestVIFS(base.TestCase):
         # https://bugs.launchpad.net/oslo.versionedobjects/+bug/1563787
         vif.obj_reset_changes(recursive=True)
         vif2.obj_reset_changes(recursive=True)
+        vif3.obj_reset_changes(recursive=True)
 
         self.assertEqual(vif, vif2)
+        self.assertEqual(vif, vif3)
 
     def test_vif_generic(self):
         self._test_vif(objects.vif.VIFGeneric,
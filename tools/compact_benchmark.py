@@ -0,0 +1,100 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the compact msgpack encoding of VIFs with JSON primitives.
+
+Usage: python tools/compact_benchmark.py [--vifs N] [--ips N] [-n NUMBER]
+"""
+
+import argparse
+import timeit
+import uuid
+
+from oslo_serialization import jsonutils
+
+import os_vif
+from os_vif import objects
+from os_vif.objects import compact
+
+
+def _make_vif(ips):
+    subnet = objects.subnet.Subnet(
+        cidr='10.0.0.0/16',
+        dns=['10.0.0.1', '8.8.8.8'],
+        gateway='10.0.0.254',
+        ips=objects.fixed_ip.FixedIPList(objects=[
+            objects.fixed_ip.FixedIP(
+                address='10.0.%d.%d' % divmod(idx + 10, 256),
+                floating_ips=[])
+            for idx in range(ips)]),
+        routes=objects.route.RouteList(objects=[
+            objects.route.Route(
+                cidr='172.16.0.0/12', gateway='10.0.0.1',
+                interface='eth0')]))
+    return objects.vif.VIFOpenVSwitch(
+        id=str(uuid.uuid4()),
+        address='ca:fe:de:ad:be:ef',
+        plugin='ovs',
+        vif_name='tap-xxx-yyy-zzz',
+        bridge_name='br-int',
+        has_traffic_filtering=True,
+        network=objects.network.Network(
+            id=str(uuid.uuid4()),
+            label='Demo Net',
+            mtu=1500,
+            subnets=objects.subnet.SubnetList(objects=[subnet])),
+        port_profile=objects.vif.VIFPortProfileOpenVSwitch(
+            interface_id=str(uuid.uuid4()),
+            datapath_type='netdev'))
+
+
+def _time(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vifs', type=int, default=16,
+                        help='number of VIFs in the payload')
+    parser.add_argument('--ips', type=int, default=8,
+                        help='number of fixed IPs of each VIF')
+    parser.add_argument('-n', '--number', type=int, default=50,
+                        help='iterations per measurement')
+    args = parser.parse_args()
+
+    os_vif.objects.register_all()
+    vifs = [_make_vif(args.ips) for _ in range(args.vifs)]
+
+    def json_dumps():
+        return jsonutils.dumps([vif.obj_to_primitive() for vif in vifs])
+
+    def json_loads(data):
+        return [objects.vif.VIFBase.obj_from_primitive(primitive)
+                for primitive in jsonutils.loads(data)]
+
+    json_data = json_dumps()
+    compact_data = compact.dumps_list(vifs)
+
+    print('%d VIFs with %d fixed IPs each' % (args.vifs, args.ips))
+    print('%-8s %10s %10s %10s' % ('', 'bytes', 'dumps ms', 'loads ms'))
+    print('%-8s %10d %10.2f %10.2f' % (
+        'json', len(json_data.encode()),
+        _time(json_dumps, args.number),
+        _time(lambda: json_loads(json_data), args.number)))
+    print('%-8s %10d %10.2f %10.2f' % (
+        'compact', len(compact_data),
+        _time(lambda: compact.dumps_list(vifs), args.number),
+        _time(lambda: compact.loads_list(compact_data), args.number)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the compiled VIF (de)serializers with the generic ones.
+
+Usage: python tools/serialization_benchmark.py [-n NUMBER]
+"""
+
+import argparse
+import timeit
+from unittest import mock
+
+import os_vif
+from os_vif import objects
+from os_vif.objects import base as osv_base
+
+
+def _make_vif():
+    subnets = []
+    for idx in range(2):
+        subnets.append(objects.subnet.Subnet(
+            cidr='192.168.%d.0/24' % idx,
+            dns=['192.168.%d.1' % idx, '8.8.8.8'],
+            gateway='192.168.%d.254' % idx,
+            ips=objects.fixed_ip.FixedIPList(objects=[
+                objects.fixed_ip.FixedIP(
+                    address='192.168.%d.10' % idx,
+                    floating_ips=['10.0.%d.5' % idx])]),
+            routes=objects.route.RouteList(objects=[
+                objects.route.Route(
+                    cidr='10.%d.0.0/16' % idx,
+                    gateway='192.168.%d.1' % idx,
+                    interface='eth0')])))
+    return objects.vif.VIFOpenVSwitch(
+        id='b679325f-ca89-4ee0-a8be-6db1409b69ea',
+        address='ca:fe:de:ad:be:ef',
+        plugin='ovs',
+        vif_name='tap-xxx-yyy-zzz',
+        bridge_name='br-int',
+        has_traffic_filtering=True,
+        network=objects.network.Network(
+            id='b82c1929-051e-481d-8110-4669916c7915',
+            label='Demo Net',
+            mtu=1500,
+            subnets=objects.subnet.SubnetList(objects=subnets)),
+        port_profile=objects.vif.VIFPortProfileOpenVSwitch(
+            interface_id='e65867e0-9340-4a7f-a256-09af6eb7a3aa',
+            datapath_type='netdev'))
+
+
+def _time(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--number', type=int, default=2000,
+                        help='iterations per measurement')
+    args = parser.parse_args()
+
+    os_vif.objects.register_all()
+    vif = _make_vif()
+    primitive = vif.obj_to_primitive()
+
+    with mock.patch.object(osv_base, '_to_primitive_plan',
+                           return_value=None):
+        generic_to = _time(vif.obj_to_primitive, args.number)
+    compiled_to = _time(vif.obj_to_primitive, args.number)
+    generic_from = _time(
+        lambda: objects.vif.VIFBase.obj_from_primitive(primitive),
+        args.number)
+    compiled_from = _time(
+        lambda: objects.vif.VIFBase.obj_from_trusted_primitive(primitive),
+        args.number)
+
+    print('%-20s %12s %12s %8s' % ('', 'generic us', 'compiled us', 'ratio'))
+    for name, generic, compiled in (
+            ('obj_to_primitive', generic_to, compiled_to),
+            ('obj_from_primitive', generic_from, compiled_from)):
+        print('%-20s %12.1f %12.1f %7.2fx' % (
+            name, generic, compiled, generic / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,8 @@ from __future__ import annotations
 from os_vif import objects
 from os_vif import plugin
 
+from vif_plug_noop import manifest
+
 
 class NoOpPlugin(plugin.PluginBase):
     """A no op plugin
@@ -32,16 +34,11 @@ class NoOpPlugin(plugin.PluginBase):
 
     """
 
+    THREAD_SAFE = True
+
     def describe(self) -> objects.HostPluginInfo:
-        return objects.host_info.HostPluginInfo(
-            plugin_name="noop",
-            vif_info=[
-                objects.host_info.HostVIFInfo(
-                    vif_object_name=objects.vif.VIFVHostUser.__name__,
-                    min_version="1.0",
-                    max_version="1.0",
-                    supported_port_profiles=[])
-            ])
+        return objects.host_info.HostPluginInfo.from_manifest(
+            "noop", manifest.MANIFEST)
 
     def plug(
         self, vif: objects.VIFBase, instance_info: objects.InstanceInfo
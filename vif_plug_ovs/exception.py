@@ -41,3 +41,7 @@ class TapCreationNotSupported(osv_exception.ExceptionBase):
     msg_fmt = _('Tap device creation requested for unsupported VIF type. '
                 'create_tap is only supported for VIFOpenVSwitch, got '
                 '%(vif_type)s')
+
+
+class KernelPlanStepFailed(osv_exception.ExceptionBase):
+    msg_fmt = _('Kernel operation %(op)s%(args)s failed: %(error)s')
@@ -19,11 +19,15 @@
 
 """Implements vlans, bridges using linux utilities."""
 
+from collections.abc import Callable
 import glob
 import os
 import re
+import threading
+from typing import Any
 
 from os_vif.internal.ip.api import ip as ip_lib
+from os_vif.internal.ip import ip_command
 from oslo_concurrency import processutils
 from oslo_log import log as logging
 from oslo_utils import excutils
@@ -49,6 +53,11 @@ UPLINK_PORT_RE = re.compile(r"p(\d+)", re.IGNORECASE)
 _SRIOV_TOTALVFS = "sriov_totalvfs"
 NIC_NAME_LEN = 14
 
+PLAN_OK = 'ok'
+PLAN_ERROR = 'error'
+PLAN_SKIPPED = 'skipped'
+
+
 
 def _update_device_mtu(dev: str, mtu: int | None) -> None:
     if not mtu:
@@ -78,11 +87,8 @@ def create_veth_pair(dev1_name: str, dev2_name: str, mtu: int) -> None:
     for dev in [dev1_name, dev2_name]:
         delete_net_dev(dev)
 
-    ip_lib.add(dev1_name, 'veth', peer=dev2_name)
-    for dev in [dev1_name, dev2_name]:
-        ip_lib.set(dev, state='up')
-        ip_lib.set(dev, promisc=True)
-        _update_device_mtu(dev, mtu)
+    ip_lib.ensure(dev1_name, 'veth', peer=dev2_name, state='up',
+                  promisc=True, mtu=mtu, check_exit_code=[0, 2, 254])
 
 
 @privsep.vif_plug.entrypoint
@@ -105,14 +111,11 @@ def create_tap(dev: str, mtu: int, mac: str, multiqueue: bool = False) -> None:
     :param multiqueue: Enable multiqueue support (boolean, default False)
                        Requires Linux kernel 3.8+
     """
-    # Create the tap device with optional multiqueue support
-    # Use check_exit_code=[0, 17] to handle EEXIST (device already exists)
-    ip_lib.add(dev, 'tuntap', mode='tap', multiqueue=multiqueue,
-               check_exit_code=[0, 17])
-    # Configure the device state and MAC address
-    ip_lib.set(dev, state='up', address=mac, check_exit_code=[0, 2, 254])
-    # Set MTU if specified
-    _update_device_mtu(dev, mtu)
+    # Create the tap device with optional multiqueue support, an existing
+    # device is reused, and configure its state, MAC address and MTU
+    ip_lib.ensure(dev, 'tuntap', mode='tap', multiqueue=multiqueue,
+                  state='up', address=mac, mtu=mtu,
+                  check_exit_code=[0, 2, 254])
 
 
 def _disable_ipv6(bridge: str) -> None:
@@ -187,6 +190,112 @@ def set_interface_state(interface_name: str, port_state: str) -> None:
     ip_lib.set(interface_name, state=port_state, check_exit_code=[0, 2, 254])
 
 
+# The privileged operations that can be part of a KernelPlan, by name. A
+# plan can only run these functions.
+PLAN_OPS: dict[str, Callable[..., None]] = {
+    'add_bridge_port': add_bridge_port,
+    'create_tap': create_tap,
+    'create_veth_pair': create_veth_pair,
+    'delete_bridge': delete_bridge,
+    'delete_net_dev': delete_net_dev,
+    'ensure_bridge': ensure_bridge,
+    'set_device_mtu': set_device_mtu,
+    'set_interface_state': set_interface_state,
+    'update_veth_pair': update_veth_pair,
+}
+
+
+def _execute_plan(
+    steps: list[tuple[str, str, list[Any]]],
+) -> list[tuple[str, str | None]]:
+    """Run the steps of a kernel plan.
+
+    :param steps: list of (group, operation, arguments) tuples.
+    :returns: a (status, error) tuple for each step, in order. Once a step
+        fails the remaining steps of the same group are skipped.
+    """
+    failed: set[str] = set()
+    results: list[tuple[str, str | None]] = []
+    for group, op, args in steps:
+        if group in failed:
+            results.append((PLAN_SKIPPED, None))
+            continue
+        if op not in PLAN_OPS:
+            failed.add(group)
+            results.append((PLAN_ERROR, f'Unknown operation {op}'))
+            continue
+        try:
+            PLAN_OPS[op](*args)
+            results.append((PLAN_OK, None))
+        except Exception as e:
+            LOG.error("Kernel plan operation %(op)s%(args)s failed: %(err)s",
+                      {'op': op, 'args': tuple(args), 'err': e})
+            failed.add(group)
+            results.append((PLAN_ERROR, f'{type(e).__name__}: {e}'))
+    return results
+
+
+@privsep.vif_plug.entrypoint
+def execute_plan(
+    steps: list[tuple[str, str, list[Any]]],
+) -> list[tuple[str, str | None]]:
+    """Run all the steps of a kernel plan with one privsep call."""
+    return _execute_plan(steps)
+
+
+class KernelPlan:
+    """A list of privileged link operations run with one privsep call.
+
+    Each privsep entrypoint call is a round trip to the privsep daemon, so
+    rather than calling e.g. :func:`ensure_bridge`, :func:`create_veth_pair`
+    and :func:`add_bridge_port` one after the other, callers add them to a
+    plan which is shipped to the daemon at once. Steps are grouped, usually
+    by VIF, and a failing step only skips the remaining steps of its own
+    group so a plan can cover a whole batch of VIFs.
+    """
+
+    def __init__(self) -> None:
+        self._steps: list[tuple[str, str, list[Any]]] = []
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def add(self, op: str, *args: Any, group: str = '') -> None:
+        """Add a step calling the ``op`` function of this module."""
+        if op not in PLAN_OPS:
+            raise ValueError(f'{op} is not a kernel plan operation')
+        self._steps.append((group, op, list(args)))
+
+    def discard(self, group: str) -> None:
+        """Drop the steps of a group."""
+        self._steps = [step for step in self._steps if step[0] != group]
+
+    def execute(self) -> dict[str, Exception | None]:
+        """Execute and clear the plan.
+
+        :returns: a mapping of group to ``None`` if all its steps succeeded,
+            or to a :class:`~vif_plug_ovs.exception.KernelPlanStepFailed`
+            for the step that failed.
+        """
+        steps, self._steps = self._steps, []
+        if not steps:
+            return {}
+        results: dict[str, Exception | None] = {}
+        for (group, op, args), (status, error) in zip(
+                steps, execute_plan(steps)):
+            results.setdefault(group, None)
+            if status == PLAN_ERROR and results[group] is None:
+                results[group] = exception.KernelPlanStepFailed(
+                    op=op, args=tuple(args), error=error)
+        return results
+
+    def run(self) -> None:
+        """Execute the plan, raising the first error encountered."""
+        for error in self.execute().values():
+            if error is not None:
+                raise error
+
+
 def _parse_vf_number(phys_port_name: str) -> str | None:
     """Parses phys_port_name and returns VF number or None.
 
@@ -250,67 +359,410 @@ def _get_pf_func(pf_ifname: str) -> str | None:
     return None
 
 
-def get_representor_port(pf_ifname: str, vf_num: str) -> str:
-    """Get the representor netdevice which is corresponding to the VF.
+_NET_CLASS_PATH = "/sys/class/net"
 
-    This method gets PF interface name and number of VF. It iterates over all
-    the interfaces under the PF location and looks for interface that has the
-    VF number in the phys_port_name. That interface is the representor for
-    the requested VF.
-    """
+# (phys_switch_id, PF number or None, VF number) of a VF representor
+_RepresentorKey = tuple[str, str | None, int]
+# (ifindex, representor key) of an indexed netdev, either being None when
+# unknown
+_Netdev = tuple[int | None, _RepresentorKey | None]
 
-    pf_sw_id = None
-    try:
-        pf_sw_id = _get_phys_switch_id(pf_ifname)
-    except (OSError, IOError):
-        raise exception.RepresentorNotFound(ifname=pf_ifname, vf_num=vf_num)
 
-    pf_subsystem_file = "/sys/class/net/%s/subsystem" % pf_ifname
-    try:
-        devices = os.listdir(pf_subsystem_file)
-    except (OSError, IOError):
-        raise exception.RepresentorNotFound(ifname=pf_ifname, vf_num=vf_num)
+class SriovTopology:
+    """Index of the VF representors and VF numbers of the host.
 
-    ifname_pf_func = _get_pf_func(pf_ifname)
-    if ifname_pf_func is None:
-        raise exception.RepresentorNotFound(ifname=pf_ifname, vf_num=vf_num)
+    Finding a representor used to mean reading the phys_switch_id and
+    phys_port_name of every netdev on the host on each lookup. This index
+    reads all the netdevs once, then follows the link notifications of the
+    kernel so that only the netdevs added, recreated under the same name or
+    removed since the previous lookup are read again or dropped; a lookup
+    is otherwise a dictionary access. Netdevs whose attributes could not be
+    read are read again when a lookup misses. All the netdevs are read
+    again if notifications were lost, and on every lookup if they cannot be
+    subscribed to.
 
-    for device in devices:
-        try:
-            device_sw_id = _get_phys_switch_id(device)
-            if not device_sw_id or device_sw_id != pf_sw_id:
-                continue
-        except (OSError, IOError):
-            continue
+    VF numbers are indexed per PF, all the VFs of a PF being indexed the
+    first time one of them is looked up.
+    """
 
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._netdevs: dict[str, _Netdev] = {}
+        self._names: dict[int, str] = {}
+        self._representors: dict[_RepresentorKey, str] = {}
+        self._vf_nums: dict[str, str] = {}
+        self._subscription: ip_command.LinkSubscription | None = None
+        # the process that subscribed, the subscription of a parent process
+        # is not used after a fork
+        self._pid: int | None = None
+
+    def refresh(self) -> None:
+        """Index the netdevs added or recreated and drop the ones removed.
+        """
+        with self._lock:
+            self._scan()
+
+    def _scan(self) -> None:
+        devices = {
+            device: _get_ifindex(device)
+            for device in os.listdir(_NET_CLASS_PATH)
+        }
+        for device in set(self._netdevs).difference(devices):
+            self._remove_netdev(device)
+        for device, ifindex in devices.items():
+            netdev = self._netdevs.get(device)
+            if netdev is not None and netdev[0] == ifindex:
+                continue
+            if netdev is not None:
+                self._remove_netdev(device)
+            self._add_netdev(device, ifindex)
+
+    def _subscribe(self) -> None:
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+        self._pid = os.getpid()
         try:
+            self._subscription = ip_lib.subscribe_links()
+        except OSError as e:
+            LOG.debug('Unable to subscribe to link notifications, netdevs '
+                      'will be read on every representor lookup: %s', e)
+
+    def _sync(self) -> None:
+        """Apply the link notifications received since the last lookup."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # NOTE: subscribe before reading the netdevs so that no
+                # change is missed, the notifications queued meanwhile are
+                # applied over the netdevs read.
+                self._subscribe()
+            elif self._subscription is not None:
+                events = self._subscription.read()
+                if events is not None:
+                    for event in events:
+                        self._apply(event)
+                    return
+                LOG.debug('Link notifications were lost, reading all the '
+                          'netdevs again')
+            self._scan()
+
+    def _apply(self, event: ip_command.LinkEvent) -> None:
+        netdev = self._netdevs.get(event.ifname)
+        if event.deleted:
+            if netdev is not None and netdev[0] in (event.ifindex, None):
+                self._remove_netdev(event.ifname)
+            return
+        if netdev is not None and netdev[0] == event.ifindex:
+            return
+        renamed = self._names.get(event.ifindex)
+        if renamed is not None:
+            self._remove_netdev(renamed)
+        if event.ifname in self._netdevs:
+            self._remove_netdev(event.ifname)
+        self._add_netdev(event.ifname, event.ifindex)
+
+    def _reindex_unknown(self) -> bool:
+        """Read again the netdevs that are not indexed as representors.
+
+        Their attributes may not have been readable yet when they were
+        first seen, e.g. while the driver was still setting them up.
+
+        :return: whether a representor was indexed
+        """
+        with self._lock:
+            found = False
+            for device, (ifindex, key) in list(self._netdevs.items()):
+                if key is None:
+                    self._add_netdev(device, ifindex)
+                    found |= self._netdevs[device][1] is not None
+            return found
+
+    def _add_netdev(self, device: str, ifindex: int | None) -> None:
+        self._netdevs[device] = (ifindex, None)
+        if ifindex is not None:
+            self._names[ifindex] = device
+        try:
+            switch_id = _get_phys_switch_id(device)
+            if not switch_id:
+                return
             phys_port_name = _get_phys_port_name(device)
             if phys_port_name is None:
-                continue
+                return
         except (OSError, IOError):
-            continue
+            return
+        self._index(device, ifindex, switch_id, phys_port_name)
 
+    def _index(
+        self, device: str, ifindex: int | None, switch_id: str,
+        phys_port_name: str,
+    ) -> None:
         # If the phys_port_name of the VF-rep is of the format pfXvfY
-        # (or vfY@pfX), then match "X" (parent PF's func number) with
-        # the PCI func number of pf_ifname.
-        rep_parent_pf_func = _parse_pf_number(phys_port_name)
-        if rep_parent_pf_func is not None:
-            if int(rep_parent_pf_func) != int(ifname_pf_func):
+        # (or vfY@pfX), then "X" is the parent PF's func number.
+        vf_num = _parse_vf_number(phys_port_name)
+        # Note: vf_num can be 0, referring to VF0
+        if vf_num is None:
+            return
+        pf_num = _parse_pf_number(phys_port_name)
+        key = (switch_id,
+               None if pf_num is None else str(int(pf_num)),
+               int(vf_num))
+        self._netdevs[device] = (ifindex, key)
+        self._representors.setdefault(key, device)
+
+    def _remove_netdev(self, device: str) -> None:
+        ifindex, key = self._netdevs.pop(device)
+        if ifindex is not None and self._names.get(ifindex) == device:
+            del self._names[ifindex]
+        if key is not None and self._representors.get(key) == device:
+            del self._representors[key]
+            # another netdev may represent the same VF
+            for other, (_, other_key) in self._netdevs.items():
+                if other_key == key:
+                    self._representors[key] = other
+                    break
+
+    def _get_pf(self, pf_ifname: str) -> tuple[str | None, str | None]:
+        """Sync the index and return the switch ID and function of a PF.
+        """
+        pf_sw_id = _get_phys_switch_id(pf_ifname)
+        self._sync()
+        return pf_sw_id, _get_pf_func(pf_ifname)
+
+    def get_ifname(
+        self, pci_addr: str, pf_interface: bool, switchdev: bool
+    ) -> str:
+        """See :func:`get_ifname_by_pci_address`."""
+        return _get_ifname_by_pci_address(pci_addr, pf_interface, switchdev)
+
+    def get_representor(self, pf_ifname: str, vf_num: str) -> str:
+        """Return the representor netdev of a VF of the given PF."""
+        try:
+            pf_sw_id, ifname_pf_func = self._get_pf(pf_ifname)
+        except (OSError, IOError):
+            raise exception.RepresentorNotFound(
+                ifname=pf_ifname, vf_num=vf_num)
+
+        if not pf_sw_id or ifname_pf_func is None:
+            raise exception.RepresentorNotFound(
+                ifname=pf_ifname, vf_num=vf_num)
+
+        try:
+            vf = int(vf_num)
+        except ValueError:
+            raise exception.RepresentorNotFound(
+                ifname=pf_ifname, vf_num=vf_num)
+
+        device = self._lookup(pf_sw_id, ifname_pf_func, vf)
+        if device is None and self._reindex_unknown():
+            device = self._lookup(pf_sw_id, ifname_pf_func, vf)
+        if device is None:
+            raise exception.RepresentorNotFound(
+                ifname=pf_ifname, vf_num=vf_num)
+        return device
+
+    def _lookup(
+        self, pf_sw_id: str, pf_func: str, vf: int
+    ) -> str | None:
+        # Representors whose phys_port_name does not include a PF number
+        # match the VF of any PF on the switch.
+        representors = self._representors
+        return representors.get(
+            (pf_sw_id, str(int(pf_func)), vf),
+            representors.get((pf_sw_id, None, vf)))
+
+    def get_vf_num(self, pci_addr: str) -> str:
+        """Return the VF number of the VF with the given PCI address."""
+        vf_num = self._vf_nums.get(pci_addr)
+        if vf_num is not None:
+            # the PF may have been reconfigured since it was indexed
+            virtfn = "/sys/bus/pci/devices/%s/physfn/virtfn%s" % (
+                pci_addr, vf_num)
+            try:
+                if os.path.basename(os.readlink(virtfn)) == pci_addr:
+                    return vf_num
+            except OSError:
+                pass
+
+        virtfns_path = "/sys/bus/pci/devices/%s/physfn/virtfn*" % (pci_addr)
+        vf_nums = {}
+        for vf_path in glob.iglob(virtfns_path):
+            match = VIRTFN_RE.search(vf_path)
+            if not match:
                 continue
+            try:
+                link = os.readlink(vf_path)
+            except OSError:
+                continue
+            vf_nums[os.path.basename(link)] = match.group(1)
+
+        with self._lock:
+            self._vf_nums.update(vf_nums)
+            if pci_addr not in vf_nums:
+                self._vf_nums.pop(pci_addr, None)
+                raise exception.PciDeviceNotFoundById(id=pci_addr)
+        return vf_nums[pci_addr]
+
+
+class NetlinkSriovTopology(SriovTopology):
+    """SR-IOV topology built from the netlink attributes of the links.
+
+    The representors, and the PFs when the kernel reports the parent device
+    of the links, are found from one RTM_GETLINK dump, kept current with
+    the link notifications that carry the same attributes, instead of
+    reading the sysfs attributes of the netdevs. The links are dumped again
+    when a lookup misses. If the dump fails the sysfs index is used
+    instead. VF numbers are not part of the link attributes and are always
+    read from sysfs.
+    """
 
-        representor_num = _parse_vf_number(phys_port_name)
-        # Note: representor_num can be 0, referring to VF0
-        if representor_num is None:
-            continue
+    def __init__(self) -> None:
+        super().__init__()
+        self._ports: dict[str, ip_command.PhysPort] | None = {}
 
-        # At this point we're confident we have a representor.
+    def _scan(self) -> None:
         try:
-            if int(representor_num) == int(vf_num):
-                return device
-        except (ValueError):
-            continue
+            ports = ip_lib.list_phys_ports()
+        except Exception:
+            LOG.warning('Unable to dump the links, falling back to sysfs '
+                        'to resolve SR-IOV representors', exc_info=True)
+            if self._ports is not None:
+                self._ports = None
+                self._netdevs = {}
+                self._names = {}
+                self._representors = {}
+            super()._scan()
+            return
+        self._ports = {}
+        self._netdevs = {}
+        self._names = {}
+        self._representors = {}
+        for port in ports:
+            self._add_port(port)
+
+    def _apply(self, event: ip_command.LinkEvent) -> None:
+        if self._ports is None:
+            super()._apply(event)
+            return
+        if event.deleted:
+            netdev = self._netdevs.get(event.ifname)
+            if netdev is not None and netdev[0] in (event.ifindex, None):
+                self._remove_port(event.ifname)
+            return
+        # the attributes of the link may have changed, index it again
+        renamed = self._names.get(event.ifindex)
+        if renamed is not None:
+            self._remove_port(renamed)
+        if event.ifname in self._netdevs:
+            self._remove_port(event.ifname)
+        if event.port is not None:
+            self._add_port(event.port)
+
+    def _add_port(self, port: ip_command.PhysPort) -> None:
+        assert self._ports is not None  # narrow type
+        self._ports[port.ifname] = port
+        self._netdevs[port.ifname] = (port.ifindex, None)
+        if port.ifindex is not None:
+            self._names[port.ifindex] = port.ifname
+        if port.port_name is not None:
+            self._index(
+                port.ifname, port.ifindex, port.switch_id, port.port_name)
+
+    def _remove_port(self, device: str) -> None:
+        if self._ports is not None:
+            self._ports.pop(device, None)
+        self._remove_netdev(device)
+
+    def _reindex_unknown(self) -> bool:
+        if self._ports is None:
+            return super()._reindex_unknown()
+        # the attributes may not have been set yet when the link was
+        # notified, dump the links again
+        with self._lock:
+            self._scan()
+        return True
+
+    def _get_pf(self, pf_ifname: str) -> tuple[str | None, str | None]:
+        self._sync()
+        ports = self._ports
+        if ports is None:
+            return _get_phys_switch_id(pf_ifname), _get_pf_func(pf_ifname)
+        port = ports.get(pf_ifname)
+        if port is None:
+            return None, None
+        if port.parent_dev is None:
+            return port.switch_id, _get_pf_func(pf_ifname)
+        match = PF_FUNC_RE.search(port.parent_dev)
+        return port.switch_id, match.group(1) if match else None
+
+    def get_ifname(
+        self, pci_addr: str, pf_interface: bool, switchdev: bool
+    ) -> str:
+        if not (pf_interface and switchdev):
+            return super().get_ifname(pci_addr, pf_interface, switchdev)
+        try:
+            pf_pci = get_pf_pci_from_vf(pci_addr)
+            ports = ip_lib.list_phys_ports()
+        except Exception:
+            return super().get_ifname(pci_addr, pf_interface, switchdev)
+        netdevs = [port for port in ports if port.parent_dev == pf_pci]
+        if not netdevs:
+            # older kernels do not report the parent device
+            return super().get_ifname(pci_addr, pf_interface, switchdev)
+        # Return the uplink representor, or the first switchdev netdev
+        for port in netdevs:
+            if port.port_name and UPLINK_PORT_RE.search(port.port_name):
+                return port.ifname
+        return netdevs[0].ifname
+
 
-    raise exception.RepresentorNotFound(ifname=pf_ifname, vf_num=vf_num)
+SRIOV_RESOLVERS: dict[str, type[SriovTopology]] = {
+    'sysfs': SriovTopology,
+    'netlink': NetlinkSriovTopology,
+}
+
+_SRIOV_TOPOLOGY = SriovTopology()
+
+
+def set_sriov_resolver(name: str) -> None:
+    """Select how the SR-IOV representors and PFs are looked up.
+
+    :param name: one of the keys of :data:`SRIOV_RESOLVERS`
+    """
+    global _SRIOV_TOPOLOGY
+    resolver = SRIOV_RESOLVERS[name]
+    if type(_SRIOV_TOPOLOGY) is not resolver:
+        _SRIOV_TOPOLOGY = resolver()
+
+
+@privsep.vif_plug.entrypoint
+def _start_privileged_link_monitor() -> None:
+    ip_lib.start_monitor()
+
+
+def start_link_monitor() -> None:
+    """Answer link lookups from a link monitor rather than the kernel.
+
+    The monitor is started in this process and in the privsep daemon, as
+    both look links up. Lookups fall back to the kernel where it cannot be
+    started.
+    """
+    try:
+        ip_lib.start_monitor()
+        _start_privileged_link_monitor()
+    except Exception:
+        LOG.warning('Unable to start the link monitor, links will be looked '
+                    'up in the kernel', exc_info=True)
+
+
+def get_representor_port(pf_ifname: str, vf_num: str) -> str:
+    """Get the representor netdevice which is corresponding to the VF.
+
+    This method gets PF interface name and number of VF. It looks up the
+    interface whose phys_port_name has the VF number, and the PCI function
+    number of the PF if any, in the host's :class:`SriovTopology`. That
+    interface is the representor for the requested VF.
+    """
+    return _SRIOV_TOPOLOGY.get_representor(pf_ifname, vf_num)
 
 
 def _get_sysfs_netdev_path(pci_addr: str, pf_interface: bool) -> str:
@@ -348,6 +800,12 @@ def get_ifname_by_pci_address(
     The returned interface name is either the parent PF or that of the VF
     itself based on the argument of pf_interface.
     """
+    return _SRIOV_TOPOLOGY.get_ifname(pci_addr, pf_interface, switchdev)
+
+
+def _get_ifname_by_pci_address(
+    pci_addr: str, pf_interface: bool, switchdev: bool
+) -> str:
     dev_path = _get_sysfs_netdev_path(pci_addr, pf_interface)
     try:
         devices = os.listdir(dev_path)
@@ -383,22 +841,7 @@ def get_vf_num_by_pci_address(pci_addr: str) -> str:
     A VF is associated with an VF number, which ip link command uses to
     configure it. This number can be obtained from the PCI device filesystem.
     """
-    virtfns_path = "/sys/bus/pci/devices/%s/physfn/virtfn*" % (pci_addr)
-    vf_num = None
-    for vf_path in glob.iglob(virtfns_path):
-        try:
-            link = os.readlink(vf_path)
-        except OSError:
-            continue
-        if re.search(pci_addr, link):
-            match = VIRTFN_RE.search(vf_path)
-            if match:
-                vf_num = match.group(1)
-                break
-
-    if vf_num is None:
-        raise exception.PciDeviceNotFoundById(id=pci_addr)
-    return vf_num
+    return _SRIOV_TOPOLOGY.get_vf_num(pci_addr)
 
 
 def get_dpdk_representor_port_name(port_id: str) -> str:
@@ -431,6 +874,19 @@ def _get_phys_port_name(ifname: str) -> str | None:
         return fd.readline().strip()
 
 
+def _get_ifindex(ifname: str) -> int | None:
+    """Get the interface name and return its ifindex
+
+    :param ifname: The interface name
+    :return: The ifindex of the given ifname, or None if it cannot be read
+    """
+    try:
+        with open("%s/%s/ifindex" % (_NET_CLASS_PATH, ifname), 'r') as fd:
+            return int(fd.readline())
+    except (OSError, ValueError):
+        return None
+
+
 def _get_phys_switch_id(ifname: str) -> str | None:
     """Get the interface name and return its phys_switch_id
 
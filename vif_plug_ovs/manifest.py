@@ -0,0 +1,60 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The VIF types supported by the OVS plugin.
+
+This is read by ``os_vif.host_info()`` without importing the plugin, so it
+must not import anything but ``os_vif``.
+"""
+
+from __future__ import annotations
+
+from os_vif.objects import vif as osv_vif
+from os_vif import plugin
+
+_PP_OVS: plugin.PortProfileManifest = {
+    'profile_object_name': osv_vif.VIFPortProfileOpenVSwitch.__name__,
+    'min_version': '1.0',
+    'max_version': '1.0',
+}
+_PP_OVS_REPRESENTOR: plugin.PortProfileManifest = {
+    'profile_object_name': osv_vif.VIFPortProfileOVSRepresentor.__name__,
+    'min_version': '1.0',
+    'max_version': '1.0',
+}
+
+MANIFEST: list[plugin.VIFManifest] = [
+    {
+        'vif_object_name': osv_vif.VIFBridge.__name__,
+        'min_version': '1.0',
+        'max_version': '1.0',
+        'supported_port_profiles': [_PP_OVS],
+    },
+    {
+        'vif_object_name': osv_vif.VIFOpenVSwitch.__name__,
+        'min_version': '1.0',
+        'max_version': '1.0',
+        'supported_port_profiles': [_PP_OVS],
+    },
+    {
+        'vif_object_name': osv_vif.VIFVHostUser.__name__,
+        'min_version': '1.0',
+        'max_version': '1.0',
+        'supported_port_profiles': [_PP_OVS, _PP_OVS_REPRESENTOR],
+    },
+    {
+        'vif_object_name': osv_vif.VIFHostDevice.__name__,
+        'min_version': '1.0',
+        'max_version': '1.0',
+        'supported_port_profiles': [_PP_OVS, _PP_OVS_REPRESENTOR],
+    },
+]
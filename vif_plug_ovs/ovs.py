@@ -19,19 +19,28 @@
 
 from __future__ import annotations
 
-from typing import cast, TypeAlias, TypeGuard
-
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from concurrent import futures
+import contextlib
+import functools
+import threading
+from typing import Any, cast, TypeAlias, TypeGuard
+
+from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_log import versionutils
 
 from os_vif import exception as osv_exception
 from os_vif.internal.ip.api import ip as ip_lib
+from os_vif.internal.ip import ip_command
 from os_vif import objects
 from os_vif import plugin
 
 from vif_plug_ovs import constants
 from vif_plug_ovs import exception
 from vif_plug_ovs import linux_net
+from vif_plug_ovs import manifest
 from vif_plug_ovs.ovsdb import api as ovsdb_api
 from vif_plug_ovs.ovsdb import ovsdb_lib
 
@@ -63,10 +72,18 @@ class OvsPlugin(plugin.PluginBase):
     If given a VIFBridge, then it will create connect the VM via
     a regular Linux bridge device to allow security group rules to
     be applied to VM traffic.
+
+    The plugin is thread safe: a VIF is locked while it is being plugged
+    or unplugged and the creation and deletion of a given OVS bridge are
+    serialized, so independent VIFs can be plugged in parallel. Batches
+    passed to plug_batch() and unplug_batch() are spread over up to
+    ``plug_workers`` threads.
     """
 
     NIC_NAME_LEN = 14
 
+    THREAD_SAFE = True
+
     CONFIG_OPTS = [
         cfg.IntOpt('network_device_mtu',
                    default=1500,
@@ -87,15 +104,29 @@ class OvsPlugin(plugin.PluginBase):
         cfg.StrOpt('ovsdb_interface',
                    choices=list(ovsdb_api.interface_map),
                    default='native',
-                   deprecated_for_removal=True,
-                   deprecated_since='2.2.0',
-                   deprecated_reason="""
-                   os-vif has supported ovsdb access via python bindings
-                   since Stein (1.15.0), starting in Victoria (2.2.0) the
-                   ovs-vsctl driver is now deprecated for removal and
-                   in future releases it will be be removed.
-                   """,
-                   help='The interface for interacting with the OVSDB'),
+                   help='The interface for interacting with the OVSDB. The '
+                   'vsctl interface is deprecated for removal since '
+                   'Victoria (2.2.0), selecting it logs a deprecation '
+                   'warning.'),
+        cfg.BoolOpt('ovsdb_monitor_conditions',
+                    default=False,
+                    help='Only replicate the OVSDB rows the plugin manages '
+                    'when using the native ovsdb interface, rather than whole '
+                    'tables. For now this limits the QoS table to the '
+                    'records created by os-vif with the configured '
+                    'default_qos_type. This needs an ovsdb-server that '
+                    'supports conditional monitoring, which was added in '
+                    'Open vSwitch 2.6; older servers send every row.'),
+        cfg.StrOpt('ovsdb_schema_cache_dir',
+                   help='A directory where the OVSDB schema is cached when '
+                   'using the native ovsdb interface. The cached schema is '
+                   'used to connect to the OVSDB straight away when the '
+                   'plugin starts, and is then checked against the schema '
+                   'of the server in the background. If the schema of the '
+                   'server changed, the cache is updated and the OVSDB '
+                   'connection switches to the new schema. The schema is '
+                   'fetched from the server on every start if this is not '
+                   'set.'),
         # NOTE(sean-k-mooney): This value is a bool for two reasons.
         # First I want to allow this config option to be reusable with
         # non ml2/ovs deployment in the future if required, as such I do not
@@ -138,11 +169,51 @@ class OvsPlugin(plugin.PluginBase):
                    managed via neutron if required for bandwidth limiting
                    and other use-cases.
                    """),
+        cfg.IntOpt('plug_workers',
+                   default=1,
+                   min=1,
+                   help='Number of threads used to plug or unplug the VIFs '
+                   'of a batch in parallel when using plug_many() and '
+                   'unplug_many(). Each VIF is locked while it is being '
+                   'plugged or unplugged and changes to a given bridge are '
+                   'serialized, so VIFs that do not share a device are '
+                   'processed concurrently.'),
+        cfg.StrOpt('sriov_resolver',
+                   choices=list(linux_net.SRIOV_RESOLVERS),
+                   default='sysfs',
+                   help='How the VF representors and the PF of an SR-IOV '
+                   'VIF are found. "sysfs" reads the attributes of each '
+                   'netdev from sysfs. "netlink" gets them all from a single '
+                   'netlink dump of the links, which is faster on hosts '
+                   'with many VFs, and falls back to sysfs if the dump fails '
+                   'or the kernel does not report the parent device of the '
+                   'links.'),
+        cfg.BoolOpt('link_monitor',
+                    default=False,
+                    help='Keep the state of the links of the host in memory, '
+                    'updated from the netlink link notifications of the '
+                    'kernel, instead of querying the kernel every time a '
+                    'link is looked up. This is done both in the plugin '
+                    'process and in its privsep daemon. The kernel is queried '
+                    'if the monitor cannot be started or falls behind.'),
     ]
 
     def __init__(self, config: cfg.ConfigOpts.GroupAttr) -> None:
         super(OvsPlugin, self).__init__(config)
+        if self.config.ovsdb_interface == 'vsctl':
+            # NOTE: os-vif has supported ovsdb access via python bindings
+            # since Stein (1.15.0), only the ovs-vsctl driver is deprecated
+            # so the option itself is not.
+            versionutils.report_deprecated_feature(
+                LOG.logger, 'The vsctl ovsdb_interface is deprecated since Victoria '
+                '(2.2.0) and will be removed in a future release, use the '
+                'native or jsonrpc interface instead.')
         self.ovsdb = ovsdb_lib.BaseOVS(self.config)
+        linux_net.set_sriov_resolver(self.config.sriov_resolver)
+        if self.config.link_monitor:
+            linux_net.start_link_monitor()
+        # per-thread state for the batch currently being (un)plugged
+        self._batch_state = threading.local()
 
     @staticmethod
     def gen_port_name(
@@ -189,40 +260,196 @@ class OvsPlugin(plugin.PluginBase):
         return address
 
     def describe(self) -> objects.HostPluginInfo:
-        pp_ovs = objects.host_info.HostPortProfileInfo(
-            profile_object_name=objects.vif.VIFPortProfileOpenVSwitch.__name__,  # noqa
-            min_version="1.0",
-            max_version="1.0",
-        )
-        pp_ovs_representor = objects.host_info.HostPortProfileInfo(
-            profile_object_name=objects.vif.VIFPortProfileOVSRepresentor.__name__,  # noqa
-            min_version="1.0",
-            max_version="1.0",
-        )
-        return objects.host_info.HostPluginInfo(
-            plugin_name=constants.PLUGIN_NAME,
-            vif_info=[
-                objects.host_info.HostVIFInfo(
-                    vif_object_name=objects.vif.VIFBridge.__name__,
-                    min_version="1.0",
-                    max_version="1.0",
-                    supported_port_profiles=[pp_ovs]),
-                objects.host_info.HostVIFInfo(
-                    vif_object_name=objects.vif.VIFOpenVSwitch.__name__,
-                    min_version="1.0",
-                    max_version="1.0",
-                    supported_port_profiles=[pp_ovs]),
-                objects.host_info.HostVIFInfo(
-                    vif_object_name=objects.vif.VIFVHostUser.__name__,
-                    min_version="1.0",
-                    max_version="1.0",
-                    supported_port_profiles=[pp_ovs, pp_ovs_representor]),
-                objects.host_info.HostVIFInfo(
-                    vif_object_name=objects.vif.VIFHostDevice.__name__,
-                    min_version="1.0",
-                    max_version="1.0",
-                    supported_port_profiles=[pp_ovs, pp_ovs_representor]),
-            ])
+        return objects.host_info.HostPluginInfo.from_manifest(
+            constants.PLUGIN_NAME, manifest.MANIFEST)
+
+    @contextlib.contextmanager
+    def _batch_scope(self) -> Iterator[None]:
+        """Track work that only needs doing once per batch of VIFs."""
+        self._batch_state.bridges = set()
+        self._batch_state.plan = linux_net.KernelPlan()
+        self._batch_state.cleanup_plan = linux_net.KernelPlan()
+        self._batch_state.links = self._snapshot_links()
+        self._batch_state.changed_links = set()
+        try:
+            yield
+        finally:
+            del self._batch_state.bridges
+            del self._batch_state.plan
+            del self._batch_state.cleanup_plan
+            del self._batch_state.links
+            del self._batch_state.changed_links
+
+    def _run_link_ops(
+        self,
+        vif: objects.VIFBase,
+        ops: Sequence[tuple[Any, ...]],
+        after_commit: bool = False,
+    ) -> None:
+        """Run privileged link operations of :mod:`linux_net`.
+
+        Each operation is a tuple of the name of a kernel plan operation and
+        its arguments. Several operations are run with one privsep call. While
+        a batch is processed they are added to the kernel plans of the batch
+        instead, which run before its OVSDB changes are committed or, with
+        ``after_commit``, once they have been. Outside a batch, operations
+        ``after_commit`` wait for the deferred OVSDB writes, if any.
+        """
+        plan: linux_net.KernelPlan | None = getattr(
+            self._batch_state, 'cleanup_plan' if after_commit else 'plan',
+            None)
+        batched = plan is not None
+        if (plan is None and after_commit and self.ovsdb.after_deferred(
+                functools.partial(self._run_link_ops, vif, ops))):
+            return
+        if plan is None:
+            if len(ops) == 1:
+                op, *args = ops[0]
+                getattr(linux_net, op)(*args)
+                return
+            plan = linux_net.KernelPlan()
+        for op, *args in ops:
+            plan.add(op, *args, group=vif.id)
+        if not batched:
+            plan.run()
+
+    @staticmethod
+    def _snapshot_links() -> Mapping[str, ip_command.LinkInfo] | None:
+        try:
+            return ip_lib.snapshot()
+        except Exception:
+            LOG.debug('Unable to take a snapshot of the links, they will '
+                      'be looked up one at a time', exc_info=True)
+            return None
+
+    def _link_exists(self, name: str) -> bool:
+        """Check if a link exists.
+
+        While a batch is processed this is answered from the snapshot of
+        the links taken when the batch started, unless the link has been
+        changed since then.
+        """
+        links: Mapping[str, ip_command.LinkInfo] | None = getattr(
+            self._batch_state, 'links', None)
+        if links is None or name in self._batch_state.changed_links:
+            return ip_lib.exists(name)
+        return name in links
+
+    def _links_changed(self, *names: str) -> None:
+        """Record that links were created or deleted.
+
+        Later checks of these links are made against the kernel instead of
+        the snapshot of the batch.
+        """
+        changed: set[str] | None = getattr(
+            self._batch_state, 'changed_links', None)
+        if changed is not None:
+            changed.update(names)
+
+    def _lock(
+        self, kind: str, name: str
+    ) -> contextlib.AbstractContextManager[Any]:
+        held: set[tuple[str, str]] | None = getattr(
+            self._batch_state, 'locks', None)
+        if held is not None and (kind, name) in held:
+            return contextlib.nullcontext()
+        return lockutils.lock(f'os-vif-ovs-{kind}-{name}', do_log=False)
+
+    @staticmethod
+    def _get_device_name(vif: objects.VIFBase) -> str:
+        if isinstance(vif, objects.vif.VIFVHostUser):
+            return OvsPlugin.gen_port_name(
+                constants.OVS_VHOSTUSER_PREFIX, vif.id)
+        if (isinstance(vif, objects.vif.VIFHostDevice) and
+                'dev_address' in vif):
+            # the representor is only known once sysfs has been read
+            return cast(str, vif.dev_address)
+        if (isinstance(vif, (objects.vif.VIFGeneric, objects.vif.VIFBridge,
+                             objects.vif.VIFOpenVSwitch,
+                             objects.vif.VIFDirect)) and
+                'vif_name' in vif and vif.vif_name):
+            return cast(str, vif.vif_name)
+        return cast(str, vif.id)
+
+    def _get_lock_names(self, vif: objects.VIFBase) -> set[tuple[str, str]]:
+        """Return the locks to hold while a VIF is plugged or unplugged.
+
+        Besides the device of the VIF, the bridges that unplugging a VIF may
+        delete are locked: trunk bridges and per-VIF port bridges. The other
+        bridges are never deleted by the plugin, creating them under their
+        lock is enough.
+        """
+        names = {('device', self._get_device_name(vif))}
+        network = vif.network if 'network' in vif else None
+        if (network is not None and 'bridge' in network and
+                network.bridge and is_trunk_bridge(network.bridge)):
+            names.add(('bridge', network.bridge))
+        if (isinstance(vif, objects.vif.VIFOpenVSwitch) and
+                self.config.per_port_bridge):
+            names.add(('bridge', self.gen_port_name('pb', vif.id)))
+        return names
+
+    @contextlib.contextmanager
+    def _vif_locks(self, vifs: Sequence[objects.VIFBase]) -> Iterator[None]:
+        """Hold the locks of VIFs until their changes are made.
+
+        The locks are taken in order so that workers locking several VIFs
+        cannot deadlock, and are held until the kernel plan and the OVSDB
+        changes of the VIFs have been committed. Locks already held by the
+        thread are not taken again.
+        """
+        held: set[tuple[str, str]] | None = getattr(
+            self._batch_state, 'locks', None)
+        owner = held is None
+        if held is None:
+            held = self._batch_state.locks = set()
+        names: set[tuple[str, str]] = set()
+        for vif in vifs:
+            names.update(self._get_lock_names(vif))
+        names.difference_update(held)
+        try:
+            with contextlib.ExitStack() as stack:
+                for kind, name in sorted(names):
+                    stack.enter_context(self._lock(kind, name))
+                    held.add((kind, name))
+                yield
+        finally:
+            held.difference_update(names)
+            if owner:
+                del self._batch_state.locks
+
+    def _ensure_ovs_bridge(
+        self, bridge: str, datapath_type: str | None
+    ) -> None:
+        # NOTE: when plugging a batch, most VIFs share the same integration
+        # bridge so there is no point in asking OVSDB to add it each time.
+        ensured: set[tuple[str, str | None]] | None = getattr(
+            self._batch_state, 'bridges', None)
+        if ensured is not None and (bridge, datapath_type) in ensured:
+            return
+        with self._bridge_change(bridge):
+            self.ovsdb.ensure_ovs_bridge(bridge, datapath_type)
+        if ensured is not None:
+            ensured.add((bridge, datapath_type))
+
+    def _delete_ovs_bridge(self, bridge: str) -> None:
+        with self._bridge_change(bridge):
+            self.ovsdb.delete_ovs_bridge(bridge)
+
+    @contextlib.contextmanager
+    def _bridge_change(self, bridge: str) -> Iterator[None]:
+        """Keep the creation and deletion of a bridge from racing.
+
+        Within :meth:`_vif_locks` the change is batched or deferred with the
+        other changes of the VIFs: the bridges that can be deleted are locked
+        until those are made, and the others are never deleted. Otherwise
+        the bridge is locked and changed straight away.
+        """
+        if getattr(self._batch_state, 'locks', None) is not None:
+            yield
+            return
+        with self._lock('bridge', bridge), self.ovsdb.immediate():
+            yield
 
     def _get_mtu(self, vif: _OVSVif) -> int:
         network = self._get_vif_network(vif)
@@ -236,12 +463,20 @@ class OvsPlugin(plugin.PluginBase):
             return False
         return True
 
-    def _isolate_vif(self, vif_name: str, bridge: str) -> bool:
+    def _isolate_vif(
+        self,
+        vif_name: str,
+        bridge: str,
+        port_exists: Callable[[], bool] | None = None,
+    ) -> bool:
         # NOTE(vsaienko): don't break traffic if port already exists,
         # we assume it is called when nova-compute is initialized and
         # since port is present it should be bound already.
-        return (self.config.isolate_vif and
-                not self.ovsdb.port_exists(vif_name, bridge))
+        if not self.config.isolate_vif:
+            return False
+        if port_exists is None:
+            return not self.ovsdb.port_exists(vif_name, bridge)
+        return not port_exists()
 
     def _create_vif_port(
         self,
@@ -256,6 +491,7 @@ class OvsPlugin(plugin.PluginBase):
         vf_num: str | None = None,
         set_ids: bool = True,
         datapath_type: str | None = None,
+        set_mtu: bool = True,
     ) -> None:
         mtu = self._get_mtu(vif)
         network = self._get_vif_network(vif)
@@ -276,11 +512,16 @@ class OvsPlugin(plugin.PluginBase):
         bridge = bridge or network.bridge
         assert isinstance(bridge, str)  # narrow type
 
+        # NOTE: both the isolation and the QoS decisions below depend on
+        # whether the port is already on the bridge; look it up at most once.
+        port_exists = functools.cache(
+            functools.partial(self.ovsdb.port_exists, vif_name, bridge))
+
         tag: int | None = None
         vlan_mode: str | None = None
         trunks: int | None = None
         # See bug #2069543.
-        if (self._isolate_vif(vif_name, bridge) and
+        if (self._isolate_vif(vif_name, bridge, port_exists) and
                 not is_trunk_bridge(bridge)):
             tag = constants.DEAD_VLAN
             vlan_mode = 'trunk'
@@ -297,7 +538,7 @@ class OvsPlugin(plugin.PluginBase):
             # This is a mitigation for the performance regression
             # introduced by the fix for bug #1734320. See bug #2017868
             # for more details.
-            if self.ovsdb.port_exists(vif_name, bridge):
+            if port_exists():
                 qos_type = None
 
         self.ovsdb.create_ovs_vif_port(
@@ -306,7 +547,7 @@ class OvsPlugin(plugin.PluginBase):
             profile.interface_id,
             address,
             instance_info.uuid,
-            mtu=mtu,
+            mtu=mtu if set_mtu else None,
             vhost_server_path=vhost_server_path,
             interface_type=interface_type,
             tag=tag,
@@ -344,9 +585,10 @@ class OvsPlugin(plugin.PluginBase):
 
             # Create the tap device with proper MAC and MTU if it doesn't
             # already exist (e.g., from a previous plug during init_host)
-            if not ip_lib.exists(vif_name):
-                linux_net.create_tap(
-                    vif_name, mtu, address, multiqueue=multiqueue)
+            if not self._link_exists(vif_name):
+                self._run_link_ops(
+                    vif, [('create_tap', vif_name, mtu, address, multiqueue)])
+                self._links_changed(vif_name)
 
     def _update_vif_port(self, vif: _OVSVif, vif_name: str) -> None:
         mtu = self._get_mtu(vif)
@@ -373,8 +615,10 @@ class OvsPlugin(plugin.PluginBase):
             profile.create_tap
         )
 
-        if create_tap and ip_lib.exists(vif_name):
-            linux_net.delete_net_dev(vif_name)
+        if create_tap and self._link_exists(vif_name):
+            self._run_link_ops(
+                vif, [('delete_net_dev', vif_name)], after_commit=True)
+            self._links_changed(vif_name)
 
     @staticmethod
     def _get_vif_datapath_type(
@@ -419,19 +663,38 @@ class OvsPlugin(plugin.PluginBase):
 
         v1_name, v2_name = self.get_veth_pair_names(vif)
 
-        linux_net.ensure_bridge(vif.bridge_name)
+        # NOTE: the privileged link changes are shipped to the privsep
+        # daemon as one plan. When plugging a batch the plan is shared by
+        # all the VIFs and executed once every VIF has been processed.
+        plan: linux_net.KernelPlan | None = getattr(
+            self._batch_state, 'plan', None)
+        batched = plan is not None
+        if plan is None:
+            plan = linux_net.KernelPlan()
+
+        plan.add('ensure_bridge', vif.bridge_name, group=vif.id)
+        self._links_changed(vif.bridge_name)
 
         mtu = self._get_mtu(vif)
         network = self._get_vif_network(vif)
-        if not ip_lib.exists(v2_name):
-            linux_net.create_veth_pair(v1_name, v2_name, mtu)
-            linux_net.add_bridge_port(vif.bridge_name, v1_name)
-            self.ovsdb.ensure_ovs_bridge(
+        if not self._link_exists(v2_name):
+            plan.add('create_veth_pair', v1_name, v2_name, mtu, group=vif.id)
+            self._links_changed(v1_name, v2_name)
+            plan.add('add_bridge_port', vif.bridge_name, v1_name,
+                     group=vif.id)
+            if not batched:
+                plan.run()
+            self._ensure_ovs_bridge(
                 network.bridge, self._get_vif_datapath_type(vif))
-            self._create_vif_port(vif, v2_name, instance_info)
+            # the veth pair was created with the right MTU already
+            self._create_vif_port(vif, v2_name, instance_info, set_mtu=False)
         else:
-            linux_net.update_veth_pair(v1_name, v2_name, mtu)
-            self._update_vif_port(vif, v2_name)
+            # NOTE: update_veth_pair sets the MTU of both veth devices, so
+            # unlike the other VIF types there is nothing left to update on
+            # the OVS side.
+            plan.add('update_veth_pair', v1_name, v2_name, mtu, group=vif.id)
+            if not batched:
+                plan.run()
 
     def _plug_port_bridge(
         self, vif: objects.VIFOpenVSwitch, instance_info: objects.InstanceInfo
@@ -446,9 +709,9 @@ class OvsPlugin(plugin.PluginBase):
         int_bridge_name = network.bridge
         int_bridge_patch = self.gen_port_name('ibp', vif.id, max_length=64)
 
-        self.ovsdb.ensure_ovs_bridge(
+        self._ensure_ovs_bridge(
              int_bridge_name, self._get_vif_datapath_type(vif))
-        self.ovsdb.ensure_ovs_bridge(
+        self._ensure_ovs_bridge(
             port_bridge_name, self._get_vif_datapath_type(vif))
         self._create_vif_port(
             vif, vif.vif_name, instance_info, bridge=port_bridge_name,
@@ -475,7 +738,7 @@ class OvsPlugin(plugin.PluginBase):
         """Create a per-VIF OVS port."""
         network = self._get_vif_network(vif)
         profile = self._get_vif_port_profile(vif)
-        self.ovsdb.ensure_ovs_bridge(
+        self._ensure_ovs_bridge(
             network.bridge, self._get_vif_datapath_type(vif))
         # NOTE(sean-k-mooney): as part of a partial revert of
         # change Iaf15fa7a678ec2624f7c12f634269c465fbad930
@@ -503,14 +766,15 @@ class OvsPlugin(plugin.PluginBase):
     ) -> None:
         datapath = self._get_vif_datapath_type(vif)
         network = self._get_vif_network(vif)
-        self.ovsdb.ensure_ovs_bridge(network.bridge, datapath)
+        self._ensure_ovs_bridge(network.bridge, datapath)
         pci_slot = vif.dev_address
         vf_num = linux_net.get_vf_num_by_pci_address(pci_slot)
         if datapath == constants.OVS_DATAPATH_SYSTEM:
             pf_ifname = linux_net.get_ifname_by_pci_address(
                 pci_slot, pf_interface=True, switchdev=True)
             representor = linux_net.get_representor_port(pf_ifname, vf_num)
-            linux_net.set_interface_state(representor, 'up')
+            self._run_link_ops(
+                vif, [('set_interface_state', representor, 'up')])
             self._create_vif_port(vif, representor, instance_info)
         else:
             representor = linux_net.get_dpdk_representor_port_name(
@@ -538,6 +802,10 @@ class OvsPlugin(plugin.PluginBase):
                 vif=vif,
                 err="This vif type is not supported by this plugin")
 
+        with self._vif_locks([vif]), self.ovsdb.deferred():
+            self._plug(vif, instance_info)
+
+    def _plug(self, vif: _OVSVif, instance_info: objects.InstanceInfo) -> None:
         if isinstance(vif, objects.vif.VIFOpenVSwitch):
             if self.config.per_port_bridge:
                 self._plug_port_bridge(vif, instance_info)
@@ -550,10 +818,105 @@ class OvsPlugin(plugin.PluginBase):
         elif isinstance(vif, objects.vif.VIFHostDevice):
             self._plug_vf(vif, instance_info)
 
+    def _run_batch(
+        self,
+        vifs: Sequence[objects.VIFBase],
+        instance_info: objects.InstanceInfo,
+        action: Callable[[objects.VIFBase, objects.InstanceInfo], None],
+    ) -> list[Exception | None]:
+        """Run ``action`` for each VIF, sharing one OVSDB transaction.
+
+        The OVSDB changes for all VIFs are committed together once every VIF
+        has been processed, and so are the kernel side changes, which are
+        made right before the commit or, for the devices of deleted OVS
+        ports, right after it. The locks of all the VIFs are held until
+        then.
+        """
+        results: list[Exception | None] = []
+        with self._vif_locks(vifs), self._batch_scope():
+            with self.ovsdb.batch() as batch:
+                for vif in vifs:
+                    with batch.owner(vif.id):
+                        try:
+                            action(vif, instance_info)
+                            results.append(None)
+                        except Exception as err:
+                            # do not commit the OVSDB changes queued for the
+                            # VIF before it failed
+                            batch.discard(vif.id)
+                            results.append(err)
+                # the kernel devices must exist before the OVS ports using
+                # them are committed, so the OVSDB changes of any VIF whose
+                # kernel plan failed are dropped.
+                plan_results = self._batch_state.plan.execute()
+                for idx, vif in enumerate(vifs):
+                    error = plan_results.get(vif.id)
+                    if error is not None and results[idx] is None:
+                        batch.discard(vif.id)
+                        results[idx] = error
+
+            for idx, vif in enumerate(vifs):
+                if results[idx] is None:
+                    results[idx] = batch.results.get(vif.id)
+            # the devices of the deleted OVS ports are only changed once the
+            # ports are gone
+            cleanup_plan = self._batch_state.cleanup_plan
+            for idx, vif in enumerate(vifs):
+                if results[idx] is not None:
+                    cleanup_plan.discard(vif.id)
+            cleanup_results = cleanup_plan.execute()
+            for idx, vif in enumerate(vifs):
+                error = cleanup_results.get(vif.id)
+                if error is not None:
+                    results[idx] = error
+        return results
+
+    def _run_parallel(
+        self,
+        vifs: Sequence[objects.VIFBase],
+        instance_info: objects.InstanceInfo,
+        action: Callable[[objects.VIFBase, objects.InstanceInfo], None],
+    ) -> list[Exception | None]:
+        """Spread a batch of VIFs over up to ``plug_workers`` threads.
+
+        Each thread processes its share of the VIFs as a batch of its own,
+        with its own OVSDB transaction and kernel plan.
+        """
+        workers = min(cast(int, self.config.plug_workers), len(vifs))
+        if workers <= 1:
+            return self._run_batch(vifs, instance_info, action)
+
+        chunks = [list(vifs[idx::workers]) for idx in range(workers)]
+        with futures.ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='os_vif_ovs') as executor:
+            chunk_results = list(executor.map(
+                lambda chunk: self._run_batch(chunk, instance_info, action),
+                chunks))
+
+        results: list[Exception | None] = [None] * len(vifs)
+        for offset, chunk_result in enumerate(chunk_results):
+            results[offset::workers] = chunk_result
+        return results
+
+    def plug_batch(
+        self,
+        vifs: Sequence[objects.VIFBase],
+        instance_info: objects.InstanceInfo,
+    ) -> list[Exception | None]:
+        return self._run_parallel(vifs, instance_info, self.plug)
+
+    def unplug_batch(
+        self,
+        vifs: Sequence[objects.VIFBase],
+        instance_info: objects.InstanceInfo,
+    ) -> list[Exception | None]:
+        return self._run_parallel(vifs, instance_info, self.unplug)
+
     def _delete_bridge_if_trunk(self, vif: _OVSVif) -> None:
         network = self._get_vif_network(vif)
         if is_trunk_bridge(network.bridge):
-            self.ovsdb.delete_ovs_bridge(network.bridge)
+            self._delete_ovs_bridge(network.bridge)
 
     def _unplug_vhostuser(
         self, vif: objects.VIFVHostUser, instance_info: objects.InstanceInfo
@@ -579,13 +942,18 @@ class OvsPlugin(plugin.PluginBase):
 
         v1_name, v2_name = self.get_veth_pair_names(vif)
 
-        linux_net.delete_bridge(linux_bridge_name, v1_name)
-
         qos_type = self._get_qos_type(vif)
         network = self._get_vif_network(vif)
         self.ovsdb.delete_ovs_vif_port(
-            network.bridge, v2_name, qos_type=qos_type
+            network.bridge, v2_name, delete_netdev=False, qos_type=qos_type
         )
+        # the linux bridge and the veth pair are deleted with one privsep
+        # call once the OVS port is gone
+        self._run_link_ops(
+            vif, [('delete_bridge', linux_bridge_name, v1_name),
+                  ('delete_net_dev', v2_name)],
+            after_commit=True)
+        self._links_changed(linux_bridge_name, v1_name, v2_name)
         self._delete_bridge_if_trunk(vif)
 
     def _get_qos_type(self, vif: _OVSVif) -> str | None:
@@ -613,7 +981,7 @@ class OvsPlugin(plugin.PluginBase):
         self.ovsdb.delete_ovs_vif_port(
             port_bridge_name, vif.vif_name, qos_type=qos_type
         )
-        self.ovsdb.delete_ovs_bridge(port_bridge_name)
+        self._delete_ovs_bridge(port_bridge_name)
         self._delete_bridge_if_trunk(vif)
 
     def _unplug_vif_generic(
@@ -656,7 +1024,9 @@ class OvsPlugin(plugin.PluginBase):
             qos_type=qos_type
         )
         if datapath == constants.OVS_DATAPATH_SYSTEM:
-            linux_net.set_interface_state(representor, 'down')
+            self._run_link_ops(
+                vif, [('set_interface_state', representor, 'down')],
+                after_commit=True)
         self._delete_bridge_if_trunk(vif)
 
     def unplug(
@@ -673,12 +1043,19 @@ class OvsPlugin(plugin.PluginBase):
             raise osv_exception.UnplugException(
                 vif=vif,
                 err="This vif type is not supported by this plugin")
+
+        with self._vif_locks([vif]), self.ovsdb.deferred():
+            self._unplug(vif, instance_info)
+
+    def _unplug(
+        self, vif: _OVSVif, instance_info: objects.InstanceInfo
+    ) -> None:
         if isinstance(vif, objects.vif.VIFOpenVSwitch):
             if self.config.per_port_bridge:
                 self._unplug_port_bridge(vif, instance_info)
             else:
                 linux_bridge_name = self.gen_port_name('qbr', vif.id)
-                if ip_lib.exists(linux_bridge_name):
+                if self._link_exists(linux_bridge_name):
                     self._unplug_bridge(vif, instance_info, linux_bridge_name)
                 else:
                     self._unplug_vif_generic(vif, instance_info)
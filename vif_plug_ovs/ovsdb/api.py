@@ -13,10 +13,15 @@
 from __future__ import annotations
 
 import abc
+from collections.abc import Callable
+import contextlib
 from typing import Literal, overload, TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from ovsdbapp import api as ovsdbapp_api
+
     from vif_plug_ovs.ovsdb import impl_idl
+    from vif_plug_ovs.ovsdb import impl_jsonrpc
     from vif_plug_ovs.ovsdb import impl_vsctl
     from vif_plug_ovs.ovsdb import ovsdb_lib
 
@@ -24,6 +29,7 @@ if TYPE_CHECKING:
 interface_map = {
     'vsctl': 'vif_plug_ovs.ovsdb.impl_vsctl',
     'native': 'vif_plug_ovs.ovsdb.impl_idl',
+    'jsonrpc': 'vif_plug_ovs.ovsdb.impl_jsonrpc',
 }
 
 
@@ -41,9 +47,20 @@ def get_instance(
     ...
 
 
+@overload
 def get_instance(
-    context: ovsdb_lib.BaseOVS, iface_name: Literal['vsctl', 'native']
-) -> impl_vsctl.OvsdbVsctl | impl_idl.NeutronOvsdbIdl:
+    context: ovsdb_lib.BaseOVS, iface_name: Literal['jsonrpc']
+) -> impl_jsonrpc.OvsdbJsonRpc:
+    ...
+
+
+def get_instance(
+    context: ovsdb_lib.BaseOVS,
+    iface_name: Literal['vsctl', 'native', 'jsonrpc'],
+) -> (
+    impl_vsctl.OvsdbVsctl | impl_idl.NeutronOvsdbIdl |
+    impl_jsonrpc.OvsdbJsonRpc
+):
     """Return the configured OVSDB API implementation"""
     match iface_name:
         case 'vsctl':
@@ -52,6 +69,9 @@ def get_instance(
         case 'native':
             from vif_plug_ovs.ovsdb import impl_idl
             return impl_idl.api_factory(context)
+        case 'jsonrpc':
+            from vif_plug_ovs.ovsdb import impl_jsonrpc
+            return impl_jsonrpc.api_factory(context)
         case _:
             raise ValueError(
                 f'{iface_name} is not a supported backend'
@@ -67,3 +87,61 @@ class ImplAPI(metaclass=abc.ABCMeta):
         :param column: (string) column name
         :return: True if the column exists, False if not.
         """
+
+    @abc.abstractmethod
+    def bridge_has_port(
+        self, bridge: str, port: str
+    ) -> ovsdbapp_api.Command:
+        """Check if a bridge has a port
+
+        The bridge is looked up by name and the port among its ports, rather
+        than searched for among the ports of every bridge.
+
+        :param bridge: (string) bridge name
+        :param port: (string) port name
+        :return: a command whose result is True if the bridge has the port,
+            False if it does not or either does not exist.
+        """
+
+    @property
+    def outdated(self) -> bool:
+        """Whether a new instance should be used in place of this one
+
+        :return: True if the connection of this instance has been replaced,
+            False by default.
+        """
+        return False
+
+    def get_schema_version(self) -> str | None:
+        """Return the version of the database schema in use
+
+        :return: the schema version, or None if it is not known without
+            querying the database.
+        """
+        return None
+
+    def deferred(self) -> contextlib.AbstractContextManager[None]:
+        """Defer the writes executed in this context, if that saves time
+
+        :return: a context manager, which does nothing by default.
+        """
+        return contextlib.nullcontext()
+
+    def immediate(self) -> contextlib.AbstractContextManager[None]:
+        """Run the writes executed in this context straight away
+
+        This undoes :meth:`deferred` in this context.
+
+        :return: a context manager, which does nothing by default.
+        """
+        return contextlib.nullcontext()
+
+    def after_deferred(self, func: Callable[[], None]) -> bool:
+        """Run a function once the writes deferred in this context are made
+
+        :param func: the function to run, without arguments.
+        :return: True if ``func`` will be run, False if nothing is deferred
+            in this context, which is always the case by default, and
+            ``func`` is not run.
+        """
+        return False
@@ -12,41 +12,185 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable
 from collections.abc import Iterable
+import functools
+import os
 import socket
-from typing import cast, TYPE_CHECKING
+import threading
+from typing import Any, cast, TYPE_CHECKING
 
+from oslo_log import log as logging
 from ovs.db import idl
 from ovs import socket_util
 from ovs import stream
+from ovsdbapp.backend.ovs_idl import command
 from ovsdbapp.backend.ovs_idl import connection
 from ovsdbapp.backend.ovs_idl import idlutils
 from ovsdbapp.backend.ovs_idl import vlog
 from ovsdbapp.schema.open_vswitch import impl_idl
 
 from vif_plug_ovs.ovsdb import api
+from vif_plug_ovs.ovsdb import schema_cache
 
 if TYPE_CHECKING:
     from vif_plug_ovs.ovsdb import ovsdb_lib
 
+LOG = logging.getLogger(__name__)
 
-REQUIRED_TABLES = ('Interface', 'Port', 'Bridge', 'Open_vSwitch', 'QoS')
 
+# The columns the plugin reads and writes, including those used by the
+# ovsdbapp commands it runs. Only these are replicated from the OVSDB.
+REQUIRED_COLUMNS: dict[str, tuple[str, ...]] = {
+    'Open_vSwitch': ('bridges', 'cur_cfg', 'next_cfg'),
+    'Bridge': ('name', 'datapath_type', 'ports'),
+    'Port': ('name', 'interfaces', 'qos', 'tag', 'trunks', 'vlan_mode'),
+    'Interface': (
+        'name', 'external_ids', 'mtu_request', 'ofport', 'options', 'type'),
+    'QoS': ('external_ids', 'type'),
+}
+REQUIRED_TABLES = tuple(REQUIRED_COLUMNS)
 
-def idl_factory(config: ovsdb_lib.BaseOVS) -> idl.Idl:
-    conn = config.connection
-    schema_name = 'Open_vSwitch'
-    helper = idlutils.get_schema_helper(conn, schema_name)
-    for table in REQUIRED_TABLES:
-        helper.register_table(table)
-    return idl.Idl(conn, helper)
+
+def monitor_conditions(qos_type: str) -> dict[str, list[Any]]:
+    """Return the OVSDB monitor conditions of the tables os-vif manages.
+
+    :param qos_type: the type of the QoS records created by os-vif
+    """
+    return {
+        'QoS': [['external_ids', 'includes', ['map', [['_type', qos_type]]]]],
+    }
+
+
+class Idl(idl.Idl):
+    """An IDL which remembers the columns of the whole schema.
+
+    Only the registered columns are replicated, but the schema capabilities
+    of :class:`NeutronOvsdbIdl` are about the database, not the replica.
+    """
+
+    def __init__(
+        self,
+        remote: str,
+        schema_helper: idl.SchemaHelper,
+        schema_columns: dict[str, frozenset[str]],
+    ) -> None:
+        self.schema_columns = schema_columns
+        super().__init__(remote, schema_helper)
+
+
+def idl_factory(
+    config: ovsdb_lib.BaseOVS,
+    on_schema_change: Callable[[dict[str, Any]], None] | None = None,
+) -> Idl:
+    return _create_idl(config, schema_cache.get_schema_json(
+        config.connection, 'Open_vSwitch', config.schema_cache_dir,
+        on_schema_change))
+
+
+def _create_idl(
+    config: ovsdb_lib.BaseOVS, schema_json: dict[str, Any]
+) -> Idl:
+    helper = idlutils.create_schema_helper(schema_json)
+    # NOTE: get_idl_schema() drops the schema of the helper, keep the
+    # column names of every table before creating the IDL.
+    schema_columns = {
+        table: frozenset(schema['columns'])
+        for table, schema in helper.schema_json['tables'].items()}
+    for table, columns in REQUIRED_COLUMNS.items():
+        # Columns missing from older schemas, such as mtu_request, are
+        # probed with has_table_column() before being used.
+        helper.register_columns(
+            table, [c for c in columns if c in schema_columns[table]])
+    ovs_idl = Idl(config.connection, helper, schema_columns)
+    if config.monitor_conditions:
+        for table, condition in monitor_conditions(config.qos_type).items():
+            ovs_idl.cond_change(table, condition)
+    return ovs_idl
+
+
+# The OVSDB connections of the process, with the PID they were created by,
+# by connection string
+_CONNECTIONS: dict[str, tuple[int, connection.Connection]] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def get_connection(config: ovsdb_lib.BaseOVS) -> connection.Connection:
+    """Return the connection of the process to an OVSDB server.
+
+    The connections, and so their IDL, replica and update thread, are shared
+    by every :class:`NeutronOvsdbIdl` of the process using the same
+    connection string. The other settings, such as the timeout, are the ones
+    of the first user. A forked process creates its own connections, as it
+    does not inherit the update threads.
+    """
+    pid = os.getpid()
+    with _CONNECTIONS_LOCK:
+        conn_pid, conn = _CONNECTIONS.get(config.connection, (None, None))
+        if conn is None or conn_pid != pid:
+            conn = connection.Connection(
+                idl=idl_factory(
+                    config, functools.partial(_schema_changed, config)),
+                timeout=config.timeout)
+            _CONNECTIONS[config.connection] = (pid, conn)
+        return conn
+
+
+def _schema_changed(
+    config: ovsdb_lib.BaseOVS, schema_json: dict[str, Any]
+) -> None:
+    """Replace a connection created from an outdated schema.
+
+    The new connection replaces the old one for the next calls to
+    :func:`api_factory`, which start it. The APIs created before use the old
+    connection until they are replaced, see
+    :attr:`NeutronOvsdbIdl.outdated`; it is stopped once the commands they
+    may have sent to it have timed out.
+    """
+    with _CONNECTIONS_LOCK:
+        conn_pid, conn = _CONNECTIONS.get(config.connection, (None, None))
+    if conn is None or conn_pid != os.getpid():
+        return
+    try:
+        new_conn = connection.Connection(
+            idl=_create_idl(config, schema_json), timeout=config.timeout)
+    except Exception:
+        LOG.exception('Unable to use the schema of the OVSDB connection %s, '
+                      'keeping the cached one', config.connection)
+        return
+    with _CONNECTIONS_LOCK:
+        replaced = _CONNECTIONS.get(config.connection, (None, None))[1] is conn
+        if replaced:
+            _CONNECTIONS[config.connection] = (conn_pid, new_conn)
+    if not replaced:
+        new_conn.idl.close()
+        return
+    timer = threading.Timer(conn.timeout, conn.stop)
+    timer.daemon = True
+    timer.start()
+    LOG.info('Replaced the OVSDB connection %s after a schema change',
+             config.connection)
 
 
 def api_factory(config: ovsdb_lib.BaseOVS) -> NeutronOvsdbIdl:
-    conn = connection.Connection(
-        idl=idl_factory(config),
-        timeout=config.timeout)
-    return NeutronOvsdbIdl(conn)
+    return NeutronOvsdbIdl(get_connection(config))
+
+
+class BridgeHasPortCommand(command.ReadOnlyCommand):
+    def __init__(
+        self, api: NeutronOvsdbIdl, bridge: str, port: str
+    ) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+        self.port = port
+
+    def run_idl(self, txn: Any) -> None:
+        # NOTE: both rows are found with the indexes on their names, unlike
+        # with port_to_br(), which goes through the ports of every bridge.
+        bridge = self.api.lookup('Bridge', self.bridge, default=None)
+        port = self.api.lookup('Port', self.port, default=None)
+        self.result = (bridge is not None and port is not None and
+                       any(p.uuid == port.uuid for p in bridge.ports))
 
 
 class NeutronOvsdbIdl(impl_idl.OvsdbIdl, api.ImplAPI):
@@ -60,12 +204,43 @@ class NeutronOvsdbIdl(impl_idl.OvsdbIdl, api.ImplAPI):
         vlog.use_python_logger()
         super(NeutronOvsdbIdl, self).__init__(conn)
 
+    # NOTE: ovsdbapp keeps the connection on the class, so every instance
+    # would use the first connection ever created, whatever its OVSDB. Keep
+    # it on the instance instead, get_connection() shares the connections.
+    @property
+    def ovsdb_connection(self) -> connection.Connection:
+        return self._connection
+
+    @ovsdb_connection.setter
+    def ovsdb_connection(self, conn: connection.Connection) -> None:
+        self._connection = conn
+
+    @property
+    def outdated(self) -> bool:
+        # the connection was replaced after a schema change, or this process
+        # was forked from the one that created it
+        with _CONNECTIONS_LOCK:
+            return not any(
+                pid == os.getpid() and conn is self._connection
+                for pid, conn in _CONNECTIONS.values())
+
     def _get_table_columns(self, table: str) -> list[str]:
+        if isinstance(self.idl, Idl):
+            return list(self.idl.schema_columns.get(table, ()))
         return list(self.tables[table].columns)
 
     def has_table_column(self, table: str, column: Iterable[str]) -> bool:
         return column in self._get_table_columns(table)
 
+    def bridge_has_port(
+        self, bridge: str, port: str
+    ) -> BridgeHasPortCommand:
+        return BridgeHasPortCommand(self, bridge, port)
+
+    def get_schema_version(self) -> str | None:
+        # ovs is not typed
+        return cast(str | None, getattr(self.idl._db, 'version', None))
+
 
 # this is derived form https://review.opendev.org/c/openstack/neutron/+/794892
 def add_keepalives(sock: socket.socket) -> int:
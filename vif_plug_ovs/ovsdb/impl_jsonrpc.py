@@ -0,0 +1,1336 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An OVSDB back-end speaking the OVSDB JSON-RPC protocol directly.
+
+The commands are those of the ``vsctl`` back-end, but they are turned into
+OVSDB ``transact`` requests sent over a persistent connection to the server,
+rather than run by ``ovs-vsctl`` processes. Unlike the native back-end,
+there is no replica of the database: the rows the commands need are
+selected from the server when the transaction is committed. Like
+``ovs-vsctl``, transactions that change the database wait for
+ovs-vswitchd to apply the change.
+"""
+
+from __future__ import annotations
+
+import abc
+from collections.abc import Iterator, Mapping, Sequence
+import contextlib
+import errno
+import os
+import threading
+import time
+from typing import Any, cast, TYPE_CHECKING
+import uuid
+
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+from oslo_utils import excutils
+from ovs.db import schema as ovs_schema
+from ovs.db import types as ovs_types
+from ovs import jsonrpc
+from ovs import poller as ovs_poller
+from ovs import stream
+from ovsdbapp import api as ovsdb_api
+from ovsdbapp.backend.ovs_idl import idlutils
+from ovsdbapp import exceptions
+
+from vif_plug_ovs.ovsdb import api
+from vif_plug_ovs.ovsdb import schema_cache
+
+if TYPE_CHECKING:
+    from vif_plug_ovs.ovsdb import ovsdb_lib
+
+
+LOG = logging.getLogger(__name__)
+
+SCHEMA_NAME = 'Open_vSwitch'
+
+
+class CommandError(exceptions.OvsdbAppException):
+    message = "%(error)s"
+
+
+class OperationError(CommandError):
+    """An operation of a ``transact`` request failed."""
+
+    def __init__(self, index: int, **kwargs: Any) -> None:
+        self.index = index
+        super().__init__(**kwargs)
+
+
+class ConnectionLost(exceptions.OvsdbConnectionUnavailable):
+    """The connection was lost before the reply to a request arrived.
+
+    The server may have run the request already, so it was not sent again.
+    """
+
+
+# the operations of a transact request that do not change the database
+_READ_ONLY_OPS = frozenset(['select', 'wait', 'comment'])
+
+
+class NamedUUID(str):
+    """The name of a row inserted by the current transaction."""
+
+
+def _named_uuid() -> NamedUUID:
+    return NamedUUID('row' + uuid.uuid4().hex)
+
+
+def _atom_to_json(base: ovs_types.BaseType, value: Any) -> Any:
+    if isinstance(value, DbCreateCommand):
+        value = value.uuid_name
+    if isinstance(value, NamedUUID):
+        return ['named-uuid', value]
+    if base.type == ovs_types.UuidType:
+        return ['uuid', str(value)]
+    if base.type == ovs_types.IntegerType:
+        return int(value)
+    if base.type == ovs_types.RealType:
+        return float(value)
+    if base.type == ovs_types.BooleanType:
+        return value in (True, 'true')
+    return str(value)
+
+
+def _to_json(type_: ovs_types.Type, value: Any) -> Any:
+    """Convert a python value to the OVSDB JSON of a column"""
+    if type_.is_map():
+        return ['map', [[_atom_to_json(type_.key, k),
+                         _atom_to_json(type_.value, v)]
+                        for k, v in value.items()]]
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return ['set', [_atom_to_json(type_.key, v) for v in value]]
+    return _atom_to_json(type_.key, value)
+
+
+def _from_json(value: Any) -> Any:
+    """Convert an OVSDB JSON value to a python value"""
+    if isinstance(value, list) and len(value) == 2:
+        if value[0] == 'uuid':
+            return uuid.UUID(value[1])
+        elif value[0] == 'set':
+            return [_from_json(v) for v in value[1]]
+        elif value[0] == 'map':
+            return {_from_json(k): _from_json(v) for k, v in value[1]}
+    return value
+
+
+def _from_json_set(value: Any) -> list[Any]:
+    """Convert the OVSDB JSON value of a set column to a list"""
+    result = _from_json(value)
+    return result if isinstance(result, list) else [result]
+
+
+def _json_set_members(value: Any) -> list[Any]:
+    """Return the OVSDB JSON values of the members of a set"""
+    if isinstance(value, list) and len(value) == 2 and value[0] == 'set':
+        return cast(list[Any], value[1])
+    return [value]
+
+
+def _where_uuid(row_uuid: Any) -> list[Any]:
+    return [['_uuid', '==', row_uuid]]
+
+
+def _where_uuids(value: Any) -> list[list[Any]]:
+    """Return a condition per member of a set of UUIDs"""
+    return [_where_uuid(member) for member in _json_set_members(value)]
+
+
+def _row_from_json(row: dict[str, Any]) -> dict[str, Any]:
+    return {column: _from_json(value) for column, value in row.items()
+            if column != '_version'}
+
+
+# The functions of the OVSDB conditions equivalent to the ovs-vsctl ones,
+# for scalars and maps. Map conditions match the given keys, like the
+# 'column:key=value' arguments of ovs-vsctl.
+_CONDITION_FUNCTIONS = {
+    '=': ('==', 'includes'),
+    '!=': ('!=', 'excludes'),
+    '<': ('<', None),
+    '>': ('>', None),
+    '<=': ('<=', None),
+    '>=': ('>=', None),
+    '{=}': ('==', '=='),
+    '{!=}': ('!=', '!='),
+    '{>=}': ('includes', 'includes'),
+}
+
+
+class Connection:
+    """A persistent JSON-RPC connection to an OVSDB server.
+
+    The connection is opened on the first request and opened again if it is
+    found closed. Requests are sent one at a time, the requests that may
+    block for long, such as waiting for ovs-vswitchd, are sent on a spare
+    connection instead, see :meth:`spare`.
+    """
+
+    def __init__(
+        self, remote: str, timeout: int, schema_cache_dir: str | None = None,
+    ) -> None:
+        self.remote = remote
+        self.timeout = timeout
+        self.schema_cache_dir = schema_cache_dir
+        self._rpc: jsonrpc.Connection | None = None
+        self._schema: ovs_schema.DbSchema | None = None
+        self._schema_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._spares: list[Connection] = []
+        self._spares_lock = threading.Lock()
+
+    @property
+    def schema(self) -> ovs_schema.DbSchema:
+        if self._schema is None:
+            schema_json = schema_cache.get_schema_json(
+                self.remote, SCHEMA_NAME, self.schema_cache_dir,
+                self._schema_changed)
+            schema = ovs_schema.DbSchema.from_json(schema_json)
+            with self._schema_lock:
+                # the cached schema may already have been checked
+                if self._schema is None:
+                    self._schema = schema
+        return self._schema
+
+    def _schema_changed(self, schema_json: dict[str, Any]) -> None:
+        # the cached schema was outdated, use the one of the server
+        schema = ovs_schema.DbSchema.from_json(schema_json)
+        with self._schema_lock:
+            self._schema = schema
+
+    def _connect(self) -> jsonrpc.Connection:
+        error = 0
+        for remote in idlutils.parse_connection(self.remote):
+            error, strm = stream.Stream.open_block(
+                stream.Stream.open(remote),
+                self.timeout * 1000 if self.timeout else -1)
+            if not error:
+                return jsonrpc.Connection(strm)
+            LOG.debug('Unable to connect to %(remote)s: %(err)s',
+                      {'remote': remote, 'err': os.strerror(error)})
+        raise exceptions.OvsdbConnectionUnavailable(
+            db_schema=SCHEMA_NAME, error=os.strerror(error))
+
+    def close(self) -> None:
+        with self._spares_lock:
+            spares, self._spares = self._spares, []
+        for spare in spares:
+            spare.close()
+        with self._lock:
+            self._close()
+
+    @contextlib.contextmanager
+    def spare(self) -> Iterator[Connection]:
+        """Lend a connection to the same server to the calling thread.
+
+        Requests on this connection are sent one at a time, a request that
+        is left waiting on the server would hold up those of every other
+        thread. The spare connections are kept open for the next users.
+        """
+        with self._spares_lock:
+            conn = (self._spares.pop() if self._spares else
+                    Connection(self.remote, self.timeout))
+        try:
+            yield conn
+        finally:
+            with self._spares_lock:
+                self._spares.append(conn)
+
+    def _close(self) -> None:
+        if self._rpc is not None:
+            self._rpc.close()
+            self._rpc = None
+
+    @staticmethod
+    def _transact_block(
+        rpc: jsonrpc.Connection,
+        request: jsonrpc.Message,
+        timeout: float | None,
+    ) -> tuple[int, jsonrpc.Message | None]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        error = rpc.send(request)
+        while not error:
+            rpc.run()
+            error, msg = rpc.recv()
+            if error == errno.EAGAIN:
+                poller = ovs_poller.Poller()
+                rpc.wait(poller)
+                rpc.recv_wait(poller)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return errno.ETIMEDOUT, None
+                    poller.timer_wait(int(remaining * 1000) + 1)
+                poller.block()
+                error = 0
+            elif error:
+                break
+            elif (msg.type in (jsonrpc.Message.T_REPLY,
+                               jsonrpc.Message.T_ERROR) and
+                    msg.id == request.id):
+                return 0, msg
+            elif (msg.type == jsonrpc.Message.T_REQUEST and
+                    msg.method == 'echo'):
+                # the inactivity probes of the server
+                error = rpc.send(
+                    jsonrpc.Message.create_reply(msg.params, msg.id))
+        return error, None
+
+    def request(
+        self,
+        method: str,
+        params: list[Any],
+        timeout: float | None = None,
+        read_only: bool = True,
+    ) -> Any:
+        """Send a request and return the result of its reply.
+
+        :param method: the JSON-RPC method
+        :param params: the parameters of the request
+        :param timeout: how long to wait for the reply, in seconds, defaults
+            to the timeout of the connection
+        :param read_only: whether the request leaves the database unchanged,
+            so that it can be sent again if the connection was lost
+        :raises OvsdbConnectionUnavailable: if the server cannot be reached
+        :raises ConnectionLost: if the connection was lost before the reply
+            to a request that is not read only arrived
+        :raises TimeoutException: if there is no reply in time
+        :raises CommandError: if the server replies with an error
+        """
+        if timeout is None and self.timeout:
+            timeout = self.timeout
+        request = jsonrpc.Message.create_request(method, params)
+        with self._lock:
+            # NOTE: a connection left open may have been closed by the
+            # server meanwhile, for example if it restarted, give it another
+            # try then. Only read only requests are sent again: the server
+            # may have run the others before the connection was lost.
+            for reused in (self._rpc is not None, False):
+                if self._rpc is None:
+                    self._rpc = self._connect()
+                error, reply = self._transact_block(
+                    self._rpc, request, timeout)
+                if not error:
+                    break
+                self._close()
+                if error == errno.ETIMEDOUT:
+                    raise exceptions.TimeoutException(
+                        commands=method, timeout=timeout,
+                        cause='no reply from %s' % self.remote)
+                if not read_only:
+                    raise ConnectionLost(
+                        db_schema=SCHEMA_NAME, error=os.strerror(error))
+                if not reused:
+                    raise exceptions.OvsdbConnectionUnavailable(
+                        db_schema=SCHEMA_NAME, error=os.strerror(error))
+
+        assert reply is not None
+        if reply.error:
+            raise CommandError(error='%s request failed: %s' % (
+                method, reply.error))
+        return reply.result
+
+    def transact(
+        self, ops: list[dict[str, Any]], timeout: float | None = None,
+    ) -> list[Any]:
+        """Run OVSDB operations in a transaction and return their results.
+
+        :raises OperationError: if an operation or the transaction fails,
+            with the index of the operation, or the number of operations if
+            the commit failed
+        :raises ConnectionLost: see :meth:`request`
+        """
+        read_only = all(op['op'] in _READ_ONLY_OPS for op in ops)
+        results = cast(list[Any], self.request(
+            'transact', [SCHEMA_NAME] + ops, timeout, read_only))
+        for idx, result in enumerate(results):
+            if isinstance(result, dict) and result.get('error'):
+                raise OperationError(index=idx, error='%s: %s (%s)' % (
+                    result['error'], result.get('details', ''),
+                    ops[idx]['op'] if idx < len(ops) else 'commit'))
+        return results
+
+
+# The OVSDB connections of the process, with the PID they were created by,
+# by connection string
+_CONNECTIONS: dict[str, tuple[int, Connection]] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def get_connection(config: ovsdb_lib.BaseOVS) -> Connection:
+    """Return the connection of the process to an OVSDB server.
+
+    The connections are shared like those of the native back-end, see
+    :func:`vif_plug_ovs.ovsdb.impl_idl.get_connection`.
+    """
+    pid = os.getpid()
+    with _CONNECTIONS_LOCK:
+        conn_pid, conn = _CONNECTIONS.get(config.connection, (None, None))
+        if conn is None or conn_pid != pid:
+            conn = Connection(config.connection, config.timeout,
+                              config.schema_cache_dir)
+            _CONNECTIONS[config.connection] = (pid, conn)
+        return conn
+
+
+def api_factory(context: ovsdb_lib.BaseOVS) -> OvsdbJsonRpc:
+    return OvsdbJsonRpc(context)
+
+
+class Transaction(ovsdb_api.Transaction):
+    """A transaction turning its commands into OVSDB operations.
+
+    The commands are run in order when the transaction is committed. They
+    select the rows they need from the server straight away and queue the
+    operations making their changes, which are then sent together in a
+    single ``transact`` request. That request starts with a ``wait``
+    operation for each of those selects, so that it fails if the rows
+    selected changed in the meantime, and the commands are then run again,
+    like ovs-vsctl does when its transaction needs to be retried.
+    """
+
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        check_error: bool = False,
+        log_errors: bool = True,
+    ) -> None:
+        self.api = api
+        self.check_error = check_error
+        self.log_errors = log_errors
+        self.commands: list[BaseCommand] = []
+        self.ops: list[dict[str, Any]] = []
+        self.results: list[Any] = []
+        # the rows inserted by the transaction, by table and name
+        self._inserted: dict[tuple[str, str], NamedUUID] = {}
+        # the wait operations checking the rows selected are unchanged
+        self._waits: dict[str, dict[str, Any]] = {}
+
+    def add(self, command: BaseCommand) -> BaseCommand:
+        self.commands.append(command)
+        return command
+
+    @property
+    def connection(self) -> Connection:
+        return self.api.connection
+
+    def column_type(self, table: str, column: str) -> ovs_types.Type:
+        if column == '_uuid':
+            return ovs_types.Type(ovs_types.BaseType(ovs_types.UuidType))
+        try:
+            return self.connection.schema.tables[table].columns[column].type
+        except KeyError:
+            raise CommandError(
+                error='%s does not contain a column whose name matches '
+                      '"%s"' % (table, column))
+
+    def to_json(self, table: str, column: str, value: Any) -> Any:
+        return _to_json(self.column_type(table, column), value)
+
+    def select(
+        self,
+        table: str,
+        where: list[Any],
+        columns: Sequence[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Select rows from the server, outside of the transaction"""
+        return self.select_many(table, [where], columns)[0]
+
+    def select_many(
+        self,
+        table: str,
+        wheres: Sequence[list[Any]],
+        columns: Sequence[str] | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Run a select for each of several conditions in one request.
+
+        The clauses of an OVSDB condition must all match, so the rows
+        matching any of several conditions, e.g. a set of UUIDs, are
+        selected with one select per condition.
+
+        :return: the rows selected by each condition, in order
+        """
+        if not wheres:
+            return []
+        ops = []
+        for where in wheres:
+            op: dict[str, Any] = {
+                'op': 'select', 'table': table, 'where': where}
+            if columns is not None:
+                op['columns'] = list(columns)
+            ops.append(op)
+        results = self.connection.transact(ops)
+        selected = []
+        for where, result in zip(wheres, results):
+            rows = cast(list[dict[str, Any]], result['rows'])
+            if columns:
+                wait_columns = list(columns)
+            else:
+                wait_columns = sorted(
+                    set(rows[0]) - {'_version'} if rows else {'_uuid'})
+            wait = {
+                'op': 'wait', 'table': table, 'where': where,
+                'columns': wait_columns, 'until': '==', 'timeout': 0,
+                'rows': [{c: row[c] for c in wait_columns} for row in rows]}
+            self._waits.setdefault(
+                jsonutils.dumps(wait, sort_keys=True), wait)
+            selected.append(rows)
+        return selected
+
+    def add_op(self, op: dict[str, Any]) -> int:
+        """Queue an operation, returning its index in the results"""
+        self.ops.append(op)
+        return len(self.ops) - 1
+
+    def insert(
+        self,
+        table: str,
+        row: dict[str, Any],
+        uuid_name: NamedUUID | None = None,
+    ) -> NamedUUID:
+        """Queue the insertion of a row, returning its named UUID"""
+        uuid_name = uuid_name or _named_uuid()
+        self.add_op({
+            'op': 'insert', 'table': table, 'uuid-name': uuid_name,
+            'row': {column: self.to_json(table, column, value)
+                    for column, value in row.items()},
+        })
+        if 'name' in row:
+            self._inserted[(table, row['name'])] = uuid_name
+        return uuid_name
+
+    def lookup(
+        self, table: str, record: Any, if_exists: bool = False,
+    ) -> Any:
+        """Return the UUID, as OVSDB JSON, of a record.
+
+        :param record: the UUID or the name of the record, or the
+            ``db_create()`` command creating it. Any record of the
+            Open_vSwitch table is the single row of that table.
+        :param if_exists: return None, rather than raise, if the record does
+            not exist
+        """
+        if isinstance(record, DbCreateCommand):
+            return ['named-uuid', record.uuid_name]
+        if table == SCHEMA_NAME:
+            rows = self.select(table, [], ['_uuid'])
+            return rows[0]['_uuid'] if rows else None
+        if (table, record) in self._inserted:
+            return ['named-uuid', self._inserted[(table, record)]]
+        try:
+            column, value = '_uuid', ['uuid', str(uuid.UUID(str(record)))]
+        except ValueError:
+            column, value = 'name', record
+        rows = self.select(table, [[column, '==', value]], ['_uuid'])
+        if rows:
+            return rows[0]['_uuid']
+        if if_exists:
+            return None
+        raise idlutils.RowNotFound(table=table, col=column, match=record)
+
+    def commit(self) -> list[Any] | None:
+        try:
+            return self._commit()
+        except Exception as e:
+            with excutils.save_and_reraise_exception() as ctxt:
+                if self.log_errors:
+                    LOG.error("Unable to run %(cmds)s. Exception: "
+                              "%(exception)s",
+                              {'cmds': self.commands, 'exception': e})
+                if not self.check_error:
+                    ctxt.reraise = False
+        return None
+
+    def _commit(self) -> list[Any]:
+        timeout = self.api.context.timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        lost = False
+        while True:
+            self.ops = []
+            self._inserted = {}
+            self._waits = {}
+            for cmd in self.commands:
+                cmd.result = None
+                cmd.run(self)
+            if not self.ops:
+                return [cmd.result for cmd in self.commands]
+            waits = list(self._waits.values())
+            # like ovs-vsctl, ask ovs-vswitchd to apply the changes
+            self.ops.append({
+                'op': 'mutate', 'table': SCHEMA_NAME, 'where': [],
+                'mutations': [['next_cfg', '+=', 1]]})
+            self.ops.append({
+                'op': 'select', 'table': SCHEMA_NAME, 'where': [],
+                'columns': ['next_cfg']})
+            try:
+                results = self.connection.transact(waits + self.ops)
+            except OperationError as e:
+                if e.index >= len(waits):
+                    raise
+                if deadline is not None and time.monotonic() > deadline:
+                    raise exceptions.TimeoutException(
+                        commands=self.commands, timeout=timeout,
+                        cause='the rows kept changing')
+                LOG.debug('The rows selected by %s changed, running them '
+                          'again', self.commands)
+                continue
+            except ConnectionLost:
+                # NOTE: the server may have committed the transaction, run
+                # the commands again so that they select the rows as they
+                # are now, unless a command would then insert a row again.
+                if lost or not all(cmd.rerunnable for cmd in self.commands):
+                    raise
+                lost = True
+                LOG.debug('The connection was lost while committing %s, '
+                          'running them again', self.commands)
+                continue
+            break
+        self.results = results[len(waits):]
+        for cmd in self.commands:
+            cmd.post_commit(self)
+        self._wait_for_vswitchd(self.results[-1]['rows'][0]['next_cfg'])
+        return [cmd.result for cmd in self.commands]
+
+    def _wait_for_vswitchd(self, next_cfg: int) -> None:
+        # NOTE: the wait is sent on a connection of its own, as it would
+        # otherwise hold up the requests of the other threads until
+        # ovs-vswitchd applies the changes.
+        with self.connection.spare() as conn:
+            self._wait_for_cfg(conn, next_cfg)
+
+    def _wait_for_cfg(self, conn: Connection, next_cfg: int) -> None:
+        timeout = self.api.context.timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        select = {'op': 'select', 'table': SCHEMA_NAME, 'where': [],
+                  'columns': ['cur_cfg']}
+        cur_cfg = conn.transact([select])[0]['rows'][0]['cur_cfg']
+        while cur_cfg < next_cfg:
+            wait: dict[str, Any] = {
+                'op': 'wait', 'table': SCHEMA_NAME, 'where': [],
+                'columns': ['cur_cfg'], 'until': '!=',
+                'rows': [{'cur_cfg': cur_cfg}]}
+            reply_timeout = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                wait['timeout'] = max(0, int(remaining * 1000))
+                reply_timeout = max(0, remaining) + 1
+            try:
+                results = conn.transact([wait, select], reply_timeout)
+            except CommandError as e:
+                if 'timed out' not in str(e):
+                    raise
+                raise exceptions.TimeoutException(
+                    commands=self.commands, timeout=timeout,
+                    cause='ovs-vswitchd did not apply the changes')
+            cur_cfg = results[1]['rows'][0]['cur_cfg']
+
+
+class BaseCommand(ovsdb_api.Command, metaclass=abc.ABCMeta):
+    #: whether running the command again, once its transaction may have
+    #: been committed, selects what it changed rather than changing it twice
+    rerunnable = True
+
+    def __init__(self, api: OvsdbJsonRpc) -> None:
+        self.api = api
+        self._result: Any | None = None
+
+    @property
+    def result(self) -> Any | None:
+        return self._result
+
+    @result.setter
+    def result(self, value: Any) -> None:
+        self._result = value
+
+    def execute(
+        self, check_error: bool = False, log_errors: bool = True
+    ) -> Any | None:
+        with self.api.create_transaction(
+                check_error=check_error, log_errors=log_errors) as txn:
+            txn.add(self)
+        return self.result
+
+    @abc.abstractmethod
+    def run(self, txn: Transaction) -> None:
+        """Select the rows needed and queue the operations of the command"""
+
+    def post_commit(self, txn: Transaction) -> None:
+        """Set the result of the command from those of its operations"""
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class AddManagerCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, target: str) -> None:
+        super().__init__(api)
+        self.target = target
+
+    def run(self, txn: Transaction) -> None:
+        manager = txn.insert('Manager', {'target': self.target})
+        txn.add_op({
+            'op': 'mutate', 'table': SCHEMA_NAME, 'where': [],
+            'mutations': [['manager_options', 'insert',
+                           ['set', [['named-uuid', manager]]]]]})
+
+
+class GetManagerCommand(BaseCommand):
+    def run(self, txn: Transaction) -> None:
+        rows = txn.select(SCHEMA_NAME, [], ['manager_options'])
+        uuids = set(_from_json_set(rows[0]['manager_options'])) if rows else ()
+        self.result = sorted(
+            row['target'] for row in txn.select(
+                'Manager', [], ['_uuid', 'target'])
+            if _from_json(row['_uuid']) in uuids)
+
+
+class RemoveManagerCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, target: str) -> None:
+        super().__init__(api)
+        self.target = target
+
+    def run(self, txn: Transaction) -> None:
+        rows = txn.select(
+            'Manager', [['target', '==', self.target]], ['_uuid'])
+        if not rows:
+            raise idlutils.RowNotFound(
+                table='Manager', col='target', match=self.target)
+        txn.add_op({
+            'op': 'mutate', 'table': SCHEMA_NAME, 'where': [],
+            'mutations': [['manager_options', 'delete',
+                           ['set', [rows[0]['_uuid']]]]]})
+
+
+class AddBridgeCommand(BaseCommand):
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        name: str,
+        may_exist: bool,
+        datapath_type: str | None,
+    ) -> None:
+        super().__init__(api)
+        self.name = name
+        self.may_exist = may_exist
+        self.datapath_type = datapath_type
+
+    def run(self, txn: Transaction) -> None:
+        bridge = txn.lookup('Bridge', self.name, if_exists=True)
+        if bridge is not None:
+            if not self.may_exist:
+                raise CommandError(
+                    error='cannot create a bridge named %s because a bridge '
+                          'named %s already exists' % (self.name, self.name))
+            if self.datapath_type:
+                txn.add_op({
+                    'op': 'update', 'table': 'Bridge',
+                    'where': _where_uuid(bridge),
+                    'row': {'datapath_type': self.datapath_type}})
+            return
+
+        iface = txn.insert('Interface', {'name': self.name,
+                                         'type': 'internal'})
+        port = txn.insert('Port', {'name': self.name, 'interfaces': [iface]})
+        row: dict[str, Any] = {'name': self.name, 'ports': [port]}
+        if self.datapath_type:
+            row['datapath_type'] = self.datapath_type
+        bridge = txn.insert('Bridge', row)
+        txn.add_op({
+            'op': 'mutate', 'table': SCHEMA_NAME, 'where': [],
+            'mutations': [['bridges', 'insert',
+                           ['set', [['named-uuid', bridge]]]]]})
+
+
+class DelBridgeCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, name: str, if_exists: bool
+    ) -> None:
+        super().__init__(api)
+        self.name = name
+        self.if_exists = if_exists
+
+    def run(self, txn: Transaction) -> None:
+        bridge = txn.lookup('Bridge', self.name, if_exists=self.if_exists)
+        if bridge is None:
+            return
+        # the bridge, its ports and their interfaces are garbage collected
+        txn.add_op({
+            'op': 'mutate', 'table': SCHEMA_NAME, 'where': [],
+            'mutations': [['bridges', 'delete', ['set', [bridge]]]]})
+
+
+class BrExistsCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, name: str) -> None:
+        super().__init__(api)
+        self.name = name
+
+    def run(self, txn: Transaction) -> None:
+        self.result = bool(txn.select(
+            'Bridge', [['name', '==', self.name]], ['_uuid']))
+
+
+class PortToBridgeCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, name: str) -> None:
+        super().__init__(api)
+        self.name = name
+
+    def run(self, txn: Transaction) -> None:
+        port = txn.lookup('Port', self.name)
+        rows = txn.select('Bridge', [['ports', 'includes', port]], ['name'])
+        if not rows:
+            raise CommandError(error='no bridge has a port %s' % self.name)
+        self.result = rows[0]['name']
+
+
+class BridgeHasPortCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, bridge: str, port: str) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+        self.port = port
+
+    def run(self, txn: Transaction) -> None:
+        port = txn.lookup('Port', self.port, if_exists=True)
+        self.result = port is not None and bool(txn.select(
+            'Bridge', [['name', '==', self.bridge],
+                       ['ports', 'includes', port]], ['_uuid']))
+
+
+class IfaceToBridgeCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, name: str) -> None:
+        super().__init__(api)
+        self.name = name
+
+    def run(self, txn: Transaction) -> None:
+        iface = txn.lookup('Interface', self.name)
+        ports = txn.select(
+            'Port', [['interfaces', 'includes', iface]], ['_uuid'])
+        rows = ports and txn.select(
+            'Bridge', [['ports', 'includes', ports[0]['_uuid']]], ['name'])
+        if not rows:
+            raise CommandError(
+                error='no bridge has an interface %s' % self.name)
+        self.result = rows[0]['name']
+
+
+class ListBridgesCommand(BaseCommand):
+    def run(self, txn: Transaction) -> None:
+        self.result = sorted(
+            row['name'] for row in txn.select('Bridge', [], ['name']))
+
+
+class BrGetExternalIdCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, name: str, field: str) -> None:
+        super().__init__(api)
+        self.name = name
+        self.field = field
+
+    def run(self, txn: Transaction) -> None:
+        bridge = txn.lookup('Bridge', self.name)
+        rows = txn.select('Bridge', _where_uuid(bridge), ['external_ids'])
+        self.result = _from_json(rows[0]['external_ids']).get(self.field)
+
+
+class DbCreateCommand(BaseCommand):
+    # the row is inserted without looking for one inserted before
+    rerunnable = False
+
+    def __init__(
+        self, api: OvsdbJsonRpc, table: str, col_values: dict[str, Any]
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.col_values = col_values
+        # NOTE: the name of the row in the transaction, the commands of the
+        # same transaction refer to the row with it
+        self.uuid_name = _named_uuid()
+        self._index: int | None = None
+
+    @property
+    def record_id(self) -> NamedUUID:
+        return self.uuid_name
+
+    def run(self, txn: Transaction) -> None:
+        txn.insert(self.table, self.col_values, self.uuid_name)
+        self._index = len(txn.ops) - 1
+
+    def post_commit(self, txn: Transaction) -> None:
+        if self._index is not None:
+            self.result = _from_json(txn.results[self._index]['uuid'])
+
+
+class DbDestroyCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, table: str, record: Any) -> None:
+        super().__init__(api)
+        self.table = table
+        self.record = record
+
+    def run(self, txn: Transaction) -> None:
+        txn.add_op({
+            'op': 'delete', 'table': self.table,
+            'where': _where_uuid(txn.lookup(self.table, self.record))})
+
+
+class DbSetCommand(BaseCommand):
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        table: str,
+        record: Any,
+        col_values: Sequence[tuple[str, Any]],
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.record = record
+        self.col_values = col_values
+
+    def run(self, txn: Transaction) -> None:
+        row = {}
+        mutations = []
+        for column, value in self.col_values:
+            if isinstance(value, Mapping):
+                # NOTE: like ovs-vsctl, only set the given keys of maps
+                key_type = txn.column_type(self.table, column).key
+                mutations += [
+                    [column, 'delete', ['set', [
+                        _atom_to_json(key_type, k) for k in value]]],
+                    [column, 'insert', txn.to_json(self.table, column, value)],
+                ]
+            else:
+                row[column] = txn.to_json(self.table, column, value)
+        where = _where_uuid(txn.lookup(self.table, self.record))
+        if row:
+            txn.add_op({'op': 'update', 'table': self.table,
+                        'where': where, 'row': row})
+        if mutations:
+            txn.add_op({'op': 'mutate', 'table': self.table,
+                        'where': where, 'mutations': mutations})
+
+
+class DbAddCommand(BaseCommand):
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        table: str,
+        record: Any,
+        column: str,
+        values: Sequence[Any],
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.record = record
+        self.column = column
+        self.values = values
+
+    def run(self, txn: Transaction) -> None:
+        mutations = []
+        for value in self.values:
+            if not isinstance(value, Mapping):
+                value = [value]
+            mutations.append([self.column, 'insert',
+                              txn.to_json(self.table, self.column, value)])
+        txn.add_op({
+            'op': 'mutate', 'table': self.table,
+            'where': _where_uuid(txn.lookup(self.table, self.record)),
+            'mutations': mutations})
+
+
+class DbClearCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, table: str, record: Any, column: str
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.record = record
+        self.column = column
+
+    def run(self, txn: Transaction) -> None:
+        type_ = txn.column_type(self.table, self.column)
+        txn.add_op({
+            'op': 'update', 'table': self.table,
+            'where': _where_uuid(txn.lookup(self.table, self.record)),
+            'row': {self.column: ['map', []] if type_.is_map()
+                    else ['set', []]}})
+
+
+class DbListCommand(BaseCommand):
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        table: str,
+        records: Sequence[Any] | None,
+        columns: list[str] | None,
+        if_exists: bool,
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.records = records
+        self.columns = columns
+        self.if_exists = if_exists
+
+    def run(self, txn: Transaction) -> None:
+        for column in self.columns or ():
+            txn.column_type(self.table, column)
+        if not self.records:
+            rows = txn.select(self.table, [], self.columns)
+        else:
+            rows = []
+            for record in self.records:
+                row_uuid = txn.lookup(self.table, record, self.if_exists)
+                if row_uuid is not None:
+                    rows += txn.select(
+                        self.table, _where_uuid(row_uuid), self.columns)
+        self.result = [_row_from_json(row) for row in rows]
+
+
+class DbGetCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, table: str, record: Any, column: str
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.record = record
+        self.column = column
+
+    def run(self, txn: Transaction) -> None:
+        txn.column_type(self.table, self.column)
+        rows = txn.select(
+            self.table, _where_uuid(txn.lookup(self.table, self.record)),
+            [self.column])
+        self.result = _from_json(rows[0][self.column])
+
+
+class DbFindCommand(BaseCommand):
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        table: str,
+        conditions: Sequence[Sequence[Any]],
+        columns: list[str] | None,
+    ) -> None:
+        super().__init__(api)
+        self.table = table
+        self.conditions = conditions
+        self.columns = columns
+
+    def run(self, txn: Transaction) -> None:
+        where = []
+        for condition in self.conditions:
+            if len(condition) == 2:
+                column, op, value = condition[0], '=', condition[1]
+            else:
+                column, op, value = condition
+            type_ = txn.column_type(self.table, column)
+            function = _CONDITION_FUNCTIONS.get(op, (None, None))[
+                1 if isinstance(value, Mapping) else 0]
+            if function is None:
+                raise CommandError(
+                    error='unsupported condition %s on %s' % (op, column))
+            where.append([column, function, _to_json(type_, value)])
+        rows = txn.select(self.table, where, self.columns)
+        self.result = [_row_from_json(row) for row in rows]
+
+
+class SetControllerCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, bridge: str, targets: Sequence[str]
+    ) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+        self.targets = targets
+
+    def run(self, txn: Transaction) -> None:
+        bridge = txn.lookup('Bridge', self.bridge)
+        controllers = [txn.insert('Controller', {'target': target})
+                       for target in self.targets]
+        txn.add_op({
+            'op': 'update', 'table': 'Bridge', 'where': _where_uuid(bridge),
+            'row': {'controller': txn.to_json('Bridge', 'controller',
+                                              controllers)}})
+
+
+class GetControllerCommand(BaseCommand):
+    def __init__(self, api: OvsdbJsonRpc, bridge: str) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+
+    def run(self, txn: Transaction) -> None:
+        bridge = txn.lookup('Bridge', self.bridge)
+        rows = txn.select('Bridge', _where_uuid(bridge), ['controller'])
+        uuids = set(_from_json_set(rows[0]['controller']))
+        self.result = sorted(
+            row['target'] for row in txn.select(
+                'Controller', [], ['_uuid', 'target'])
+            if _from_json(row['_uuid']) in uuids)
+
+
+class AddPortCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, bridge: str, port: str, may_exist: bool
+    ) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+        self.port = port
+        self.may_exist = may_exist
+
+    def run(self, txn: Transaction) -> None:
+        port = txn.lookup('Port', self.port, if_exists=True)
+        if port is not None:
+            rows = txn.select(
+                'Bridge', [['ports', 'includes', port]], ['name'])
+            bridge_name = rows[0]['name'] if rows else None
+            if not self.may_exist or bridge_name != self.bridge:
+                raise CommandError(
+                    error='cannot create a port named %s because a port '
+                          'named %s already exists on bridge %s' % (
+                              self.port, self.port, bridge_name))
+            return
+
+        bridge = txn.lookup('Bridge', self.bridge)
+        iface = txn.insert('Interface', {'name': self.port})
+        port = txn.insert('Port', {'name': self.port, 'interfaces': [iface]})
+        txn.add_op({
+            'op': 'mutate', 'table': 'Bridge', 'where': _where_uuid(bridge),
+            'mutations': [['ports', 'insert',
+                           ['set', [['named-uuid', port]]]]]})
+
+
+class DelPortCommand(BaseCommand):
+    def __init__(
+        self,
+        api: OvsdbJsonRpc,
+        port: str,
+        bridge: str | None,
+        if_exists: bool,
+    ) -> None:
+        super().__init__(api)
+        self.port = port
+        self.bridge = bridge
+        self.if_exists = if_exists
+
+    def run(self, txn: Transaction) -> None:
+        port = txn.lookup('Port', self.port, if_exists=self.if_exists)
+        if port is None:
+            return
+        where = [['ports', 'includes', port]]
+        if self.bridge:
+            where += _where_uuid(txn.lookup('Bridge', self.bridge))
+            if not txn.select('Bridge', where, ['_uuid']):
+                raise CommandError(
+                    error='bridge %s does not have a port %s' % (
+                        self.bridge, self.port))
+        # the port and its interfaces are garbage collected
+        txn.add_op({
+            'op': 'mutate', 'table': 'Bridge', 'where': where,
+            'mutations': [['ports', 'delete', ['set', [port]]]]})
+
+
+class ListPortsCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, bridge: str, ifaces: bool = False
+    ) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+        self.ifaces = ifaces
+
+    def run(self, txn: Transaction) -> None:
+        bridge = txn.lookup('Bridge', self.bridge)
+        rows = txn.select('Bridge', _where_uuid(bridge), ['ports'])
+        # NOTE: only the rows of the bridge are selected, one per UUID,
+        # rather than every row of the tables.
+        ports = [
+            row for selected in txn.select_many(
+                'Port', _where_uuids(rows[0]['ports']),
+                ['name', 'interfaces'])
+            for row in selected if row['name'] != self.bridge]
+        if not self.ifaces:
+            self.result = sorted(row['name'] for row in ports)
+            return
+
+        wheres = [where for row in ports
+                  for where in _where_uuids(row['interfaces'])]
+        self.result = sorted(
+            row['name'] for selected in txn.select_many(
+                'Interface', wheres, ['name'])
+            for row in selected)
+
+
+class SetBridgeColumnCommand(BaseCommand):
+    def __init__(
+        self, api: OvsdbJsonRpc, bridge: str, column: str, value: Any
+    ) -> None:
+        super().__init__(api)
+        self.bridge = bridge
+        self.column = column
+        self.value = value
+
+    def run(self, txn: Transaction) -> None:
+        txn.add_op({
+            'op': 'update', 'table': 'Bridge',
+            'where': _where_uuid(txn.lookup('Bridge', self.bridge)),
+            'row': {self.column: txn.to_json(
+                'Bridge', self.column, self.value)}})
+
+
+class OvsdbJsonRpc(ovsdb_api.API, api.ImplAPI):
+    def __init__(self, context: ovsdb_lib.BaseOVS) -> None:
+        super(OvsdbJsonRpc, self).__init__()
+        self.context = context
+
+    @property
+    def connection(self) -> Connection:
+        return get_connection(self.context)
+
+    def create_transaction(
+        self, check_error: bool = False, log_errors: bool = True,
+        **kwargs: Any,
+    ) -> Transaction:
+        return Transaction(self, check_error, log_errors)
+
+    def add_manager(self, connection_uri: str) -> BaseCommand:
+        return AddManagerCommand(self, connection_uri)
+
+    def get_manager(self) -> BaseCommand:
+        return GetManagerCommand(self)
+
+    def remove_manager(self, connection_uri: str) -> BaseCommand:
+        return RemoveManagerCommand(self, connection_uri)
+
+    def add_br(
+        self,
+        name: str,
+        may_exist: bool = True,
+        datapath_type: str | None = None
+    ) -> BaseCommand:
+        return AddBridgeCommand(self, name, may_exist, datapath_type)
+
+    def del_br(self, name: str, if_exists: bool = True) -> BaseCommand:
+        return DelBridgeCommand(self, name, if_exists)
+
+    def br_exists(self, name: str) -> BaseCommand:
+        return BrExistsCommand(self, name)
+
+    def port_to_br(self, name: str) -> BaseCommand:
+        return PortToBridgeCommand(self, name)
+
+    def bridge_has_port(self, bridge: str, port: str) -> BaseCommand:
+        return BridgeHasPortCommand(self, bridge, port)
+
+    def iface_to_br(self, name: str) -> BaseCommand:
+        return IfaceToBridgeCommand(self, name)
+
+    def list_br(self) -> BaseCommand:
+        return ListBridgesCommand(self)
+
+    def br_get_external_id(self, name: str, field: str) -> BaseCommand:
+        return BrGetExternalIdCommand(self, name, field)
+
+    def db_create(self, table: str, **col_values: Any) -> DbCreateCommand:
+        return DbCreateCommand(self, table, col_values)
+
+    def db_destroy(self, table: str, record: Any) -> BaseCommand:
+        return DbDestroyCommand(self, table, record)
+
+    def db_set(
+        self, table: str, record: Any, *col_values: tuple[str, Any]
+    ) -> BaseCommand:
+        return DbSetCommand(self, table, record, col_values)
+
+    def db_add(
+        self, table: str, record: Any, column: str, *values: Any
+    ) -> BaseCommand:
+        return DbAddCommand(self, table, record, column, values)
+
+    def db_clear(self, table: str, record: Any, column: str) -> BaseCommand:
+        return DbClearCommand(self, table, record, column)
+
+    def db_get(self, table: str, record: Any, column: str) -> BaseCommand:
+        return DbGetCommand(self, table, record, column)
+
+    def db_list(
+        self,
+        table: str,
+        records: list[Any] | None = None,
+        columns: list[str] | None = None,
+        if_exists: bool = False
+    ) -> BaseCommand:
+        return DbListCommand(self, table, records, columns, if_exists)
+
+    def db_find(
+        self,
+        table: str,
+        *conditions: Any,
+        columns: list[str] | None = None,
+        **kwargs: Any
+    ) -> BaseCommand:
+        return DbFindCommand(self, table, conditions, columns)
+
+    def set_controller(
+        self, bridge: str, controllers: Sequence[str]
+    ) -> BaseCommand:
+        return SetControllerCommand(self, bridge, controllers)
+
+    def del_controller(self, bridge: str) -> BaseCommand:
+        return SetBridgeColumnCommand(self, bridge, 'controller', [])
+
+    def get_controller(self, bridge: str) -> BaseCommand:
+        return GetControllerCommand(self, bridge)
+
+    def set_fail_mode(self, bridge: str, mode: str) -> BaseCommand:
+        return SetBridgeColumnCommand(self, bridge, 'fail_mode', mode)
+
+    def add_port(
+        self, bridge: str, port: str, may_exist: bool = True
+    ) -> BaseCommand:
+        return AddPortCommand(self, bridge, port, may_exist)
+
+    def del_port(
+        self, port: str, bridge: str | None = None, if_exists: bool = True
+    ) -> BaseCommand:
+        return DelPortCommand(self, port, bridge, if_exists)
+
+    def list_ports(self, bridge: str) -> BaseCommand:
+        return ListPortsCommand(self, bridge)
+
+    def list_ifaces(self, bridge: str) -> BaseCommand:
+        return ListPortsCommand(self, bridge, ifaces=True)
+
+    def db_list_rows(
+        self, table: str, record: str | None = None, if_exists: bool = False
+    ) -> BaseCommand:
+        raise NotImplementedError()
+
+    def db_find_rows(
+        self, table: str, *conditions: str, **kwargs: Any
+    ) -> BaseCommand:
+        raise NotImplementedError()
+
+    def db_remove(
+        self,
+        table: str,
+        record: str,
+        column: str,
+        *values: Any,
+        **keyvalues: Any
+    ) -> BaseCommand:
+        raise NotImplementedError()
+
+    def has_table_column(self, table: str, column: str) -> bool:
+        tables = self.connection.schema.tables
+        return table in tables and column in tables[table].columns
+
+    def get_schema_version(self) -> str | None:
+        # ovs is not typed
+        return cast(str | None, self.connection.schema.version)
@@ -14,8 +14,10 @@
 
 from __future__ import annotations
 
-from collections.abc import Mapping, Sequence
+from collections.abc import Callable, Iterator, Mapping, Sequence
+import contextlib
 import itertools
+import threading
 from typing import Any, TYPE_CHECKING
 import uuid
 
@@ -35,6 +37,16 @@ if TYPE_CHECKING:
 
 LOG = logging.getLogger(__name__)
 
+# The ovs-vsctl commands whose execution may be deferred, as nobody waits
+# for their result, see OvsdbVsctl.deferred()
+DEFERRABLE_COMMANDS = frozenset([
+    'add', 'add-br', 'add-port', 'clear', 'create', 'del-br',
+    'del-controller', 'del-port', 'destroy', 'set', 'set-controller',
+    'set-fail-mode',
+])
+
+_local = threading.local()
+
 
 def _val_to_py(val: Any) -> Any:
     """Convert a json ovsdb return value to native python object"""
@@ -71,6 +83,52 @@ def _run_vsctl(full_args: Sequence[str]) -> str:
     return processutils.execute(*full_args)[0].rstrip()
 
 
+class _DeferredCommands:
+    """The commands deferred in a thread by :meth:`OvsdbVsctl.deferred`."""
+
+    def __init__(self, context: ovsdb_lib.BaseOVS) -> None:
+        self.context = context
+        self.commands: list[BaseCommand] = []
+        self.check_error = False
+        self.log_errors = False
+        self.callbacks: list[Callable[[], None]] = []
+
+    def add(
+        self, command: BaseCommand, check_error: bool, log_errors: bool
+    ) -> None:
+        self.commands.append(command)
+        self.check_error = self.check_error or check_error
+        self.log_errors = self.log_errors or log_errors
+
+    def take(self) -> list[BaseCommand]:
+        commands = self.commands
+        self.commands = []
+        self.check_error = self.log_errors = False
+        return commands
+
+    def flush(self) -> None:
+        if not self.commands:
+            return
+        txn = Transaction(self.context, check_error=self.check_error,
+                          log_errors=self.log_errors)
+        txn.commands = self.take()
+        txn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        callbacks = self.callbacks
+        self.callbacks = []
+        for callback in callbacks:
+            callback()
+
+
+def _get_deferred(context: ovsdb_lib.BaseOVS) -> _DeferredCommands | None:
+    deferred: _DeferredCommands | None = getattr(_local, 'deferred', None)
+    if deferred is None or deferred.context is not context:
+        return None
+    return deferred
+
+
 class Transaction(ovsdb_api.Transaction):
     def __init__(
         self,
@@ -95,31 +153,88 @@ class Transaction(ovsdb_api.Transaction):
         return command
 
     def commit(self) -> list[str] | None:
+        commands = self.commands
+        deferred = _get_deferred(self.context)
+        if deferred is not None and deferred.commands:
+            if all(cmd.cmd in DEFERRABLE_COMMANDS for cmd in commands):
+                # nothing is read, the deferred commands can be run by the
+                # same ovs-vsctl invocation, before those of this transaction
+                self.check_error = self.check_error or deferred.check_error
+                self.log_errors = self.log_errors or deferred.log_errors
+                commands = deferred.take() + commands
+            else:
+                # the reads are tried with the deferred writes first. A
+                # failed ovs-vsctl invocation changes nothing, in which case
+                # the writes are made on their own, as a failed read must not
+                # roll them back, and the reads are run again.
+                try:
+                    self._run(deferred.commands + commands,
+                              check_error=True, log_errors=False)
+                except Exception:
+                    deferred.flush()
+                else:
+                    deferred.take()
+                    return [cmd.result for cmd in self.commands if cmd.result]
+
+        if self._run(commands) is None:
+            return None
+        return [cmd.result for cmd in self.commands if cmd.result]
+
+    def _run(
+        self,
+        commands: list[BaseCommand],
+        check_error: bool | None = None,
+        log_errors: bool | None = None,
+    ) -> str | None:
+        """Run commands with one ovs-vsctl invocation and set their results.
+
+        :param check_error: overrides the ``check_error`` of the transaction.
+        :param log_errors: overrides the ``log_errors`` of the transaction.
+        :returns: the output of ovs-vsctl, or None if it failed.
+        """
         args = []
-        for cmd in self.commands:
+        spans = []
+        for cmd in commands:
             cmd.result = None
-            args += cmd.vsctl_args()
-        res = self.run_vsctl(args)
+            cmd_args = cmd.vsctl_args()
+            # a command may run several ovs-vsctl commands, separated by
+            # '--', each printing one line
+            spans.append(cmd_args.count('--'))
+            args += cmd_args
+        res = self.run_vsctl(args, check_error=check_error,
+                             log_errors=log_errors)
         if res is None:
             return None
-        for i, record in enumerate(
-            res.replace(r'\\', '\\').splitlines()
-        ):
-            self.commands[i].result = record
-        return [cmd.result for cmd in self.commands if cmd.result]
-
-    def run_vsctl(self, args: list[str]) -> str | None:
+        records = res.replace(r'\\', '\\').splitlines()
+        line = 0
+        for cmd, span in zip(commands, spans):
+            # trailing empty lines are stripped from the output
+            if line < len(records):
+                cmd.result = records[line]
+            line += span
+        return res
+
+    def run_vsctl(
+        self,
+        args: list[str],
+        check_error: bool | None = None,
+        log_errors: bool | None = None,
+    ) -> str | None:
+        if check_error is None:
+            check_error = self.check_error
+        if log_errors is None:
+            log_errors = self.log_errors
         full_args = ["ovs-vsctl"] + self.opts + args
         try:
             # We log our own errors, so never have utils.execute do it
             return _run_vsctl(full_args)  # type: ignore
         except Exception as e:
             with excutils.save_and_reraise_exception() as ctxt:
-                if self.log_errors:
+                if log_errors:
                     LOG.error("Unable to execute %(cmd)s. Exception: "
                               "%(exception)s",
                               {'cmd': full_args, 'exception': e})
-                if not self.check_error:
+                if not check_error:
                     ctxt.reraise = False
 
             return None
@@ -150,6 +265,10 @@ class BaseCommand(ovsdb_api.Command):
     def execute(
         self, check_error: bool = False, log_errors: bool = True
     ) -> str | None:
+        deferred = _get_deferred(self.context)
+        if deferred is not None and self.cmd in DEFERRABLE_COMMANDS:
+            deferred.add(self, check_error, log_errors)
+            return None
         with Transaction(self.context, check_error=check_error,
                          log_errors=log_errors) as txn:
             txn.add(self)
@@ -172,6 +291,25 @@ class MultiLineCommand(BaseCommand):
         self._result = raw_result.split(r'\n') if raw_result else []
 
 
+class BridgeHasPortCommand(MultiLineCommand):
+    """Check the ports listed by list-ports for a port"""
+
+    def __init__(
+        self, context: ovsdb_lib.BaseOVS, bridge: str, port: str
+    ) -> None:
+        super().__init__(context, 'list-ports', args=[bridge])
+        self.port = port
+
+    @property
+    def result(self) -> Any | None:
+        return self._result
+
+    @result.setter
+    def result(self, raw_result: str) -> None:
+        self._result = self.port in (
+            raw_result.split(r'\n') if raw_result else [])
+
+
 def _parse_db_result(raw_result: str) -> list[dict[str, Any]] | None:
     # If check_error=False, run_vsctl can return None
     if not raw_result:
@@ -283,6 +421,65 @@ class OvsdbVsctl(ovsdb_api.API, api.ImplAPI):
     ) -> Transaction:
         return Transaction(self.context, check_error, log_errors, opts=opts)
 
+    @contextlib.contextmanager
+    def deferred(self) -> Iterator[None]:
+        """Defer the writes executed in this context by this thread.
+
+        The commands that only write, such as ``add_br()`` or ``del_port()``,
+        are queued by ``execute()``, which returns None, rather than each
+        being run by its own ovs-vsctl process. They are run together, in
+        order, by the next transaction or read, or when the context exits.
+        Their results are set on the commands then. Commands of a transaction
+        can refer to the named UUIDs of deferred ``db_create()`` commands.
+        The functions passed to :meth:`after_deferred` are run last.
+        """
+        previous: _DeferredCommands | None = getattr(_local, 'deferred', None)
+        if previous is not None and previous.context is self.context:
+            yield
+            return
+
+        deferred = _DeferredCommands(self.context)
+        _local.deferred = deferred
+        try:
+            yield
+        finally:
+            _local.deferred = previous
+            # NOTE: the writes made before an error are kept, as they would
+            # have been if they were not deferred.
+            deferred.close()
+
+    def after_deferred(self, func: Callable[[], None]) -> bool:
+        """Run ``func`` once the writes deferred by this thread are made.
+
+        It is run when the context of :meth:`deferred` exits.
+
+        :return: False, without running ``func``, if the writes of this
+            thread are not deferred.
+        """
+        deferred = _get_deferred(self.context)
+        if deferred is None:
+            return False
+        deferred.callbacks.append(func)
+        return True
+
+    @contextlib.contextmanager
+    def immediate(self) -> Iterator[None]:
+        """Run the writes executed in this context by this thread at once.
+
+        The commands deferred so far are run first, to keep them in order.
+        """
+        previous: _DeferredCommands | None = getattr(_local, 'deferred', None)
+        if previous is None or previous.context is not self.context:
+            yield
+            return
+
+        previous.flush()
+        _local.deferred = None
+        try:
+            yield
+        finally:
+            _local.deferred = previous
+
     def add_manager(self, connection_uri: str) -> BaseCommand:
         # This will add a new manager without overriding existing ones.
         conn_uri = 'target="%s"' % connection_uri
@@ -323,6 +520,11 @@ class OvsdbVsctl(ovsdb_api.API, api.ImplAPI):
     def port_to_br(self, name: str) -> BaseCommand:
         return BaseCommand(self.context, 'port-to-br', args=[name])
 
+    def bridge_has_port(
+        self, bridge: str, port: str
+    ) -> BridgeHasPortCommand:
+        return BridgeHasPortCommand(self.context, bridge, port)
+
     def iface_to_br(self, name: str) -> BaseCommand:
         return BaseCommand(self.context, 'iface-to-br', args=[name])
 
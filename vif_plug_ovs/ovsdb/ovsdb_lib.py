@@ -12,7 +12,10 @@
 
 from __future__ import annotations
 
-from typing import Any, TYPE_CHECKING
+from collections.abc import Callable, Iterator
+import contextlib
+import threading
+from typing import Any, TypeAlias, TYPE_CHECKING
 import uuid
 
 from oslo_config import cfg
@@ -25,6 +28,7 @@ from vif_plug_ovs.ovsdb import api as ovsdb_api
 
 if TYPE_CHECKING:
     from vif_plug_ovs.ovsdb import impl_idl
+    from vif_plug_ovs.ovsdb import impl_jsonrpc
     from vif_plug_ovs.ovsdb import impl_vsctl
 
 
@@ -32,15 +36,148 @@ LOG = logging.getLogger(__name__)
 QOS_UUID_NAMESPACE = uuid.UUID("68da264a-847f-42a8-8ab0-5e774aee3d95")
 
 
+_TxnOp: TypeAlias = 'Callable[[impl_vsctl.Transaction], object]'
+
+# The optional parts of the Open_vSwitch schema the plugin adapts to, as
+# (table, column) pairs. They are all probed together the first time any
+# schema capability is needed.
+SCHEMA_CAPABILITIES: tuple[tuple[str, str], ...] = (
+    ('Interface', 'mtu_request'),
+)
+
+
+class OVSDBBatch:
+    """Collect OVSDB commands for many ports and commit them at once.
+
+    While a batch is active on a :class:`BaseOVS` instance, the methods that
+    would normally commit their own transaction queue their commands here
+    instead. On :meth:`commit` all queued commands are added to a single
+    OVSDB transaction. Work that must happen after the OVSDB change, such as
+    removing the kernel netdev of a deleted port, is run once the
+    transaction has been committed.
+
+    Queued operations are grouped by a key, which defaults to the name of the
+    port or bridge being changed and can be overridden with :meth:`owner` to
+    group all the operations for e.g. a single VIF. If the combined
+    transaction fails, each group is retried in its own transaction so that
+    one bad port does not fail the whole batch. Idempotent operations that
+    several groups depend on, such as ensuring a bridge exists, are queued
+    as shared operations which are only added once to the combined
+    transaction but are repeated in each retried group.
+    """
+
+    def __init__(self, ovs: BaseOVS) -> None:
+        self._ovs = ovs
+        self._owner: str | None = None
+        self._shared_ops: dict[str, _TxnOp] = {}
+        self._ops: dict[str, list[_TxnOp]] = {}
+        self._post_ops: dict[str, list[Callable[[], None]]] = {}
+        self.results: dict[str, Exception | None] = {}
+
+    @contextlib.contextmanager
+    def owner(self, key: str) -> Iterator[None]:
+        """Group the operations queued in this context under ``key``."""
+        self._owner = key
+        try:
+            yield
+        finally:
+            self._owner = None
+
+    def add(
+        self,
+        key: str,
+        op: _TxnOp,
+        post_op: Callable[[], None] | None = None,
+    ) -> None:
+        """Queue an operation.
+
+        :param key: the key to report the result under, unless overridden by
+            an enclosing :meth:`owner` context.
+        :param op: callable adding the commands for the operation to the
+            transaction passed to it.
+        :param post_op: optional callable run after the transaction has been
+            committed successfully.
+        """
+        key = self._owner or key
+        self._ops.setdefault(key, []).append(op)
+        self._post_ops.setdefault(key, [])
+        if post_op is not None:
+            self._post_ops[key].append(post_op)
+
+    def add_shared(self, key: str, op: _TxnOp) -> None:
+        """Queue an idempotent operation that other operations depend on.
+
+        Only the first operation queued for a given ``key`` is kept.
+        """
+        self._shared_ops.setdefault(key, op)
+
+    def discard(self, key: str) -> None:
+        """Drop the operations queued under ``key``."""
+        self._ops.pop(key, None)
+        self._post_ops.pop(key, None)
+
+    def _run(self, ops: list[_TxnOp]) -> None:
+        with self._ovs.ovsdb.transaction(check_error=True) as txn:
+            for op in ops:
+                op(txn)
+
+    def commit(self) -> dict[str, Exception | None]:
+        """Commit all queued operations.
+
+        :returns: a mapping of key to ``None`` if the operations queued
+            under that key succeeded, or to the exception raised.
+        """
+        if not self._ops and not self._shared_ops:
+            return self.results
+
+        shared_ops = list(self._shared_ops.values())
+        try:
+            self._run(
+                shared_ops + [op for ops in self._ops.values() for op in ops])
+            self.results.update(dict.fromkeys(self._ops))
+        except Exception:
+            LOG.warning("Failed to commit OVSDB batch of %d operation "
+                        "groups, retrying each group on its own",
+                        len(self._ops), exc_info=True)
+            for key, ops in self._ops.items():
+                try:
+                    self._run(shared_ops + ops)
+                    self.results[key] = None
+                except Exception as err:
+                    self.results[key] = err
+
+        for key, post_ops in self._post_ops.items():
+            if self.results[key] is not None:
+                continue
+            try:
+                for post_op in post_ops:
+                    post_op()
+            except Exception as err:
+                self.results[key] = err
+
+        self._shared_ops = {}
+        self._ops = {}
+        self._post_ops = {}
+        return self.results
+
+
 class BaseOVS:
 
     def __init__(self, config: cfg.ConfigOpts.GroupAttr) -> None:
         self.timeout = config.ovs_vsctl_timeout
         self.connection = config.ovsdb_connection
         self.interface = config.ovsdb_interface
+        self.monitor_conditions = config.ovsdb_monitor_conditions
+        self.qos_type = config.default_qos_type
+        self.schema_cache_dir = config.ovsdb_schema_cache_dir
         self._ovsdb: (
-            impl_vsctl.OvsdbVsctl | impl_idl.NeutronOvsdbIdl | None
+            impl_vsctl.OvsdbVsctl | impl_idl.NeutronOvsdbIdl |
+            impl_jsonrpc.OvsdbJsonRpc | None
         ) = None
+        self._local = threading.local()
+        self._capabilities: dict[tuple[str, str], bool] = {}
+        self._capabilities_source: tuple[object, str | None] | None = None
+        self._capabilities_lock = threading.Lock()
 
     # NOTE(sean-k-mooney): when using the native ovsdb bindings
     # creating an instance of the ovsdb api connects to the ovsdb
@@ -48,13 +185,116 @@ class BaseOVS:
     # of the ovsdb. To avoid that we lazy load the ovsdb
     # instance the first time we need it via a property.
     @property
-    def ovsdb(self) -> impl_vsctl.OvsdbVsctl | impl_idl.NeutronOvsdbIdl:
-        if not self._ovsdb:
+    def ovsdb(self) -> (
+        impl_vsctl.OvsdbVsctl | impl_idl.NeutronOvsdbIdl |
+        impl_jsonrpc.OvsdbJsonRpc
+    ):
+        if not self._ovsdb or self._ovsdb.outdated:
             self._ovsdb = ovsdb_api.get_instance(self, self.interface)
         return self._ovsdb
 
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[OVSDBBatch]:
+        """Collect OVSDB changes made in this context into one transaction.
+
+        The transaction is committed when the context exits without an
+        exception. The per key results are available from the returned
+        batch's ``results`` attribute afterwards.
+        """
+        batch = OVSDBBatch(self)
+        self._local.batch = batch
+        try:
+            yield batch
+        finally:
+            self._local.batch = None
+        batch.commit()
+
+    def deferred(self) -> contextlib.AbstractContextManager[None]:
+        """Defer the OVSDB writes made in this context where that helps.
+
+        With the ``vsctl`` interface, the commands that are executed on
+        their own are queued and run together by a single ovs-vsctl process,
+        see :meth:`impl_vsctl.OvsdbVsctl.deferred`. This does nothing with
+        the other interfaces, where each command is cheap.
+        """
+        # NOTE: do not connect to the OVSDB just to do nothing
+        if self.interface != 'vsctl':
+            return contextlib.nullcontext()
+        return self.ovsdb.deferred()
+
+    def after_deferred(self, func: Callable[[], None]) -> bool:
+        """Run ``func`` once the OVSDB writes deferred by this thread are made.
+
+        :returns: False, without running ``func``, if no :meth:`deferred`
+            context defers them.
+        """
+        if self.interface != 'vsctl':
+            return False
+        return self.ovsdb.after_deferred(func)
+
+    @contextlib.contextmanager
+    def immediate(self) -> Iterator[None]:
+        """Make the OVSDB changes of this context straight away.
+
+        They are neither queued in the batch of the thread nor deferred, so
+        they are done by the time the context exits, for example while a
+        lock is held.
+        """
+        batch = self._get_batch()
+        self._local.batch = None
+        # NOTE: do not connect to the OVSDB just to do nothing
+        immediate = (self.ovsdb.immediate() if self.interface == 'vsctl'
+                     else contextlib.nullcontext())
+        try:
+            with immediate:
+                yield
+        finally:
+            self._local.batch = batch
+
+    def _get_batch(self) -> OVSDBBatch | None:
+        batch: OVSDBBatch | None = getattr(self._local, 'batch', None)
+        return batch
+
+    def has_capability(self, table: str, column: str) -> bool:
+        """Check if the OVSDB schema has a given column.
+
+        The result is cached for the current OVSDB API instance and schema
+        version. The columns in :data:`SCHEMA_CAPABILITIES` are probed
+        together the first time, others as they are requested.
+        """
+        ovsdb = self.ovsdb
+        source = (ovsdb, ovsdb.get_schema_version())
+        capabilities = self._capabilities
+        if (self._capabilities_source is None or
+                self._capabilities_source[0] is not source[0] or
+                self._capabilities_source[1] != source[1]):
+            with self._capabilities_lock:
+                capabilities = {
+                    (t, c): ovsdb.has_table_column(t, c)
+                    for t, c in SCHEMA_CAPABILITIES}
+                self._capabilities = capabilities
+                self._capabilities_source = source
+        key = (table, column)
+        if key not in capabilities:
+            with self._capabilities_lock:
+                capabilities = dict(self._capabilities)
+                capabilities[key] = ovsdb.has_table_column(table, column)
+                self._capabilities = capabilities
+        return capabilities[key]
+
+    def invalidate_capabilities(self) -> None:
+        """Drop the cached schema capabilities.
+
+        They are probed again on the next :meth:`has_capability` call. This
+        is only needed with the ``vsctl`` interface, which cannot tell when
+        the schema changes.
+        """
+        with self._capabilities_lock:
+            self._capabilities = {}
+            self._capabilities_source = None
+
     def _ovs_supports_mtu_requests(self) -> bool:
-        return self.ovsdb.has_table_column('Interface', 'mtu_request')
+        return self.has_capability('Interface', 'mtu_request')
 
     def _set_mtu_request(
         self, txn: impl_vsctl.Transaction, dev: str, mtu: int
@@ -89,6 +329,12 @@ class BaseOVS:
     def ensure_ovs_bridge(
         self, bridge: str, datapath_type: str | None
     ) -> str | Any | None:
+        batch = self._get_batch()
+        if batch is not None:
+            batch.add_shared(bridge, lambda txn: txn.add(
+                self.ovsdb.add_br(bridge, may_exist=True,
+                                  datapath_type=datapath_type)))
+            return None
         return self.ovsdb.add_br(bridge, may_exist=True,
                                  datapath_type=datapath_type).execute()
 
@@ -102,6 +348,10 @@ class BaseOVS:
         # TODO(sean-k-mooney): when we fix bug: #1914886
         # add a guard against deleting the integration bridge
         # after adding a config option to store its name.
+        batch = self._get_batch()
+        if batch is not None:
+            batch.add(bridge, lambda txn: txn.add(self.ovsdb.del_br(bridge)))
+            return None
         return self.ovsdb.del_br(bridge).execute()
 
     def create_patch_port_pair(
@@ -135,7 +385,7 @@ class BaseOVS:
         # 2.) in all cases we either want to fully create the patch port
         # pair or not create it atomically. By using a transaction we know
         # that we will never be in a mixed state where it was partly created.
-        with self.ovsdb.transaction() as txn:
+        def _add_commands(txn: impl_vsctl.Transaction) -> None:
             # create integration bridge patch peer
             external_ids = {
                 'iface-id': iface_id, 'iface-status': 'active',
@@ -163,6 +413,14 @@ class BaseOVS:
             txn.add(
                 self.ovsdb.db_set('Interface', port_bridge_port, *col_values))
 
+        batch = self._get_batch()
+        if batch is not None:
+            batch.add(int_bridge_port, _add_commands)
+            return
+
+        with self.ovsdb.transaction() as txn:
+            _add_commands(txn)
+
     def create_ovs_vif_port(
         self,
         bridge: str,
@@ -239,25 +497,19 @@ class BaseOVS:
                 PF_PCI=pf_pci, VF_NUM=vf_num)
             col_values.append(('options',
                               {'dpdk-devargs': devargs_string}))
-        # create qos record if qos type is specified
-        # and get the qos id. This is done outside of the transaction
-        # because we need the qos id to set the qos on the port.
-        # The qos uuid cannot be set when creating the record so we
-        # have to look it up after the record is created. this means
-        # we need to create the qos record outside of the transaction
-        # that creates the port.
-        qid = None
+        # NOTE: the QoS record is created in the same transaction as the
+        # port and referenced from the port by the create command, which
+        # both backends translate to the row created by that command.
+        # Stale records left by a previous plug are looked up here and
+        # destroyed in that transaction as well.
+        stale_qos: list[str] = []
+        qos_external_ids: dict[str, str] = {}
         if qos_type:
-            self.delete_qos_if_exists(dev, qos_type)
+            stale_qos = self._find_qos(dev, qos_type)
             qos_id = uuid.uuid5(QOS_UUID_NAMESPACE, dev)
             qos_external_ids = {'id': str(qos_id), '_type': qos_type}
-            self.ovsdb.db_create(
-                'QoS', type=qos_type, external_ids=qos_external_ids
-                ).execute(check_error=True)
-            record = self.get_qos(dev, qos_type)
-            qid = record[0]['_uuid']
 
-        with self.ovsdb.transaction() as txn:
+        def _add_commands(txn: impl_vsctl.Transaction) -> None:
             if datapath_type:
                 txn.add(self.ovsdb.add_br(bridge, may_exist=True,
                                           datapath_type=datapath_type))
@@ -269,17 +521,31 @@ class BaseOVS:
                                           ('vlan_mode', vlan_mode)))
             if trunks:
                 txn.add(self.ovsdb.db_set('Port', dev, ('trunks', trunks)))
-            if qid:
-                txn.add(self.ovsdb.db_set('Port', dev, ('qos', qid)))
+            if qos_type:
+                for qos_uuid in stale_qos:
+                    txn.add(self.ovsdb.db_destroy('QoS', qos_uuid))
+                qos = txn.add(self.ovsdb.db_create(
+                    'QoS', type=qos_type, external_ids=qos_external_ids))
+                txn.add(self.ovsdb.db_set('Port', dev, ('qos', qos)))
             if col_values:
                 txn.add(self.ovsdb.db_set('Interface', dev, *col_values))
             self.update_device_mtu(
                 txn, dev, mtu, interface_type=interface_type
             )
 
+        batch = self._get_batch()
+        if batch is not None:
+            batch.add(dev, _add_commands)
+            return
+
+        with self.ovsdb.transaction() as txn:
+            _add_commands(txn)
+
     def port_exists(self, port_name: str, bridge: str) -> bool:
-        ports = self.ovsdb.list_ports(bridge).execute()
-        return ports is not None and port_name in ports
+        # NOTE: look the bridge up by name and the port among its ports,
+        # port_to_br() goes through the ports of every bridge.
+        return bool(self.ovsdb.bridge_has_port(bridge, port_name).execute(
+            log_errors=False))
 
     def get_qos(self, dev: str, qos_type: str) -> Any:
         qos_id = uuid.uuid5(QOS_UUID_NAMESPACE, dev)
@@ -289,14 +555,19 @@ class BaseOVS:
             colmuns=['_uuid']
         ).execute()
 
+    def _find_qos(self, dev: str, qos_type: str) -> list[str]:
+        """Return the UUIDs of the QoS records of a port."""
+        records = self.get_qos(dev, qos_type) or []
+        return [str(record['_uuid']) for record in records
+                if '_uuid' in record]
+
     def delete_qos_if_exists(self, dev: str, qos_type: str) -> None:
-        qos_ids = self.get_qos(dev, qos_type)
-        if qos_ids is not None and len(qos_ids) > 0:
-            for qos_id in qos_ids:
-                if '_uuid' in qos_id:
-                    self.ovsdb.db_destroy(
-                        'QoS', str(qos_id['_uuid'])
-                    ).execute()
+        qos_uuids = self._find_qos(dev, qos_type)
+        if not qos_uuids:
+            return
+        with self.ovsdb.transaction() as txn:
+            for qos_uuid in qos_uuids:
+                txn.add(self.ovsdb.db_destroy('QoS', qos_uuid))
 
     def update_ovs_vif_port(
         self,
@@ -304,6 +575,12 @@ class BaseOVS:
         mtu: int | None = None,
         interface_type: str | None = None,
     ) -> None:
+        batch = self._get_batch()
+        if batch is not None:
+            batch.add(dev, lambda txn: self.update_device_mtu(
+                txn, dev, mtu, interface_type=interface_type))
+            return
+
         with self.ovsdb.transaction() as txn:
             self.update_device_mtu(
                 txn, dev, mtu, interface_type=interface_type
@@ -316,8 +593,26 @@ class BaseOVS:
         delete_netdev: bool = True,
         qos_type: str | None = None,
     ) -> None:
-        self.ovsdb.del_port(dev, bridge=bridge, if_exists=True).execute()
-        if qos_type:
-            self.delete_qos_if_exists(dev, qos_type)
-        if delete_netdev:
-            linux_net.delete_net_dev(dev)
+        def _cleanup() -> None:
+            if qos_type:
+                self.delete_qos_if_exists(dev, qos_type)
+            if delete_netdev:
+                linux_net.delete_net_dev(dev)
+
+        batch = self._get_batch()
+        if batch is not None:
+            batch.add(dev, lambda txn: txn.add(
+                self.ovsdb.del_port(dev, bridge=bridge, if_exists=True)),
+                post_op=_cleanup)
+            return
+
+        # NOTE: the netdev must only be deleted once it is no longer an OVS
+        # port, so when the deletion of the port is deferred, so is the
+        # cleanup.
+        if self.after_deferred(_cleanup):
+            self.ovsdb.del_port(dev, bridge=bridge, if_exists=True).execute()
+            return
+
+        with self.ovsdb.transaction() as txn:
+            txn.add(self.ovsdb.del_port(dev, bridge=bridge, if_exists=True))
+        _cleanup()
@@ -0,0 +1,138 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""An on-disk cache of the OVSDB schemas.
+
+Creating an IDL needs the schema of the database, which is fetched from the
+server with a blocking get_schema request. With a cache directory, the
+schema fetched the last time is used straight away instead, and compared to
+the one of the server in a background thread. A schema that changed is
+written to the cache, and passed to the caller so that it can rebuild what
+it created from the cached one.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import hashlib
+import os
+import threading
+from typing import Any, cast
+
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+from ovsdbapp.backend.ovs_idl import idlutils
+
+LOG = logging.getLogger(__name__)
+
+
+def _cache_path(cache_dir: str, connection: str, schema_name: str) -> str:
+    key = hashlib.sha256(
+        ('%s\n%s' % (connection, schema_name)).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, '%s-%s.json' % (schema_name, key))
+
+
+def _schema_id(schema: dict[str, Any]) -> tuple[Any, Any]:
+    return schema.get('version'), schema.get('cksum')
+
+
+def _fetch(connection: str, schema_name: str) -> dict[str, Any]:
+    # ovsdbapp is not typed
+    return cast(dict[str, Any],
+                idlutils.fetch_schema_json(connection, schema_name))
+
+
+def _read(path: str) -> dict[str, Any] | None:
+    try:
+        with open(path, 'rb') as f:
+            schema = jsonutils.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        LOG.warning('Ignoring the unreadable OVSDB schema cache %s', path,
+                    exc_info=True)
+        return None
+    if not isinstance(schema, dict) or 'tables' not in schema:
+        LOG.warning('Ignoring the invalid OVSDB schema cache %s', path)
+        return None
+    return schema
+
+
+def _write(path: str, schema: dict[str, Any]) -> None:
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            jsonutils.dump(schema, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # the cache only saves time, carry on without it
+        LOG.warning('Unable to write the OVSDB schema cache %s', path,
+                    exc_info=True)
+
+
+def _check(
+    path: str, connection: str, schema_name: str, cached: dict[str, Any],
+    on_change: Callable[[dict[str, Any]], None] | None,
+) -> None:
+    try:
+        schema = _fetch(connection, schema_name)
+    except Exception:
+        LOG.warning('Unable to check the cached %s schema against %s',
+                    schema_name, connection, exc_info=True)
+        return
+    if _schema_id(schema) == _schema_id(cached):
+        return
+    LOG.warning('The %(name)s schema of %(conn)s changed from version '
+                '%(old)s to %(new)s since it was cached, using the new '
+                'schema.',
+                {'name': schema_name, 'conn': connection,
+                 'old': cached.get('version'), 'new': schema.get('version')})
+    _write(path, schema)
+    if on_change is None:
+        return
+    try:
+        on_change(schema)
+    except Exception:
+        LOG.exception('Unable to switch to the new %s schema of %s',
+                      schema_name, connection)
+
+
+def get_schema_json(
+    connection: str, schema_name: str, cache_dir: str | None = None,
+    on_change: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """Return the schema of an OVSDB database.
+
+    :param connection: the OVSDB connection string
+    :param schema_name: the name of the database
+    :param cache_dir: the directory of the cached schemas, the schema is
+        fetched from the server every time if it is not set
+    :param on_change: called from the background check with the schema of
+        the server if it differs from the cached one that was returned
+    :returns: the schema, as a JSON object
+    """
+    if not cache_dir:
+        return _fetch(connection, schema_name)
+
+    path = _cache_path(cache_dir, connection, schema_name)
+    cached = _read(path)
+    if cached is None:
+        schema = _fetch(connection, schema_name)
+        _write(path, schema)
+        return schema
+
+    threading.Thread(
+        target=_check,
+        args=(path, connection, schema_name, cached, on_change),
+        name='os-vif-ovsdb-schema-check', daemon=True).start()
+    return cached
@@ -0,0 +1,580 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A small in-process OVSDB server, for the tests of the JSON-RPC back-end.
+
+It serves a cut down Open_vSwitch schema over a unix socket and implements
+the parts of RFC 7047 the back-end uses: the ``get_schema``, ``list_dbs``,
+``echo`` and ``transact`` methods, the insert, select, update, mutate,
+delete and wait operations, referential integrity, the indexes of the
+tables and the garbage collection of the rows that are not part of a root
+set.
+
+A wait operation whose condition does not hold fails straight away as if it
+timed out. The ``vswitchd`` attribute makes the server apply the changes of
+each transaction to ``cur_cfg``, as ovs-vswitchd would do.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import Any
+import uuid
+
+import fixtures
+from ovs.db import schema as ovs_schema
+from ovs.db import types as ovs_types
+
+
+def _column(key: Any, min_: int = 1, max_: int | str = 1,
+            value: Any = None) -> dict[str, Any]:
+    type_: dict[str, Any] = {'key': key, 'min': min_, 'max': max_}
+    if value is not None:
+        type_['value'] = value
+    return {'type': type_}
+
+
+def _ref(table: str) -> dict[str, Any]:
+    return {'type': 'uuid', 'refTable': table}
+
+
+_SET: dict[str, Any] = {'min_': 0, 'max_': 'unlimited'}
+_STRING_MAP = _column('string', 0, 'unlimited', 'string')
+
+SCHEMA: dict[str, Any] = {
+    'name': 'Open_vSwitch',
+    'version': '8.3.0',
+    'cksum': '3781850481 26690',
+    'tables': {
+        'Open_vSwitch': {
+            'isRoot': True,
+            'columns': {
+                'bridges': _column(_ref('Bridge'), **_SET),
+                'manager_options': _column(_ref('Manager'), **_SET),
+                'next_cfg': _column('integer'),
+                'cur_cfg': _column('integer'),
+                'external_ids': _STRING_MAP,
+            },
+        },
+        'Bridge': {
+            'indexes': [['name']],
+            'columns': {
+                'name': _column('string'),
+                'datapath_type': _column('string'),
+                'ports': _column(_ref('Port'), **_SET),
+                'controller': _column(_ref('Controller'), **_SET),
+                'fail_mode': _column(
+                    {'type': 'string',
+                     'enum': ['set', ['secure', 'standalone']]}, 0, 1),
+                'external_ids': _STRING_MAP,
+            },
+        },
+        'Port': {
+            'indexes': [['name']],
+            'columns': {
+                'name': _column('string'),
+                'interfaces': _column(_ref('Interface'), 1, 'unlimited'),
+                'qos': _column(_ref('QoS'), 0, 1),
+                'tag': _column('integer', 0, 1),
+                'external_ids': _STRING_MAP,
+            },
+        },
+        'Interface': {
+            'indexes': [['name']],
+            'columns': {
+                'name': _column('string'),
+                'type': _column('string'),
+                'mtu_request': _column('integer', 0, 1),
+                'ofport': _column('integer', 0, 1),
+                'options': _STRING_MAP,
+                'external_ids': _STRING_MAP,
+            },
+        },
+        'QoS': {
+            'isRoot': True,
+            'columns': {
+                'type': _column('string'),
+                'external_ids': _STRING_MAP,
+            },
+        },
+        'Controller': {
+            'columns': {'target': _column('string')},
+        },
+        'Manager': {
+            'columns': {'target': _column('string')},
+        },
+    },
+}
+
+
+class OvsdbError(Exception):
+    def __init__(self, error: str, details: str = '') -> None:
+        super().__init__(error)
+        self.error = error
+        self.details = details
+
+
+class Database:
+    """The rows of the database, as python values.
+
+    Atoms are strings, numbers, booleans or ``('uuid', str)`` tuples, sets are
+    sorted lists of atoms and maps are dicts. The scalar columns hold their
+    atom.
+    """
+
+    def __init__(self, schema_json: dict[str, Any]) -> None:
+        self.schema = ovs_schema.DbSchema.from_json(copy.deepcopy(schema_json))
+        self.tables: dict[str, dict[str, dict[str, Any]]] = {
+            name: {} for name in self.schema.tables}
+        self.lock = threading.Lock()
+        self.vswitchd = False
+        self.tables['Open_vSwitch'][str(uuid.uuid4())] = self._defaults(
+            'Open_vSwitch')
+
+    def _columns(self, table: str) -> dict[str, Any]:
+        try:
+            return dict(self.schema.tables[table].columns)
+        except KeyError:
+            raise OvsdbError('unknown table', table)
+
+    def _type(self, table: str, column: str) -> ovs_types.Type:
+        if column == '_uuid':
+            return ovs_types.Type(ovs_types.BaseType(ovs_types.UuidType))
+        try:
+            return self._columns(table)[column].type
+        except KeyError:
+            raise OvsdbError('unknown column', '%s.%s' % (table, column))
+
+    @staticmethod
+    def _is_scalar(type_: ovs_types.Type) -> bool:
+        return not type_.is_map() and type_.n_min == 1 and type_.n_max == 1
+
+    def _defaults(self, table: str) -> dict[str, Any]:
+        row: dict[str, Any] = {}
+        for name, column in self._columns(table).items():
+            type_ = column.type
+            if type_.is_map():
+                row[name] = {}
+            elif self._is_scalar(type_):
+                row[name] = type_.key.type.default_atom().value
+            else:
+                row[name] = []
+        return row
+
+    # JSON conversions
+
+    def _atom(self, base: ovs_types.BaseType, value: Any,
+              names: dict[str, str]) -> Any:
+        if base.type == ovs_types.UuidType:
+            if not isinstance(value, list) or len(value) != 2:
+                raise OvsdbError('syntax error', 'not a uuid: %r' % value)
+            if value[0] == 'named-uuid':
+                if value[1] not in names:
+                    raise OvsdbError('syntax error',
+                                     'unknown named-uuid %s' % value[1])
+                return ('uuid', names[value[1]])
+            return ('uuid', value[1])
+        if base.type == ovs_types.IntegerType and not isinstance(value, int):
+            raise OvsdbError('syntax error', 'not an integer: %r' % value)
+        if base.type == ovs_types.StringType and not isinstance(value, str):
+            raise OvsdbError('syntax error', 'not a string: %r' % value)
+        return value
+
+    def _set(self, base: ovs_types.BaseType, value: Any,
+             names: dict[str, str]) -> list[Any]:
+        items = value[1] if (isinstance(value, list) and value and
+                             value[0] == 'set') else [value]
+        return sorted({self._atom(base, item, names) for item in items},
+                      key=repr)
+
+    def _map(self, type_: ovs_types.Type, value: Any,
+             names: dict[str, str]) -> dict[Any, Any]:
+        if not isinstance(value, list) or value[:1] != ['map']:
+            raise OvsdbError('syntax error', 'not a map: %r' % value)
+        return {self._atom(type_.key, k, names):
+                self._atom(type_.value, v, names) for k, v in value[1]}
+
+    def from_json(self, table: str, column: str, value: Any,
+                  names: dict[str, str]) -> Any:
+        type_ = self._type(table, column)
+        if type_.is_map():
+            return self._map(type_, value, names)
+        if self._is_scalar(type_):
+            return self._atom(type_.key, value, names)
+        result = self._set(type_.key, value, names)
+        if not type_.n_min <= len(result) <= type_.n_max:
+            raise OvsdbError('constraint violation',
+                             '%s.%s has %d values' % (table, column,
+                                                      len(result)))
+        return result
+
+    @staticmethod
+    def _atom_to_json(atom: Any) -> Any:
+        return list(atom) if isinstance(atom, tuple) else atom
+
+    def to_json(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return ['map', [[self._atom_to_json(k), self._atom_to_json(v)]
+                            for k, v in value.items()]]
+        if isinstance(value, list):
+            if len(value) == 1:
+                return self._atom_to_json(value[0])
+            return ['set', [self._atom_to_json(v) for v in value]]
+        return self._atom_to_json(value)
+
+    # conditions
+
+    def _matches(self, table: str, row_uuid: str, row: dict[str, Any],
+                 where: list[Any], names: dict[str, str]) -> bool:
+        for column, function, value in where:
+            actual = (('uuid', row_uuid) if column == '_uuid' else
+                      row[column])
+            value = self.from_json(table, column, value, names) if (
+                column != '_uuid') else self._atom(
+                    ovs_types.BaseType(ovs_types.UuidType), value, names)
+            if not self._test(actual, function, value):
+                return False
+        return True
+
+    @staticmethod
+    def _test(actual: Any, function: str, value: Any) -> bool:
+        if isinstance(actual, dict):
+            includes = all(actual.get(k, object()) == v
+                           for k, v in value.items())
+            excludes = all(actual.get(k, object()) != v
+                           for k, v in value.items())
+        elif isinstance(actual, list):
+            includes = set(value) <= set(actual)
+            excludes = not set(value) & set(actual)
+        else:
+            includes = actual == value
+            excludes = actual != value
+        if function == '==':
+            return bool(actual == value)
+        if function == '!=':
+            return bool(actual != value)
+        if function == 'includes':
+            return includes
+        if function == 'excludes':
+            return excludes
+        if function in ('<', '<=', '>', '>='):
+            return bool({'<': actual < value, '<=': actual <= value,
+                         '>': actual > value, '>=': actual >= value}[function])
+        raise OvsdbError('syntax error', 'unknown function %s' % function)
+
+    def _rows(self, tables: dict[str, dict[str, dict[str, Any]]], op: Any,
+              names: dict[str, str]) -> list[tuple[str, dict[str, Any]]]:
+        table = op['table']
+        self._columns(table)
+        return [(row_uuid, row) for row_uuid, row in tables[table].items()
+                if self._matches(table, row_uuid, row, op['where'], names)]
+
+    # operations
+
+    def _insert(self, tables: Any, op: Any, names: dict[str, str]) -> Any:
+        table = op['table']
+        row_uuid = str(uuid.uuid4())
+        if 'uuid-name' in op:
+            names[op['uuid-name']] = row_uuid
+        row = self._defaults(table)
+        for column, value in op.get('row', {}).items():
+            row[column] = self.from_json(table, column, value, names)
+        tables[table][row_uuid] = row
+        return {'uuid': ['uuid', row_uuid]}
+
+    def _select(self, tables: Any, op: Any, names: dict[str, str]) -> Any:
+        columns = op.get('columns')
+        rows = []
+        for row_uuid, row in self._rows(tables, op, names):
+            values = dict(row, _uuid=('uuid', row_uuid),
+                          _version=('uuid', row_uuid))
+            rows.append({column: self.to_json(values[column])
+                         for column in columns or values})
+        return {'rows': rows}
+
+    def _update(self, tables: Any, op: Any, names: dict[str, str]) -> Any:
+        rows = self._rows(tables, op, names)
+        for _, row in rows:
+            for column, value in op['row'].items():
+                row[column] = self.from_json(op['table'], column, value,
+                                             names)
+        return {'count': len(rows)}
+
+    def _mutate(self, tables: Any, op: Any, names: dict[str, str]) -> Any:
+        table = op['table']
+        rows = self._rows(tables, op, names)
+        for _, row in rows:
+            for column, mutator, value in op['mutations']:
+                type_ = self._type(table, column)
+                current = row[column]
+                if mutator in ('+=', '-=', '*=', '/=', '%='):
+                    row[column] = {
+                        '+=': current + value, '-=': current - value,
+                        '*=': current * value, '/=': current // value,
+                        '%=': current % value}[mutator]
+                elif type_.is_map():
+                    if mutator == 'insert':
+                        for k, v in self._map(type_, value, names).items():
+                            current.setdefault(k, v)
+                    elif value[:1] == ['map']:
+                        for k, v in self._map(type_, value, names).items():
+                            if current.get(k, object()) == v:
+                                del current[k]
+                    else:
+                        for k in self._set(type_.key, value, names):
+                            current.pop(k, None)
+                else:
+                    atoms = set(self._set(type_.key, value, names))
+                    if mutator == 'insert':
+                        new = set(current) | atoms
+                    else:
+                        new = set(current) - atoms
+                    row[column] = sorted(new, key=repr)
+                    if not type_.n_min <= len(new) <= type_.n_max:
+                        raise OvsdbError('constraint violation',
+                                         '%s.%s' % (table, column))
+        return {'count': len(rows)}
+
+    def _delete(self, tables: Any, op: Any, names: dict[str, str]) -> Any:
+        rows = self._rows(tables, op, names)
+        for row_uuid, _ in rows:
+            del tables[op['table']][row_uuid]
+        return {'count': len(rows)}
+
+    def _wait(self, tables: Any, op: Any, names: dict[str, str]) -> Any:
+        table = op['table']
+        actual = sorted(
+            (repr({c: ('uuid', row_uuid) if c == '_uuid' else row[c]
+                   for c in op['columns']})
+             for row_uuid, row in self._rows(tables, op, names)))
+        expected = sorted(
+            repr({c: self.from_json(table, c, v, names)
+                  for c, v in row.items()}) for row in op['rows'])
+        if (actual == expected) != (op['until'] == '=='):
+            raise OvsdbError('timed out', 'wait condition not met')
+        return {}
+
+    def _check_references(self, tables: Any) -> None:
+        for table, table_schema in self.schema.tables.items():
+            for name, column in table_schema.columns.items():
+                ref_tables = [
+                    base.ref_table_name for base in (
+                        column.type.key, column.type.value)
+                    if base is not None and base.ref_table_name]
+                for ref_table in ref_tables:
+                    for row in tables[table].values():
+                        value = row[name]
+                        atoms = (list(value.keys()) + list(value.values())
+                                 if isinstance(value, dict) else
+                                 value if isinstance(value, list) else
+                                 [value])
+                        for atom in atoms:
+                            if (isinstance(atom, tuple) and
+                                    atom[1] not in tables[ref_table]):
+                                raise OvsdbError(
+                                    'referential integrity violation',
+                                    '%s.%s refers to a missing %s row' % (
+                                        table, name, ref_table))
+
+    def _check_indexes(self, tables: Any) -> None:
+        for table, table_schema in self.schema.tables.items():
+            for index in table_schema.indexes:
+                seen = set()
+                for row in tables[table].values():
+                    key = repr([row[column.name] for column in index])
+                    if key in seen:
+                        raise OvsdbError(
+                            'constraint violation',
+                            'multiple %s rows have the same %s' % (
+                                table, ', '.join(c.name for c in index)))
+                    seen.add(key)
+
+    def _collect_garbage(self, tables: Any) -> None:
+        reachable = set()
+        todo = [(table, row_uuid) for table, table_schema in
+                self.schema.tables.items() if table_schema.is_root
+                for row_uuid in tables[table]]
+        while todo:
+            table, row_uuid = todo.pop()
+            if (table, row_uuid) in reachable:
+                continue
+            reachable.add((table, row_uuid))
+            for name, column in self.schema.tables[table].columns.items():
+                ref_table = column.type.key.ref_table_name
+                if not ref_table:
+                    continue
+                value = tables[table][row_uuid][name]
+                for atom in value if isinstance(value, list) else [value]:
+                    todo.append((ref_table, atom[1]))
+        for table, rows in tables.items():
+            for row_uuid in list(rows):
+                if (table, row_uuid) not in reachable:
+                    del rows[row_uuid]
+
+    def transact(self, ops: list[Any]) -> list[Any]:
+        with self.lock:
+            tables = copy.deepcopy(self.tables)
+            names: dict[str, str] = {}
+            results: list[Any] = []
+            for op in ops:
+                try:
+                    results.append(getattr(self, '_' + op['op'])(
+                        tables, op, names))
+                except OvsdbError as e:
+                    results.append({'error': e.error, 'details': e.details})
+                    return results + [None] * (len(ops) - len(results))
+            try:
+                self._collect_garbage(tables)
+                self._check_references(tables)
+                self._check_indexes(tables)
+            except OvsdbError as e:
+                return results + [{'error': e.error, 'details': e.details}]
+            if self.vswitchd:
+                for row in tables['Open_vSwitch'].values():
+                    row['cur_cfg'] = row['next_cfg']
+            self.tables = tables
+            return results
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: _Server
+
+    def handle(self) -> None:
+        self.server.connections.append(self.request)
+        decoder = json.JSONDecoder()
+        buf = ''
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data.decode()
+            while buf.strip():
+                try:
+                    msg, end = decoder.raw_decode(buf.lstrip())
+                except ValueError:
+                    break
+                buf = buf.lstrip()[end:]
+                reply = self.server.fake.handle(msg)
+                if reply is None:
+                    continue
+                if self.server.fake.send_echo:
+                    self._send({'method': 'echo', 'params': [],
+                                'id': 'echo'})
+                self._send(reply)
+
+    def _send(self, msg: dict[str, Any]) -> None:
+        try:
+            self.request.sendall(json.dumps(msg).encode())
+        except OSError:
+            pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    fake: FakeOvsdbServer
+    connections: list[socket.socket]
+
+
+class FakeOvsdbServer(fixtures.Fixture):
+    """A fake OVSDB server listening on a unix socket.
+
+    :ivar connection: the OVSDB connection string of the server
+    :ivar db: the :class:`Database` served
+    :ivar requests: the methods of the requests received
+    :ivar send_echo: send an echo request before each reply, like the
+        inactivity probes of a real server
+    :ivar echo_replies: the number of replies to those echo requests
+    :ivar drop_after_write: the number of transactions changing the
+        database after which the connections are dropped, once the
+        transaction is committed but before it is replied to
+    """
+
+    def _setUp(self) -> None:
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'db.sock')
+        self.connection = 'unix:%s' % path
+        self.db = Database(SCHEMA)
+        self.requests: list[str] = []
+        self.send_echo = False
+        self.echo_replies = 0
+        self.drop_after_write = 0
+        self._server = _Server(path, _Handler)
+        self._server.fake = self
+        self._server.connections = []
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  kwargs={'poll_interval': 0.01},
+                                  daemon=True)
+        thread.start()
+        self.addCleanup(self._server.server_close)
+        self.addCleanup(self.drop_connections)
+        self.addCleanup(self._server.shutdown)
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._server.connections)
+
+    def drop_connections(self) -> None:
+        """Close the connections of the clients, as a restart would"""
+        for conn in self._server.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle(self, msg: dict[str, Any]) -> dict[str, Any] | None:
+        method = msg.get('method')
+        params: list[Any] = msg.get('params') or []
+        id_ = msg['id']
+        if method is None:
+            # the reply to an echo request
+            self.echo_replies += 1
+            return None
+        self.requests.append(method)
+        result: Any = None
+        error: Any = None
+        if method == 'echo':
+            result = params
+        elif method == 'list_dbs':
+            result = [SCHEMA['name']]
+        elif method == 'get_schema':
+            if params != [SCHEMA['name']]:
+                error = 'unknown database'
+            else:
+                result = SCHEMA
+        elif method == 'transact':
+            if params[0] != SCHEMA['name']:
+                error = 'unknown database'
+            else:
+                result = self.db.transact(params[1:])
+                if (self.drop_after_write and
+                        any(op['op'] not in ('select', 'wait')
+                            for op in params[1:])):
+                    self.drop_after_write -= 1
+                    self.drop_connections()
+                    return None
+        else:
+            error = 'unknown method'
+        return {'id': id_, 'result': result, 'error': error}
+
+    def rows(self, table: str) -> list[dict[str, Any]]:
+        """Return the rows of a table, with their ``_uuid``"""
+        with self.db.lock:
+            return [dict(row, _uuid=row_uuid) for row_uuid, row in
+                    self.db.tables[table].items()]
@@ -0,0 +1,227 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import threading
+from unittest import mock
+
+import fixtures
+from ovsdbapp.backend.ovs_idl import connection
+from ovsdbapp.backend.ovs_idl import idlutils
+import testtools
+
+from vif_plug_ovs.ovsdb import impl_idl
+
+
+def _schema_json(extra_columns=None, missing_columns=()):
+    tables = {}
+    for table, columns in impl_idl.REQUIRED_COLUMNS.items():
+        names = set(columns) | set((extra_columns or {}).get(table, ()))
+        tables[table] = {
+            'columns': {
+                name: {'type': 'string'}
+                for name in names - set(missing_columns)},
+        }
+    tables['Manager'] = {'columns': {'target': {'type': 'string'}}}
+    return {'name': 'Open_vSwitch', 'version': '8.4.0', 'tables': tables}
+
+
+class IdlFactoryTest(testtools.TestCase):
+
+    def _idl_factory(self, schema_json, monitor_conditions=False):
+        config = mock.Mock(connection='tcp:127.0.0.1:6640',
+                           monitor_conditions=monitor_conditions,
+                           qos_type='linux-htb',
+                           schema_cache_dir=None)
+        with mock.patch.object(idlutils, 'fetch_schema_json',
+                               return_value=schema_json) as mock_fetch:
+            ovs_idl = impl_idl.idl_factory(config)
+        mock_fetch.assert_called_once_with(
+            'tcp:127.0.0.1:6640', 'Open_vSwitch')
+        return ovs_idl
+
+    def test_idl_factory_registers_columns(self):
+        ovs_idl = self._idl_factory(_schema_json(
+            extra_columns={'Interface': ['statistics', 'status']}))
+
+        self.assertEqual(set(impl_idl.REQUIRED_TABLES), set(ovs_idl.tables))
+        for table, columns in impl_idl.REQUIRED_COLUMNS.items():
+            self.assertEqual(set(columns), set(ovs_idl.tables[table].columns))
+        # the rest of the schema is still known
+        self.assertIn('statistics', ovs_idl.schema_columns['Interface'])
+        self.assertIn('Manager', ovs_idl.schema_columns)
+
+        api = mock.Mock(idl=ovs_idl, tables=ovs_idl.tables)
+        self.assertIn(
+            'status',
+            impl_idl.NeutronOvsdbIdl._get_table_columns(api, 'Interface'))
+
+    def test_idl_factory_missing_column(self):
+        ovs_idl = self._idl_factory(
+            _schema_json(missing_columns=['mtu_request']))
+
+        self.assertNotIn('mtu_request', ovs_idl.tables['Interface'].columns)
+        api = mock.Mock(idl=ovs_idl, tables=ovs_idl.tables)
+        self.assertNotIn(
+            'mtu_request',
+            impl_idl.NeutronOvsdbIdl._get_table_columns(api, 'Interface'))
+
+    def test_idl_factory_monitor_conditions(self):
+        ovs_idl = self._idl_factory(_schema_json())
+
+        self.assertFalse(ovs_idl.cond_changed)
+        self.assertEqual(
+            [True], ovs_idl.tables['QoS'].condition_state.latest)
+
+        ovs_idl = self._idl_factory(_schema_json(), monitor_conditions=True)
+
+        self.assertTrue(ovs_idl.cond_changed)
+        self.assertEqual(
+            [['external_ids', 'includes', ['map', [['_type', 'linux-htb']]]]],
+            ovs_idl.tables['QoS'].condition_state.latest)
+        self.assertEqual(
+            [True], ovs_idl.tables['Port'].condition_state.latest)
+
+
+class ConnectionRegistryTest(testtools.TestCase):
+
+    def setUp(self):
+        super(ConnectionRegistryTest, self).setUp()
+        self.useFixture(fixtures.MockPatchObject(
+            impl_idl, '_CONNECTIONS', {}))
+        self.mock_idl_factory = self.useFixture(fixtures.MockPatchObject(
+            impl_idl, 'idl_factory')).mock
+        self.mock_connection = self.useFixture(fixtures.MockPatchObject(
+            connection, 'Connection',
+            side_effect=lambda idl, timeout: mock.MagicMock(
+                idl=idl, timeout=timeout))).mock
+
+    @staticmethod
+    def _config(conn='tcp:127.0.0.1:6640'):
+        return mock.Mock(connection=conn, timeout=10)
+
+    def test_api_factory_shares_connection(self):
+        config = self._config()
+        api1 = impl_idl.api_factory(config)
+        api2 = impl_idl.api_factory(self._config())
+
+        self.assertIs(api1.ovsdb_connection, api2.ovsdb_connection)
+        self.mock_idl_factory.assert_called_once_with(config, mock.ANY)
+        self.mock_connection.assert_called_once_with(
+            idl=self.mock_idl_factory.return_value, timeout=10)
+        api1.ovsdb_connection.start.assert_called_with()
+        # the connection is not stored on the class by ovsdbapp
+        self.assertIsNone(impl_idl.NeutronOvsdbIdl._ovsdb_connection)
+
+    def test_api_factory_per_ovsdb(self):
+        api1 = impl_idl.api_factory(self._config())
+        api2 = impl_idl.api_factory(self._config('tcp:192.0.2.1:6640'))
+
+        self.assertIsNot(api1.ovsdb_connection, api2.ovsdb_connection)
+        self.assertEqual(2, self.mock_idl_factory.call_count)
+
+    @mock.patch.object(threading, 'Timer')
+    @mock.patch.object(impl_idl, '_create_idl')
+    def test_schema_changed(self, mock_create_idl, mock_timer):
+        config = self._config()
+        api = impl_idl.api_factory(config)
+        conn = api.ovsdb_connection
+        on_schema_change = self.mock_idl_factory.call_args.args[1]
+
+        on_schema_change({'version': '8.5.0'})
+
+        mock_create_idl.assert_called_once_with(config, {'version': '8.5.0'})
+        new_conn = impl_idl.get_connection(config)
+        self.assertIsNot(conn, new_conn)
+        self.assertIs(mock_create_idl.return_value, new_conn.idl)
+        self.assertTrue(api.outdated)
+        new_api = impl_idl.api_factory(config)
+        self.assertIs(new_conn, new_api.ovsdb_connection)
+        self.assertFalse(new_api.outdated)
+        new_conn.start.assert_called_with()
+        # the old connection is left to the commands already sent to it
+        conn.idl.close.assert_not_called()
+        mock_timer.assert_called_once_with(10, conn.stop)
+        mock_timer.return_value.start.assert_called_once_with()
+
+    @mock.patch.object(threading, 'Timer')
+    @mock.patch.object(impl_idl, '_create_idl', side_effect=RuntimeError)
+    def test_schema_changed_error(self, mock_create_idl, mock_timer):
+        config = self._config()
+        api = impl_idl.api_factory(config)
+        on_schema_change = self.mock_idl_factory.call_args.args[1]
+
+        with mock.patch.object(impl_idl.LOG, 'exception') as mock_log:
+            on_schema_change({'version': '8.5.0'})
+
+        mock_log.assert_called_once_with(mock.ANY, config.connection)
+        self.assertIs(api.ovsdb_connection, impl_idl.get_connection(config))
+        self.assertFalse(api.outdated)
+        mock_timer.assert_not_called()
+
+    @mock.patch.object(impl_idl, '_create_idl')
+    def test_schema_changed_after_fork(self, mock_create_idl):
+        conn = impl_idl.get_connection(self._config())
+        on_schema_change = self.mock_idl_factory.call_args.args[1]
+        with mock.patch.object(os, 'getpid', return_value=os.getpid() + 1):
+            on_schema_change({'version': '8.5.0'})
+
+        mock_create_idl.assert_not_called()
+        self.assertIs(conn, impl_idl.get_connection(self._config()))
+
+    def test_get_connection_after_fork(self):
+        conn = impl_idl.get_connection(self._config())
+        with mock.patch.object(os, 'getpid', return_value=os.getpid() + 1):
+            child_conn = impl_idl.get_connection(self._config())
+            self.assertIs(
+                child_conn, impl_idl.get_connection(self._config()))
+
+        self.assertIsNot(conn, child_conn)
+
+    def test_outdated_after_fork(self):
+        api = impl_idl.api_factory(self._config())
+        with mock.patch.object(os, 'getpid', return_value=os.getpid() + 1):
+            self.assertTrue(api.outdated)
+
+
+class BridgeHasPortCommandTest(testtools.TestCase):
+
+    def setUp(self):
+        super(BridgeHasPortCommandTest, self).setUp()
+        self.port = mock.Mock(uuid='port-uuid')
+        self.bridge = mock.Mock(ports=[mock.Mock(uuid='other-uuid'),
+                                       mock.Mock(uuid='port-uuid')])
+        self.rows = {('Bridge', 'br0'): self.bridge,
+                     ('Port', 'tap0'): self.port}
+        self.api = mock.Mock()
+        self.api.lookup.side_effect = (
+            lambda table, record, default: self.rows.get(
+                (table, record), default))
+
+    def _run(self, bridge, port):
+        cmd = impl_idl.BridgeHasPortCommand(self.api, bridge, port)
+        cmd.run_idl(None)
+        return cmd.result
+
+    def test_bridge_has_port(self):
+        self.assertTrue(self._run('br0', 'tap0'))
+        self.api.lookup.assert_has_calls([
+            mock.call('Bridge', 'br0', default=None),
+            mock.call('Port', 'tap0', default=None)])
+
+    def test_bridge_has_port_other_bridge(self):
+        self.bridge.ports = [mock.Mock(uuid='other-uuid')]
+        self.assertFalse(self._run('br0', 'tap0'))
+
+    def test_bridge_has_port_missing(self):
+        self.assertFalse(self._run('br1', 'tap0'))
+        self.assertFalse(self._run('br0', 'tap1'))
@@ -0,0 +1,409 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+from unittest import mock
+import uuid
+
+import fixtures
+from ovsdbapp.backend.ovs_idl import idlutils
+from ovsdbapp import exceptions
+import testtools
+
+from vif_plug_ovs.ovsdb import impl_jsonrpc
+from vif_plug_ovs.ovsdb import ovsdb_lib
+from vif_plug_ovs.ovsdb import schema_cache
+from vif_plug_ovs.tests.unit.ovsdb import fake_server
+
+
+class OvsdbJsonRpcTest(testtools.TestCase):
+
+    def setUp(self):
+        super(OvsdbJsonRpcTest, self).setUp()
+        self.server = self.useFixture(fake_server.FakeOvsdbServer())
+        self.server.db.vswitchd = True
+        self.useFixture(fixtures.MockPatchObject(
+            impl_jsonrpc, '_CONNECTIONS', {}))
+        self.context = mock.Mock(timeout=5, connection=self.server.connection,
+                                 schema_cache_dir=None)
+        self.api = impl_jsonrpc.api_factory(self.context)
+        self.addCleanup(self.api.connection.close)
+
+    def _row(self, table, name):
+        return [row for row in self.server.rows(table)
+                if row['name'] == name][0]
+
+    def test_bridges(self):
+        self.api.add_br('br0', datapath_type='netdev').execute(
+            check_error=True)
+        self.api.add_br('br1').execute(check_error=True)
+        self.api.add_br('br1', datapath_type='system').execute(
+            check_error=True)
+
+        self.assertEqual(['br0', 'br1'], self.api.list_br().execute())
+        self.assertTrue(self.api.br_exists('br0').execute())
+        self.assertEqual('netdev', self._row('Bridge', 'br0')['datapath_type'])
+        self.assertEqual('system', self._row('Bridge', 'br1')['datapath_type'])
+        # the bridge port and interface
+        self.assertEqual('internal', self._row('Interface', 'br0')['type'])
+        self.assertEqual([], self.api.list_ports('br0').execute())
+
+        self.api.del_br('br0').execute(check_error=True)
+        self.assertFalse(self.api.br_exists('br0').execute())
+        self.assertEqual(['br1'],
+                         [row['name'] for row in self.server.rows('Port')])
+
+    def test_add_br_exists(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.assertRaises(impl_jsonrpc.CommandError,
+                          self.api.add_br('br0', may_exist=False).execute,
+                          check_error=True)
+
+    def test_ports(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.api.add_port('br0', 'tap1').execute(check_error=True)
+        self.api.add_port('br0', 'tap0').execute(check_error=True)
+        self.api.add_port('br0', 'tap0').execute(check_error=True)
+
+        self.assertEqual(['tap0', 'tap1'],
+                         self.api.list_ports('br0').execute())
+        self.assertEqual(['tap0', 'tap1'],
+                         self.api.list_ifaces('br0').execute())
+        self.assertEqual('br0', self.api.port_to_br('tap0').execute())
+        self.assertEqual('br0', self.api.iface_to_br('tap0').execute())
+
+        self.assertTrue(self.api.bridge_has_port('br0', 'tap0').execute())
+        self.assertFalse(self.api.bridge_has_port('br1', 'tap0').execute())
+        self.assertFalse(self.api.bridge_has_port('br0', 'tap2').execute())
+
+        self.api.del_port('tap0', bridge='br0').execute(check_error=True)
+        self.api.del_port('tap0').execute(check_error=True)
+        self.assertEqual(['tap1'], self.api.list_ports('br0').execute())
+        self.assertEqual(['br0', 'tap1'], sorted(
+            row['name'] for row in self.server.rows('Interface')))
+        self.assertRaises(idlutils.RowNotFound,
+                          self.api.del_port('tap0', if_exists=False).execute,
+                          check_error=True)
+
+    def test_list_ports_selects_bridge_ports(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.api.add_br('br1').execute(check_error=True)
+        self.api.add_port('br0', 'tap0').execute(check_error=True)
+        self.api.add_port('br1', 'tap1').execute(check_error=True)
+
+        with mock.patch.object(
+                impl_jsonrpc.Connection, 'transact', autospec=True,
+                side_effect=impl_jsonrpc.Connection.transact) as transact:
+            self.assertEqual(['tap0'], self.api.list_ifaces('br0').execute())
+        # the Port and Interface rows of the bridge are selected by UUID,
+        # with one request per table
+        requests = [call.args[1] for call in transact.call_args_list
+                    if call.args[1][0]['table'] in ('Port', 'Interface')]
+        # the internal port of the bridge is not listed
+        self.assertEqual([2, 1], [len(ops) for ops in requests])
+        for ops in requests:
+            for op in ops:
+                self.assertEqual('_uuid', op['where'][0][0])
+
+    def test_add_port_other_bridge(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.api.add_br('br1').execute(check_error=True)
+        self.api.add_port('br0', 'tap0').execute(check_error=True)
+        self.assertRaises(impl_jsonrpc.CommandError,
+                          self.api.add_port('br1', 'tap0').execute,
+                          check_error=True)
+
+    def test_db_commands(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.api.db_set('Bridge', 'br0',
+                        ('external_ids', {'a': '1', 'b': '2'})).execute(
+            check_error=True)
+        # only the given keys of maps are set
+        self.api.db_set('Bridge', 'br0', ('external_ids', {'b': '3'}),
+                        ('fail_mode', 'secure')).execute(check_error=True)
+
+        self.assertEqual({'a': '1', 'b': '3'}, self.api.db_get(
+            'Bridge', 'br0', 'external_ids').execute(check_error=True))
+        self.assertEqual('3', self.api.br_get_external_id(
+            'br0', 'b').execute(check_error=True))
+        rows = self.api.db_list('Bridge', ['br0'],
+                                columns=['name', 'fail_mode']).execute(
+            check_error=True)
+        self.assertEqual([{'name': 'br0', 'fail_mode': 'secure'}], rows)
+
+        self.api.db_add('Bridge', 'br0', 'external_ids', {'c': '4'}).execute(
+            check_error=True)
+        rows = self.api.db_find(
+            'Bridge', ('external_ids', '=', {'c': '4'}),
+            columns=['name']).execute(check_error=True)
+        self.assertEqual([{'name': 'br0'}], rows)
+        self.assertEqual([], self.api.db_find(
+            'Bridge', ('external_ids', '=', {'c': '5'})).execute(
+            check_error=True))
+
+        self.api.db_clear('Bridge', 'br0', 'external_ids').execute(
+            check_error=True)
+        self.assertEqual({}, self.api.db_get(
+            'Bridge', 'br0', 'external_ids').execute(check_error=True))
+
+    def test_db_create(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.api.add_port('br0', 'tap0').execute(check_error=True)
+        with self.api.transaction(check_error=True) as txn:
+            qos = txn.add(self.api.db_create(
+                'QoS', type='linux-noop', external_ids={'id': 'tap0'}))
+            txn.add(self.api.db_set('Port', 'tap0', ('qos', qos)))
+
+        self.assertIsInstance(qos.result, uuid.UUID)
+        self.assertEqual(qos.result, self.api.db_get(
+            'Port', 'tap0', 'qos').execute(check_error=True))
+        rows = self.api.db_find(
+            'QoS', ('external_ids', '=', {'id': 'tap0'}),
+            colmuns=['_uuid']).execute(check_error=True)
+        self.assertEqual([qos.result], [row['_uuid'] for row in rows or []])
+
+        with self.api.transaction(check_error=True) as txn:
+            txn.add(self.api.db_clear('Port', 'tap0', 'qos'))
+            txn.add(self.api.db_destroy('QoS', str(qos.result)))
+        self.assertEqual([], self.server.rows('QoS'))
+
+    def test_transaction_new_rows(self):
+        # the commands of a transaction see the rows it inserts
+        with self.api.transaction(check_error=True) as txn:
+            txn.add(self.api.add_br('br0'))
+            txn.add(self.api.add_port('br0', 'tap0'))
+            txn.add(self.api.db_set('Interface', 'tap0',
+                                    ('mtu_request', 9000)))
+        self.assertEqual([9000], self._row('Interface', 'tap0')['mtu_request'])
+        self.assertEqual(['tap0'], self.api.list_ports('br0').execute())
+
+    def test_transaction_atomic(self):
+        self.api.add_br('br0').execute(check_error=True)
+        txn = self.api.create_transaction(check_error=True)
+        txn.add(self.api.add_port('br0', 'tap0'))
+        txn.add(self.api.db_set('Port', 'tap0', ('qos', uuid.uuid4())))
+        self.assertRaises(impl_jsonrpc.CommandError, txn.commit)
+        self.assertEqual([], self.api.list_ports('br0').execute())
+
+    def test_index_constraint(self):
+        self.api.add_br('br0').execute(check_error=True)
+        txn = self.api.create_transaction(check_error=True)
+        txn.add(self.api.db_set('Port', 'br0', ('name', 'br1')))
+        txn.add(self.api.add_br('br1'))
+        self.assertRaises(impl_jsonrpc.CommandError, txn.commit)
+        self.assertEqual(['br0'], self.api.list_br().execute())
+
+    def test_concurrent_add_br(self):
+        barrier = threading.Barrier(2, timeout=5)
+        run = impl_jsonrpc.AddBridgeCommand.run
+        calls = []
+
+        def run_concurrently(cmd, txn):
+            run(cmd, txn)
+            calls.append(cmd)
+            if len(calls) <= 2:
+                # both commands have found no bridge before either commits
+                barrier.wait()
+
+        self.useFixture(fixtures.MockPatchObject(
+            impl_jsonrpc.AddBridgeCommand, 'run', run_concurrently))
+        errors = []
+
+        def add_br():
+            try:
+                self.api.add_br('br0', may_exist=True).execute(
+                    check_error=True)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add_br) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        # the second transaction saw the bridge changed and ran again
+        self.assertEqual(3, len(calls))
+        self.assertEqual(1, len(self.server.rows('Bridge')))
+        self.assertEqual(1, len(self.server.rows('Port')))
+        self.assertEqual(['br0'], self.api.list_br().execute())
+
+    def test_check_error(self):
+        self.assertIsNone(self.api.port_to_br('tap0').execute())
+        self.assertRaises(idlutils.RowNotFound,
+                          self.api.port_to_br('tap0').execute,
+                          check_error=True)
+
+    def test_managers_and_controllers(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.api.add_manager('ptcp:6640').execute(check_error=True)
+        self.api.set_controller('br0', ['tcp:127.0.0.1:6653']).execute(
+            check_error=True)
+        self.api.set_fail_mode('br0', 'standalone').execute(check_error=True)
+
+        self.assertEqual(['ptcp:6640'], self.api.get_manager().execute())
+        self.assertEqual(['tcp:127.0.0.1:6653'],
+                         self.api.get_controller('br0').execute())
+
+        self.api.remove_manager('ptcp:6640').execute(check_error=True)
+        self.api.del_controller('br0').execute(check_error=True)
+        self.assertEqual([], self.api.get_manager().execute())
+        self.assertEqual([], self.server.rows('Controller'))
+
+    def test_schema(self):
+        self.assertTrue(self.api.has_table_column('Interface', 'mtu_request'))
+        self.assertFalse(self.api.has_table_column('Interface', 'foo'))
+        self.assertEqual('8.3.0', self.api.get_schema_version())
+
+    @mock.patch.object(schema_cache, 'get_schema_json')
+    def test_schema_changed(self, mock_get_schema_json):
+        schema_json = dict(fake_server.SCHEMA, version='8.2.0')
+        mock_get_schema_json.return_value = schema_json
+        self.assertEqual('8.2.0', self.api.get_schema_version())
+        mock_get_schema_json.assert_called_once_with(
+            self.server.connection, 'Open_vSwitch', None, mock.ANY)
+
+        # the cached schema was outdated
+        on_change = mock_get_schema_json.call_args.args[3]
+        on_change(fake_server.SCHEMA)
+        self.assertEqual('8.3.0', self.api.get_schema_version())
+
+    def test_persistent_connection(self):
+        self.api.add_br('br0').execute(check_error=True)
+        connection_count = self.server.connection_count
+        for name in ('br1', 'br2'):
+            self.api.add_br(name).execute(check_error=True)
+        self.assertEqual(['br0', 'br1', 'br2'], self.api.list_br().execute())
+        self.assertEqual(connection_count, self.server.connection_count)
+
+    def test_reconnect(self):
+        self.api.add_br('br0').execute(check_error=True)
+        connection_count = self.server.connection_count
+        self.server.drop_connections()
+        self.assertEqual(['br0'], self.api.list_br().execute(
+            check_error=True))
+        self.assertEqual(connection_count + 1, self.server.connection_count)
+
+    def test_connection_lost_on_write(self):
+        self.api.list_br().execute(check_error=True)
+        self.server.drop_after_write = 1
+        self.api.add_br('br0').execute(check_error=True)
+        # the transaction is not sent again, the commands are run again
+        # and find the bridge added before the connection was lost
+        self.assertEqual(1, len(self.server.rows('Bridge')))
+        self.assertEqual(['br0'], self.api.list_br().execute())
+
+    def test_connection_lost_on_create(self):
+        self.api.list_br().execute(check_error=True)
+        self.server.drop_after_write = 1
+        # the row would be inserted again if the commands were run again
+        self.assertRaises(impl_jsonrpc.ConnectionLost,
+                          self.api.db_create('QoS', type='linux-noop').execute,
+                          check_error=True)
+        self.assertEqual(1, len(self.server.rows('QoS')))
+
+    def test_connection_lost_twice(self):
+        self.api.add_br('br0').execute(check_error=True)
+        self.server.drop_after_write = 2
+        self.assertRaises(
+            impl_jsonrpc.ConnectionLost,
+            self.api.db_set('Bridge', 'br0',
+                            ('external_ids', {'a': 'b'})).execute,
+            check_error=True)
+
+    def test_echo(self):
+        self.server.send_echo = True
+        self.assertEqual([], self.api.list_br().execute(check_error=True))
+        self.assertEqual([], self.api.list_br().execute(check_error=True))
+        # the echo replies are sent before the replies are read
+        self.assertGreaterEqual(self.server.echo_replies, 1)
+
+    def test_connection_unavailable(self):
+        self.context.connection = 'unix:/nonexistent/db.sock'
+        self.assertRaises(exceptions.OvsdbConnectionUnavailable,
+                          self.api.list_br().execute, check_error=True)
+
+    def test_vswitchd_timeout(self):
+        self.server.db.vswitchd = False
+        self.assertRaises(exceptions.TimeoutException,
+                          self.api.add_br('br0').execute, check_error=True)
+        # the change itself is made
+        self.assertEqual(['br0'], self.api.list_br().execute())
+
+    @mock.patch.object(impl_jsonrpc.Transaction, '_wait_for_cfg',
+                       autospec=True)
+    def test_vswitchd_wait_spare_connection(self, mock_wait_for_cfg):
+        self.api.add_br('br0').execute(check_error=True)
+        conn = mock_wait_for_cfg.call_args.args[1]
+        # the wait does not hold up the requests of other threads
+        self.assertIsNot(self.api.connection, conn)
+
+        connection = self.api.connection
+        with connection.spare() as spare:
+            self.assertIs(conn, spare)
+            with connection.spare() as other:
+                self.assertIsNot(spare, other)
+
+    def test_read_only(self):
+        self.server.db.vswitchd = False
+        self.api.list_br().execute(check_error=True)
+        row = self.server.rows('Open_vSwitch')[0]
+        self.assertEqual(0, row['next_cfg'])
+
+
+class BaseOVSJsonRpcTest(testtools.TestCase):
+
+    def setUp(self):
+        super(BaseOVSJsonRpcTest, self).setUp()
+        self.server = self.useFixture(fake_server.FakeOvsdbServer())
+        self.server.db.vswitchd = True
+        self.useFixture(fixtures.MockPatchObject(
+            impl_jsonrpc, '_CONNECTIONS', {}))
+        config = mock.Mock(ovs_vsctl_timeout=5,
+                           ovsdb_connection=self.server.connection,
+                           ovsdb_interface='jsonrpc',
+                           ovsdb_monitor_conditions=False,
+                           default_qos_type='linux-noop',
+                           ovsdb_schema_cache_dir=None)
+        self.br = ovsdb_lib.BaseOVS(config)
+        self.addCleanup(self.br.ovsdb.connection.close)
+        self.useFixture(fixtures.MockPatch(
+            'vif_plug_ovs.linux_net.delete_net_dev'))
+
+    def test_plug_unplug(self):
+        self.br.ensure_ovs_bridge('br-int', 'system')
+        self.br.create_ovs_vif_port(
+            'br-int', 'tap0', 'iface-id', 'ca:fe:ca:fe:ca:fe', 'vm-uuid',
+            mtu=1450, interface_type='dpdkvhostuserclient',
+            vhost_server_path='/var/run/vhu0', tag=10,
+            qos_type='linux-noop')
+
+        self.assertTrue(self.br.port_exists('tap0', 'br-int'))
+        port = [row for row in self.server.rows('Port')
+                if row['name'] == 'tap0'][0]
+        self.assertEqual([10], port['tag'])
+        iface = [row for row in self.server.rows('Interface')
+                 if row['name'] == 'tap0'][0]
+        self.assertEqual('dpdkvhostuserclient', iface['type'])
+        self.assertEqual({'vhost-server-path': '/var/run/vhu0'},
+                         iface['options'])
+        self.assertEqual([1450], iface['mtu_request'])
+        self.assertEqual('iface-id', iface['external_ids']['iface-id'])
+        qos = self.server.rows('QoS')
+        self.assertEqual([('uuid', qos[0]['_uuid'])], port['qos'])
+        self.assertEqual(1, len(self.br.get_qos('tap0', 'linux-noop')))
+
+        self.br.delete_ovs_vif_port('br-int', 'tap0',
+                                    qos_type='linux-noop')
+        self.assertFalse(self.br.port_exists('tap0', 'br-int'))
+        self.assertEqual([], self.server.rows('QoS'))
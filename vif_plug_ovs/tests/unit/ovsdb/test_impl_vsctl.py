@@ -0,0 +1,173 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+import uuid
+
+import fixtures
+import testtools
+
+from vif_plug_ovs.ovsdb import impl_vsctl
+
+OPTS = ['ovs-vsctl', '--timeout=120', '--oneline', '--format=json']
+QOS_UUID = '3c5e8a2f-7b1d-4e96-a0c4-9f2d6b8e1a73'
+
+
+class OvsdbVsctlTest(testtools.TestCase):
+
+    def setUp(self):
+        super(OvsdbVsctlTest, self).setUp()
+        self.context = mock.Mock(timeout=120, connection=None)
+        self.api = impl_vsctl.api_factory(self.context)
+        self.mock_run_vsctl = self.useFixture(fixtures.MockPatchObject(
+            impl_vsctl, '_run_vsctl', return_value='')).mock
+
+    def test_execute(self):
+        self.assertIsNone(self.api.add_br('br0').execute())
+        self.assertIsNone(self.api.del_port('tap0').execute())
+        self.mock_run_vsctl.assert_has_calls([
+            mock.call(OPTS + ['--', '--may-exist', 'add-br', 'br0']),
+            mock.call(OPTS + ['--', '--if-exists', 'del-port', 'tap0']),
+        ])
+
+    def test_bridge_has_port(self):
+        self.mock_run_vsctl.return_value = r'tap0\ntap1'
+        self.assertTrue(self.api.bridge_has_port('br0', 'tap1').execute())
+        self.assertFalse(self.api.bridge_has_port('br0', 'tap2').execute())
+        self.mock_run_vsctl.assert_called_with(
+            OPTS + ['--', 'list-ports', 'br0'])
+
+    def test_bridge_has_port_no_bridge(self):
+        self.mock_run_vsctl.return_value = None
+        self.assertFalse(self.api.bridge_has_port('br0', 'tap0').execute())
+
+    def test_deferred(self):
+        with self.api.deferred():
+            self.assertIsNone(self.api.add_br(
+                'br0', datapath_type='netdev').execute())
+            self.assertIsNone(self.api.del_port('tap0').execute())
+            self.mock_run_vsctl.assert_not_called()
+
+        self.mock_run_vsctl.assert_called_once_with(OPTS + [
+            '--', '--may-exist', 'add-br', 'br0',
+            '--', 'set', 'Bridge', 'br0', 'datapath_type=netdev',
+            '--', '--if-exists', 'del-port', 'tap0'])
+
+    def test_immediate(self):
+        with self.api.deferred():
+            self.api.del_port('tap0').execute()
+            with self.api.immediate():
+                # the deferred commands are run first
+                self.api.add_br('br0').execute()
+                self.assertEqual(2, self.mock_run_vsctl.call_count)
+            self.api.del_port('tap1').execute()
+            self.assertEqual(2, self.mock_run_vsctl.call_count)
+
+        self.mock_run_vsctl.assert_has_calls([
+            mock.call(OPTS + ['--', '--if-exists', 'del-port', 'tap0']),
+            mock.call(OPTS + ['--', '--may-exist', 'add-br', 'br0']),
+            mock.call(OPTS + ['--', '--if-exists', 'del-port', 'tap1']),
+        ])
+
+    def test_deferred_read(self):
+        # add-port prints nothing
+        self.mock_run_vsctl.return_value = '\nbr0'
+        with self.api.deferred():
+            self.api.add_port('br0', 'tap0').execute()
+            # the deferred writes are run with the read
+            self.assertEqual('br0', self.api.port_to_br('tap0').execute())
+            self.mock_run_vsctl.assert_called_once_with(OPTS + [
+                '--', '--may-exist', 'add-port', 'br0', 'tap0',
+                '--', 'port-to-br', 'tap0'])
+        self.mock_run_vsctl.assert_called_once()
+
+    def test_deferred_read_error(self):
+        self.mock_run_vsctl.side_effect = [RuntimeError('boom'), '', 'br0']
+        with self.api.deferred():
+            self.api.add_port('br0', 'tap0').execute()
+            # the read failed, so the deferred writes are run on their own
+            # and the read is run again
+            self.assertEqual('br0', self.api.port_to_br('tap0').execute())
+            self.assertEqual(3, self.mock_run_vsctl.call_count)
+        self.assertEqual(3, self.mock_run_vsctl.call_count)
+        self.mock_run_vsctl.assert_has_calls([
+            mock.call(OPTS + ['--', '--may-exist', 'add-port', 'br0',
+                              'tap0']),
+            mock.call(OPTS + ['--', 'port-to-br', 'tap0']),
+        ])
+
+    def test_after_deferred(self):
+        callback = mock.Mock(side_effect=lambda: self.assertEqual(
+            1, self.mock_run_vsctl.call_count))
+        self.assertFalse(self.api.after_deferred(callback))
+        with self.api.deferred():
+            self.assertTrue(self.api.after_deferred(callback))
+            self.api.del_port('tap0').execute()
+            callback.assert_not_called()
+        # the callback is run once the deferred writes are made
+        callback.assert_called_once_with()
+
+    def test_deferred_transaction(self):
+        # add-br and set print nothing
+        self.mock_run_vsctl.return_value = '\n\n%s' % QOS_UUID
+        with self.api.deferred():
+            self.api.add_br('br0', datapath_type='system').execute()
+            qos = self.api.db_create('QoS', type='linux-noop')
+            self.assertIsNone(qos.execute())
+            with self.api.transaction() as txn:
+                txn.add(self.api.db_set('Port', 'tap0', ('qos', qos)))
+            self.mock_run_vsctl.assert_called_once_with(OPTS + [
+                '--', '--may-exist', 'add-br', 'br0',
+                '--', 'set', 'Bridge', 'br0', 'datapath_type=system',
+                '--', '--id=%s' % qos.record_id, 'create', 'QoS',
+                'type=linux-noop',
+                '--', 'set', 'Port', 'tap0', 'qos=%s' % qos.record_id])
+        self.mock_run_vsctl.assert_called_once()
+        # the results are given back to the deferred commands
+        self.assertEqual(uuid.UUID(QOS_UUID), qos.result)
+
+    def test_deferred_error(self):
+        def _plug():
+            with self.api.deferred():
+                self.api.del_br('br0').execute()
+                raise RuntimeError('boom')
+
+        self.assertRaises(RuntimeError, _plug)
+        self.mock_run_vsctl.assert_called_once_with(
+            OPTS + ['--', '--if-exists', 'del-br', 'br0'])
+
+    def test_deferred_nested(self):
+        with self.api.deferred():
+            self.api.del_br('br0').execute()
+            with self.api.deferred():
+                self.api.del_br('br1').execute()
+            self.mock_run_vsctl.assert_not_called()
+        self.mock_run_vsctl.assert_called_once()
+
+    def test_deferred_other_context(self):
+        other = impl_vsctl.api_factory(
+            mock.Mock(timeout=120, connection=None))
+        with self.api.deferred():
+            self.api.del_br('br0').execute()
+            other.del_br('br1').execute()
+            self.mock_run_vsctl.assert_called_once_with(
+                OPTS + ['--', '--if-exists', 'del-br', 'br1'])
+
+    def test_commit_results(self):
+        self.mock_run_vsctl.return_value = (
+            '\n\n{"data":[[["uuid","%s"]]],"headings":["_uuid"]}' % QOS_UUID)
+        with self.api.transaction() as txn:
+            txn.add(self.api.add_br('br0', datapath_type='system'))
+            find = txn.add(self.api.db_find(
+                'QoS', ('external_ids', '=', {'_type': 'linux-noop'}),
+                columns=['_uuid']))
+        self.assertEqual([{'_uuid': uuid.UUID(QOS_UUID)}], find.result)
@@ -38,6 +38,14 @@ class BaseOVSTest(testtools.TestCase):
                           test_vif_plug_ovs_group)
         CONF.register_opt(cfg.StrOpt('ovsdb_connection', default=None),
                           test_vif_plug_ovs_group)
+        CONF.register_opt(cfg.BoolOpt('ovsdb_monitor_conditions',
+                                      default=False),
+                          test_vif_plug_ovs_group)
+        CONF.register_opt(cfg.StrOpt('default_qos_type',
+                                     default='linux-noop'),
+                          test_vif_plug_ovs_group)
+        CONF.register_opt(cfg.StrOpt('ovsdb_schema_cache_dir', default=None),
+                          test_vif_plug_ovs_group)
         self.br = ovsdb_lib.BaseOVS(cfg.CONF.test_vif_plug_ovs)
         self.mock_db_set = mock.patch.object(self.br.ovsdb, 'db_set').start()
         self.mock_del_port = mock.patch.object(self.br.ovsdb,
@@ -176,6 +184,31 @@ class BaseOVSTest(testtools.TestCase):
                     ]
                 )
 
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'get_qos',
+                       return_value=[{'_uuid': 'stale-qos'}])
+    def test_create_ovs_vif_port_with_qos(self, mock_get_qos):
+        with mock.patch.object(self.br.ovsdb, 'db_create') as mock_create, \
+                mock.patch.object(self.br.ovsdb,
+                                  'db_destroy') as mock_destroy:
+            txn = self.mock_transaction.return_value.__enter__.return_value
+            txn.add.side_effect = lambda cmd: cmd
+            self.br.create_ovs_vif_port(
+                'bridge', 'device', 'iface_id', 'ca:fe:ca:fe:ca:fe',
+                'instance_id', qos_type='linux-noop')
+
+        mock_get_qos.assert_called_once_with('device', 'linux-noop')
+        # the stale record is destroyed and the new one is created and
+        # referenced by the port in the port transaction
+        self.mock_transaction.assert_called_once_with()
+        mock_destroy.assert_called_once_with('QoS', 'stale-qos')
+        mock_destroy.return_value.execute.assert_not_called()
+        mock_create.assert_called_once_with(
+            'QoS', type='linux-noop',
+            external_ids={'id': mock.ANY, '_type': 'linux-noop'})
+        mock_create.return_value.execute.assert_not_called()
+        self.mock_db_set.assert_any_call(
+            'Port', 'device', ('qos', mock_create.return_value))
+
     def test_update_ovs_vif_port(self):
         with mock.patch.object(self.br, 'update_device_mtu') as \
                 mock_update_device_mtu:
@@ -200,6 +233,25 @@ class BaseOVSTest(testtools.TestCase):
             [mock.call('device', bridge='bridge', if_exists=True)])
         mock_delete_net_dev.assert_not_called()
 
+    @mock.patch.object(linux_net, 'delete_net_dev')
+    def test_delete_ovs_vif_port_deferred(self, mock_delete_net_dev):
+        with self.br.deferred():
+            self.br.delete_ovs_vif_port('bridge', 'device')
+            self.mock_del_port.return_value.execute.assert_called_once_with()
+            # the netdev is only deleted once the deferred port deletion
+            # has been made
+            mock_delete_net_dev.assert_not_called()
+        self.mock_transaction.assert_not_called()
+        mock_delete_net_dev.assert_called_once_with('device')
+
+    def test_deferred_native(self):
+        self.br.interface = 'native'
+        with mock.patch.object(ovsdb_lib.BaseOVS, 'ovsdb',
+                               new_callable=mock.PropertyMock) as mock_ovsdb:
+            with self.br.deferred():
+                pass
+            mock_ovsdb.assert_not_called()
+
     def test_ensure_ovs_bridge(self):
         self.br.ensure_ovs_bridge('bridge', constants.OVS_DATAPATH_SYSTEM)
         self.mock_add_br('bridge', may_exist=True,
@@ -228,3 +280,125 @@ class BaseOVSTest(testtools.TestCase):
                               self.br._ovs_supports_mtu_requests)
             mock_db_list.assert_called_once_with('Interface',
                                                  columns=['mtu_request'])
+
+    def test_port_exists(self):
+        with mock.patch.object(self.br.ovsdb,
+                               'bridge_has_port') as mock_has_port:
+            mock_has_port.return_value.execute.return_value = True
+            self.assertTrue(self.br.port_exists('device', 'bridge'))
+            mock_has_port.assert_called_once_with('bridge', 'device')
+            mock_has_port.return_value.execute.assert_called_once_with(
+                log_errors=False)
+
+    def test_port_exists_no_port(self):
+        with mock.patch.object(self.br.ovsdb,
+                               'bridge_has_port') as mock_has_port:
+            mock_has_port.return_value.execute.return_value = None
+            self.assertFalse(self.br.port_exists('device', 'bridge'))
+
+    def test_has_capability_cached(self):
+        with mock.patch.object(self.br.ovsdb, 'db_list') as mock_db_list:
+            self.assertTrue(self.br._ovs_supports_mtu_requests())
+            self.assertTrue(self.br._ovs_supports_mtu_requests())
+            mock_db_list.assert_called_once_with('Interface',
+                                                 columns=['mtu_request'])
+
+    def test_has_capability_not_in_registry(self):
+        with mock.patch.object(self.br.ovsdb, 'has_table_column',
+                               return_value=False) as mock_has_column:
+            self.assertFalse(self.br.has_capability('Port', 'foo'))
+            self.assertFalse(self.br.has_capability('Port', 'foo'))
+            mock_has_column.assert_has_calls([
+                mock.call('Interface', 'mtu_request'),
+                mock.call('Port', 'foo')])
+            self.assertEqual(2, mock_has_column.call_count)
+
+    def test_has_capability_schema_version_change(self):
+        with mock.patch.object(self.br.ovsdb, 'has_table_column',
+                               return_value=True) as mock_has_column, \
+                mock.patch.object(self.br.ovsdb, 'get_schema_version',
+                                  return_value='8.3.0') as mock_version:
+            self.assertTrue(self.br._ovs_supports_mtu_requests())
+            mock_version.return_value = '8.4.0'
+            mock_has_column.return_value = False
+            self.assertFalse(self.br._ovs_supports_mtu_requests())
+            self.assertEqual(2, mock_has_column.call_count)
+
+    def test_has_capability_reconnect(self):
+        with mock.patch.object(self.br.ovsdb, 'has_table_column',
+                               return_value=True) as mock_has_column:
+            self.assertTrue(self.br._ovs_supports_mtu_requests())
+            new_ovsdb = mock.Mock(outdated=False)
+            new_ovsdb.get_schema_version.return_value = None
+            new_ovsdb.has_table_column.return_value = False
+            with mock.patch.object(self.br, '_ovsdb', new_ovsdb):
+                self.assertFalse(self.br._ovs_supports_mtu_requests())
+            mock_has_column.assert_called_once_with(
+                'Interface', 'mtu_request')
+            new_ovsdb.has_table_column.assert_called_once_with(
+                'Interface', 'mtu_request')
+
+    def test_invalidate_capabilities(self):
+        with mock.patch.object(self.br.ovsdb, 'has_table_column',
+                               return_value=True) as mock_has_column:
+            self.assertTrue(self.br._ovs_supports_mtu_requests())
+            self.br.invalidate_capabilities()
+            self.assertTrue(self.br._ovs_supports_mtu_requests())
+            self.assertEqual(2, mock_has_column.call_count)
+
+    @mock.patch.object(linux_net, 'delete_net_dev')
+    def test_batch_single_transaction(self, mock_delete_net_dev):
+        with mock.patch.object(self.br, 'update_device_mtu'):
+            with self.br.batch() as batch:
+                self.br.ensure_ovs_bridge('br-int', None)
+                self.br.ensure_ovs_bridge('br-int', None)
+                with batch.owner('vif1'):
+                    self.br.create_ovs_vif_port(
+                        'br-int', 'dev1', 'iface1', 'ca:fe:ca:fe:ca:fe',
+                        'instance')
+                with batch.owner('vif2'):
+                    self.br.delete_ovs_vif_port('br-int', 'dev2')
+                # nothing is committed until the batch is done
+                self.mock_transaction.assert_not_called()
+                self.mock_add_br.assert_not_called()
+                mock_delete_net_dev.assert_not_called()
+
+        self.mock_transaction.assert_called_once_with(check_error=True)
+        self.mock_add_br.assert_called_once_with(
+            'br-int', may_exist=True, datapath_type=None)
+        self.mock_add_port.assert_called_once_with('br-int', 'dev1')
+        self.mock_del_port.assert_called_once_with(
+            'dev2', bridge='br-int', if_exists=True)
+        mock_delete_net_dev.assert_called_once_with('dev2')
+        self.assertEqual({'vif1': None, 'vif2': None}, batch.results)
+
+    @mock.patch.object(linux_net, 'delete_net_dev')
+    def test_batch_retries_groups_on_failure(self, mock_delete_net_dev):
+        error = RuntimeError('boom')
+
+        def _del_port(dev, **kwargs):
+            if dev == 'dev1':
+                raise error
+
+        self.mock_del_port.side_effect = _del_port
+        with self.br.batch() as batch:
+            self.br.ensure_ovs_bridge('br-int', None)
+            self.br.delete_ovs_vif_port('br-int', 'dev1')
+            self.br.delete_ovs_vif_port('br-int', 'dev2')
+
+        # one combined attempt then one per group
+        self.assertEqual(3, self.mock_transaction.call_count)
+        # the shared bridge operation is repeated in every attempt
+        self.assertEqual(3, self.mock_add_br.call_count)
+        self.assertEqual({'dev1': error, 'dev2': None}, batch.results)
+        mock_delete_net_dev.assert_called_once_with('dev2')
+
+    def test_batch_not_committed_on_error(self):
+        def _fail():
+            with self.br.batch():
+                self.br.ensure_ovs_bridge('br-int', None)
+                raise RuntimeError('boom')
+
+        self.assertRaises(RuntimeError, _fail)
+        self.mock_transaction.assert_not_called()
+        self.assertIsNone(self.br._get_batch())
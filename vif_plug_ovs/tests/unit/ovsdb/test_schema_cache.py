@@ -0,0 +1,135 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import threading
+from unittest import mock
+
+import fixtures
+from ovsdbapp.backend.ovs_idl import idlutils
+import testtools
+
+from vif_plug_ovs.ovsdb import schema_cache
+
+CONNECTION = 'tcp:127.0.0.1:6640'
+SCHEMA = {
+    'name': 'Open_vSwitch',
+    'version': '8.4.0',
+    'cksum': '2915846498 27342',
+    'tables': {'Bridge': {'columns': {'name': {'type': 'string'}}}},
+}
+NEW_SCHEMA = dict(SCHEMA, version='8.5.0', cksum='1234567890 27400')
+
+
+class SchemaCacheTest(testtools.TestCase):
+
+    def setUp(self):
+        super(SchemaCacheTest, self).setUp()
+        self.cache_dir = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'schemas')
+        self.mock_fetch = self.useFixture(fixtures.MockPatchObject(
+            idlutils, 'fetch_schema_json', return_value=SCHEMA)).mock
+        self.mock_thread = self.useFixture(fixtures.MockPatchObject(
+            threading, 'Thread')).mock
+
+    def _get_schema_json(self):
+        return schema_cache.get_schema_json(
+            CONNECTION, 'Open_vSwitch', self.cache_dir)
+
+    def _run_check(self):
+        self.mock_thread.return_value.start.assert_called_once_with()
+        kwargs = self.mock_thread.call_args.kwargs
+        kwargs['target'](*kwargs['args'])
+
+    def test_get_schema_json_no_cache(self):
+        for _ in range(2):
+            self.assertEqual(SCHEMA, schema_cache.get_schema_json(
+                CONNECTION, 'Open_vSwitch'))
+        self.assertEqual(2, self.mock_fetch.call_count)
+        self.mock_thread.assert_not_called()
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_get_schema_json_cached(self):
+        self.assertEqual(SCHEMA, self._get_schema_json())
+        self.mock_fetch.assert_called_once_with(CONNECTION, 'Open_vSwitch')
+        self.mock_thread.assert_not_called()
+
+        self.mock_fetch.reset_mock()
+        self.assertEqual(SCHEMA, self._get_schema_json())
+        # the cached schema is only checked in the background
+        self.mock_fetch.assert_not_called()
+        self._run_check()
+        self.mock_fetch.assert_called_once_with(CONNECTION, 'Open_vSwitch')
+        path = schema_cache._cache_path(
+            self.cache_dir, CONNECTION, 'Open_vSwitch')
+        self.assertEqual([os.path.basename(path)], os.listdir(self.cache_dir))
+
+    def test_get_schema_json_changed(self):
+        self._get_schema_json()
+        self.mock_fetch.return_value = NEW_SCHEMA
+
+        self.assertEqual(SCHEMA, self._get_schema_json())
+        self._run_check()
+
+        self.mock_thread.reset_mock()
+        self.mock_fetch.reset_mock()
+        self.assertEqual(NEW_SCHEMA, self._get_schema_json())
+        self.mock_fetch.assert_not_called()
+
+    def test_get_schema_json_changed_callback(self):
+        on_change = mock.Mock()
+        self._get_schema_json()
+        self.assertEqual(SCHEMA, schema_cache.get_schema_json(
+            CONNECTION, 'Open_vSwitch', self.cache_dir, on_change))
+        self._run_check()
+        on_change.assert_not_called()
+
+        self.mock_thread.reset_mock()
+        self.mock_fetch.return_value = NEW_SCHEMA
+        self.assertEqual(SCHEMA, schema_cache.get_schema_json(
+            CONNECTION, 'Open_vSwitch', self.cache_dir, on_change))
+        on_change.side_effect = Exception('boom')
+        self._run_check()
+        on_change.assert_called_once_with(NEW_SCHEMA)
+        # the new schema is cached even if the callback failed
+        self.mock_thread.reset_mock()
+        self.assertEqual(NEW_SCHEMA, self._get_schema_json())
+
+    def test_get_schema_json_check_failure(self):
+        self._get_schema_json()
+        self.mock_fetch.side_effect = Exception('connection refused')
+
+        self.assertEqual(SCHEMA, self._get_schema_json())
+        self._run_check()
+
+        self.mock_thread.reset_mock()
+        self.assertEqual(SCHEMA, self._get_schema_json())
+
+    def test_get_schema_json_invalid_cache(self):
+        os.makedirs(self.cache_dir)
+        path = schema_cache._cache_path(
+            self.cache_dir, CONNECTION, 'Open_vSwitch')
+        with open(path, 'w') as f:
+            f.write('{"tables": ')
+
+        self.assertEqual(SCHEMA, self._get_schema_json())
+        self.mock_fetch.assert_called_once_with(CONNECTION, 'Open_vSwitch')
+        self.mock_thread.assert_not_called()
+        self.assertEqual(SCHEMA, schema_cache._read(path))
+
+    def test_get_schema_json_cache_per_connection(self):
+        self._get_schema_json()
+        self.mock_fetch.return_value = NEW_SCHEMA
+
+        self.assertEqual(NEW_SCHEMA, schema_cache.get_schema_json(
+            'tcp:127.0.0.1:6641', 'Open_vSwitch', self.cache_dir))
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
@@ -18,18 +18,39 @@ from unittest import mock
 import testtools
 
 from os_vif.internal.ip.api import ip as ip_lib
+from os_vif.internal.ip import ip_command
 
 from vif_plug_ovs import exception
 from vif_plug_ovs import linux_net
 from vif_plug_ovs import privsep
 
 
+# a dual port NIC in switchdev mode with two VFs on each PF
+SWITCHDEV_PORTS = [
+    ip_command.PhysPort('enp3s0f0', '5c6f4f0003e5b1', 'p0', '0000:03:00.0'),
+    ip_command.PhysPort('enp3s0f1', '5c6f4f0003e5b1', 'p1', '0000:03:00.1'),
+    ip_command.PhysPort('enp3s0f0_0', '5c6f4f0003e5b1', 'pf0vf0', None),
+    ip_command.PhysPort('enp3s0f0_1', '5c6f4f0003e5b1', 'pf0vf1', None),
+    ip_command.PhysPort('enp3s0f1_0', '5c6f4f0003e5b1', 'pf1vf0', None),
+    ip_command.PhysPort('enp3s0f1_1', '5c6f4f0003e5b1', 'pf1vf1', None),
+]
+
+
 class LinuxNetTest(testtools.TestCase):
 
     def setUp(self):
         super(LinuxNetTest, self).setUp()
 
         privsep.vif_plug.set_client_mode(False)
+        topology = mock.patch.object(
+            linux_net, '_SRIOV_TOPOLOGY', linux_net.SriovTopology())
+        topology.start()
+        self.addCleanup(topology.stop)
+        # the netdevs are read on every representor lookup
+        subscribe_links = mock.patch.object(
+            ip_lib, 'subscribe_links', side_effect=OSError)
+        subscribe_links.start()
+        self.addCleanup(subscribe_links.stop)
 
     @mock.patch.object(linux_net, "_arp_filtering")
     @mock.patch.object(linux_net, "set_interface_state")
@@ -213,8 +234,9 @@ class LinuxNetTest(testtools.TestCase):
         ]
         mock__get_phys_switch_id.return_value = 'pf_sw_id'
         mock__get_pf_func.return_value = "0"
+        # the netdevs that are not representors are read again on a miss
         mock__get_phys_port_name.side_effect = (
-            ["p0", "1", "2"])
+            ["p0", "1", "2"] * 2)
         self.assertRaises(
             exception.RepresentorNotFound,
             linux_net.get_representor_port,
@@ -231,10 +253,11 @@ class LinuxNetTest(testtools.TestCase):
             'pf_ifname', 'rep_vf_1', 'rep_vf_2'
         ]
         mock__get_phys_switch_id.side_effect = (
-            ['pf_sw_id', 'pf_sw_id', IOError(), 'pf_sw_id', '2'])
+            ['pf_sw_id', 'pf_sw_id', IOError(), 'pf_sw_id',
+             'pf_sw_id', IOError()])
         mock__get_pf_func.return_value = "0"
         mock__get_phys_port_name.side_effect = (
-            ["p0", "pf0vf0", "pf0vf1"])
+            ["p0", "pf0vf0", "p0"])
         self.assertRaises(
             exception.RepresentorNotFound,
             linux_net.get_representor_port,
@@ -251,13 +274,139 @@ class LinuxNetTest(testtools.TestCase):
             'pf_ifname', 'rep_vf_1', 'rep_vf_2'
         ]
         mock__get_phys_switch_id.return_value = 'pf_sw_id'
-        mock__get_phys_port_name.side_effect = (['p0', '1', 'a'])
+        mock__get_phys_port_name.side_effect = (['p0', '1', 'a'] * 2)
         mock__get_pf_func.return_value = "0"
         self.assertRaises(
             exception.RepresentorNotFound,
             linux_net.get_representor_port,
             'pf_ifname', '3')
 
+    @mock.patch.object(os, 'listdir')
+    @mock.patch.object(linux_net, "_get_pf_func", return_value="0")
+    @mock.patch.object(linux_net, "_get_phys_port_name")
+    @mock.patch.object(linux_net, '_get_phys_switch_id',
+                       return_value='pf_sw_id')
+    def test_get_representor_port_incremental(
+            self, mock__get_phys_switch_id, mock__get_phys_port_name,
+            mock__get_pf_func, mock_listdir):
+        mock_listdir.return_value = ['pf_ifname', 'rep_vf_1']
+        mock__get_phys_port_name.side_effect = ['p0', 'pf0vf1']
+        self.assertEqual(
+            'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+        self.assertEqual(2, mock__get_phys_port_name.call_count)
+
+        # known netdevs are not read again, new ones are indexed
+        mock_listdir.return_value = ['pf_ifname', 'rep_vf_1', 'rep_vf_2']
+        mock__get_phys_port_name.side_effect = ['pf0vf2']
+        self.assertEqual(
+            'rep_vf_2', linux_net.get_representor_port('pf_ifname', '2'))
+        self.assertEqual(
+            'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+        self.assertEqual(3, mock__get_phys_port_name.call_count)
+
+        # removed netdevs are dropped, the PF is read again on the miss
+        mock_listdir.return_value = ['pf_ifname', 'rep_vf_2']
+        mock__get_phys_port_name.side_effect = ['p0']
+        self.assertRaises(
+            exception.RepresentorNotFound,
+            linux_net.get_representor_port, 'pf_ifname', '1')
+        self.assertEqual(4, mock__get_phys_port_name.call_count)
+
+    @mock.patch.object(os, 'listdir',
+                       return_value=['pf_ifname', 'rep_vf_1'])
+    @mock.patch.object(linux_net, '_get_ifindex')
+    @mock.patch.object(linux_net, "_get_pf_func", return_value="0")
+    @mock.patch.object(linux_net, "_get_phys_port_name")
+    @mock.patch.object(linux_net, '_get_phys_switch_id',
+                       return_value='pf_sw_id')
+    def test_get_representor_port_recreated(
+            self, mock__get_phys_switch_id, mock__get_phys_port_name,
+            mock__get_pf_func, mock__get_ifindex, mock_listdir):
+        ifindexes = {'pf_ifname': 2, 'rep_vf_1': 10}
+        mock__get_ifindex.side_effect = ifindexes.get
+        mock__get_phys_port_name.side_effect = ['p0', 'pf0vf1']
+        self.assertEqual(
+            'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+
+        # the netdev is recreated under the same name for another VF
+        ifindexes['rep_vf_1'] = 11
+        mock__get_phys_port_name.side_effect = ['pf0vf2']
+        self.assertEqual(
+            'rep_vf_1', linux_net.get_representor_port('pf_ifname', '2'))
+        mock__get_phys_port_name.side_effect = ['p0']
+        self.assertRaises(
+            exception.RepresentorNotFound,
+            linux_net.get_representor_port, 'pf_ifname', '1')
+        self.assertEqual(4, mock__get_phys_port_name.call_count)
+
+    @mock.patch.object(os, 'listdir',
+                       return_value=['pf_ifname', 'rep_vf_1'])
+    @mock.patch.object(linux_net, '_get_ifindex')
+    @mock.patch.object(linux_net, "_get_pf_func", return_value="0")
+    @mock.patch.object(linux_net, "_get_phys_port_name")
+    @mock.patch.object(linux_net, '_get_phys_switch_id',
+                       return_value='pf_sw_id')
+    def test_get_representor_port_link_events(
+            self, mock__get_phys_switch_id, mock__get_phys_port_name,
+            mock__get_pf_func, mock__get_ifindex, mock_listdir):
+        ifindexes = {'pf_ifname': 2, 'rep_vf_1': 10}
+        mock__get_ifindex.side_effect = ifindexes.get
+        subscription = mock.Mock(spec=ip_command.LinkSubscription)
+        subscription.read.return_value = []
+        with mock.patch.object(ip_lib, 'subscribe_links',
+                               return_value=subscription):
+            mock__get_phys_port_name.side_effect = ['p0', 'pf0vf1']
+            self.assertEqual(
+                'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+            self.assertEqual(
+                'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+            mock_listdir.assert_called_once_with('/sys/class/net')
+
+            # only the netdevs notified are read again or dropped
+            subscription.read.return_value = [
+                ip_command.LinkEvent(False, 11, 'rep_vf_2', None),
+                ip_command.LinkEvent(True, 10, 'rep_vf_1', None)]
+            mock__get_phys_port_name.side_effect = ['pf0vf2']
+            self.assertEqual(
+                'rep_vf_2', linux_net.get_representor_port('pf_ifname', '2'))
+            subscription.read.return_value = []
+            # the PF is read again on the miss
+            mock__get_phys_port_name.side_effect = ['p0']
+            self.assertRaises(
+                exception.RepresentorNotFound,
+                linux_net.get_representor_port, 'pf_ifname', '1')
+            mock_listdir.assert_called_once_with('/sys/class/net')
+
+            # all the netdevs are read again if notifications were lost
+            subscription.read.return_value = None
+            ifindexes['rep_vf_1'] = 12
+            mock__get_phys_port_name.side_effect = ['pf0vf1']
+            self.assertEqual(
+                'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+            self.assertEqual(2, mock_listdir.call_count)
+            self.assertEqual(5, mock__get_phys_port_name.call_count)
+
+    @mock.patch.object(os, 'listdir',
+                       return_value=['pf_ifname', 'rep_vf_1'])
+    @mock.patch.object(linux_net, "_get_pf_func", return_value="0")
+    @mock.patch.object(linux_net, "_get_phys_port_name")
+    @mock.patch.object(linux_net, '_get_phys_switch_id',
+                       return_value='pf_sw_id')
+    def test_get_representor_port_unreadable_when_indexed(
+            self, mock__get_phys_switch_id, mock__get_phys_port_name,
+            mock__get_pf_func, mock_listdir):
+        # the attributes of the representor are not readable yet
+        mock__get_phys_port_name.side_effect = ['p0', None, 'p0', None]
+        self.assertRaises(
+            exception.RepresentorNotFound,
+            linux_net.get_representor_port, 'pf_ifname', '1')
+
+        # they are read again on the next miss
+        mock__get_phys_port_name.side_effect = ['p0', 'pf0vf1']
+        self.assertEqual(
+            'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+        self.assertEqual(6, mock__get_phys_port_name.call_count)
+
     @mock.patch.object(os, 'listdir')
     @mock.patch.object(linux_net, '_get_phys_switch_id')
     @mock.patch.object(linux_net, "_get_phys_port_name")
@@ -337,6 +486,25 @@ class LinuxNetTest(testtools.TestCase):
         vf_num = linux_net.get_vf_num_by_pci_address('0000:00:00.1')
         self.assertEqual(vf_num, '3')
 
+    @mock.patch.object(os, 'readlink')
+    @mock.patch.object(glob, 'iglob')
+    def test_vf_number_indexed(self, mock_iglob, mock_readlink):
+        mock_iglob.return_value = [
+            '/sys/bus/pci/devices/0000:00:00.1/physfn/virtfn0',
+            '/sys/bus/pci/devices/0000:00:00.1/physfn/virtfn1',
+        ]
+        mock_readlink.side_effect = ['../0000:00:00.1', '../0000:00:00.2']
+        self.assertEqual(
+            '0', linux_net.get_vf_num_by_pci_address('0000:00:00.1'))
+        # the other VFs of the PF were indexed by the same scan
+        mock_readlink.side_effect = ['../0000:00:00.2']
+        self.assertEqual(
+            '1', linux_net.get_vf_num_by_pci_address('0000:00:00.2'))
+        mock_iglob.assert_called_once_with(
+            '/sys/bus/pci/devices/0000:00:00.1/physfn/virtfn*')
+        mock_readlink.assert_called_with(
+            '/sys/bus/pci/devices/0000:00:00.2/physfn/virtfn1')
+
     @mock.patch.object(os, 'readlink')
     @mock.patch.object(glob, 'iglob')
     def test_vf_number_not_found(self, mock_iglob, mock_readlink):
@@ -396,46 +564,238 @@ class LinuxNetTest(testtools.TestCase):
         phys_port_name = linux_net._get_phys_switch_id("ifname")
         self.assertIsNone(phys_port_name)
 
-    @mock.patch.object(linux_net, "_update_device_mtu")
-    @mock.patch.object(ip_lib, "set")
-    @mock.patch.object(ip_lib, "add")
-    def test_create_tap(self, mock_add, mock_set, mock_update_mtu):
+    @mock.patch.object(ip_lib, "ensure")
+    def test_create_tap(self, mock_ensure):
         """Test basic tap device creation."""
         linux_net.create_tap("tap0", 1500, "aa:bb:cc:dd:ee:ff",
                              multiqueue=False)
 
-        mock_add.assert_called_once_with("tap0", "tuntap", mode="tap",
-                                         multiqueue=False,
-                                         check_exit_code=[0, 17])
-        mock_set.assert_called_once_with("tap0", state="up",
-                                         address="aa:bb:cc:dd:ee:ff",
-                                         check_exit_code=[0, 2, 254])
-        mock_update_mtu.assert_called_once_with("tap0", 1500)
+        mock_ensure.assert_called_once_with(
+            "tap0", "tuntap", mode="tap", multiqueue=False, state="up",
+            address="aa:bb:cc:dd:ee:ff", mtu=1500,
+            check_exit_code=[0, 2, 254])
 
-    @mock.patch.object(linux_net, "_update_device_mtu")
-    @mock.patch.object(ip_lib, "set")
-    @mock.patch.object(ip_lib, "add")
-    def test_create_tap_with_multiqueue(self, mock_add, mock_set,
-                                        mock_update_mtu):
+    @mock.patch.object(ip_lib, "ensure")
+    def test_create_tap_with_multiqueue(self, mock_ensure):
         """Test tap device creation with multiqueue enabled."""
         linux_net.create_tap("tap0", 1500, "aa:bb:cc:dd:ee:ff",
                              multiqueue=True)
 
-        mock_add.assert_called_once_with("tap0", "tuntap", mode="tap",
-                                         multiqueue=True,
-                                         check_exit_code=[0, 17])
-        mock_set.assert_called_once_with("tap0", state="up",
-                                         address="aa:bb:cc:dd:ee:ff",
-                                         check_exit_code=[0, 2, 254])
-        mock_update_mtu.assert_called_once_with("tap0", 1500)
+        mock_ensure.assert_called_once_with(
+            "tap0", "tuntap", mode="tap", multiqueue=True, state="up",
+            address="aa:bb:cc:dd:ee:ff", mtu=1500,
+            check_exit_code=[0, 2, 254])
 
-    @mock.patch.object(linux_net, "_update_device_mtu")
-    @mock.patch.object(ip_lib, "set")
-    @mock.patch.object(ip_lib, "add")
-    def test_create_tap_no_mtu(self, mock_add, mock_set, mock_update_mtu):
+    @mock.patch.object(ip_lib, "ensure")
+    def test_create_tap_no_mtu(self, mock_ensure):
         """Test tap device creation without MTU."""
         linux_net.create_tap("tap0", None, "aa:bb:cc:dd:ee:ff")
 
-        mock_add.assert_called_once()
-        mock_set.assert_called_once()
-        mock_update_mtu.assert_called_once_with("tap0", None)
+        mock_ensure.assert_called_once_with(
+            "tap0", "tuntap", mode="tap", multiqueue=False, state="up",
+            address="aa:bb:cc:dd:ee:ff", mtu=None,
+            check_exit_code=[0, 2, 254])
+
+    @mock.patch.object(ip_lib, "ensure")
+    @mock.patch.object(linux_net, "delete_net_dev")
+    def test_create_veth_pair(self, mock_delete, mock_ensure):
+        linux_net.create_veth_pair("qvb0", "qvo0", 1500)
+
+        mock_delete.assert_has_calls(
+            [mock.call("qvb0"), mock.call("qvo0")])
+        mock_ensure.assert_called_once_with(
+            "qvb0", "veth", peer="qvo0", state="up", promisc=True, mtu=1500,
+            check_exit_code=[0, 2, 254])
+
+    def test_kernel_plan(self):
+        mock_ensure_bridge = mock.Mock()
+        mock_create_veth_pair = mock.Mock(
+            side_effect=[None, ValueError('boom')])
+        mock_add_bridge_port = mock.Mock()
+        plan_ops = mock.patch.dict(linux_net.PLAN_OPS, {
+            'ensure_bridge': mock_ensure_bridge,
+            'create_veth_pair': mock_create_veth_pair,
+            'add_bridge_port': mock_add_bridge_port,
+        })
+        plan_ops.start()
+        self.addCleanup(plan_ops.stop)
+        plan = linux_net.KernelPlan()
+        for group in ('vif1', 'vif2'):
+            plan.add('ensure_bridge', 'qbr-' + group, group=group)
+            plan.add('create_veth_pair', 'qvb-' + group, 'qvo-' + group,
+                     1500, group=group)
+            plan.add('add_bridge_port', 'qbr-' + group, 'qvb-' + group,
+                     group=group)
+        self.assertEqual(6, len(plan))
+
+        with mock.patch.object(linux_net, "execute_plan",
+                               side_effect=linux_net._execute_plan) as m_exec:
+            results = plan.execute()
+
+        m_exec.assert_called_once()
+        self.assertEqual(0, len(plan))
+        self.assertIsNone(results['vif1'])
+        self.assertIsInstance(results['vif2'],
+                              exception.KernelPlanStepFailed)
+        self.assertEqual(2, mock_ensure_bridge.call_count)
+        # the failed group skipped its remaining steps
+        mock_add_bridge_port.assert_called_once_with('qbr-vif1', 'qvb-vif1')
+
+    def test_kernel_plan_unknown_op(self):
+        plan = linux_net.KernelPlan()
+        self.assertRaises(ValueError, plan.add, 'execute', 'rm')
+        self.assertEqual(
+            [(linux_net.PLAN_ERROR, 'Unknown operation execute'),
+             (linux_net.PLAN_SKIPPED, None)],
+            linux_net._execute_plan([('', 'execute', ['rm']),
+                                     ('', 'ensure_bridge', ['br'])]))
+        # only the plan operations can be run, not any function of the
+        # module
+        self.assertRaises(ValueError, plan.add, 'get_representor_port',
+                          'eth0', '1')
+        self.assertEqual(
+            [(linux_net.PLAN_ERROR, 'Unknown operation _execute_plan')],
+            linux_net._execute_plan([('', '_execute_plan', [[]])]))
+
+    def test_kernel_plan_discard(self):
+        plan = linux_net.KernelPlan()
+        plan.add('ensure_bridge', 'br1', group='vif1')
+        plan.add('ensure_bridge', 'br2', group='vif2')
+        plan.discard('vif1')
+        with mock.patch.object(linux_net, 'execute_plan',
+                               return_value=[[linux_net.PLAN_OK, None]]) as m:
+            self.assertEqual({'vif2': None}, plan.execute())
+        m.assert_called_once_with([('vif2', 'ensure_bridge', ['br2'])])
+
+    @mock.patch.object(linux_net, "execute_plan")
+    def test_kernel_plan_run(self, mock_execute_plan):
+        mock_execute_plan.return_value = [
+            [linux_net.PLAN_OK, None], [linux_net.PLAN_ERROR, 'boom']]
+        plan = linux_net.KernelPlan()
+        plan.add('ensure_bridge', 'br0')
+        plan.add('set_interface_state', 'br0', 'up')
+        self.assertRaises(exception.KernelPlanStepFailed, plan.run)
+        # an empty plan does not need a privsep call
+        mock_execute_plan.reset_mock()
+        plan.run()
+        mock_execute_plan.assert_not_called()
+
+    @mock.patch.object(ip_lib, 'start_monitor')
+    @mock.patch.object(linux_net, '_start_privileged_link_monitor')
+    def test_start_link_monitor(self, mock_privileged, mock_start):
+        linux_net.start_link_monitor()
+        mock_start.assert_called_once_with()
+        mock_privileged.assert_called_once_with()
+
+    @mock.patch.object(ip_lib, 'start_monitor', side_effect=OSError)
+    @mock.patch.object(linux_net, '_start_privileged_link_monitor')
+    def test_start_link_monitor_failure(self, mock_privileged, mock_start):
+        linux_net.start_link_monitor()
+        mock_privileged.assert_not_called()
+
+
+class NetlinkSriovTopologyTest(testtools.TestCase):
+
+    def setUp(self):
+        super(NetlinkSriovTopologyTest, self).setUp()
+        self.topology = linux_net.NetlinkSriovTopology()
+        topology = mock.patch.object(
+            linux_net, '_SRIOV_TOPOLOGY', self.topology)
+        topology.start()
+        self.addCleanup(topology.stop)
+        list_phys_ports = mock.patch.object(
+            ip_lib, 'list_phys_ports', return_value=SWITCHDEV_PORTS)
+        self.mock_list_phys_ports = list_phys_ports.start()
+        self.addCleanup(list_phys_ports.stop)
+        subscribe_links = mock.patch.object(
+            ip_lib, 'subscribe_links', side_effect=OSError)
+        self.mock_subscribe_links = subscribe_links.start()
+        self.addCleanup(subscribe_links.stop)
+
+    @mock.patch.object(linux_net, '_get_pf_func')
+    @mock.patch.object(linux_net, '_get_phys_switch_id')
+    def test_get_representor_port(self, mock__get_phys_switch_id,
+                                  mock__get_pf_func):
+        self.assertEqual(
+            'enp3s0f1_1',
+            linux_net.get_representor_port('enp3s0f1', '1'))
+        self.assertEqual(
+            'enp3s0f0_1',
+            linux_net.get_representor_port('enp3s0f0', '1'))
+        mock__get_phys_switch_id.assert_not_called()
+        mock__get_pf_func.assert_not_called()
+
+    def test_get_representor_port_not_found(self):
+        self.assertRaises(
+            exception.RepresentorNotFound,
+            linux_net.get_representor_port, 'enp3s0f0', '2')
+        self.assertRaises(
+            exception.RepresentorNotFound,
+            linux_net.get_representor_port, 'eth0', '1')
+
+    def test_get_representor_port_link_events(self):
+        subscription = mock.Mock(spec=ip_command.LinkSubscription)
+        subscription.read.return_value = []
+        self.mock_subscribe_links.side_effect = None
+        self.mock_subscribe_links.return_value = subscription
+        self.assertEqual(
+            'enp3s0f0_1', linux_net.get_representor_port('enp3s0f0', '1'))
+
+        # the notified links are indexed from their attributes
+        subscription.read.return_value = [
+            ip_command.LinkEvent(True, 12, 'enp3s0f0_1', None),
+            ip_command.LinkEvent(
+                False, 20, 'enp3s0f0_2',
+                ip_command.PhysPort('enp3s0f0_2', '5c6f4f0003e5b1',
+                                    'pf0vf2', None, 20))]
+        self.assertEqual(
+            'enp3s0f0_2', linux_net.get_representor_port('enp3s0f0', '2'))
+        self.mock_list_phys_ports.assert_called_once_with()
+
+        # the links are dumped again on a miss
+        subscription.read.return_value = []
+        self.assertEqual(
+            'enp3s0f0_1', linux_net.get_representor_port('enp3s0f0', '1'))
+        self.assertEqual(2, self.mock_list_phys_ports.call_count)
+
+    @mock.patch.object(os, 'listdir')
+    @mock.patch.object(linux_net, '_get_pf_func', return_value='0')
+    @mock.patch.object(linux_net, '_get_phys_port_name')
+    @mock.patch.object(linux_net, '_get_phys_switch_id',
+                       return_value='pf_sw_id')
+    def test_get_representor_port_sysfs_fallback(
+            self, mock__get_phys_switch_id, mock__get_phys_port_name,
+            mock__get_pf_func, mock_listdir):
+        self.mock_list_phys_ports.side_effect = OSError()
+        mock_listdir.return_value = ['pf_ifname', 'rep_vf_1']
+        mock__get_phys_port_name.side_effect = ['p0', 'pf0vf1']
+        self.assertEqual(
+            'rep_vf_1', linux_net.get_representor_port('pf_ifname', '1'))
+
+    @mock.patch.object(linux_net, 'get_pf_pci_from_vf',
+                       return_value='0000:03:00.1')
+    def test_get_ifname_by_pci_address(self, mock_get_pf_pci_from_vf):
+        self.assertEqual(
+            'enp3s0f1',
+            linux_net.get_ifname_by_pci_address(
+                '0000:03:02.3', pf_interface=True, switchdev=True))
+        mock_get_pf_pci_from_vf.assert_called_once_with('0000:03:02.3')
+
+    @mock.patch.object(linux_net, '_get_ifname_by_pci_address',
+                       return_value='enp3s0f1')
+    @mock.patch.object(linux_net, 'get_pf_pci_from_vf',
+                       return_value='0000:04:00.1')
+    def test_get_ifname_by_pci_address_no_parent_dev(
+            self, mock_get_pf_pci_from_vf, mock_sysfs):
+        self.assertEqual(
+            'enp3s0f1',
+            linux_net.get_ifname_by_pci_address(
+                '0000:04:02.3', pf_interface=True, switchdev=True))
+        mock_sysfs.assert_called_once_with('0000:04:02.3', True, True)
+
+    def test_set_sriov_resolver(self):
+        linux_net.set_sriov_resolver('netlink')
+        self.assertIs(self.topology, linux_net._SRIOV_TOPOLOGY)
+        linux_net.set_sriov_resolver('sysfs')
+        self.assertIs(linux_net.SriovTopology,
+                      type(linux_net._SRIOV_TOPOLOGY))
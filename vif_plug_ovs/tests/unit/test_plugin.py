@@ -10,11 +10,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import threading
 from unittest import mock
 
 import testtools
 
 from os_vif.internal.ip.api import ip as ip_lib
+from os_vif.internal.ip import ip_command
 from os_vif import objects
 from os_vif.objects import fields
 
@@ -22,9 +24,17 @@ from vif_plug_ovs import constants
 from vif_plug_ovs import exception
 from vif_plug_ovs import linux_net
 from vif_plug_ovs import ovs
+from vif_plug_ovs.ovsdb import impl_vsctl
 from vif_plug_ovs.ovsdb import ovsdb_lib
 
 
+def _execute_plan(steps):
+    """Run a kernel plan with the linux_net functions patched by a test."""
+    with mock.patch.dict(linux_net.PLAN_OPS, {
+            op: getattr(linux_net, op) for op in linux_net.PLAN_OPS}):
+        return linux_net._execute_plan(steps)
+
+
 class PluginTest(testtools.TestCase):
 
     def __init__(self, *args, **kwargs):
@@ -157,6 +167,15 @@ class PluginTest(testtools.TestCase):
             name='demo',
             uuid='f0000000-0000-0000-0000-000000000001')
 
+    def setUp(self):
+        super(PluginTest, self).setUp()
+        # batches look the links up one at a time unless a test provides
+        # a snapshot
+        snapshot = mock.patch.object(
+            ovs.OvsPlugin, '_snapshot_links', return_value=None)
+        self.mock_snapshot_links = snapshot.start()
+        self.addCleanup(snapshot.stop)
+
     def test_is_ovs_vif(self):
         supported_vifs = (
             self.vif_ovs_hybrid,
@@ -168,6 +187,26 @@ class PluginTest(testtools.TestCase):
             self.assertTrue(ovs._is_ovs_vif(vif))
         self.assertFalse(ovs._is_ovs_vif(objects.vif.VIFGeneric()))
 
+    @mock.patch.object(linux_net, 'start_link_monitor')
+    def test_link_monitor(self, mock_start):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        mock_start.assert_not_called()
+        with mock.patch.object(plugin.config, 'link_monitor', True):
+            ovs.OvsPlugin(plugin.config)
+        mock_start.assert_called_once_with()
+
+    @mock.patch('oslo_log.versionutils.report_deprecated_feature')
+    def test_vsctl_interface_deprecated(self, mock_report):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        for interface in ('native', 'jsonrpc'):
+            with mock.patch.object(plugin.config, 'ovsdb_interface',
+                                   interface):
+                ovs.OvsPlugin(plugin.config)
+        mock_report.assert_not_called()
+        with mock.patch.object(plugin.config, 'ovsdb_interface', 'vsctl'):
+            ovs.OvsPlugin(plugin.config)
+        mock_report.assert_called_once_with(ovs.LOG.logger, mock.ANY)
+
     def test__get_vif_datapath_type(self):
         plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
         dp_type = plugin._get_vif_datapath_type(
@@ -474,6 +513,23 @@ class PluginTest(testtools.TestCase):
             vhost_server_path=None, interface_type=None, pf_pci=None,
             vf_num=None, datapath_type=None)
 
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'create_ovs_vif_port')
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'port_exists')
+    def test_create_vif_port_isolate_vif_qos_single_lookup(
+            self, mock_port_exists, mock_create_ovs_vif_port):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        mock_port_exists.return_value = False
+        with mock.patch.object(plugin.config, 'isolate_vif', True):
+            plugin._create_vif_port(
+                self.vif_ovs_system, mock.sentinel.vif_name, self.instance,
+                bridge='br-int')
+        # both the isolation and the QoS decision use the same lookup
+        mock_port_exists.assert_called_once_with(
+            mock.sentinel.vif_name, 'br-int')
+        _, kwargs = mock_create_ovs_vif_port.call_args
+        self.assertEqual(constants.DEAD_VLAN, kwargs['tag'])
+        self.assertEqual('linux-noop', kwargs['qos_type'])
+
     @mock.patch.object(ovsdb_lib.BaseOVS, 'create_ovs_vif_port')
     @mock.patch.object(ovsdb_lib.BaseOVS, 'port_exists')
     def test_create_vif_port_qos_port_bridge_true_port_exists(
@@ -573,6 +629,283 @@ class PluginTest(testtools.TestCase):
         # by libvirt so we assert _create_vif_port is not called.
         create_port.assert_not_called()
 
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ensure_ovs_bridge')
+    @mock.patch.object(ovs.OvsPlugin, "_create_vif_port")
+    def test_plug_batch_ensures_bridge_once(self, create_port,
+                                            ensure_bridge):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vif_ovs2 = objects.vif.VIFOpenVSwitch(
+            id='2d0a9f3b-3c58-4e55-9d5e-3c1a2f0c8b11',
+            address='ca:fe:de:ad:be:ee',
+            network=self.network_ovs,
+            vif_name='tap-aaa-bbb-ccc',
+            port_profile=self.profile_ovs)
+        results = plugin.plug_batch([self.vif_ovs, vif_ovs2], self.instance)
+        self.assertEqual([None, None], results)
+        ensure_bridge.assert_called_once_with('br0', 'netdev')
+
+        # outside of a batch every plug ensures the bridge again
+        plugin.plug(self.vif_ovs, self.instance)
+        self.assertEqual(2, ensure_bridge.call_count)
+
+    @mock.patch.object(linux_net, 'set_device_mtu')
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'port_exists', return_value=False)
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ovsdb')
+    def test_plug_batch_shares_transaction(self, mock_ovsdb, port_exists,
+                                           set_device_mtu):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        profile = objects.vif.VIFPortProfileOpenVSwitch(
+            interface_id='e65867e0-9340-4a7f-a256-09af6eb7a3aa',
+            datapath_type='netdev', create_port=True)
+        vifs = [
+            objects.vif.VIFOpenVSwitch(
+                id=vif_id,
+                address='ca:fe:de:ad:be:ef',
+                network=self.network_ovs,
+                vif_name='tap' + vif_id[:11],
+                port_profile=profile)
+            for vif_id in ('b679325f-ca89-4ee0-a8be-6db1409b69ea',
+                           '2d0a9f3b-3c58-4e55-9d5e-3c1a2f0c8b11')
+        ]
+        error = RuntimeError('boom')
+
+        def _add_port(bridge, dev):
+            if dev == vifs[1].vif_name:
+                raise error
+
+        mock_ovsdb.add_port.side_effect = _add_port
+        results = plugin.plug_batch(vifs, self.instance)
+        self.assertEqual([None, error], results)
+        mock_ovsdb.add_br.assert_called_with(
+            'br0', may_exist=True, datapath_type='netdev')
+        # one combined transaction and one retry per VIF
+        self.assertEqual(3, mock_ovsdb.transaction.call_count)
+
+    @mock.patch.object(ovs.OvsPlugin, '_plug')
+    def test_plug_batch_discards_failed_vif(self, _plug):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vif_ovs2 = objects.vif.VIFOpenVSwitch(
+            id='2d0a9f3b-3c58-4e55-9d5e-3c1a2f0c8b11',
+            address='ca:fe:de:ad:be:ee',
+            network=self.network_ovs,
+            vif_name='tap-aaa-bbb-ccc',
+            port_profile=self.profile_ovs)
+        error = RuntimeError('boom')
+        ops = {self.vif_ovs.id: mock.Mock(), vif_ovs2.id: mock.Mock()}
+
+        def _plug_vif(vif, instance_info):
+            batch = plugin.ovsdb._get_batch()
+            assert batch is not None
+            batch.add(vif.vif_name, ops[vif.id])
+            if vif.id == self.vif_ovs.id:
+                raise error
+
+        _plug.side_effect = _plug_vif
+        with mock.patch.object(ovsdb_lib.OVSDBBatch, '_run') as run:
+            results = plugin.plug_batch([self.vif_ovs, vif_ovs2],
+                                        self.instance)
+        # the commands queued for the failed VIF are not committed
+        self.assertEqual([error, None], results)
+        run.assert_called_once_with([ops[vif_ovs2.id]])
+
+    @mock.patch.object(ovs.OvsPlugin, '_plug')
+    def test_plug_batch_parallel(self, _plug):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vifs = [
+            objects.vif.VIFOpenVSwitch(
+                id='%08d-f95e-49fa-9edb-70239aee5a2c' % idx,
+                address='ca:fe:de:ad:be:ef',
+                network=self.network_ovs,
+                vif_name='tap%d' % idx,
+                port_profile=self.profile_ovs)
+            for idx in range(5)
+        ]
+        errors = {vifs[1].id: RuntimeError('boom'),
+                  vifs[4].id: RuntimeError('bang')}
+
+        def _plug_vif(vif, instance_info):
+            if vif.id in errors:
+                raise errors[vif.id]
+
+        _plug.side_effect = _plug_vif
+        with mock.patch.object(plugin.config, 'plug_workers', 2), \
+                mock.patch.object(plugin, '_run_batch',
+                                  wraps=plugin._run_batch) as run_batch:
+            results = plugin.plug_batch(vifs, self.instance)
+        self.assertEqual(
+            [None, errors[vifs[1].id], None, None, errors[vifs[4].id]],
+            results)
+        self.assertEqual(5, _plug.call_count)
+        run_batch.assert_has_calls(
+            [mock.call([vifs[0], vifs[2], vifs[4]], self.instance,
+                       plugin.plug),
+             mock.call([vifs[1], vifs[3]], self.instance, plugin.plug)],
+            any_order=True)
+
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'delete_ovs_bridge')
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ensure_ovs_bridge')
+    def test_bridge_operations_are_serialized(self, ensure_bridge,
+                                              delete_bridge):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        started = threading.Event()
+        release = threading.Event()
+
+        def _ensure_bridge(bridge, datapath_type):
+            started.set()
+            release.wait(5)
+
+        ensure_bridge.side_effect = _ensure_bridge
+        thread = threading.Thread(
+            target=plugin._ensure_ovs_bridge, args=('tbr-1', 'system'))
+        thread.start()
+        self.assertTrue(started.wait(5))
+
+        deleter = threading.Thread(
+            target=plugin._delete_ovs_bridge, args=('tbr-1',))
+        deleter.start()
+        # another bridge is not blocked
+        plugin._delete_ovs_bridge('tbr-2')
+        delete_bridge.assert_called_once_with('tbr-2')
+
+        release.set()
+        thread.join(5)
+        deleter.join(5)
+        delete_bridge.assert_called_with('tbr-1')
+        self.assertEqual(2, delete_bridge.call_count)
+
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ovsdb')
+    def test_bridge_operations_are_serialized_in_batch(self, mock_ovsdb):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vif = objects.vif.VIFOpenVSwitch(
+            id='b679325f-ca89-4ee0-a8be-6db1409b69ea',
+            address='ca:fe:de:ad:be:ef',
+            network=self.network_ovs_trunk,
+            vif_name='tap-xxx-yyy-zzz',
+            port_profile=self.profile_ovs)
+        events = []
+
+        def _record(name):
+            def _command(*args, **kwargs):
+                events.append(name)
+                return mock.DEFAULT
+            return _command
+
+        mock_ovsdb.add_br.side_effect = _record('add_br')
+        mock_ovsdb.del_br.side_effect = _record('del_br')
+        committing = threading.Event()
+        release = threading.Event()
+        commit = ovsdb_lib.OVSDBBatch.commit
+
+        def _commit(batch):
+            committing.set()
+            release.wait(5)
+            # the bridge is ensured in the transaction of the batch
+            commit(batch)
+            events.append('commit')
+
+        with mock.patch.object(ovsdb_lib.OVSDBBatch, 'commit',
+                               autospec=True, side_effect=_commit):
+            plugger = threading.Thread(
+                target=plugin.plug_batch, args=([vif], self.instance))
+            plugger.start()
+            self.assertTrue(committing.wait(5))
+            deleter = threading.Thread(
+                target=plugin._delete_ovs_bridge,
+                args=(self.network_ovs_trunk.bridge,))
+            deleter.start()
+            release.set()
+            plugger.join(5)
+            deleter.join(5)
+
+        # the trunk bridge is not deleted by another worker before the
+        # ports added to it by the batch are committed
+        self.assertEqual(['add_br', 'commit', 'del_br'], events)
+
+    @mock.patch.object(linux_net, 'execute_plan',
+                       side_effect=lambda steps: [
+                           [linux_net.PLAN_OK, None]] * len(steps))
+    @mock.patch.object(ip_lib, 'exists', return_value=False)
+    @mock.patch.object(impl_vsctl, '_run_vsctl', return_value='')
+    def test_vsctl_calls_hybrid(self, run_vsctl, device_exists,
+                                execute_plan):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        plugin.ovsdb.interface = 'vsctl'
+
+        plugin.plug(self.vif_ovs_hybrid, self.instance)
+        # the bridge is ensured with the lookup of the port, then the QoS
+        # records of the port are looked up and the port is created
+        self.assertEqual(3, run_vsctl.call_count)
+        args = run_vsctl.call_args_list[0][0][0]
+        self.assertIn('add-br', args)
+        self.assertIn('list-ports', args)
+
+        run_vsctl.reset_mock()
+        execute_plan.reset_mock()
+        plugin.unplug(self.vif_ovs_hybrid, self.instance)
+        # the port is deleted, then its QoS records are looked up
+        self.assertEqual(2, run_vsctl.call_count)
+        self.assertIn('del-port', run_vsctl.call_args_list[0][0][0])
+        # and the devices are deleted once the port is gone
+        execute_plan.assert_called_once()
+
+    @mock.patch.object(linux_net, 'delete_net_dev')
+    @mock.patch.object(linux_net, 'set_device_mtu')
+    @mock.patch.object(impl_vsctl, '_run_vsctl', return_value='')
+    def test_vsctl_calls_port_bridge(self, run_vsctl, set_device_mtu,
+                                     delete_net_dev):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        plugin.ovsdb.interface = 'vsctl'
+
+        with mock.patch.object(plugin.config, 'per_port_bridge', True):
+            plugin.plug(self.vif_ovs_system, self.instance)
+            # both bridges are ensured with the lookup of the port, then the
+            # QoS records of the port are looked up, the port is created and
+            # so is the patch port pair
+            self.assertEqual(4, run_vsctl.call_count)
+            args = run_vsctl.call_args_list[0][0][0]
+            self.assertEqual(2, args.count('add-br'))
+            self.assertIn('list-ports', args)
+
+            run_vsctl.reset_mock()
+            plugin.unplug(self.vif_ovs_system, self.instance)
+        # the ports and the bridge are deleted, then the QoS records of the
+        # port are looked up
+        self.assertEqual(2, run_vsctl.call_count)
+        args = run_vsctl.call_args_list[0][0][0]
+        self.assertEqual(3, args.count('del-port'))
+        self.assertIn('del-br', args)
+        self.assertEqual(3, delete_net_dev.call_count)
+
+    def test_get_lock_names(self):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        self.assertEqual({('device', 'tap-xxx-yyy-zzz')},
+                         plugin._get_lock_names(self.vif_ovs))
+        self.assertEqual(
+            {('device', 'vhub679325f-ca'),
+             ('bridge', self.network_ovs_trunk.bridge)},
+            plugin._get_lock_names(self.vif_vhostuser_trunk))
+        with mock.patch.object(plugin.config, 'per_port_bridge', True):
+            self.assertEqual(
+                {('device', 'tap-xxx-yyy-zzz'),
+                 ('bridge', 'pbb679325f-ca8')},
+                plugin._get_lock_names(self.vif_ovs))
+
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ensure_ovs_bridge')
+    def test_plug_batch_reports_per_vif_errors(self, ensure_bridge):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vif_no_profile = objects.vif.VIFOpenVSwitch(
+            id='2d0a9f3b-3c58-4e55-9d5e-3c1a2f0c8b11',
+            address='ca:fe:de:ad:be:ee',
+            network=self.network_ovs,
+            vif_name='tap-aaa-bbb-ccc')
+        results = plugin.plug_batch(
+            [vif_no_profile, self.vif_ovs], self.instance)
+        self.assertIsInstance(results[0], exception.MissingPortProfile)
+        self.assertIsNone(results[1])
+        ensure_bridge.assert_called_once_with('br0', 'netdev')
+
+    @mock.patch.object(linux_net, 'execute_plan',
+                       side_effect=_execute_plan)
     @mock.patch.object(linux_net, 'set_interface_state')
     @mock.patch.object(ovsdb_lib.BaseOVS, 'ensure_ovs_bridge')
     @mock.patch.object(ovs.OvsPlugin, '_update_vif_port')
@@ -586,7 +919,7 @@ class PluginTest(testtools.TestCase):
                              create_veth_pair, update_veth_pair,
                              add_bridge_port, _create_vif_port,
                              _update_vif_port, ensure_ovs_bridge,
-                             set_interface_state):
+                             set_interface_state, execute_plan):
         dp_type = ovs.OvsPlugin._get_vif_datapath_type(self.vif_ovs_hybrid)
         calls = {
             'device_exists': [mock.call('qvob679325f-ca')],
@@ -601,11 +934,10 @@ class PluginTest(testtools.TestCase):
                                               'up')],
             'add_bridge_port': [mock.call('qbrvif-xxx-yyy',
                                           'qvbb679325f-ca')],
-            '_update_vif_port': [mock.call(self.vif_ovs_hybrid,
-                                           'qvob679325f-ca')],
             '_create_vif_port': [mock.call(self.vif_ovs_hybrid,
                                            'qvob679325f-ca',
-                                           self.instance)],
+                                           self.instance,
+                                           set_mtu=False)],
             'ensure_ovs_bridge': [mock.call('br0', dp_type)]
         }
 
@@ -622,11 +954,14 @@ class PluginTest(testtools.TestCase):
         add_bridge_port.assert_has_calls(calls['add_bridge_port'])
         _create_vif_port.assert_has_calls(calls['_create_vif_port'])
         ensure_ovs_bridge.assert_has_calls(calls['ensure_ovs_bridge'])
+        # all the privileged calls are made with one privsep round trip
+        execute_plan.assert_called_once()
 
         # reset call stacks
 
         create_veth_pair.reset_mock()
         _create_vif_port.reset_mock()
+        execute_plan.reset_mock()
 
         # plugging existing devices should result in devices being updated
 
@@ -635,7 +970,74 @@ class PluginTest(testtools.TestCase):
         create_veth_pair.assert_not_called()
         _create_vif_port.assert_not_called()
         update_veth_pair.assert_has_calls(calls['update_veth_pair'])
-        _update_vif_port.assert_has_calls(calls['_update_vif_port'])
+        _update_vif_port.assert_not_called()
+        execute_plan.assert_called_once()
+
+    @mock.patch.object(linux_net, 'execute_plan',
+                       side_effect=_execute_plan)
+    @mock.patch.object(linux_net, 'add_bridge_port')
+    @mock.patch.object(linux_net, 'create_veth_pair')
+    @mock.patch.object(linux_net, 'ensure_bridge')
+    @mock.patch.object(ip_lib, 'exists', return_value=False)
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'port_exists', return_value=False)
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ovsdb')
+    def test_plug_batch_hybrid_single_plan(
+            self, mock_ovsdb, port_exists, device_exists, ensure_bridge,
+            create_veth_pair, add_bridge_port, execute_plan):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vif2 = objects.vif.VIFBridge(
+            id='2d0a9f3b-3c58-4e55-9d5e-3c1a2f0c8b11',
+            address='ca:fe:de:ad:be:ee',
+            network=self.network_ovs,
+            vif_name='tap-xxx-yyy-zzz',
+            bridge_name="qbrvif-aaa-bbb",
+            port_profile=self.profile_ovs)
+        error = RuntimeError('boom')
+
+        def _create_veth_pair(dev1, dev2, mtu):
+            if dev1 == 'qvb2d0a9f3b-3c':
+                raise error
+
+        create_veth_pair.side_effect = _create_veth_pair
+        results = plugin.plug_batch(
+            [self.vif_ovs_hybrid, vif2], self.instance)
+
+        execute_plan.assert_called_once()
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], exception.KernelPlanStepFailed)
+        add_bridge_port.assert_called_once_with(
+            'qbrvif-xxx-yyy', 'qvbb679325f-ca')
+        # the OVS port is only created for the VIF whose devices exist
+        mock_ovsdb.add_port.assert_called_once_with('br0', 'qvob679325f-ca')
+
+    @mock.patch.object(linux_net, 'execute_plan')
+    @mock.patch.object(ip_lib, 'exists')
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'port_exists', return_value=False)
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ovsdb')
+    def test_plug_batch_uses_link_snapshot(
+            self, mock_ovsdb, port_exists, device_exists, execute_plan):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        self.mock_snapshot_links.return_value = {
+            'qvob679325f-ca': ip_command.LinkInfo(
+                7, 0, 1500, None, 'veth')}
+        results = plugin.plug_batch([self.vif_ovs_hybrid], self.instance)
+        self.assertEqual([None], results)
+        self.mock_snapshot_links.assert_called_once_with()
+        device_exists.assert_not_called()
+        # the veth pair is known to exist so it is only updated
+        steps = execute_plan.call_args[0][0]
+        self.assertEqual(['ensure_bridge', 'update_veth_pair'],
+                         [op for _, op, _ in steps])
+
+    @mock.patch.object(ip_lib, 'exists', return_value=True)
+    def test_link_exists_after_change(self, device_exists):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        self.mock_snapshot_links.return_value = {}
+        with plugin._batch_scope():
+            self.assertFalse(plugin._link_exists('tap0'))
+            plugin._links_changed('tap0')
+            self.assertTrue(plugin._link_exists('tap0'))
+        device_exists.assert_called_once_with('tap0')
 
     @mock.patch.object(ovsdb_lib.BaseOVS, 'delete_ovs_bridge')
     @mock.patch.object(ovs.OvsPlugin, '_unplug_vif_generic')
@@ -665,22 +1067,71 @@ class PluginTest(testtools.TestCase):
         delete_port.assert_called_once()
         delete_ovs_bridge.assert_not_called()
 
+    @mock.patch.object(linux_net, 'execute_plan',
+                       side_effect=_execute_plan)
     @mock.patch.object(ovsdb_lib.BaseOVS, 'delete_ovs_bridge')
     @mock.patch.object(ovsdb_lib.BaseOVS, 'delete_ovs_vif_port')
+    @mock.patch.object(linux_net, 'delete_net_dev')
     @mock.patch.object(linux_net, 'delete_bridge')
-    def test_unplug_ovs_bridge(self, delete_bridge,
-                               delete_ovs_vif_port, delete_ovs_bridge):
+    def test_unplug_ovs_bridge(self, delete_bridge, delete_net_dev,
+                               delete_ovs_vif_port, delete_ovs_bridge,
+                               execute_plan):
         calls = {
             'delete_bridge': [mock.call('qbrvif-xxx-yyy', 'qvbb679325f-ca')],
+            'delete_net_dev': [mock.call('qvob679325f-ca')],
             'delete_ovs_vif_port': [mock.call(
-                'br0', 'qvob679325f-ca', qos_type='linux-noop'
+                'br0', 'qvob679325f-ca', delete_netdev=False,
+                qos_type='linux-noop'
             )]
         }
         plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
         plugin.unplug(self.vif_ovs_hybrid, self.instance)
         delete_bridge.assert_has_calls(calls['delete_bridge'])
+        delete_net_dev.assert_has_calls(calls['delete_net_dev'])
         delete_ovs_vif_port.assert_has_calls(calls['delete_ovs_vif_port'])
         delete_ovs_bridge.assert_not_called()
+        # the bridge and the veth pair are deleted with one privsep call
+        execute_plan.assert_called_once()
+
+    @mock.patch.object(linux_net, 'execute_plan')
+    @mock.patch.object(ovsdb_lib.BaseOVS, 'ovsdb')
+    def test_unplug_batch_hybrid_single_plan(self, mock_ovsdb,
+                                             execute_plan):
+        plugin = ovs.OvsPlugin.load(constants.PLUGIN_NAME)
+        vif2 = objects.vif.VIFBridge(
+            id='2d0a9f3b-3c58-4e55-9d5e-3c1a2f0c8b11',
+            address='ca:fe:de:ad:be:ee',
+            network=self.network_ovs,
+            vif_name='tap-xxx-yyy-zzz',
+            bridge_name="qbrvif-aaa-bbb",
+            port_profile=self.profile_ovs)
+        events = []
+
+        def _execute(steps):
+            events.append('execute_plan')
+            return [[linux_net.PLAN_OK, None]] * len(steps)
+
+        def _commit(batch):
+            events.append('commit')
+            return batch.results
+
+        execute_plan.side_effect = _execute
+        with mock.patch.object(ovsdb_lib.OVSDBBatch, 'commit',
+                               autospec=True, side_effect=_commit):
+            results = plugin.unplug_batch(
+                [self.vif_ovs_hybrid, vif2], self.instance)
+
+        self.assertEqual([None, None], results)
+        # the devices are deleted once the OVS ports are gone
+        self.assertEqual(['commit', 'execute_plan'], events)
+        self.assertEqual(
+            [(self.vif_ovs_hybrid.id, 'delete_bridge',
+              ['qbrvif-xxx-yyy', 'qvbb679325f-ca']),
+             (self.vif_ovs_hybrid.id, 'delete_net_dev', ['qvob679325f-ca']),
+             (vif2.id, 'delete_bridge',
+              ['qbrvif-aaa-bbb', 'qvb2d0a9f3b-3c']),
+             (vif2.id, 'delete_net_dev', ['qvo2d0a9f3b-3c'])],
+            execute_plan.call_args[0][0])
 
     @mock.patch.object(ovs.OvsPlugin, '_create_vif_port')
     def test_plug_ovs_vhostuser(self, _create_vif_port):
@@ -986,7 +1437,7 @@ class PluginTest(testtools.TestCase):
             'tap-xxx-yyy-zzz',
             plugin.config.network_device_mtu,
             'ca:fe:de:ad:be:ef',
-            multiqueue=False)
+            False)
 
     @mock.patch.object(linux_net, 'create_tap')
     @mock.patch.object(ovsdb_lib.BaseOVS, 'create_ovs_vif_port')
@@ -1016,7 +1467,7 @@ class PluginTest(testtools.TestCase):
             'tap-xxx-yyy-zzz',
             plugin.config.network_device_mtu,
             'ca:fe:de:ad:be:ef',
-            multiqueue=True)
+            True)
 
     @mock.patch.object(ovsdb_lib.BaseOVS, 'create_ovs_vif_port')
     @mock.patch.object(ovsdb_lib.BaseOVS, 'port_exists')